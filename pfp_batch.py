@@ -1,11 +1,16 @@
 # standard modules
 import datetime
+import json
+import logging
+import multiprocessing
 import ntpath
 import os
 import sys
+import time
 import traceback
 # 3rd party modules
 from configobj import ConfigObj
+import matplotlib.pyplot as plt
 # PFP modules
 sys.path.append("scripts")
 import pfp_cfg
@@ -18,19 +23,21 @@ import pfp_levels
 import pfp_log
 import pfp_mpt
 import pfp_plot
+import pfp_rp
 import pfp_utils
 
 def do_L1_batch(cf_level):
     logger = pfp_log.change_logger_filename("pfp_log", "L1")
+    failed = []
     for i in cf_level.keys():
         cf_file_name = os.path.split(cf_level[i])
         logger.info("Starting L1 processing with %s", cf_file_name[1])
         try:
             cf = pfp_io.get_controlfilecontents(cf_level[i])
+            incremental = pfp_io.incremental_get_info(cf)
             ds1 = pfp_levels.l1qc(cf)
-            outfilename = pfp_io.get_outfilenamefromcf(cf)
-            ncFile = pfp_io.nc_open_write(outfilename)
-            pfp_io.nc_write_series(ncFile, ds1)
+            pfp_io.incremental_truncate(ds1, incremental)
+            pfp_io.incremental_write(cf, ds1, incremental)
             msg = "Finished L1 processing with " + cf_file_name[1]
             logger.info(msg)
             logger.info("")
@@ -39,10 +46,12 @@ def do_L1_batch(cf_level):
             logger.error(msg)
             error_message = traceback.format_exc()
             logger.error(error_message)
+            failed.append(cf_level[i])
             continue
-    return
+    return failed
 def do_L2_batch(cf_level):
     logger = pfp_log.change_logger_filename("pfp_log", "L2")
+    failed = []
     for i in cf_level.keys():
         cf_file_name = os.path.split(cf_level[i])
         msg = "Starting L2 processing with " + cf_file_name[1]
@@ -50,11 +59,10 @@ def do_L2_batch(cf_level):
         try:
             cf = pfp_io.get_controlfilecontents(cf_level[i])
             infilename = pfp_io.get_infilenamefromcf(cf)
-            ds1 = pfp_io.nc_read_series(infilename)
+            incremental = pfp_io.incremental_get_info(cf)
+            ds1 = pfp_io.nc_read_series(infilename, start=incremental["start"])
             ds2 = pfp_levels.l2qc(cf, ds1)
-            outfilename = pfp_io.get_outfilenamefromcf(cf)
-            ncFile = pfp_io.nc_open_write(outfilename)
-            pfp_io.nc_write_series(ncFile, ds2)
+            pfp_io.incremental_write(cf, ds2, incremental)
             msg = "Finished L2 processing with " + cf_file_name[1]
             logger.info(msg)
             logger.info("")
@@ -63,10 +71,12 @@ def do_L2_batch(cf_level):
             logger.error(msg)
             error_message = traceback.format_exc()
             logger.error(error_message)
+            failed.append(cf_level[i])
             continue
-    return
+    return failed
 def do_L3_batch(cf_level):
     logger = pfp_log.change_logger_filename("pfp_log", "L3")
+    failed = []
     for i in cf_level.keys():
         cf_file_name = os.path.split(cf_level[i])
         msg = "Starting L3 processing with " + cf_file_name[1]
@@ -74,11 +84,11 @@ def do_L3_batch(cf_level):
         try:
             cf = pfp_io.get_controlfilecontents(cf_level[i])
             infilename = pfp_io.get_infilenamefromcf(cf)
-            ds2 = pfp_io.nc_read_series(infilename)
+            columnar = pfp_utils.get_optionskeyaslogical(cf, "ColumnarDataStructure")
+            incremental = pfp_io.incremental_get_info(cf)
+            ds2 = pfp_io.nc_read_series(infilename, columnar=columnar, start=incremental["start"])
             ds3 = pfp_levels.l3qc(cf, ds2)
-            outfilename = pfp_io.get_outfilenamefromcf(cf)
-            ncFile = pfp_io.nc_open_write(outfilename)
-            pfp_io.nc_write_series(ncFile, ds3)
+            pfp_io.incremental_write(cf, ds3, incremental)
             msg = "Finished L3 processing with " + cf_file_name[1]
             logger.info(msg)
             logger.info("")
@@ -87,10 +97,12 @@ def do_L3_batch(cf_level):
             logger.error(msg)
             error_message = traceback.format_exc()
             logger.error(error_message)
+            failed.append(cf_level[i])
             continue
-    return
+    return failed
 def do_ecostress_batch(cf_level):
     logger = pfp_log.change_logger_filename("pfp_log", "ecostress")
+    failed = []
     for i in cf_level.keys():
         cf_file_name = os.path.split(cf_level[i])
         msg = "Starting ECOSTRESS output with " + cf_file_name[1]
@@ -106,38 +118,59 @@ def do_ecostress_batch(cf_level):
             logger.error(msg)
             error_message = traceback.format_exc()
             logger.error(error_message)
+            failed.append(cf_level[i])
             continue
-    return
+    return failed
 def do_fluxnet_batch(cf_level):
     logger = pfp_log.change_logger_filename("pfp_log", "fluxnet")
+    failed = []
     for i in cf_level.keys():
         cf_file_name = os.path.split(cf_level[i])
         msg = "Starting FluxNet output with " + cf_file_name[1]
         logger.info(msg)
-        cf = pfp_io.get_controlfilecontents(cf_level[i])
-        pfp_io.fn_write_csv(cf)
-        msg = "Finished FluxNet output with " + cf_file_name[1]
-        logger.info(msg)
-        logger.info("")
-    return
+        try:
+            cf = pfp_io.get_controlfilecontents(cf_level[i])
+            pfp_io.fn_write_csv(cf)
+            msg = "Finished FluxNet output with " + cf_file_name[1]
+            logger.info(msg)
+            logger.info("")
+        except Exception:
+            msg = "Error occurred during FluxNet output " + cf_file_name[1]
+            logger.error(msg)
+            error_message = traceback.format_exc()
+            logger.error(error_message)
+            failed.append(cf_level[i])
+            continue
+    return failed
 def do_reddyproc_batch(cf_level):
     logger = pfp_log.change_logger_filename("pfp_log", "reddyproc")
+    failed = []
     for i in cf_level.keys():
         cf_file_name = os.path.split(cf_level[i])
         msg = "Starting REddyProc output with " + cf_file_name[1]
         logger.info(msg)
-        cf = pfp_io.get_controlfilecontents(cf_level[i])
-        pfp_io.reddyproc_write_csv(cf)
-        msg = "Finished REddyProc output with " + cf_file_name[1]
-        logger.info(msg)
-        logger.info("")
-    return
+        try:
+            cf = pfp_io.get_controlfilecontents(cf_level[i])
+            pfp_io.reddyproc_write_csv(cf)
+            msg = "Finished REddyProc output with " + cf_file_name[1]
+            logger.info(msg)
+            logger.info("")
+        except Exception:
+            msg = "Error occurred during REddyProc output " + cf_file_name[1]
+            logger.error(msg)
+            error_message = traceback.format_exc()
+            logger.error(error_message)
+            failed.append(cf_level[i])
+            continue
+    return failed
 def do_concatenate_batch(cf_level):
     logger = pfp_log.change_logger_filename("pfp_log", "concatenate")
+    failed = []
     for i in cf_level.keys():
         if not os.path.isfile(cf_level[i]):
             msg = " Control file " + cf_level[i] + " not found"
             logger.error(msg)
+            failed.append(cf_level[i])
             continue
         cf_file_name = os.path.split(cf_level[i])
         msg = "Starting concatenation with " + cf_file_name[1]
@@ -148,6 +181,7 @@ def do_concatenate_batch(cf_level):
             if not info["NetCDFConcatenate"]["OK"]:
                 msg = " Error occurred parsing the control file " + cf_file_name[1]
                 logger.error(msg)
+                failed.append(cf_level[i])
                 continue
             pfp_io.NetCDFConcatenate(info)
             msg = "Finished concatenation with " + cf_file_name[1]
@@ -182,14 +216,17 @@ def do_concatenate_batch(cf_level):
             logger.error(msg)
             error_message = traceback.format_exc()
             logger.error(error_message)
+            failed.append(cf_level[i])
             continue
-    return
+    return failed
 def do_climatology_batch(cf_level):
     logger = pfp_log.change_logger_filename("pfp_log", "climatology")
+    failed = []
     for i in cf_level.keys():
         if not os.path.isfile(cf_level[i]):
             msg = " Control file " + cf_level[i] + " not found"
             logger.error(msg)
+            failed.append(cf_level[i])
             continue
         cf_file_name = os.path.split(cf_level[i])
         msg = "Starting climatology with " + cf_file_name[1]
@@ -205,10 +242,12 @@ def do_climatology_batch(cf_level):
             logger.error(msg)
             error_message = traceback.format_exc()
             logger.error(error_message)
+            failed.append(cf_level[i])
             continue
-    return
+    return failed
 def do_cpd1_batch(cf_level):
     logger = pfp_log.change_logger_filename("pfp_log", "cpd1")
+    failed = []
     for i in cf_level.keys():
         cf_file_name = os.path.split(cf_level[i])
         msg = "Starting CPD (McHugh) with " + cf_file_name[1]
@@ -228,10 +267,12 @@ def do_cpd1_batch(cf_level):
             logger.error(msg)
             error_message = traceback.format_exc()
             logger.error(error_message)
+            failed.append(cf_level[i])
             continue
-    return
+    return failed
 def do_cpd2_batch(cf_level):
     logger = pfp_log.change_logger_filename("pfp_log", "cpd2")
+    failed = []
     for i in cf_level.keys():
         cf_file_name = os.path.split(cf_level[i])
         msg = "Starting CPD (Barr) with " + cf_file_name[1]
@@ -251,10 +292,12 @@ def do_cpd2_batch(cf_level):
             logger.error(msg)
             error_message = traceback.format_exc()
             logger.error(error_message)
+            failed.append(cf_level[i])
             continue
-    return
+    return failed
 def do_mpt_batch(cf_level):
     logger = pfp_log.change_logger_filename("pfp_log", "mpt")
+    failed = []
     for i in cf_level.keys():
         cf_file_name = os.path.split(cf_level[i])
         msg = "Starting MPT with " + cf_file_name[1]
@@ -274,14 +317,17 @@ def do_mpt_batch(cf_level):
             logger.error(msg)
             error_message = traceback.format_exc()
             logger.error(error_message)
+            failed.append(cf_level[i])
             continue
-    return
+    return failed
 def do_L4_batch(cf_level):
     logger = pfp_log.change_logger_filename("pfp_log", "L4")
+    failed = []
     for i in cf_level.keys():
         if not os.path.isfile(cf_level[i]):
             msg = " Control file " + cf_level[i] + " not found"
             logger.error(msg)
+            failed.append(cf_level[i])
             continue
         cf_file_name = os.path.split(cf_level[i])
         msg = "Starting L4 processing with " + cf_file_name[1]
@@ -293,11 +339,11 @@ def do_L4_batch(cf_level):
             cf_l4["Options"]["call_mode"] = "batch"
             cf_l4["Options"]["show_plots"] = "No"
             infilename = pfp_io.get_infilenamefromcf(cf_l4)
-            ds3 = pfp_io.nc_read_series(infilename)
+            columnar = pfp_utils.get_optionskeyaslogical(cf_l4, "ColumnarDataStructure")
+            incremental = pfp_io.incremental_get_info(cf_l4)
+            ds3 = pfp_io.nc_read_series(infilename, columnar=columnar, start=incremental["start"])
             ds4 = pfp_levels.l4qc(None, cf_l4, ds3)
-            outfilename = pfp_io.get_outfilenamefromcf(cf_l4)
-            ncFile = pfp_io.nc_open_write(outfilename)
-            pfp_io.nc_write_series(ncFile, ds4)
+            pfp_io.incremental_write(cf_l4, ds4, incremental)
             msg = "Finished L4 processing with " + cf_file_name[1]
             logger.info(msg)
             # now plot the fingerprints for the L4 files
@@ -326,14 +372,17 @@ def do_L4_batch(cf_level):
             logger.error(msg)
             error_message = traceback.format_exc()
             logger.error(error_message)
+            failed.append(cf_level[i])
             continue
-    return
+    return failed
 def do_L5_batch(cf_level):
     logger = pfp_log.change_logger_filename("pfp_log", "L5")
+    failed = []
     for i in cf_level.keys():
         if not os.path.isfile(cf_level[i]):
             msg = " Control file " + cf_level[i] + " not found"
             logger.error(msg)
+            failed.append(cf_level[i])
             continue
         cf_file_name = os.path.split(cf_level[i])
         msg = "Starting L5 processing with " + cf_file_name[1]
@@ -345,11 +394,11 @@ def do_L5_batch(cf_level):
             cf_l5["Options"]["call_mode"] = "batch"
             cf_l5["Options"]["show_plots"] = "No"
             infilename = pfp_io.get_infilenamefromcf(cf_l5)
-            ds4 = pfp_io.nc_read_series(infilename)
+            columnar = pfp_utils.get_optionskeyaslogical(cf_l5, "ColumnarDataStructure")
+            incremental = pfp_io.incremental_get_info(cf_l5)
+            ds4 = pfp_io.nc_read_series(infilename, columnar=columnar, start=incremental["start"])
             ds5 = pfp_levels.l5qc(None, cf_l5, ds4)
-            outfilename = pfp_io.get_outfilenamefromcf(cf_l5)
-            ncFile = pfp_io.nc_open_write(outfilename)
-            pfp_io.nc_write_series(ncFile, ds5)
+            pfp_io.incremental_write(cf_l5, ds5, incremental)
             msg = "Finished L5 processing with " + cf_file_name[1]
             logger.info(msg)
             # now plot the fingerprints for the L5 files
@@ -379,14 +428,17 @@ def do_L5_batch(cf_level):
             logger.error(msg)
             error_message = traceback.format_exc()
             logger.error(error_message)
+            failed.append(cf_level[i])
             continue
-    return
+    return failed
 def do_L6_batch(cf_level):
     logger = pfp_log.change_logger_filename("pfp_log", "L6")
+    failed = []
     for i in cf_level.keys():
         if not os.path.isfile(cf_level[i]):
             msg = " Control file " + cf_level[i] + " not found"
             logger.error(msg)
+            failed.append(cf_level[i])
             continue
         cf_file_name = os.path.split(cf_level[i])
         msg = "Starting L6 processing with " + cf_file_name[1]
@@ -398,11 +450,16 @@ def do_L6_batch(cf_level):
             cf["Options"]["call_mode"] = "batch"
             cf["Options"]["show_plots"] = "No"
             infilename = pfp_io.get_infilenamefromcf(cf)
-            ds5 = pfp_io.nc_read_series(infilename)
-            ds6 = pfp_levels.l6qc(None, cf, ds5)
-            outfilename = pfp_io.get_outfilenamefromcf(cf)
-            ncFile = pfp_io.nc_open_write(outfilename)
-            pfp_io.nc_write_series(ncFile, ds6)
+            columnar = pfp_utils.get_optionskeyaslogical(cf, "ColumnarDataStructure")
+            incremental = pfp_io.incremental_get_info(cf)
+            ds5 = pfp_io.nc_read_series(infilename, columnar=columnar, start=incremental["start"])
+            summary = (incremental["mode"] != "append")
+            ds6 = pfp_levels.l6qc(None, cf, ds5, summary=summary)
+            pfp_io.incremental_write(cf, ds6, incremental)
+            if not summary:
+                # the summary is for the whole of the spliced file
+                ds6 = pfp_io.nc_read_series(pfp_io.get_outfilenamefromcf(cf))
+                pfp_rp.L6_summary(cf, ds6)
             msg = "Finished L6 processing with " + cf_file_name[1]
             logger.info(msg)
             logger.info("")
@@ -411,7 +468,298 @@ def do_L6_batch(cf_level):
             logger.error(msg)
             error_message = traceback.format_exc()
             logger.error(error_message)
+            failed.append(cf_level[i])
+            continue
+    return failed
+batch_functions = {"l1": do_L1_batch, "l2": do_L2_batch, "l3": do_L3_batch,
+                   "ecostress": do_ecostress_batch, "fluxnet": do_fluxnet_batch,
+                   "reddyproc": do_reddyproc_batch, "concatenate": do_concatenate_batch,
+                   "climatology": do_climatology_batch, "cpd1": do_cpd1_batch,
+                   "cpd2": do_cpd2_batch, "mpt": do_mpt_batch, "l4": do_L4_batch,
+                   "l5": do_L5_batch, "l6": do_L6_batch}
+def get_batch_job_files(level, cf):
+    """
+    Purpose:
+     Return the files read and the files written by a batch job.  These are
+     used to work out which jobs depend on which other jobs.
+    Usage:
+     inputs, outputs = get_batch_job_files(level, cf)
+     where level is the processing level in lower case eg "l3", "cpd2"
+           cf is the contents of the job control file
+    Author: PRI
+    Date: October 2026
+    """
+    inputs = []
+    outputs = []
+    if "Files" not in cf:
+        return inputs, outputs
+    files = cf["Files"]
+    if level == "concatenate":
+        if "In" in files:
+            inputs = [files["In"][i] for i in files["In"].keys()]
+        if "Out" in files and "ncFileName" in files["Out"]:
+            outputs = [files["Out"]["ncFileName"]]
+    elif "in_filename" in files:
+        in_filename = pfp_io.get_infilenamefromcf(cf)
+        if level != "l1":
+            # L1 reads the raw data files, every other level reads a netCDF file
+            inputs.append(in_filename)
+        if level in ["l4", "l5", "l6"]:
+            # alternate data, climatology and CPD results
+            not_inputs = ["file_path", "in_filename", "out_filename", "plot_path"]
+            for item in files.keys():
+                if item not in not_inputs and not isinstance(files[item], dict):
+                    inputs.append(files[item])
+        if level in ["l1", "l2", "l3", "l4", "l5", "l6"]:
+            outputs.append(pfp_io.get_outfilenamefromcf(cf))
+        elif level in ["cpd1", "cpd2"] and "out_filename" in files:
+            outputs.append(pfp_io.get_outfilenamefromcf(cf))
+        elif level == "cpd1":
+            outputs.append(in_filename.replace(".nc", "_CPD_McHugh.xls"))
+        elif level == "cpd2":
+            outputs.append(in_filename.replace(".nc", "_CPD_Barr.xls"))
+        elif level == "climatology":
+            outputs.append(in_filename.replace(".nc", "_Climatology.xls"))
+        elif level == "mpt":
+            outputs.append(in_filename.replace(".nc", "_MPT.xls"))
+    inputs = [os.path.normcase(os.path.abspath(str(f))) for f in inputs]
+    outputs = [os.path.normcase(os.path.abspath(str(f))) for f in outputs]
+    return inputs, outputs
+def build_batch_jobs(cf_batch, levels, batch_log_path):
+    """
+    Purpose:
+     Build the graph of batch jobs from the batch control file.  There is one
+     job for each control file in the [Levels] section.  A job depends on the
+     jobs at earlier levels that write the files it reads, a job whose input
+     files can not be worked out depends on all jobs at earlier levels.
+     Jobs at the same level, or for different sites, are independent and can
+     be run at the same time.
+    Usage:
+     jobs = build_batch_jobs(cf_batch, levels, batch_log_path)
+     where cf_batch is the contents of the batch control file
+           levels is the list of levels to process, in order
+           batch_log_path is the directory for the log files
+    Author: PRI
+    Date: October 2026
+    """
+    jobs = []
+    for order, level in enumerate(levels):
+        for key in cf_batch["Levels"][level].keys():
+            cf_path = cf_batch["Levels"][level][key]
+            cf_name = os.path.splitext(os.path.basename(cf_path))[0]
+            name = "_".join([level, str(key), cf_name])
+            job = {"name": name, "level": level.lower(), "key": key,
+                   "control_file": cf_path, "index": len(jobs), "order": order,
+                   "log_path": os.path.join(batch_log_path, name),
+                   "inputs": [], "outputs": [], "depends_on": [],
+                   "status": "pending", "attempts": 0,
+                   "start": None, "wall_time": 0.0}
+            if os.path.isfile(cf_path):
+                cf = pfp_io.get_controlfilecontents(cf_path, mode="quiet")
+                job["inputs"], job["outputs"] = get_batch_job_files(job["level"], cf)
+            jobs.append(job)
+    for job in jobs:
+        earlier = [other for other in jobs if other["order"] < job["order"]]
+        if job["level"] != "l1" and len(job["inputs"]) == 0:
+            # don't know what this job reads so wait for everything before it
+            job["depends_on"] = [other["name"] for other in earlier]
             continue
+        for other in earlier:
+            if len(set(job["inputs"]) & set(other["outputs"])) != 0:
+                job["depends_on"].append(other["name"])
+    return jobs
+def init_batch_worker():
+    """
+    Purpose:
+     Initialise a batch worker process, plots are not shown in batch mode so
+     use a non-interactive matplotlib backend.
+    Author: PRI
+    Date: October 2026
+    """
+    plt.switch_backend("Agg")
+    return
+def run_batch_job(job):
+    """
+    Purpose:
+     Run a single batch job.  This is called by the batch scheduler, either in
+     the main process or in a worker process.  The messages from the job are
+     written to log files in the job's own log directory.
+    Usage:
+     result = run_batch_job(job)
+     where job is a job from build_batch_jobs()
+           result is a dictionary with the job name, status ("done" or
+           "failed"), the start time and the wall time in seconds
+    Author: PRI
+    Date: October 2026
+    """
+    logger = logging.getLogger("pfp_log")
+    # swap the batch log handlers for the job log handlers
+    batch_handlers = list(logger.handlers)
+    for handler in batch_handlers:
+        logger.removeHandler(handler)
+    if not os.path.isdir(job["log_path"]):
+        os.makedirs(job["log_path"])
+    # use the same log file name as the do_<level>_batch routines
+    log_name = job["level"]
+    if log_name in ["l1", "l2", "l3", "l4", "l5", "l6"]:
+        log_name = log_name.upper()
+    log_file_name = os.path.join(job["log_path"], log_name + ".log")
+    logger = pfp_log.init_logger("pfp_log", log_file_name, to_file=True, to_screen=False)
+    # the log file is written by a separate thread so logging does not hold up the job
+    pfp_log.start_queued_logging("pfp_log")
+    start = time.time()
+    try:
+        failed = batch_functions[job["level"]]({job["key"]: job["control_file"]})
+        status = "failed" if len(failed) != 0 else "done"
+    except Exception:
+        msg = "Error occurred running batch job " + job["name"]
+        logger.error(msg)
+        error_message = traceback.format_exc()
+        logger.error(error_message)
+        status = "failed"
+    wall_time = time.time() - start
+    # write any queued messages then put the batch log handlers back
+    pfp_log.stop_queued_logging("pfp_log")
+    for handler in list(logger.handlers):
+        handler.close()
+        logger.removeHandler(handler)
+    for handler in batch_handlers:
+        logger.addHandler(handler)
+    return {"name": job["name"], "status": status, "start": start, "wall_time": wall_time}
+def run_batch_jobs(jobs, nprocs=1, retries=1):
+    """
+    Purpose:
+     Run the batch jobs in the order given by their dependencies.  A job is
+     started when all of the jobs it depends on have finished, up to nprocs
+     jobs are run at the same time.  Failed jobs are tried again up to retries
+     times and jobs that depend on a job that failed are skipped.
+     The status, number of attempts, start time and wall time of each job are
+     written into the job dictionaries.
+    Usage:
+     run_batch_jobs(jobs, nprocs=4, retries=1)
+     where jobs is the list of jobs from build_batch_jobs()
+           nprocs is the number of jobs to run at the same time
+           retries is the number of times to retry a failed job
+    Author: PRI
+    Date: October 2026
+    """
+    logger = logging.getLogger("pfp_log")
+    status = dict([(job["name"], job["status"]) for job in jobs])
+    pending = list(jobs)
+    running = []
+    pool = None
+    if nprocs > 1:
+        pool = multiprocessing.Pool(processes=nprocs, initializer=init_batch_worker)
+    try:
+        while len(pending) != 0 or len(running) != 0:
+            # skip jobs that depend on a job that failed
+            for job in list(pending):
+                if any([status[name] in ["failed", "skipped"] for name in job["depends_on"]]):
+                    job["status"] = status[job["name"]] = "skipped"
+                    pending.remove(job)
+                    msg = " Skipping " + job["name"] + ", a job it depends on did not finish"
+                    logger.warning(msg)
+            # start the jobs that are ready to run
+            ready = [job for job in pending
+                     if all([status[name] == "done" for name in job["depends_on"]])]
+            if pool is None:
+                ready = ready[:1]
+            for job in ready:
+                pending.remove(job)
+                job["attempts"] += 1
+                job["status"] = status[job["name"]] = "running"
+                msg = " Starting " + job["name"] + " (attempt " + str(job["attempts"]) + ")"
+                logger.info(msg)
+                if pool is None:
+                    running.append([job, run_batch_job(job)])
+                else:
+                    running.append([job, pool.apply_async(run_batch_job, (job,))])
+            # collect the jobs that have finished
+            for item in list(running):
+                job, result = item
+                if pool is not None:
+                    if not result.ready():
+                        continue
+                    try:
+                        result = result.get()
+                    except Exception:
+                        result = {"status": "failed", "start": time.time(), "wall_time": 0.0}
+                running.remove(item)
+                if job["start"] is None:
+                    job["start"] = result["start"]
+                job["end"] = result["start"] + result["wall_time"]
+                job["wall_time"] += result["wall_time"]
+                if result["status"] == "failed" and job["attempts"] <= retries:
+                    msg = " " + job["name"] + " failed, trying again"
+                    logger.warning(msg)
+                    job["status"] = status[job["name"]] = "pending"
+                    pending.append(job)
+                    pending.sort(key=lambda j: j["index"])
+                    continue
+                job["status"] = status[job["name"]] = result["status"]
+                msg = " Finished " + job["name"] + " (" + job["status"] + ", "
+                msg += "%.1f" % job["wall_time"] + " s)"
+                if job["status"] == "done":
+                    logger.info(msg)
+                else:
+                    logger.error(msg)
+            if pool is not None and len(running) != 0:
+                time.sleep(0.1)
+    except:
+        if pool is not None:
+            pool.terminate()
+            pool = None
+        raise
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return
+def write_batch_summary(jobs, levels, start, end, file_name):
+    """
+    Purpose:
+     Write a machine-readable (JSON) summary of a batch run.  The summary
+     gives the status, number of attempts and wall time of each job and the
+     wall time and number of jobs done, failed and skipped for each level.
+    Usage:
+     write_batch_summary(jobs, levels, start, end, file_name)
+     where jobs is the list of jobs after run_batch_jobs()
+           levels is the list of levels processed
+           start and end are the start and end times of the batch run
+           file_name is the name of the summary file
+    Author: PRI
+    Date: October 2026
+    """
+    fmt = "%Y-%m-%d %H:%M:%S"
+    summary = {"start": start.strftime(fmt), "end": end.strftime(fmt),
+               "wall_time": (end - start).total_seconds(),
+               "levels": [], "jobs": []}
+    for job in jobs:
+        item = {"name": job["name"], "level": job["level"],
+                "control_file": job["control_file"], "status": job["status"],
+                "attempts": job["attempts"], "depends_on": job["depends_on"],
+                "wall_time": round(job["wall_time"], 3), "log_path": job["log_path"]}
+        for key in ["start", "end"]:
+            if job.get(key) is not None:
+                item[key] = datetime.datetime.fromtimestamp(job[key]).strftime(fmt)
+        summary["jobs"].append(item)
+    for level in levels:
+        level_jobs = [job for job in jobs if job["level"] == level.lower()]
+        item = {"level": level, "jobs": len(level_jobs)}
+        for status in ["done", "failed", "skipped"]:
+            item[status] = len([job for job in level_jobs if job["status"] == status])
+        # elapsed time from the start of the first job to the end of the last
+        started = [job for job in level_jobs if job["start"] is not None]
+        if len(started) != 0:
+            level_start = min([job["start"] for job in started])
+            level_end = max([job["end"] for job in started])
+            item["wall_time"] = round(level_end - level_start, 3)
+        else:
+            item["wall_time"] = 0.0
+        item["job_time"] = round(sum([job["wall_time"] for job in level_jobs]), 3)
+        summary["levels"].append(item)
+    with open(file_name, "w") as f:
+        json.dump(summary, f, indent=4)
     return
 def do_levels_batch(cf_batch):
     batch_log_path = pfp_log.get_batch_log_path("logfiles")
@@ -436,60 +784,45 @@ def do_levels_batch(cf_batch):
                          "concatenate", "climatology",
                          "cpd1", "cpd2", "mpt",
                          "l4", "l5", "l6"]
-    for level in levels:
+    for level in list(levels):
         if level.lower() not in processing_levels:
             msg = "Unrecognised level " + level
             logger.warning(msg)
-            continue
-        if level.lower() == "l1":
-            # L1 processing
-            do_L1_batch(cf_batch["Levels"][level])
-        elif level.lower() == "l2":
-            # L2 processing
-            do_L2_batch(cf_batch["Levels"][level])
-        elif level.lower() == "l3":
-            # L3 processing
-            do_L3_batch(cf_batch["Levels"][level])
-        elif level.lower() == "ecostress":
-            # convert netCDF files to ECOSTRESS CSV files
-            do_ecostress_batch(cf_batch["Levels"][level])
-        elif level.lower() == "fluxnet":
-            # convert netCDF files to FluxNet CSV files
-            do_fluxnet_batch(cf_batch["Levels"][level])
-        elif level.lower() == "reddyproc":
-            # convert netCDF files to REddyProc CSV files
-            do_reddyproc_batch(cf_batch["Levels"][level])
-        elif level.lower() == "concatenate":
-            # concatenate netCDF files
-            do_concatenate_batch(cf_batch["Levels"][level])
-        elif level.lower() == "climatology":
-            # climatology
-            do_climatology_batch(cf_batch["Levels"][level])
-        elif level.lower() == "cpd1":
-            # ustar threshold from change point detection
-            do_cpd1_batch(cf_batch["Levels"][level])
-        elif level.lower() == "cpd2":
-            # ustar threshold from change point detection
-            do_cpd2_batch(cf_batch["Levels"][level])
-        elif level.lower() == "mpt":
-            # ustar threshold from change point detection
-            do_mpt_batch(cf_batch["Levels"][level])
-        elif level.lower() == "l4":
-            # L4 processing
-            do_L4_batch(cf_batch["Levels"][level])
-        elif level.lower() == "l5":
-            # L5 processing
-            do_L5_batch(cf_batch["Levels"][level])
-        elif level.lower() == "l6":
-            # L6 processing
-            do_L6_batch(cf_batch["Levels"][level])
-    logger = pfp_log.change_logger_filename("pfp_log", "batch")
-    end = datetime.datetime.now()
-    msg = " Finished batch processing at " + end.strftime("%Y%m%d%H%M")
-    logger.info(msg)
+            levels.remove(level)
+    # build the job graph and run the jobs
+    nprocs = pfp_utils.get_number_of_processes(cf_batch)
+    opt = pfp_utils.get_keyvaluefromcf(cf_batch, ["Options"], "NumberOfRetries", default=1)
+    try:
+        retries = max([0, int(opt)])
+    except ValueError:
+        msg = " Unrecognised NumberOfRetries (" + str(opt) + "), using 1"
+        logger.warning(msg)
+        retries = 1
+    jobs = build_batch_jobs(cf_batch, levels, batch_log_path)
+    # the batch log and the console are written by a separate thread from here on
+    pfp_log.start_queued_logging("pfp_log")
+    try:
+        msg = " Running " + str(len(jobs)) + " jobs using " + str(nprocs) + " process(es)"
+        logger.info(msg)
+        run_batch_jobs(jobs, nprocs=nprocs, retries=retries)
+        end = datetime.datetime.now()
+        summary_file_name = os.path.join(batch_log_path, "batch_summary.json")
+        write_batch_summary(jobs, levels, start, end, summary_file_name)
+        msg = " Finished batch processing at " + end.strftime("%Y%m%d%H%M")
+        logger.info(msg)
+        msg = " Batch summary written to " + summary_file_name
+        logger.info(msg)
+    finally:
+        # write any queued messages before returning
+        pfp_log.stop_queued_logging("pfp_log")
     return
 
 if (__name__ == '__main__'):
+    # --no-cache turns off the cache of results from the expensive stages,
+    # the environment variable is inherited by any worker processes
+    if "--no-cache" in sys.argv:
+        sys.argv.remove("--no-cache")
+        os.environ["PFP_NO_CACHE"] = "1"
     # get the control file name
     if len(sys.argv) == 1:
         # not on the command line, so ask the user
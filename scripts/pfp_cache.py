@@ -0,0 +1,237 @@
+""" A disk cache for the results of the expensive stages (u* thresholds, MDS, SOLO and ER)."""
+# standard modules
+import cPickle
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import zlib
+# 3rd party modules
+import numpy
+# PFP modules
+# pfp_utils is imported in get_info() because this module is imported before
+# pfp_io by the modules that use it and pfp_utils must not be the first PFP
+# module imported (meteorologicalfunctions imports from pfp_utils)
+import cfg
+
+logger = logging.getLogger("pfp_log")
+
+# hashes of the source files of the modules used to make cache keys
+source_hashes = {}
+# modules used by all of the stages, their source is part of every cache key
+common_modules = ["constants", "meteorologicalfunctions", "pfp_cfg", "pfp_io",
+                  "pfp_ts", "pfp_utils"]
+# control file options that do not change the results of a stage
+ignore_options = ["call_mode", "show_plots", "NumberOfProcesses", "WorkspaceInMemory",
+                  "UseCache", "CachePath", "CacheSizeMB"]
+
+def get_info(cf):
+    """
+    Purpose:
+     Return a dictionary with the cache settings from the [Options] section
+     of the control file.
+     UseCache (default No) turns the cache on or off, CachePath (default
+     "cache") is the directory used to hold the cache files and CacheSizeMB
+     (default 1024) is the size above which the least recently used files
+     are removed.  A relative CachePath is taken to be relative to the
+     directory of the output file, not the current directory.  The cache is
+     always off when the PFP_NO_CACHE environment variable is set, this is
+     done by the --no-cache option of pfp_batch.py.
+    Usage:
+     cache_info = pfp_cache.get_info(cf)
+    Author: PRI
+    Date: October 2026
+    Modified:
+     October 2026 - the cache is off by default and is kept with the output file
+    """
+    import pfp_utils
+    enabled = pfp_utils.get_optionskeyaslogical(cf, "UseCache", default=False)
+    if os.environ.get("PFP_NO_CACHE", "0") not in ["", "0"]:
+        enabled = False
+    path = str(pfp_utils.get_keyvaluefromcf(cf, ["Options"], "CachePath", default="cache"))
+    if not os.path.isabs(path):
+        file_path = str(pfp_utils.get_keyvaluefromcf(cf, ["Files"], "file_path", default=""))
+        out_filename = str(pfp_utils.get_keyvaluefromcf(cf, ["Files"], "out_filename", default=""))
+        out_path = os.path.dirname(os.path.join(file_path, out_filename))
+        path = os.path.join(os.path.abspath(out_path), path)
+    opt = pfp_utils.get_keyvaluefromcf(cf, ["Options"], "CacheSizeMB", default=1024)
+    try:
+        size_mb = float(opt)
+    except ValueError:
+        msg = " Unrecognised CacheSizeMB (" + str(opt) + "), using 1024"
+        logger.warning(msg)
+        size_mb = float(1024)
+    return {"enabled": enabled, "path": path, "size_mb": size_mb}
+
+def get_cf_settings(cf, sections):
+    """
+    Purpose:
+     Return the contents of the named sections of the control file as a
+     dictionary for use with make_key.  Options that do not change the
+     results (the number of processes, plotting, the cache settings etc)
+     are left out so that changing them does not change the key.
+    Usage:
+     settings = pfp_cache.get_cf_settings(cf, ["Options", "Variables"])
+    Author: PRI
+    Date: October 2026
+    """
+    settings = {}
+    for section in sections:
+        if section in cf:
+            settings[section] = cf[section].dict()
+    for item in ignore_options:
+        if "Options" in settings and item in settings["Options"]:
+            settings["Options"].pop(item)
+    return settings
+
+def get_source_hash(module_name):
+    """ Return the SHA1 hash of the source file of the named module."""
+    file_name = os.path.splitext(sys.modules[module_name].__file__)[0] + ".py"
+    if file_name not in source_hashes:
+        with open(file_name, "rb") as f:
+            source_hashes[file_name] = hashlib.sha1(f.read()).hexdigest()
+    return source_hashes[file_name]
+
+def make_key(stage, arrays, settings, modules):
+    """
+    Purpose:
+     Return the cache key for a stage.  The key is the SHA1 hash of the stage
+     name, the input data, the settings that control the stage and the code
+     version (the PFP version, the source of the modules that do the work and
+     the source of the modules in common_modules that they use) so that a
+     change to any of these gives a new key.
+    Usage:
+     key = pfp_cache.make_key("GapFillUsingMDS", [target, driver1, driver2],
+                              settings, ["pfp_gfMDS"])
+     where arrays is a list of numpy arrays, masked arrays are allowed
+           settings is a dictionary of the options used by the stage, it must
+                    not hold things that do not change the results e.g. paths
+                    or the number of processes
+           modules is a list of the names of the modules used by the stage
+    Author: PRI
+    Date: October 2026
+    Modified:
+     October 2026 - include the source of the common modules
+    """
+    h = hashlib.sha1()
+    h.update(stage)
+    h.update(cfg.version_name + cfg.version_number)
+    # modules that have not been imported can not change the results
+    common = [m for m in common_modules if m in sys.modules and m not in modules]
+    for module_name in list(modules) + common:
+        h.update(get_source_hash(module_name))
+    for array in arrays:
+        mask = numpy.ma.getmaskarray(array)
+        data = numpy.ma.getdata(array)
+        if data.dtype == object:
+            # hash the values, not the object addresses, datetimes are hashed as datetime64
+            try:
+                data = data.astype("datetime64[us]")
+            except (TypeError, ValueError):
+                h.update(str(data.shape))
+                h.update(cPickle.dumps(data.tolist(), 2))
+                continue
+        data = numpy.ascontiguousarray(data)
+        h.update(str(data.dtype) + str(data.shape))
+        h.update(data.tobytes())
+        if numpy.any(mask):
+            h.update(numpy.packbits(mask).tobytes())
+    h.update(json.dumps(settings, sort_keys=True, default=str))
+    return h.hexdigest()
+
+def get(cache_info, key, stage):
+    """
+    Purpose:
+     Return the results stored for key or None if they are not in the cache.
+     The modification time of the cache file is updated on a hit so that the
+     least recently used files are the first to be removed.
+    Usage:
+     results = pfp_cache.get(cache_info, key, "GapFillUsingMDS")
+    Author: PRI
+    Date: October 2026
+    """
+    if not cache_info["enabled"]:
+        return None
+    file_name = os.path.join(cache_info["path"], key + ".pfc")
+    if not os.path.isfile(file_name):
+        return None
+    try:
+        with open(file_name, "rb") as f:
+            results = cPickle.loads(zlib.decompress(f.read()))
+        os.utime(file_name, None)
+    except Exception:
+        msg = " " + stage + ": unable to read cache file " + file_name + ", ignoring it"
+        logger.warning(msg)
+        return None
+    msg = " " + stage + ": using cached results (" + key[:12] + "), skipping this stage"
+    logger.info(msg)
+    return results
+
+def put(cache_info, key, results):
+    """
+    Purpose:
+     Store results in the cache under key then remove the least recently used
+     files until the cache is smaller than the size limit.  The file is
+     written under a temporary name and renamed so that other processes never
+     see a partly written file.
+    Usage:
+     pfp_cache.put(cache_info, key, results)
+     where results is any object that can be pickled, usually a dictionary
+           of numpy arrays
+    Author: PRI
+    Date: October 2026
+    """
+    if not cache_info["enabled"]:
+        return
+    path = cache_info["path"]
+    try:
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        fd, tmp_name = tempfile.mkstemp(suffix=".tmp", dir=path)
+        with os.fdopen(fd, "wb") as f:
+            f.write(zlib.compress(cPickle.dumps(results, 2), 1))
+        file_name = os.path.join(path, key + ".pfc")
+        if os.path.exists(file_name):
+            os.remove(file_name)
+        os.rename(tmp_name, file_name)
+    except (IOError, OSError) as e:
+        msg = " Unable to write to the cache in " + path + " (" + str(e) + ")"
+        logger.warning(msg)
+        return
+    evict(cache_info)
+    return
+
+def evict(cache_info):
+    """
+    Purpose:
+     Remove the least recently used cache files until the total size of the
+     cache is below cache_info["size_mb"].
+    Usage:
+     pfp_cache.evict(cache_info)
+    Author: PRI
+    Date: October 2026
+    """
+    path = cache_info["path"]
+    files = []
+    for item in os.listdir(path):
+        if not item.endswith(".pfc"):
+            continue
+        try:
+            st = os.stat(os.path.join(path, item))
+        except OSError:
+            # removed by another process
+            continue
+        files.append([st.st_mtime, st.st_size, item])
+    size_limit = cache_info["size_mb"]*1024*1024
+    total = sum([f[1] for f in files])
+    for mtime, size, item in sorted(files):
+        if total <= size_limit:
+            break
+        try:
+            os.remove(os.path.join(path, item))
+        except OSError:
+            pass
+        total = total - size
+    return
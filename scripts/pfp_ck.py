@@ -434,43 +434,93 @@ def do_diurnalcheck(cf, ds, section, series, code=5):
     Side effects:
     Author: PRI
     Date: Back in the day, tidied up in April 2020 during the COVID-19 lockdown
+    Modified: October 2026 - now done by do_diurnalchecks
     """
-    if "DiurnalCheck" not in cf[section][series].keys():
-        return
-    if "NumSd" not in cf[section][series]["DiurnalCheck"].keys():
+    do_diurnalchecks(cf, ds, section, [series], code=code)
+    return
+
+def do_diurnalchecks(cf, ds, section, series_list, code=5):
+    """
+    Purpose:
+     Do the diurnal QC check (see do_diurnalcheck) on all series in series_list
+     for which it has been requested.  The monthly diurnal statistics of all
+     series are done in one call to pfp_utils.get_grouped_stats.
+    Usage:
+     pfp_ck.do_diurnalchecks(cf, ds, "Variables", ["Fsd", "Ta", "Fc"])
+    Side effects:
+     Points outside the limits are set to missing and their QC flag is set
+     to code.
+    Author: PRI
+    Date: October 2026
+    """
+    labels = []
+    NSd = []
+    for series in series_list:
+        if series not in ds.series.keys():
+            continue
+        nsd = get_diurnalcheck_numsd(cf, section, series)
+        if nsd is None:
+            continue
+        labels.append(series)
+        NSd.append(nsd)
+    if len(labels) == 0:
         return
-    ts = float(ds.globalattributes['time_step'])
-    n = int((60./ts) + 0.5)             #Number of timesteps per hour
-    nInts = int((1440.0/ts)+0.5)        #Number of timesteps per day
-    Av = numpy.array([c.missing_value]*nInts, dtype=numpy.float64)
-    Sd = numpy.array([c.missing_value]*nInts, dtype=numpy.float64)
-    NSd = numpy.array(parse_rangecheck_limit(cf[section][series]['DiurnalCheck']['NumSd']))
-    ldt = pfp_utils.GetVariable(ds, "DateTime")
-    month = numpy.array([d.month for d in ldt["Data"]])
-    Hdh = numpy.array([(d.hour + d.minute/float(60)) for d in ldt["Data"]])
-    for m in range(1, 13):
-        mindex = numpy.where(month == m)[0]
-        if len(mindex) != 0:
-            lHdh = Hdh[mindex]
-            l2ds = ds.series[series]["Data"][mindex]
-            for i in range(nInts):
-                li = numpy.where((abs(lHdh-(float(i)/float(n)))<c.eps)&(l2ds!=float(c.missing_value)))
-                if numpy.size(li)!=0:
-                    Av[i] = numpy.mean(l2ds[li])
-                    Sd[i] = numpy.std(l2ds[li])
-                else:
-                    Av[i] = float(c.missing_value)
-                    Sd[i] = float(c.missing_value)
-            Lwr = Av - NSd[m-1]*Sd
-            Upr = Av + NSd[m-1]*Sd
-            hindex = numpy.array(n*lHdh,int)
-            index = numpy.where(((l2ds!=float(c.missing_value))&(l2ds<Lwr[hindex]))|
-                                ((l2ds!=float(c.missing_value))&(l2ds>Upr[hindex])))[0] + mindex[0]
-            ds.series[series]["Data"][index] = numpy.float64(c.missing_value)
-            ds.series[series]["Flag"][index] = numpy.int32(code)
-            ds.series[series]["Attr"]["diurnalcheck_numsd"] = cf[section][series]["DiurnalCheck"]["NumSd"]
+    data = numpy.column_stack([ds.series[label]["Data"] for label in labels])
+    reject = get_diurnalcheck_mask(ds, data, NSd)
+    for n, label in enumerate(labels):
+        index = numpy.where(reject[:, n])[0]
+        ds.series[label]["Data"][index] = numpy.float64(c.missing_value)
+        ds.series[label]["Flag"][index] = numpy.int32(code)
+        ds.series[label]["Attr"]["diurnalcheck_numsd"] = cf[section][label]["DiurnalCheck"]["NumSd"]
     return
 
+def get_diurnalcheck_numsd(cf, section, series):
+    """
+    Purpose:
+     Return the 12 monthly values of NumSd for the diurnal check of series
+     or None if the diurnal check has not been requested.
+    Usage:
+     nsd = pfp_ck.get_diurnalcheck_numsd(cf, "Variables", "Fc")
+    Author: PRI
+    Date: October 2026
+    """
+    if "DiurnalCheck" not in cf[section][series].keys():
+        return None
+    if "NumSd" not in cf[section][series]["DiurnalCheck"].keys():
+        return None
+    nsd = parse_rangecheck_limit(cf[section][series]["DiurnalCheck"]["NumSd"])
+    if len(nsd) != 12:
+        msg = " Diurnal check: NumSd for " + series + " must have 12 values, skipping ..."
+        logger.error(msg)
+        return None
+    return nsd
+
+def get_diurnalcheck_mask(ds, data, NSd):
+    """
+    Purpose:
+     Return a boolean array that is True where the data lie outside the
+     monthly diurnal average +/- NumSd*standard deviation.
+    Usage:
+     reject = pfp_ck.get_diurnalcheck_mask(ds, data, NSd)
+     where data is a 2D array with a column for each variable
+           NSd is a list with the 12 monthly values of NumSd for each variable
+    Author: PRI
+    Date: October 2026
+    """
+    # groups are the time of day in each month
+    groups, ngroups = pfp_utils.get_diurnal_groups(ds)
+    nperday = ngroups/12
+    stats = pfp_utils.get_grouped_stats(data, groups, ngroups, stats=["Av", "Sd"])
+    # number of standard deviations for each group and series
+    NSd = numpy.array(NSd, dtype=numpy.float64).T[numpy.arange(ngroups)//nperday]
+    # no limits for groups without data
+    Lwr = numpy.ma.filled(stats["Av"] - NSd*stats["Sd"], -numpy.inf)
+    Upr = numpy.ma.filled(stats["Av"] + NSd*stats["Sd"], numpy.inf)
+    on_step = (groups >= 0).reshape((-1, 1))
+    gi = numpy.where(groups >= 0, groups, 0)
+    return (on_step & (abs(data - float(c.missing_value)) > c.eps) &
+            ((data < Lwr[gi]) | (data > Upr[gi])))
+
 def do_EC155check(cf,ds):
     """
     Purpose:
@@ -926,6 +976,19 @@ def do_rangecheck(cf, ds, section, series, code=2):
     return
 
 def do_qcchecks(cf,ds,mode="verbose"):
+    """
+    Purpose:
+     Do the QC checks (range, lower, upper, diurnal, EPQCFlag, exclude dates,
+     exclude hours and dependency) requested in the control file.
+    Usage:
+     pfp_ck.do_qcchecks(cf, ds)
+    Author: PRI
+    Date: Back in the day
+    Modified:
+     October 2026 - the QC options are parsed once into a QC plan which is
+                    then applied to all series at the same time, see
+                    get_qcplan and apply_qcplan
+    """
     if "nc_level" in ds.globalattributes:
         level = str(ds.globalattributes["nc_level"])
         if mode!="quiet": logger.info(" Doing the QC checks at level "+str(level))
@@ -941,28 +1004,356 @@ def do_qcchecks(cf,ds,mode="verbose"):
         msg = " do_qcchecks: Variables, Drivers or Fluxes section not found in control file, skipping QC checks ..."
         logger.warning(msg)
         return
-    # loop over the series specified in the control file
-    # first time for general QC checks
+    # check the series are in the data structure
     for series in series_list:
-        # check the series is in the data structure
         if series not in ds.series.keys():
             if mode!="quiet":
                 msg = " do_qcchecks: series "+series+" not found in data structure, skipping ..."
                 logger.warning(msg)
+    series_list = [series for series in series_list if series in ds.series.keys()]
+    # parse the QC options once then apply them to all series
+    qcplan = get_qcplan(cf, ds, section, series_list)
+    apply_qcplan(cf, ds, qcplan)
+    return
+
+def get_qcplan(cf, ds, section, series_list):
+    """
+    Purpose:
+     Parse the QC options for the series in series_list into a QC plan.
+     The plan holds a table of rules for each QC check with the limits,
+     dates and hours already converted to numbers and indices so that
+     apply_qcplan can do each check on all series at once.
+     The dependency checks are put in an order where each precursor is
+     checked before the series that depend on it.
+    Usage:
+     qcplan = pfp_ck.get_qcplan(cf, ds, "Variables", ["Fsd", "Ta", "Fc"])
+    Author: PRI
+    Date: October 2026
+    """
+    ldt = ds.series["DateTime"]["Data"]
+    ts = ds.globalattributes["time_step"]
+    nrecs = len(pfp_utils.get_datetime64(ds))
+    qcplan = {"section": section, "labels": [], "others": [], "attr": {},
+              "range": {"rows": [], "lower": [], "upper": []},
+              "lower": [], "upper": [],
+              "diurnal": {"rows": [], "NSd": []},
+              "epqc": [], "excludedates": [], "excludehours": [],
+              "winddirection": [], "dependency": {}}
+    for series in series_list:
+        cfs = cf[section][series]
+        # dependency check, code=23
+        rule = get_qcplan_dependency(cf, section, series)
+        if rule is not None:
+            qcplan["dependency"][series] = rule
+        # series that are not float64 with one value per time step are done
+        # one at a time by do_qcchecks_oneseries
+        data = ds.series[series]["Data"]
+        if (not isinstance(data, numpy.ndarray) or data.dtype != numpy.float64 or
+            data.ndim != 1 or len(data) != nrecs):
+            qcplan["others"].append(series)
             continue
-        # if so, do the QC checks
-        do_qcchecks_oneseries(cf,ds,section,series)
-    # loop over the series in the control file
-    # second time for dependencies
+        row = len(qcplan["labels"])
+        qcplan["labels"].append(series)
+        attr = qcplan["attr"][series] = []
+        # range check, code=2
+        if "RangeCheck" in cfs.keys():
+            if ("lower" not in cfs["RangeCheck"].keys() or
+                "upper" not in cfs["RangeCheck"].keys()):
+                msg = "RangeCheck: key not found in control file for "+series+", skipping ..."
+                logger.warning(msg)
+            else:
+                upr = parse_rangecheck_limit(cfs["RangeCheck"]["upper"])
+                lwr = parse_rangecheck_limit(cfs["RangeCheck"]["lower"])
+                if len(upr) != 12:
+                    msg = " Need 12 'upper' values, got "+str(len(upr))+" for "+series
+                    logger.error(msg)
+                elif len(lwr) != 12:
+                    msg = " Need 12 'lower' values, got "+str(len(lwr))+" for "+series
+                    logger.error(msg)
+                else:
+                    qcplan["range"]["rows"].append(row)
+                    qcplan["range"]["lower"].append(lwr)
+                    qcplan["range"]["upper"].append(upr)
+                    attr.append(["rangecheck_lower", cfs["RangeCheck"]["lower"]])
+                    attr.append(["rangecheck_upper", cfs["RangeCheck"]["upper"]])
+                    attr.append(["valid_range", repr(numpy.min(lwr)) + "," + repr(numpy.max(upr))])
+        # lower and upper checks, code=2
+        for check in ["LowerCheck", "UpperCheck"]:
+            if check not in cfs:
+                continue
+            if len(cfs[check].keys()) == 0:
+                msg = "do_" + check.lower() + ": no date ranges specified"
+                logger.info(msg)
+                continue
+            for n, item in enumerate(list(cfs[check].keys())):
+                info = cfs[check][item]
+                if isinstance(info, basestring):
+                    attr.append([check.lower() + "_" + str(n), info])
+                    info = info.split(",")
+                else:
+                    attr.append([check.lower() + "_" + str(n), str(info)])
+                start_date = dateutil.parser.parse(info[0])
+                end_date = dateutil.parser.parse(info[2])
+                si = pfp_utils.GetDateIndex(ldt, start_date, ts=ts, default=0, match="exact")
+                ei = pfp_utils.GetDateIndex(ldt, end_date, ts=ts, default=len(ldt)-1, match="exact")
+                rule = [row, si, ei, float(info[1]), float(info[3])]
+                qcplan[check[:5].lower()].append(rule)
+        # diurnal check, code=5
+        nsd = get_diurnalcheck_numsd(cf, section, series)
+        if nsd is not None:
+            qcplan["diurnal"]["rows"].append(row)
+            qcplan["diurnal"]["NSd"].append(nsd)
+            attr.append(["diurnalcheck_numsd", cfs["DiurnalCheck"]["NumSd"]])
+        # EddyPro QC flag check, code=9
+        rule = get_qcplan_epqc(cfs, series)
+        if rule is not None:
+            qcplan["epqc"].append([row] + rule)
+        # exclude dates, code=6
+        if "ExcludeDates" in cfs.keys():
+            for i in range(len(cfs["ExcludeDates"].keys())):
+                exclude_dates_string = cfs["ExcludeDates"][str(i)]
+                exclude_dates_list = exclude_dates_string.split(",")
+                if len(exclude_dates_list) == 1:
+                    try:
+                        dt = datetime.datetime.strptime(exclude_dates_list[0].strip(),'%Y-%m-%d %H:%M')
+                        si = pfp_utils.find_nearest_value(ldt, dt)
+                        ei = si + 1
+                    except ValueError:
+                        si = 0
+                        ei = -1
+                elif len(exclude_dates_list) == 2:
+                    try:
+                        dt = datetime.datetime.strptime(exclude_dates_list[0].strip(),'%Y-%m-%d %H:%M')
+                        si = pfp_utils.find_nearest_value(ldt, dt)
+                    except ValueError:
+                        si = 0
+                    try:
+                        dt = datetime.datetime.strptime(exclude_dates_list[1].strip(),'%Y-%m-%d %H:%M')
+                        ei = pfp_utils.find_nearest_value(ldt, dt)
+                    except ValueError:
+                        ei = -1
+                    if si == ei:
+                        ei = si + 1
+                else:
+                    msg = "ExcludeDates: bad date string ("+exclude_dates_string+"), skipping ..."
+                    logger.warning(msg)
+                    break
+                qcplan["excludedates"].append([row, si, ei])
+                attr.append(["ExcludeDates_"+str(i), exclude_dates_string])
+        # exclude hours, code=7
+        if "ExcludeHours" in cfs.keys():
+            for i in range(len(cfs["ExcludeHours"].keys())):
+                exclude_hours_string = cfs["ExcludeHours"][str(i)]
+                ExcludeHourList = exclude_hours_string.split(",")
+                try:
+                    dt = datetime.datetime.strptime(ExcludeHourList[0],'%Y-%m-%d %H:%M')
+                    si = pfp_utils.find_nearest_value(ldt, dt)
+                except ValueError:
+                    si = 0
+                try:
+                    dt = datetime.datetime.strptime(ExcludeHourList[1],'%Y-%m-%d %H:%M')
+                    ei = pfp_utils.find_nearest_value(ldt, dt)
+                except ValueError:
+                    ei = -1
+                hours = []
+                for item in ExcludeHourList[2:]:
+                    dt = datetime.datetime.strptime(item,'%H:%M')
+                    hours.append(60*dt.hour + dt.minute)
+                if len(hours) != 0:
+                    qcplan["excludehours"].append([row, si, ei, hours])
+                    attr.append(["ExcludeHours_"+str(i), exclude_hours_string])
+        # wind direction correction
+        if "CorrectWindDirection" in cfs.keys():
+            qcplan["winddirection"].append(series)
+    qcplan["dependency_order"] = get_qcplan_dependency_order(qcplan["dependency"], series_list)
+    return qcplan
+
+def get_qcplan_epqc(cfs, series):
+    """ Return the [sources, rejects] for the EPQCFlagCheck of series or None."""
+    if "EPQCFlagCheck" not in cfs.keys():
+        return None
+    for item in ["source", "reject"]:
+        if item not in cfs["EPQCFlagCheck"]:
+            msg = "  EPQCFlagCheck: '" + item + "' key not found for (" + series + ")"
+            logger.error(msg)
+            return None
+        if not isinstance(cfs["EPQCFlagCheck"][item], basestring):
+            msg = "  EPQCFlagCheck: '" + item + "' value must be a string (" + series + ")"
+            logger.error(msg)
+            return None
+    source_list = pfp_cfg.cfg_string_to_list(cfs["EPQCFlagCheck"]["source"])
+    reject_list = [float(value) for value in pfp_cfg.cfg_string_to_list(cfs["EPQCFlagCheck"]["reject"])]
+    return [source_list, reject_list]
+
+def get_qcplan_dependency(cf, section, series):
+    """ Return the [source_list, ignore_missing] for the DependencyCheck of series or None."""
+    if "DependencyCheck" not in cf[section][series].keys():
+        return None
+    if "source" not in cf[section][series]["DependencyCheck"]:
+        msg = " DependencyCheck: keyword Source not found for series " + series + ", skipping ..."
+        logger.error(msg)
+        return None
+    source_string = cf[section][series]["DependencyCheck"]["source"]
+    if "," in source_string:
+        source_list = source_string.split(",")
+    else:
+        source_list = [source_string]
+    opt = pfp_utils.get_keyvaluefromcf(cf, [section,series,"DependencyCheck"], "ignore_missing", default="no")
+    ignore_missing = (opt.lower() in ["yes", "y", "true", "t"])
+    return [source_list, ignore_missing]
+
+def get_qcplan_dependency_order(rules, series_list):
+    """
+    Purpose:
+     Return the series with dependency checks in an order where every
+     precursor that has its own dependency check comes before the series
+     that depend on it, otherwise the order is that of series_list.  Series
+     in a circular dependency are done in the order of series_list.
+    Usage:
+     order = pfp_ck.get_qcplan_dependency_order(qcplan["dependency"], series_list)
+    Author: PRI
+    Date: October 2026
+    """
+    order = []
+    state = {}
+    def visit(series, path):
+        if state.get(series) == "done":
+            return
+        if state.get(series) == "visiting":
+            msg = " DependencyCheck: circular dependency (" + ",".join(path + [series]) + ")"
+            logger.warning(msg)
+            return
+        state[series] = "visiting"
+        for item in rules[series][0]:
+            if item in rules and item != series:
+                visit(item, path + [series])
+        state[series] = "done"
+        order.append(series)
     for series in series_list:
-        # check the series is in the data structure
-        if series not in ds.series.keys():
-            if mode!="quiet":
-                msg = " do_qcchecks: series "+series+" not found in data structure, skipping ..."
+        if series in rules:
+            visit(series, [])
+    return order
+
+def apply_qcplan(cf, ds, qcplan):
+    """
+    Purpose:
+     Apply a QC plan made by get_qcplan.  The data and QC flags of all
+     series in the plan are put in 2D blocks (one row per series) and each
+     check is done as a mask over the rows it applies to.  The checks are
+     done in the same order as do_qcchecks_oneseries so the QC flags are
+     the same, points rejected by more than one check get the flag of the
+     last check.  The dependency checks are done last, in the order given
+     by get_qcplan_dependency_order, and each series is masked once using
+     the flags of all of its precursors.
+     Series that can not go in the blocks (not float64) are done one at a
+     time by do_qcchecks_oneseries.
+    Usage:
+     pfp_ck.apply_qcplan(cf, ds, qcplan)
+    Side effects:
+     The data, QC flags and attributes of the series in the plan are updated.
+    Author: PRI
+    Date: October 2026
+    """
+    for series in qcplan["others"]:
+        do_qcchecks_oneseries(cf, ds, qcplan["section"], series)
+    if len(qcplan["labels"]) != 0:
+        apply_qcplan_block(cf, ds, qcplan)
+    apply_qcplan_dependency(ds, qcplan)
+    return
+
+def apply_qcplan_block(cf, ds, qcplan):
+    """ Apply the QC checks, other than the dependency checks, to the series in the 2D blocks."""
+    labels = qcplan["labels"]
+    missing = float(c.missing_value)
+    data = numpy.array([numpy.ma.filled(ds.series[label]["Data"], missing) for label in labels],
+                       dtype=numpy.float64)
+    flag = numpy.array([ds.series[label]["Flag"] for label in labels], dtype=numpy.int32)
+    dt64 = pfp_utils.get_datetime64(ds)
+    # range check, code=2, missing data is also flagged as in do_rangecheck
+    rows = qcplan["range"]["rows"]
+    if len(rows) != 0:
+        month = dt64.astype("datetime64[M]").astype(numpy.int64) % 12
+        lwr = numpy.array(qcplan["range"]["lower"])[:, month]
+        upr = numpy.array(qcplan["range"]["upper"])[:, month]
+        block = data[rows]
+        reject = (block < lwr) | (block > upr)
+        block[reject] = missing
+        data[rows] = block
+        block = flag[rows]
+        block[reject] = numpy.int32(2)
+        flag[rows] = block
+    # lower and upper checks, code=2
+    for check, sign in [["lower", 1.0], ["upper", -1.0]]:
+        for row, si, ei, su, eu in qcplan[check]:
+            seg = data[row, si:ei+1]
+            limit = numpy.interp(numpy.arange(si, ei+1, 1), [si, ei], [su, eu])
+            index = numpy.where((abs(seg - missing) > c.eps) & (sign*(seg - limit) < 0))[0] + si
+            data[row, index] = missing
+            flag[row, index] = numpy.int32(2)
+    # diurnal check, code=5
+    rows = qcplan["diurnal"]["rows"]
+    if len(rows) != 0:
+        reject = get_diurnalcheck_mask(ds, data[rows].T, qcplan["diurnal"]["NSd"]).T
+        block = data[rows]
+        block[reject] = missing
+        data[rows] = block
+        block = flag[rows]
+        block[reject] = numpy.int32(5)
+        flag[rows] = block
+    # EddyPro QC flag check, code=9, the flags are taken from the data structure
+    for row, source_list, reject_list in qcplan["epqc"]:
+        reject = numpy.zeros(data.shape[1], dtype=bool)
+        for source in source_list:
+            if source not in ds.series.keys():
+                msg = "  EPQCFlagCheck: source " + source + " not found for (" + labels[row] + ")"
+                logger.error(msg)
+                continue
+            epflag = numpy.asarray(ds.series[source]["Data"], dtype=numpy.float64)
+            ok = abs(epflag - missing) > c.eps
+            for value in reject_list:
+                reject = reject | (ok & numpy.isclose(epflag, value))
+        data[row, reject] = missing
+        flag[row, reject] = numpy.int32(9)
+    # exclude dates, code=6
+    for row, si, ei in qcplan["excludedates"]:
+        data[row, si:ei] = missing
+        flag[row, si:ei] = numpy.int32(6)
+    # exclude hours, code=7
+    if len(qcplan["excludehours"]) != 0:
+        tod = (dt64.astype("datetime64[m]") - dt64.astype("datetime64[D]")).astype(numpy.int64)
+        for row, si, ei, hours in qcplan["excludehours"]:
+            index = numpy.where(numpy.in1d(tod[si:ei], hours))[0] + si
+            data[row, index] = missing
+            flag[row, index] = numpy.int32(7)
+    # put the data, flags and attributes back into the data structure
+    for row, label in enumerate(labels):
+        ds.series[label]["Data"] = data[row]
+        ds.series[label]["Flag"] = flag[row]
+        for name, value in qcplan["attr"][label]:
+            ds.series[label]["Attr"][name] = value
+    for label in qcplan["winddirection"]:
+        pfp_ts.CorrectWindDirection(cf, ds, label)
+    return
+
+def apply_qcplan_dependency(ds, qcplan):
+    """ Apply the dependency checks, precursors before the series that depend on them."""
+    missing = float(c.missing_value)
+    for series in qcplan["dependency_order"]:
+        source_list, ignore_missing = qcplan["dependency"][series]
+        reject = numpy.zeros(len(ds.series[series]["Data"]), dtype=bool)
+        for item in source_list:
+            if item not in ds.series.keys():
+                msg = " DependencyCheck: "+series+" precursor series "+item+" not found, skipping ..."
                 logger.warning(msg)
-            continue
-        # if so, do dependency check
-        do_dependencycheck(cf,ds,section,series,code=23,mode="quiet")
+                continue
+            not_ok = numpy.mod(ds.series[item]["Flag"], 10) != 0
+            if ignore_missing:
+                not_ok = not_ok & ~numpy.isclose(ds.series[item]["Data"], missing)
+            reject = reject | not_ok
+        ds.series[series]["Data"][reject] = missing
+        ds.series[series]["Flag"][reject] = numpy.int32(23)
+        ds.series[series]["Attr"]["DependencyCheck_source"] = str(source_list)
+    return
 
 def do_qcchecks_oneseries(cf, ds, section, series):
     if len(section) == 0:
@@ -9,8 +9,8 @@ import time
 # 3rd party modules
 from scipy.interpolate import griddata
 import matplotlib.pyplot as plt
+import netCDF4
 import numpy
-import xlwt
 # PFP modules
 import constants as c
 import pfp_ck
@@ -82,58 +82,48 @@ def write_data_1columnpermonth(xlSheet, data, ts, format_string=''):
     nrows = numpy.shape(data)[0]
     ncols = numpy.shape(data)[1]
     xlSheet.write(1,xlCol,'Hour')
-    for j in range(nrows+1):
-        xlSheet.write(j+2,xlCol,float(j)*ts/60)
+    xlSheet.write_column(2, xlCol, numpy.arange(nrows+1)*float(ts)/60)
     xlCol = xlCol + 1
-    if len(format_string)!=0:
-        d_xf = xlwt.easyxf(num_format_str=format_string)
-    else:
-        d_xf = xlwt.easyxf()
+    d_xf = format_string if len(format_string)!=0 else None
     for m in range(1,ncols+1):
         xlSheet.write(0,xlCol,calendar.month_abbr[m])
         xlSheet.write(1,xlCol,'Av')
-        for j in range(nrows):
-            xlSheet.write(j+2,xlCol,data[j,m-1],d_xf)
+        xlSheet.write_column(2, xlCol, data[:,m-1], num_format=d_xf)
         xlCol = xlCol + 1
 
 def write_data_1columnpertimestep(xlSheet, data, ts, startdate=None, format_string=''):
     tmp = data.copy()
     if numpy.ma.isMA(tmp): tmp = numpy.ma.filled(tmp,float(c.missing_value))
+    tmp = numpy.asarray(tmp, dtype=numpy.float64)
     xlCol = 0
-    # write the data to the xl file
+    # write the data to the xl file, one column per time step
     xlSheet.write(1,xlCol,'Day')
     nrows = numpy.shape(tmp)[0]
     ncols = numpy.shape(tmp)[1]
     if startdate is None:
-        for j in range(nrows+1):
-            xlSheet.write(j+2,xlCol,j)
+        xlSheet.write_column(2, xlCol, numpy.arange(nrows+1))
     else:
-        d_xf = xlwt.easyxf(num_format_str='dd/mm/yyyy')
-        for j in range(nrows):
-            d = startdate + datetime.timedelta(days=j)
-            xlSheet.write(j+2,xlCol,d,d_xf)
+        days = [startdate + datetime.timedelta(days=j) for j in range(nrows)]
+        xlSheet.write_column(2, xlCol, days, num_format='dd/mm/yyyy')
     xlCol = xlCol + 1
-    if len(format_string)!=0:
-        d_xf = xlwt.easyxf(num_format_str=format_string)
-    else:
-        d_xf = xlwt.easyxf()
+    d_xf = format_string if len(format_string)!=0 else None
+    xlSheet.write_row(1, xlCol, numpy.arange(1, ncols+1)*float(ts)/60)
     for m in range(1,ncols+1):
-        xlSheet.write(1,xlCol,float(m)*ts/60)
-        for j in range(nrows):
-            xlSheet.write(j+2,xlCol,float(tmp[j,m-1]),d_xf)
+        xlSheet.write_column(2, xlCol, tmp[:,m-1], num_format=d_xf)
         xlCol = xlCol + 1
 
 def do_diurnalstats(Month, Hdh, data, xlSheet, format_string='',ts=30):
     xlCol = 0
-    nInts = 24*int((60/ts)+0.5)
+    d_xf = format_string if len(format_string)!=0 else None
+    # statistics for all months in one go, groups are the time of day in each month
+    tod, nInts = pfp_utils.get_tod_index(Hdh, ts)
+    groups = numpy.where(tod >= 0, (numpy.asarray(Month, dtype=int)-1)*nInts + tod, -1)
+    stats = pfp_utils.get_grouped_stats(data, groups, 12*nInts)
+    Hr = numpy.ma.array(numpy.arange(nInts)*float(ts)/60.)
     Av_all = numpy.ma.zeros([nInts,12]) + float(c.missing_value)
-    if len(format_string)!=0:
-        d_xf = xlwt.easyxf(num_format_str=format_string)
-    else:
-        d_xf = xlwt.easyxf()
     for m in range(1,13):
-        mi = numpy.where(Month==m)[0]
-        Num,Hr,Av,Sd,Mx,Mn = get_diurnalstats(Hdh[mi],data[mi],ts)
+        mi = slice((m-1)*nInts, m*nInts)
+        Num,Av,Sd,Mx,Mn = [stats[item][mi] for item in ["Num","Av","Sd","Mx","Mn"]]
         Av_all[:,m-1] = Av[:]
         Num = numpy.ma.filled(Num,float(c.missing_value))
         Hr = numpy.ma.filled(Hr,float(c.missing_value))
@@ -143,44 +133,24 @@ def do_diurnalstats(Month, Hdh, data, xlSheet, format_string='',ts=30):
         Mn = numpy.ma.filled(Mn,float(c.missing_value))
         if m==1:
             xlSheet.write(1,xlCol,'Hour')
-            for j in range(len(Hr)):
-                xlSheet.write(j+2,xlCol,Hr[j])
+            xlSheet.write_column(2, xlCol, Hr)
             xlCol = xlCol + 1
         xlSheet.write(0,xlCol,calendar.month_abbr[m])
-        xlSheet.write(1,xlCol,'Num')
-        xlSheet.write(1,xlCol+1,'Av')
-        xlSheet.write(1,xlCol+2,'Sd')
-        xlSheet.write(1,xlCol+3,'Mx')
-        xlSheet.write(1,xlCol+4,'Mn')
-        for j in range(len(Hr)):
-            xlSheet.write(j+2,xlCol,Num[j])
-            xlSheet.write(j+2,xlCol+1,Av[j],d_xf)
-            xlSheet.write(j+2,xlCol+2,Sd[j],d_xf)
-            xlSheet.write(j+2,xlCol+3,Mx[j],d_xf)
-            xlSheet.write(j+2,xlCol+4,Mn[j],d_xf)
+        xlSheet.write_row(1, xlCol, ['Num', 'Av', 'Sd', 'Mx', 'Mn'])
+        xlSheet.write_column(2, xlCol, Num)
+        xlSheet.write_column(2, xlCol+1, Av, num_format=d_xf)
+        xlSheet.write_column(2, xlCol+2, Sd, num_format=d_xf)
+        xlSheet.write_column(2, xlCol+3, Mx, num_format=d_xf)
+        xlSheet.write_column(2, xlCol+4, Mn, num_format=d_xf)
         xlCol = xlCol + 5
     return Av_all
 
 def get_diurnalstats(DecHour,Data,ts):
-    nInts = 24*int((60/ts)+0.5)
-    Num = numpy.ma.zeros(nInts,dtype=int)
-    Hr = numpy.ma.zeros(nInts,dtype=float)
-    for i in range(nInts):
-        Hr[i] = float(i)*ts/60.
-    Av = numpy.ma.masked_all(nInts)
-    Sd = numpy.ma.masked_all(nInts)
-    Mx = numpy.ma.masked_all(nInts)
-    Mn = numpy.ma.masked_all(nInts)
-    if numpy.size(Data)!=0:
-        for i in range(nInts):
-            li = numpy.ma.where((abs(DecHour-Hr[i])<c.eps)&(abs(Data-float(c.missing_value))>c.eps))
-            Num[i] = numpy.size(li)
-            if Num[i]!=0:
-                Av[i] = numpy.ma.mean(Data[li])
-                Sd[i] = numpy.ma.std(Data[li])
-                Mx[i] = numpy.ma.max(Data[li])
-                Mn[i] = numpy.ma.min(Data[li])
-    return Num, Hr, Av, Sd, Mx, Mn
+    tod, nInts = pfp_utils.get_tod_index(DecHour, ts)
+    Hr = numpy.ma.array(numpy.arange(nInts)*float(ts)/60.)
+    stats = pfp_utils.get_grouped_stats(Data, tod, nInts)
+    Num = numpy.ma.array(stats["Num"])
+    return Num, Hr, stats["Av"], stats["Sd"], stats["Mx"], stats["Mn"]
 
 def get_rangecheck_limit(cf,label,upr_def=1E10,lwr_def=-1E10):
     upper = float(upr_def)
@@ -200,11 +170,65 @@ def get_formatstring(cf,label,fmt_def=''):
                 fmt_str = str(cf[section][label]['format'])
     return fmt_str
 
+def write_climatology_netcdf(cli_filename, ts, cli_data):
+    """
+    Purpose:
+     Write the climatology to a netCDF file alongside the Excel workbook so
+     that GapFillFromClimatology can read it without going through xlrd.
+     The interpolated daily values are stored as 2D arrays (day by time of
+     day) in variables named after the series and the monthly diurnal
+     averages as 2D arrays (hour by month) in variables named <label>_monthly.
+     The time of day is the end of the averaging period, the same as the
+     column headers of the i(day) worksheets.
+    Usage:
+     pfp_clim.write_climatology_netcdf(cli_filename, ts, cli_data)
+     where cli_filename is the name of the netCDF file
+           ts is the time step in minutes
+           cli_data is a dictionary {label: {"daily": 2D array, "monthly": 2D array,
+                                             "startdate": datetime of the first day}}
+    Author: PRI
+    Date: October 2026
+    """
+    if len(cli_data) == 0:
+        return
+    labels = sorted(cli_data.keys())
+    ndays, nts = numpy.shape(cli_data[labels[0]]["daily"])
+    nc_file = netCDF4.Dataset(cli_filename, "w", format="NETCDF4")
+    nc_file.time_step = str(ts)
+    nc_file.createDimension("day", ndays)
+    nc_file.createDimension("time_of_day", nts)
+    nc_file.createDimension("hour", nts)
+    nc_file.createDimension("month", 12)
+    day0 = numpy.datetime64(cli_data[labels[0]]["startdate"], "D")
+    nc_var = nc_file.createVariable("day", "i4", ("day",))
+    nc_var.units = "days since " + str(day0) + " 00:00:00"
+    nc_var[:] = numpy.arange(ndays)
+    nc_var = nc_file.createVariable("time_of_day", "f8", ("time_of_day",))
+    nc_var.units = "hours"
+    nc_var[:] = numpy.arange(1, nts+1)*float(ts)/60
+    nc_var = nc_file.createVariable("hour", "f8", ("hour",))
+    nc_var.units = "hours"
+    nc_var[:] = numpy.arange(nts)*float(ts)/60
+    nc_var = nc_file.createVariable("month", "i4", ("month",))
+    nc_var[:] = numpy.arange(1, 13)
+    for label in labels:
+        nc_var = nc_file.createVariable(label, "f8", ("day", "time_of_day"), zlib=True,
+                                        fill_value=float(c.missing_value))
+        nc_var[:] = numpy.ma.filled(cli_data[label]["daily"], float(c.missing_value))
+        nc_var = nc_file.createVariable(label+"_monthly", "f8", ("hour", "month"), zlib=True,
+                                        fill_value=float(c.missing_value))
+        nc_var[:] = numpy.ma.filled(cli_data[label]["monthly"], float(c.missing_value))
+    nc_file.close()
+    return
+
 def climatology(cf):
     nc_filename = pfp_io.get_infilenamefromcf(cf)
     if not pfp_utils.file_exists(nc_filename): return
-    xl_filename = nc_filename.replace(".nc","_Climatology.xls")
-    xlFile = xlwt.Workbook()
+    results_format = pfp_io.get_results_format(cf)
+    xl_filename = pfp_io.get_results_filename(nc_filename.replace(".nc","_Climatology.xls"), results_format)
+    cli_filename = nc_filename.replace(".nc","_Climatology.nc")
+    cli_data = {}
+    xlFile = pfp_io.ResultsWorkbook(xl_filename, results_format=results_format)
     ds = pfp_io.nc_read_series(nc_filename)
     # calculate Fa if it is not in the data structure
     got_Fa = True
@@ -278,11 +302,14 @@ def climatology(cf):
             data_daily_i = do_2dinterpolation(data_daily)
             xlSheet = xlFile.add_sheet(ThisOne+'i(day)')
             write_data_1columnpertimestep(xlSheet, data_daily_i, ts, startdate=sdate, format_string=fmt_str)
+            cli_data[ThisOne] = {"daily": data_daily_i, "monthly": Av_all, "startdate": sdate}
         else:
             logger.warning(" Requested variable "+ThisOne+" not in data structure")
             continue
-    logger.info(" Saving Excel file "+os.path.split(xl_filename)[1])
-    xlFile.save(xl_filename)
+    logger.info(" Saving results file "+os.path.split(xl_filename)[1])
+    xlFile.save()
+    logger.info(" Saving netCDF file "+os.path.split(cli_filename)[1])
+    write_climatology_netcdf(cli_filename, ts, cli_data)
 
 def compare_eddypro():
     epname = pfp_io.get_filename_dialog(title='Choose an EddyPro full output file')
@@ -317,6 +317,7 @@ def ParseConcatenateControlFile(cf):
     # work through the choices in the [Options] section
     opt = pfp_utils.get_keyvaluefromcf(cf, ["Options"], "NumberOfDimensions", default=3)
     inc["NumberOfDimensions"] = int(opt)
+    inc["nc_options"] = pfp_io.get_nc_write_options(cf)
     opt = pfp_utils.get_keyvaluefromcf(cf, ["Options"], "MaxGapInterpolate", default=0)
     inc["MaxGapInterpolate"] = int(opt)
     opt = pfp_utils.get_keyvaluefromcf(cf, ["Options"], "FixTimeStepMethod", default="round")
@@ -328,6 +329,9 @@ def ParseConcatenateControlFile(cf):
     s = "Ah,CO2,Fa,Fg,Fld,Flu,Fn,Fsd,Fsu,ps,Sws,Ta,Ts,Ws,Wd,Precip"
     opt = pfp_utils.get_keyvaluefromcf(cf, ["Options"], "SeriesToCheck", default=s)
     inc["SeriesToCheck"] = pfp_utils.csv_string_to_list(s)
+    # streaming copies one variable at a time from the input files to the output file
+    opt = pfp_utils.get_keyvaluefromcf(cf, ["Options"], "Streaming", default="No")
+    inc["Streaming"] = str(opt)
     # now add the bits and pieces
     inc["start_date"] = []
     inc["end_date"] = []
@@ -32,73 +32,115 @@ def bootstrap(df):
 
 #------------------------------------------------------------------------------
 def fit(temp_df):
-
+    """
+    Purpose:
+     Fit the operational (b) and diagnostic (a) change point models to the
+     binned ustar and Fc data and return the change points, F statistics and
+     regression parameters.
+     The SSE of the one and two segment models for all candidate change points
+     are calculated at once from cumulative sums of the data, statsmodels is
+     only used for the final diagnostic model.
+    Usage:
+     results = fit(temp_df)
+     where temp_df is a dataframe with the ustar and Fc bin averages sorted by ustar
+    """
     # Only works if the index is reset here (bug?)!
     temp_df=temp_df.reset_index(drop=True)
 
     # Processing 30x faster if dtype-float64...
     temp_df = temp_df.astype(np.float64)
+    x = temp_df['ustar'].values
+    y = temp_df['Fc'].values
+    n = len(x)
 
     ### Calculate null model SSE for operational (b) and diagnostic (a) model
-    SSE_null_b=((temp_df['Fc']-temp_df['Fc'].mean())**2).sum() # b model SSE
-    alpha0,alpha1=stats.linregress(temp_df['ustar'],temp_df['Fc'])[:2] # a model regression
-    SSE_null_a=((temp_df['Fc']-(temp_df['ustar']*alpha0+alpha1))**2).sum() # a model SSE
-
-    ### Create empty array to hold f statistics
-    f_a_array=np.empty(50)
-    f_b_array=np.empty(50)
-
-    # Add series to df for numpy linalg
-    temp_df['int']=np.ones(50)
-
-    ### Iterate through all possible change points (1-49) as below
-    #for i in xrange(1,49):
-    for i in range(1,49):
-
-        # Operational (b) model
-        temp_df['ustar_alt']=temp_df['ustar'] # Add dummy variable to df
-        temp_df['ustar_alt'].iloc[i+1:]=temp_df['ustar_alt'].iloc[i]
-        reg_params=np.linalg.lstsq(temp_df[['int','ustar_alt']],temp_df['Fc'],rcond=None)[0] # Do linear regression
-        yHat=reg_params[0]+reg_params[1]*temp_df['ustar_alt'] # Calculate the predicted values for y
-        SSE_full=((temp_df['Fc']-yHat)**2).sum() # Calculate SSE
-        f_b_array[i]=(SSE_null_b-SSE_full)/(SSE_full/(50-2)) # Calculate and store F-score
-
-        # Diagnostic (a) model
-        temp_df['ustar_alt1']=temp_df['ustar']
-        temp_df['ustar_alt1'].iloc[i+1:]=temp_df['ustar_alt1'].iloc[i]
-        temp_df['ustar_alt2']=(temp_df['ustar']-temp_df['ustar'].iloc[i])*np.concatenate([np.zeros(i+1),np.ones(50-(i+1))])
-        reg_params=np.linalg.lstsq(temp_df[['int','ustar_alt1','ustar_alt2']],temp_df['Fc'],rcond=None)[0] # Do piecewise linear regression (multiple regression with dummy)
-        yHat=reg_params[0]+reg_params[1]*temp_df['ustar_alt1']+reg_params[2]*temp_df['ustar_alt2'] # Calculate the predicted values for y
-        SSE_full=((temp_df['Fc']-yHat)**2).sum() # Calculate SSE
-        f_a_array[i]=(SSE_null_a-SSE_full)/(SSE_full/(50-2)) # Calculate and store F-score
+    SSE_null_b=((y-y.mean())**2).sum() # b model SSE
+    alpha0,alpha1=stats.linregress(x,y)[:2] # a model regression
+    SSE_null_a=((y-(x*alpha0+alpha1))**2).sum() # a model SSE
+
+    ### Sums for all possible change points (1-48), centring the data first
+    ### does not change the SSE but reduces the round off error in the sums
+    xc = x - x.mean()
+    yc = y - y.mean()
+    cp = np.arange(1,n-1)
+    xi = xc[cp]                    # ustar at the change point
+    m = (n-1-cp).astype(np.float64) # number of points after the change point
+    Sx_lo = np.cumsum(xc)[cp]      # sums up to and including the change point
+    Sxx_lo = np.cumsum(xc*xc)[cp]
+    Sxy_lo = np.cumsum(xc*yc)[cp]
+    Sy_lo = np.cumsum(yc)[cp]
+    Sx_hi = xc.sum() - Sx_lo       # sums after the change point
+    Sxx_hi = (xc*xc).sum() - Sxx_lo
+    Sxy_hi = (xc*yc).sum() - Sxy_lo
+    Sy_hi = yc.sum() - Sy_lo
+    Sy = yc.sum()
+    Syy = (yc*yc).sum() - Sy*Sy/n
+    Sxx_tot = (xc*xc).sum()
+
+    # ustar_alt (x1) is ustar up to the change point and constant after it,
+    # ustar_alt2 (x2) is 0 up to the change point and ustar-ustar(cp) after it
+    S1 = Sx_lo + m*xi
+    S2 = Sx_hi - m*xi
+    S11 = Sxx_lo + m*xi*xi - S1*S1/n
+    S22 = Sxx_hi - 2*xi*Sx_hi + m*xi*xi - S2*S2/n
+    S12 = xi*(Sx_hi - m*xi) - S1*S2/n
+    S1y = Sxy_lo + xi*Sy_hi - S1*Sy/n
+    S2y = Sxy_hi - xi*Sy_hi - S2*Sy/n
+
+    ### SSE of the operational (b) model (linear regression on ustar_alt) and
+    ### of the diagnostic (a) model (multiple regression on ustar_alt and ustar_alt2)
+    det = S11*S22 - S12*S12
+    singular = (S11 <= c.eps*Sxx_tot) | (np.abs(det) <= c.eps*np.abs(S11*S22))
+    S11[singular] = 1.0
+    det[singular] = 1.0
+    SSE_b = Syy - S1y*S1y/S11
+    SSE_a = Syy - (S22*S1y*S1y - 2*S12*S1y*S2y + S11*S2y*S2y)/det
+    # do the few degenerate cases (ties in ustar) the long way
+    for k in np.where(singular)[0]:
+        i = cp[k]
+        ustar_alt1 = np.where(np.arange(n) > i, x[i], x)
+        ustar_alt2 = np.where(np.arange(n) > i, x-x[i], 0.0)
+        X = np.column_stack([np.ones(n), ustar_alt1])
+        SSE_b[k] = ((y-X.dot(np.linalg.lstsq(X,y,rcond=None)[0]))**2).sum()
+        X = np.column_stack([np.ones(n), ustar_alt1, ustar_alt2])
+        SSE_a[k] = ((y-X.dot(np.linalg.lstsq(X,y,rcond=None)[0]))**2).sum()
+    f_b = (SSE_null_b-SSE_b)/(SSE_b/(n-2))
+    f_a = (SSE_null_a-SSE_a)/(SSE_a/(n-2))
+
+    ### Create arrays to hold f statistics, the end points are not change points
+    f_a_array=np.empty(n)
+    f_b_array=np.empty(n)
+    f_b_array[cp] = f_b
+    f_a_array[cp] = f_a
 
     # Get max f-score, associated change point and ustar value
+    # F-scores that differ only by round off (tied ustar) go to the first change point
+    tol = 1E-9
 
     # b model
-    f_b_array[0],f_b_array[-1]=f_b_array.min(),f_b_array.min()
+    f_b_array[0],f_b_array[-1]=f_b.min(),f_b.min()
     f_b_max=f_b_array.max()
-    change_point_b=f_b_array.argmax()
-    ustar_threshold_b=temp_df['ustar'].iloc[change_point_b]
+    change_point_b=np.argmax(f_b_array >= f_b_max-tol*abs(f_b_max))
+    ustar_threshold_b=x[change_point_b]
 
     # a model
-    f_a_array[0],f_a_array[-1]=f_a_array.min(),f_a_array.min()
+    f_a_array[0],f_a_array[-1]=f_a.min(),f_a.min()
     f_a_max=f_a_array.max()
-    change_point_a=f_a_array.argmax()
-    ustar_threshold_a=temp_df['ustar'].iloc[change_point_a]
+    change_point_a=np.argmax(f_a_array >= f_a_max-tol*abs(f_a_max))
+    ustar_threshold_a=x[change_point_a]
 
     # Get regression parameters
 
     # b model
-    temp_df['ustar_alt']=temp_df['ustar']
-    temp_df['ustar_alt'].iloc[change_point_b+1:]=ustar_threshold_b
-    reg_params=np.linalg.lstsq(temp_df[['int','ustar_alt']],temp_df['Fc'],rcond=None)[0]
+    ustar_alt=np.where(np.arange(n) > change_point_b, ustar_threshold_b, x)
+    reg_params=np.linalg.lstsq(np.column_stack([np.ones(n),ustar_alt]),y,rcond=None)[0]
     b0=reg_params[0]
     b1=reg_params[1]
 
     # a model
-    temp_df['ustar_alt1']=temp_df['ustar']
-    temp_df['ustar_alt1'].iloc[change_point_a+1:]=temp_df['ustar_alt1'].iloc[change_point_a]
-    temp_df['ustar_alt2']=(temp_df['ustar']-temp_df['ustar'].iloc[change_point_a])*np.concatenate([np.zeros(change_point_a+1),np.ones(50-(change_point_a+1))])
+    after = np.arange(n) > change_point_a
+    temp_df['ustar_alt1']=np.where(after, ustar_threshold_a, x)
+    temp_df['ustar_alt2']=np.where(after, x-ustar_threshold_a, 0.0)
     #use statsmodels
     resols=sm.ols(formula="Fc ~ ustar_alt1 + ustar_alt2", data=temp_df).fit()
     a0=resols.params[0]
@@ -306,7 +348,7 @@ def CPD_run(cf):
             names[item] = item
     # read the netcdf file
     logger.info(' Reading netCDF file '+file_in)
-    ds = pfp_io.nc_read_series(file_in)
+    ds = pfp_io.nc_read_series(file_in, variables=names.values())
     ts = int(ds.globalattributes["time_step"])
     # get the datetime
     dt = ds.series["DateTime"]["Data"]
@@ -327,7 +369,7 @@ def CPD_run(cf):
             if len(idx)!=0:
                 for itemd in d.keys():
                     d[itemd][idx] = np.nan
-    d["Year"] = np.array([ldt.year for ldt in dt])
+    d["Year"] = pfp_utils.get_year_from_datetime64(pfp_utils.get_datetime64(ds) - np.timedelta64(ts, "m"))
     df=pd.DataFrame(d,index=dt)
     # replace missing values with NaN
     df.replace(c.missing_value,np.nan)
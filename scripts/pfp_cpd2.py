@@ -1,15 +1,16 @@
 # standard modules
 import datetime
 import logging
+import multiprocessing
 import os
-import time
 # 3rd party modules
 import numpy
 import scipy
+import scipy.interpolate
 import scipy.stats
 import statsmodels.api as sm
-import xlwt
 # PFP modules
+import pfp_cache
 import pfp_io
 import pfp_ts
 import pfp_utils
@@ -17,6 +18,66 @@ import pfp_utils
 # get the logger
 logger = logging.getLogger("pfp_log")
 
+# Fmax tables used to get the significance of the change points, see
+# cpdFmax2pCp2 and cpdFmax2pCp3.  The interpolators for the critical Fmax
+# values as a function of the number of points are built once, here.
+pTable2 = numpy.array([0.8, 0.9, 0.95, 0.99])
+nTable2 = numpy.array([10, 15, 20, 30, 50, 70, 100, 150, 200, 300, 500, 700, 1000])
+FmaxTable2 = numpy.array([[3.9293, 6.2992, 9.1471, 18.2659],
+                          [3.7734, 5.6988, 7.877, 13.81],
+                          [3.7516, 5.5172, 7.4426, 12.6481],
+                          [3.7538, 5.3224, 7.0306, 11.4461],
+                          [3.7941, 5.303, 6.8758, 10.6635],
+                          [3.8548, 5.348, 6.8883, 10.5026],
+                          [3.9798, 5.4465, 6.9184, 10.4527],
+                          [4.0732, 5.5235, 6.9811, 10.3859],
+                          [4.1467, 5.6136, 7.0624, 10.5596],
+                          [4.277, 5.7391, 7.2005, 10.6871],
+                          [4.4169, 5.8733, 7.3421, 10.6751],
+                          [4.5556, 6.0591, 7.5627, 11.0072],
+                          [4.7356, 6.2738, 7.7834, 11.2319]])
+pTable3 = numpy.array([0.9, 0.95, 0.99])
+nTable3 = numpy.concatenate([numpy.arange(10, 110, 10),
+                             numpy.arange(150, 600, 50),
+                             numpy.arange(600, 1200, 200),
+                             numpy.arange(2500, 3500, 1000)])
+FmaxTable3 = numpy.array([[11.646, 15.559, 28.412],
+                          [9.651, 11.948, 18.043],
+                          [9.379, 11.396, 16.249],
+                          [9.261, 11.148, 15.75],
+                          [9.269, 11.068, 15.237],
+                          [9.296, 11.072, 15.252],
+                          [9.296, 11.059, 14.985],
+                          [9.341, 11.072, 15.013],
+                          [9.397, 11.08, 14.891],
+                          [9.398, 11.085, 14.874],
+                          [9.506, 11.127, 14.828],
+                          [9.694, 11.208, 14.898],
+                          [9.691, 11.31, 14.975],
+                          [9.79, 11.406, 14.998],
+                          [9.794, 11.392, 15.044],
+                          [9.84, 11.416, 14.98],
+                          [9.872, 11.474, 15.072],
+                          [9.929, 11.537, 15.115],
+                          [9.955, 11.552, 15.086],
+                          [9.995, 11.549, 15.164],
+                          [10.102, 11.673, 15.292],
+                          [10.169, 11.749, 15.154],
+                          [10.478, 12.064, 15.519]])
+FmaxCriticalInterp = {2: scipy.interpolate.PchipInterpolator(nTable2, FmaxTable2, axis=0),
+                      3: scipy.interpolate.PchipInterpolator(nTable3, FmaxTable3, axis=0)}
+# the critical Fmax values and their interpolators for each number of points,
+# filled as they are needed by cpdFmaxCritical
+FmaxCriticalCache = {}
+# statistics from the change point detection for each season and temperature
+# stratum, stored in structured arrays
+stat_labels = ['ciT', 'mt', 'Fmax', 'puStarVsT', 'ruStarVsT', 'mT', 'n', 'p',
+               'cib0', 'cib1', 'b0', 'b1', 'b2', 'ti', 'tf', 'c2', 'Cp', 'cic2',
+               'nSeasons', 'nStrata']
+stat_dtype = numpy.dtype([(label, numpy.float64) for label in stat_labels])
+# data shared with the bootstrap worker processes
+cpdBootstrap_worker = {}
+
 def cpd2_main(cf):
     """
     Purpose:
@@ -24,9 +85,18 @@ def cpd2_main(cf):
     Side effects:
     Author: PRI
     Date: November 2019
+    Modified:
+     October 2026 - the thresholds are cached on the input data and the options
     """
     opt = pfp_utils.get_keyvaluefromcf(cf, ["Options"], "Num_bootstraps", default=100)
     nBoot = int(opt)
+    # the bootstraps can be run in parallel, the results do not depend on the
+    # number of processes
+    nprocs = pfp_utils.get_number_of_processes(cf)
+    # set RandomSeed to get the same bootstraps every time
+    opt = pfp_utils.get_keyvaluefromcf(cf, ["Options"], "RandomSeed", default="None")
+    if str(opt).lower() != "none":
+        numpy.random.seed(int(opt))
     opt = pfp_utils.get_keyvaluefromcf(cf, ["Options"], "Fsd_threshold", default=5)
     Fsd_threshold = float(opt)
     opt = pfp_utils.get_keyvaluefromcf(cf, ["Options"], "ApplyFcStorage", default="No")
@@ -60,18 +130,28 @@ def cpd2_main(cf):
             names[item] = item
     # read the netcdf file
     logger.info(" Reading netCDF file " + file_in)
-    ds = pfp_io.nc_read_series(file_in)
+    # only the variables used are read from the file
+    ds = pfp_io.nc_read_series(file_in, lazy=True)
     # get the single-point storage, Fc_single, if available
     if apply_storage and "Fc_storage" not in ds.series.keys():
         pfp_ts.CalculateFcStorageSinglePoint(cf, ds, Fc_out="Fc_single")
         Fc_single = pfp_utils.GetVariable(ds, "Fc_single")
         Fc_single["Label"] = "Fc_storage"
         pfp_utils.CreateVariable(ds, Fc_single)
+    # the results are cached on the input data and the options
+    cache_info = pfp_cache.get_info(cf)
+    labels = [label for label in ["Fsd", "Fc", "ustar", "Ta", "Fc_storage"] if label in ds.series]
+    arrays = [pfp_utils.GetVariable(ds, label)["Data"] for label in ["DateTime"] + labels]
+    settings = pfp_cache.get_cf_settings(cf, ["Options", "Variables"])
+    cache_key = pfp_cache.make_key("cpd2_main", arrays, settings, ["pfp_cpd2"])
+    ustar_results = pfp_cache.get(cache_info, cache_key, "cpd2_main")
+    if ustar_results is not None:
+        xl_write_cpd(file_out, ustar_results)
+        return
     cSiteYr = ds.globalattributes["site_name"]
     ts = int(ds.globalattributes["time_step"])
-    dt = pfp_utils.GetVariable(ds, "DateTime")
     ustar_results = {}
-    years = sorted(list(set([ldt.year for ldt in dt["Data"]])))
+    years = sorted(numpy.unique(pfp_utils.get_year_from_datetime64(pfp_utils.get_datetime64(ds))).tolist())
     msg = " Starting CPD analysis for " + str(years)
     logger.info(msg)
     pb = {"nYears": len(years), "n": 0}
@@ -103,7 +183,8 @@ def cpd2_main(cf):
         # call the bootstrap routine
         Cp2, Stats2, Cp3, Stats3 = cpdBootstrapUStarTh4Season20100901(t, Fc["Data"], ustar["Data"],
                                                                       Ta["Data"], fNight, fPlot,
-                                                                      cSiteYr, nBoot, pb)
+                                                                      cSiteYr, nBoot, pb,
+                                                                      nprocs=nprocs)
         # call the QC routine
         Cp, n, tW, CpW, cMode, cFailure, fSelect, sSine, FracSig, FracModeD, FracSelect = \
             cpdAssignUStarTh20100901(Stats2,fPlot,cSiteYr)
@@ -112,6 +193,7 @@ def cpd2_main(cf):
         ustar_results[year]["bootstraps"] = Cp
         msg = "  Finished CPD analysis for year " + str(year)
         logger.info(msg)
+    pfp_cache.put(cache_info, cache_key, ustar_results)
     xl_write_cpd(file_out, ustar_results)
     return
 
@@ -122,29 +204,27 @@ def xl_write_cpd(cpd_full_path, ustar_results):
     Side effects:
     Author: PRI
     Date: November 2019
+    Modified:
+     October 2026 - write whole columns using pfp_io.ResultsWorkbook
     """
     years = sorted(ustar_results.keys())
-    xl_file = xlwt.Workbook()
+    # the results are read back with xlrd so the format is given by the file extension
+    xl_file = pfp_io.ResultsWorkbook(cpd_full_path)
     xl_sheet = xl_file.add_sheet("Annual")
-    xl_sheet.write(0, 0,"Year")
-    xl_sheet.write(0, 1,"ustar_mean")
-    xl_sheet.write(0, 2,"ustar_sig")
-    for n, year in enumerate(years):
-        xl_sheet.write(n+1, 0, year)
-        xl_sheet.write(n+1, 1, ustar_results[year]["ustar_mean"])
-        xl_sheet.write(n+1, 2, ustar_results[year]["ustar_sig"])
+    xl_sheet.write_row(0, 0, ["Year", "ustar_mean", "ustar_sig"])
+    xl_sheet.write_column(1, 0, years)
+    xl_sheet.write_column(1, 1, [ustar_results[year]["ustar_mean"] for year in years])
+    xl_sheet.write_column(1, 2, [ustar_results[year]["ustar_sig"] for year in years])
     for year in years:
         xl_sheet = xl_file.add_sheet(str(year))
-        xl_sheet.write(0, 0, "Bootstraps")
-        xl_sheet.write(0, 1, "Values")
+        xl_sheet.write_row(0, 0, ["Bootstraps", "Values"])
         bootstraps = len(ustar_results[year]["bootstraps"])
-        for n in range(bootstraps):
-            xl_sheet.write(n+1, 0, n)
-            xl_sheet.write(n+1, 1, ustar_results[year]["bootstraps"][n])
-    xl_file.save(cpd_full_path)
+        xl_sheet.write_column(1, 0, numpy.arange(bootstraps))
+        xl_sheet.write_column(1, 1, ustar_results[year]["bootstraps"])
+    xl_file.save()
     return
 
-def cpdBootstrapUStarTh4Season20100901(t, NEE, uStar, T, fNight, fPlot, cSiteYr, nBoot, pb):
+def cpdBootstrapUStarTh4Season20100901(t, NEE, uStar, T, fNight, fPlot, cSiteYr, nBoot, pb, nprocs=1):
     """
     cpdBootstrapUStarTh4Season20100901
 
@@ -231,52 +311,124 @@ def cpdBootstrapUStarTh4Season20100901(t, NEE, uStar, T, fNight, fPlot, cSiteYr,
     ntNee = len(itNee)
     Cp2 = numpy.full((nSeasons, nStrataX, nBoot), numpy.nan)
     Cp3 = numpy.full((nSeasons, nStrataX, nBoot), numpy.nan)
-    # Stats2 and Stats3 as dictionaries
-    stat_labels = ['ciT', 'mt', 'Fmax', 'puStarVsT', 'ruStarVsT', 'mT', 'n', 'p',
-                   'cib0', 'cib1', 'b0', 'b1', 'b2', 'ti', 'tf', 'c2', 'Cp', 'cic2']
-    Stats2 = {}
-    Stats3 = {}
-    for iBoot in range(nBoot):
-        Stats2[iBoot] = {}
-        Stats3[iBoot] = {}
-        for iSeason in range(nSeasons):
-            Stats2[iBoot][iSeason] = {}
-            Stats3[iBoot][iSeason] = {}
-            for iStrata in range(nStrataX):
-                Stats2[iBoot][iSeason][iStrata] = {}
-                Stats3[iBoot][iSeason][iStrata] = {}
-                for stat in stat_labels:
-                    Stats2[iBoot][iSeason][iStrata][stat] = numpy.nan
-                    Stats3[iBoot][iSeason][iStrata][stat] = numpy.nan
+    # Stats2 and Stats3 as structured arrays (nBoot x nSeasons x nStrataX)
+    Stats2 = cpdInitialiseStats((nBoot, nSeasons, nStrataX))
+    Stats3 = cpdInitialiseStats((nBoot, nSeasons, nStrataX))
     if ntNee >= ntN:
-        for iBoot in range(nBoot):
-            if iBoot == 0:
-                it = numpy.linspace(0, nt-1, nt).astype(int)
-            else:
-                it = numpy.sort(numpy.random.randint(0, nt, nt))
-            if iBoot > 0:
-                fPlot = 0
-
-            #print "Calling cpdEvaluateUStarTh4Season20100901"
-            t0 = time.time()
-            xCp2, xStats2, xCp3, xStats3 = cpdEvaluateUStarTh4Season20100901(t[it], NEE[it], uStar[it],
-                                                                             T[it], fNight[it],
-                                                                             fPlot, cSiteYr)
-            #print "cpdEvaluateUStarTh4Season20100901 took " + str(time.time() - t0)
-
-            Cp2[:, :, iBoot] = xCp2
-            Stats2[iBoot] = xStats2
-            Cp3[:, :, iBoot] = xCp3
-            Stats3[iBoot] = xStats3
-
-            progress = float((pb["n"]-1)*nBoot+iBoot+1)/float(pb["nYears"]*nBoot)
-            pfp_utils.update_progress(progress)
+        # each bootstrap gets the state of the random number generator at the
+        # point it would have been drawn when the bootstraps were run in order,
+        # this makes the results independent of the number of processes
+        cpdBootstrapInitWorker({"t": t, "NEE": NEE, "uStar": uStar, "T": T,
+                                "fNight": fNight, "fPlot": fPlot, "cSiteYr": cSiteYr})
+        tasks = cpdBootstrapTasks(nt, nBoot)
+        pool = None
+        if nprocs > 1 and nBoot > 1:
+            pool = multiprocessing.Pool(processes=min([nprocs, nBoot]),
+                                        initializer=cpdBootstrapInitWorker,
+                                        initargs=(cpdBootstrap_worker,))
+            results = pool.imap(cpdBootstrapRun, tasks)
+        else:
+            results = (cpdBootstrapRun(task) for task in tasks)
+        try:
+            for iBoot, xCp2, xStats2, xCp3, xStats3 in results:
+                Cp2[:, :, iBoot] = xCp2
+                Stats2[iBoot] = xStats2
+                Cp3[:, :, iBoot] = xCp3
+                Stats3[iBoot] = xStats3
+
+                progress = float((pb["n"]-1)*nBoot+iBoot+1)/float(pb["nYears"]*nBoot)
+                pfp_utils.update_progress(progress)
+        except:
+            if pool is not None:
+                pool.terminate()
+                pool = None
+            raise
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            cpdBootstrap_worker.clear()
 
     else:
         #print "cpdBootstrapUStarTh4Season: insufficient points"
         logger.info("cpdBootstrapUStarTh4Season: insufficient points")
     return Cp2, Stats2, Cp3, Stats3
 
+def cpdBootstrapTasks(nt, nBoot):
+    """
+    Purpose:
+     Generator for the bootstrap tasks.  Each task is the bootstrap number and
+     the state of the numpy random number generator to use for the bootstrap
+     sample, the first bootstrap uses the observations and has no state.
+     The global random number generator is advanced as if the samples had been
+     drawn in order so the bootstraps are the same as those from a sequential
+     run with the same seed.
+    Usage:
+     tasks = cpdBootstrapTasks(nt, nBoot)
+    Author: PRI
+    Date: October 2026
+    """
+    for iBoot in range(nBoot):
+        if iBoot == 0:
+            yield iBoot, None
+        else:
+            state = numpy.random.get_state()
+            numpy.random.randint(0, nt, nt)
+            yield iBoot, state
+
+def cpdBootstrapInitWorker(data):
+    """
+    Purpose:
+     Store the data for the bootstraps in the worker process.
+    Usage:
+     cpdBootstrapInitWorker(data)
+    Author: PRI
+    Date: October 2026
+    """
+    cpdBootstrap_worker.update(data)
+    return
+
+def cpdBootstrapRun(task):
+    """
+    Purpose:
+     Run a single bootstrap of the CPD, in the main process or in a worker.
+    Usage:
+     iBoot, Cp2, Stats2, Cp3, Stats3 = cpdBootstrapRun(task)
+     where task is (iBoot, state) from cpdBootstrapTasks
+    Author: PRI
+    Date: October 2026
+    """
+    iBoot, state = task
+    w = cpdBootstrap_worker
+    nt = len(w["t"])
+    if state is None:
+        it = numpy.linspace(0, nt-1, nt).astype(int)
+        fPlot = w["fPlot"]
+    else:
+        rs = numpy.random.RandomState()
+        rs.set_state(state)
+        it = numpy.sort(rs.randint(0, nt, nt))
+        fPlot = 0
+    xCp2, xStats2, xCp3, xStats3 = cpdEvaluateUStarTh4Season20100901(w["t"][it], w["NEE"][it], w["uStar"][it],
+                                                                     w["T"][it], w["fNight"][it],
+                                                                     fPlot, w["cSiteYr"])
+    return iBoot, xCp2, xStats2, xCp3, xStats3
+
+def cpdInitialiseStats(shape):
+    """
+    Purpose:
+     Return a structured array of CPD statistics with the fields in
+     stat_labels, all set to NaN.
+    Usage:
+     Stats = cpdInitialiseStats((nBoot, nSeasons, nStrata))
+    Author: PRI
+    Date: October 2026
+    """
+    Stats = numpy.empty(shape, dtype=stat_dtype)
+    for label in stat_labels:
+        Stats[label] = numpy.nan
+    return Stats
+
 def cpdEvaluateUStarTh4Season20100901(t, NEE, uStar, T, fNight, fPlot, cSiteYr):
     """
     nacpEvaluateUStarTh4Season20100901
@@ -352,20 +504,9 @@ def cpdEvaluateUStarTh4Season20100901(t, NEE, uStar, T, fNight, fPlot, cSiteYr):
     # Initialize outputs, Cp2 and Cp3 as numpy arrays.
     Cp2 = numpy.full((nSeasons, nStrataX), numpy.nan)
     Cp3 = numpy.full((nSeasons, nStrataX), numpy.nan)
-    # Stats2 and Stats3 as dictionaries
-    stat_labels = ['ciT', 'mt', 'Fmax', 'puStarVsT', 'ruStarVsT', 'mT', 'n', 'p',
-                   'cib0', 'cib1', 'b0', 'b1', 'b2', 'ti', 'tf', 'c2', 'Cp', 'cic2']
-    Stats2 = {}
-    Stats3 = {}
-    for iSeason in range(nSeasons):
-        Stats2[iSeason] = {}
-        Stats3[iSeason] = {}
-        for iStrata in range(nStrataX):
-            Stats2[iSeason][iStrata] = {}
-            Stats3[iSeason][iStrata] = {}
-            for stat in stat_labels:
-                Stats2[iSeason][iStrata][stat] = numpy.nan
-                Stats3[iSeason][iStrata][stat] = numpy.nan
+    # Stats2 and Stats3 as structured arrays (nSeasons x nStrataX)
+    Stats2 = cpdInitialiseStats((nSeasons, nStrataX))
+    Stats3 = cpdInitialiseStats((nSeasons, nStrataX))
     if ntAnnual < nN:
         #print "cpdEvaluateUStarTh4Season: ntAnnual less than nN ", ntAnnual, nN
         msg = "  cpdEvaluateUStarTh4Season: ntAnnual (" + str(ntAnnual)
@@ -463,9 +604,10 @@ def cpdEvaluateUStarTh4Season20100901(t, NEE, uStar, T, fNight, fPlot, cSiteYr):
             xs3["nSeasons"] = nSeasons
             xs3["nStrata"] = nStrata
             Cp2[iSeason, iStrata] = xCp2
-            Stats2[iSeason][iStrata] = xs2
             Cp3[iSeason, iStrata] = xCp3
-            Stats3[iSeason][iStrata] = xs3
+            for label in stat_labels:
+                Stats2[label][iSeason, iStrata] = xs2.get(label, numpy.nan)
+                Stats3[label][iSeason, iStrata] = xs3.get(label, numpy.nan)
 
     xls_out["cpdFindChangePoint_output"]["Cp2"] = Cp2
     xls_out["cpdFindChangePoint_output"]["Cp3"] = Cp3
@@ -540,42 +682,12 @@ def cpdFindChangePoint20100901(xx, yy, iSeason, iStrata):
     a = scipy.stats.linregress(x, y)
     yHat3 = a[1] + a[0]*x
     SSERed3 = numpy.sum((y - yHat3) ** 2)
-    nFull2 = 2
-    nFull3 = 3
     # Compute F score (Fc2 and Fc3) for each data point in order to identify Fmax.
-    Fc2 = numpy.full(n, numpy.nan)
-    Fc3 = numpy.full(n, numpy.nan)
+    Fc2, Fc3 = cpdScanChangePoints(x, y, SSERed2, SSERed3)
     nEndPtsN = 3
     nEndPts = numpy.floor(0.05*n)
     if nEndPts < nEndPtsN:
         nEndPts = nEndPtsN
-    for i in numpy.arange(0, n-1):
-        # fit operational 2 parameter model, with zero slope above Cp2:
-        # 2 connected line segments, segment 2 has zero slope
-        # parameters b0, b1 and xCp
-        iAbv = numpy.arange(i, n)
-        x1 = numpy.array(x)
-        x1[iAbv] = x[i]
-        x1a = numpy.column_stack((numpy.ones(len(x1)), x1))
-        # we use numpy.linalg.lstsq to duplicate the matrix left divide
-        # used in the original MATLAB code.
-        a2 = numpy.linalg.lstsq(x1a, y, rcond=None)[0]
-        yHat2 = a2[0] + a2[1]*x1
-        SSEFull2 = numpy.sum((y - yHat2) ** 2)
-        Fc2[i] = (SSERed2 - SSEFull2) / (SSEFull2 / (n - nFull2))
-        # 2 connected line segments with noslope constraints
-        # parameters b0, b1, b2 and xCp
-        zAbv = numpy.zeros(n)
-        zAbv[iAbv] = 1
-        x1 = numpy.array(x)
-        x2 = numpy.multiply((x - x[i]), zAbv)
-        X = numpy.column_stack((numpy.ones(len(x1)), x1, x2))
-        # we use numpy.linalg.lstsq to duplicate the matrix left divide
-        # used in the original MATLAB code.
-        a3 = numpy.linalg.lstsq(X, y, rcond=None)[0]
-        yHat3 = a3[0] + a3[1]*x1 + a3[2]*x2
-        SSEFull3 = numpy.sum((y - yHat3) ** 2)
-        Fc3[i] = (SSERed3 - SSEFull3) / (SSEFull3 / (n - nFull3))
     # Assign changepoints from Fc2 and Fc3 maxima.
     # Calc stats and test for significance of Fmax scores.
     pSig = 0.05
@@ -589,6 +701,7 @@ def cpdFindChangePoint20100901(xx, yy, iSeason, iStrata):
     # if OLS can't find a solution, a2.params only has 1 element not 2
     # this is trapped below
     a2 = sm.OLS(y, sm.add_constant(x1)).fit()
+    ci2 = a2.conf_int(pSig)
     p2 = cpdFmax2pCp2(Fmax2, n)
     Cp2 = xCp2
     if p2 > pSig:
@@ -606,6 +719,7 @@ def cpdFindChangePoint20100901(xx, yy, iSeason, iStrata):
     # if OLS can't find a solution, a3.params only has 1 element not 3
     # this is trapped below
     a3 = sm.OLS(y, X).fit()
+    ci3 = a3.conf_int(pSig)
     p3 = cpdFmax2pCp3(Fmax3, n)
     Cp3 = xCp3
     if p3 > pSig:
@@ -620,8 +734,8 @@ def cpdFindChangePoint20100901(xx, yy, iSeason, iStrata):
             s2["p"] = p2
             s2["b0"] = a2.params[0]
             s2["b1"] = a2.params[1]
-            s2["cib0"] = 0.5*(a2.conf_int(pSig)[0, 1] - a2.conf_int(pSig)[0, 0])
-            s2["cib1"] = 0.5*(a2.conf_int(pSig)[1, 1] - a2.conf_int(pSig)[1, 0])
+            s2["cib0"] = 0.5*(ci2[0, 1] - ci2[0, 0])
+            s2["cib1"] = 0.5*(ci2[1, 1] - ci2[1, 0])
     if (iCp3 > nEndPts - 1) and (iCp3 < (n - nEndPts - 1)):
         if len(a3.params) == 3:
             s3["Cp"] = xCp3
@@ -631,12 +745,152 @@ def cpdFindChangePoint20100901(xx, yy, iSeason, iStrata):
             s3["b1"] = a3.params[1]
             s3["b2"] = a3.params[2]
             s3["c2"] = a3.params[1] + a3.params[2]
-            s3["cib0"] = 0.5*(a3.conf_int(pSig)[0, 1] - a3.conf_int(pSig)[0, 0])
-            s3["cib1"] = 0.5*(a3.conf_int(pSig)[1, 1] - a3.conf_int(pSig)[1, 0])
-            s3["cic2"] = 0.5*(a3.conf_int(pSig)[2, 1] - a3.conf_int(pSig)[2, 0])
+            s3["cib0"] = 0.5*(ci3[0, 1] - ci3[0, 0])
+            s3["cib1"] = 0.5*(ci3[1, 1] - ci3[1, 0])
+            s3["cic2"] = 0.5*(ci3[2, 1] - ci3[2, 0])
 
     return Cp2, s2, Cp3, s3
 
+def cpdChangePointF(x, y, i, SSERed2, SSERed3):
+    """
+    Purpose:
+     Return the F scores of the operational 2 parameter and the diagnostic
+     3 parameter models with the change point at x[i].
+    Usage:
+     Fc2, Fc3 = cpdChangePointF(x, y, i, SSERed2, SSERed3)
+    Author: PRI
+    Date: October 2026
+    """
+    n = len(x)
+    nFull2 = 2
+    nFull3 = 3
+    # fit operational 2 parameter model, with zero slope above Cp2:
+    # 2 connected line segments, segment 2 has zero slope
+    # parameters b0, b1 and xCp
+    iAbv = numpy.arange(i, n)
+    x1 = numpy.array(x)
+    x1[iAbv] = x[i]
+    x1a = numpy.column_stack((numpy.ones(len(x1)), x1))
+    # we use numpy.linalg.lstsq to duplicate the matrix left divide
+    # used in the original MATLAB code.
+    a2 = numpy.linalg.lstsq(x1a, y, rcond=None)[0]
+    yHat2 = a2[0] + a2[1]*x1
+    SSEFull2 = numpy.sum((y - yHat2) ** 2)
+    Fc2 = (SSERed2 - SSEFull2) / (SSEFull2 / (n - nFull2))
+    # 2 connected line segments with noslope constraints
+    # parameters b0, b1, b2 and xCp
+    zAbv = numpy.zeros(n)
+    zAbv[iAbv] = 1
+    x1 = numpy.array(x)
+    x2 = numpy.multiply((x - x[i]), zAbv)
+    X = numpy.column_stack((numpy.ones(len(x1)), x1, x2))
+    # we use numpy.linalg.lstsq to duplicate the matrix left divide
+    # used in the original MATLAB code.
+    a3 = numpy.linalg.lstsq(X, y, rcond=None)[0]
+    yHat3 = a3[0] + a3[1]*x1 + a3[2]*x2
+    SSEFull3 = numpy.sum((y - yHat3) ** 2)
+    Fc3 = (SSERed3 - SSEFull3) / (SSEFull3 / (n - nFull3))
+    return Fc2, Fc3
+
+def cpdScanChangePoints(x, y, SSERed2, SSERed3):
+    """
+    Purpose:
+     Return the F scores of the operational 2 parameter and the diagnostic
+     3 parameter models for every candidate change point x[0] to x[n-2],
+     the last element is NaN.
+     The SSE of both models for all candidates are calculated at once from
+     cumulative sums of the data.  The candidates that are degenerate (tied
+     x values) and those within round off of the maximum F score are then done
+     again with cpdChangePointF so that the change point and Fmax are exactly
+     those of the original least squares scan.
+    Usage:
+     Fc2, Fc3 = cpdScanChangePoints(x, y, SSERed2, SSERed3)
+    Author: PRI
+    Date: October 2026
+    """
+    n = len(x)
+    Fc2 = numpy.full(n, numpy.nan)
+    Fc3 = numpy.full(n, numpy.nan)
+    # centre the data, this does not change the SSE but reduces round off
+    xc = x - numpy.mean(x)
+    yc = y - numpy.mean(y)
+    icp = numpy.arange(0, n-1)
+    xi = xc[icp]
+    # number of points above the change point
+    m = (n - 1 - icp).astype(numpy.float64)
+    Sx_lo = numpy.cumsum(xc)[icp]
+    Sxx_lo = numpy.cumsum(xc*xc)[icp]
+    Sxy_lo = numpy.cumsum(xc*yc)[icp]
+    Sy_lo = numpy.cumsum(yc)[icp]
+    Sx_hi = numpy.sum(xc) - Sx_lo
+    Sxx_hi = numpy.sum(xc*xc) - Sxx_lo
+    Sxy_hi = numpy.sum(xc*yc) - Sxy_lo
+    Sy_hi = numpy.sum(yc) - Sy_lo
+    Sy = numpy.sum(yc)
+    Syy = numpy.sum(yc*yc) - Sy*Sy/n
+    # x1 is x up to the change point and x[i] above it,
+    # x2 is 0 up to the change point and x-x[i] above it
+    S1 = Sx_lo + m*xi
+    S2 = Sx_hi - m*xi
+    S11 = Sxx_lo + m*xi*xi - S1*S1/n
+    S22 = Sxx_hi - 2*xi*Sx_hi + m*xi*xi - S2*S2/n
+    S12 = xi*(Sx_hi - m*xi) - S1*S2/n
+    S1y = Sxy_lo + xi*Sy_hi - S1*Sy/n
+    S2y = Sxy_hi - xi*Sy_hi - S2*Sy/n
+    det = S11*S22 - S12*S12
+    eps = numpy.finfo(numpy.float64).eps
+    singular = ((S11 <= 1E3*eps*numpy.sum(xc*xc)) |
+                (numpy.abs(det) <= 1E3*eps*numpy.abs(S11*S22)))
+    S11[singular] = 1.0
+    det[singular] = 1.0
+    SSEFull2 = Syy - S1y*S1y/S11
+    SSEFull3 = Syy - (S22*S1y*S1y - 2*S12*S1y*S2y + S11*S2y*S2y)/det
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        Fc2[icp] = (SSERed2 - SSEFull2) / (SSEFull2 / (n - 2))
+        Fc3[icp] = (SSERed3 - SSEFull3) / (SSEFull3 / (n - 3))
+    # do the degenerate candidates and those close to the maximum exactly
+    exact = list(numpy.where(singular)[0])
+    for F in [Fc2, Fc3]:
+        Fmax = numpy.nanmax(F[icp][~singular]) if numpy.any(~singular) else numpy.nan
+        if not numpy.isfinite(Fmax):
+            exact = list(icp)
+            break
+        with numpy.errstate(invalid="ignore"):
+            close = numpy.where(F[icp] >= Fmax - 1E-6*max([abs(Fmax), 1.0]))[0]
+        exact = exact + list(close)
+    for i in sorted(set(exact)):
+        Fc2[i], Fc3[i] = cpdChangePointF(x, y, i, SSERed2, SSERed3)
+    return Fc2, Fc3
+
+def cpdFmaxCritical(nPar, n):
+    """
+    Purpose:
+     Return the critical Fmax values for the 2 or 3 parameter change point
+     model with n points, the interpolator from Fmax to p and the F statistics
+     used to extrapolate outside the table.  The values for each n are
+     calculated once and kept in FmaxCriticalCache.
+    Usage:
+     FmaxCritical, pInterp, fLow, fHigh = cpdFmaxCritical(nPar, n)
+     where nPar is 2 or 3
+           n is the number of points
+    Author: PRI
+    Date: October 2026
+    """
+    key = (nPar, n)
+    if key not in FmaxCriticalCache:
+        if nPar == 2:
+            pTable = pTable2
+            pLow = 0.9
+        else:
+            pTable = pTable3
+            pLow = 0.95
+        FmaxCritical = numpy.array(FmaxCriticalInterp[nPar](n), dtype=numpy.float64)
+        pInterp = scipy.interpolate.PchipInterpolator(FmaxCritical, 1 - pTable)
+        fLow = scipy.stats.f.ppf(pLow, 3, n)
+        fHigh = scipy.stats.f.ppf(0.995, 3, n)
+        FmaxCriticalCache[key] = (FmaxCritical, pInterp, fLow, fHigh)
+    return FmaxCriticalCache[key]
+
 def cpdFmax2pCp2(Fmax, n):
     """
     p = cpdFmax2pCp2(Fmax,n)
@@ -652,40 +906,20 @@ def cpdFmax2pCp2(Fmax, n):
     p = numpy.nan
     if numpy.isnan(Fmax) or numpy.isnan(n) or n < 10:
         return p
-    pTable = numpy.array([0.8, 0.9, 0.95, 0.99])
-    np = len(pTable)
-    nTable = numpy.array([10, 15, 20, 30, 50, 70, 100, 150, 200, 300, 500, 700, 1000])
-    FmaxTable = numpy.array([[3.9293, 6.2992, 9.1471, 18.2659],
-                             [3.7734, 5.6988, 7.877, 13.81],
-                             [3.7516, 5.5172, 7.4426, 12.6481],
-                             [3.7538, 5.3224, 7.0306, 11.4461],
-                             [3.7941, 5.303, 6.8758, 10.6635],
-                             [3.8548, 5.348, 6.8883, 10.5026],
-                             [3.9798, 5.4465, 6.9184, 10.4527],
-                             [4.0732, 5.5235, 6.9811, 10.3859],
-                             [4.1467, 5.6136, 7.0624, 10.5596],
-                             [4.277, 5.7391, 7.2005, 10.6871],
-                             [4.4169, 5.8733, 7.3421, 10.6751],
-                             [4.5556, 6.0591, 7.5627, 11.0072],
-                             [4.7356, 6.2738, 7.7834, 11.2319]])
-    FmaxCritical = numpy.full(np, numpy.nan)
-    for ip in numpy.arange(np):
-        interp_func = scipy.interpolate.PchipInterpolator(nTable, FmaxTable[:, ip])
-        FmaxCritical[ip] = interp_func(n)
+    FmaxCritical, pInterp, fLow, fHigh = cpdFmaxCritical(2, n)
     if Fmax < FmaxCritical[0]:
-        fAdj = (scipy.stats.f.ppf(0.9, 3, n)*Fmax) / FmaxCritical[0]
+        fAdj = (fLow*Fmax) / FmaxCritical[0]
         p = 2*(1 - scipy.stats.f.cdf(fAdj, 3, n))
         if p > 1:
             p = 1
         return p
     if Fmax > FmaxCritical[-1]:
-        fAdj = (scipy.stats.f.ppf(0.995, 3, n)*Fmax) / FmaxCritical[2]
+        fAdj = (fHigh*Fmax) / FmaxCritical[2]
         p = 2*(1 - scipy.stats.f.cdf(fAdj, 3, n))
         if p < 0:
             p = 0
         return p
-    interp_func = scipy.interpolate.PchipInterpolator(FmaxCritical, 1 - pTable)
-    p = interp_func(Fmax)
+    p = pInterp(Fmax)
     return numpy.asscalar(p)
 
 def cpdFmax2pCp3(Fmax, n):
@@ -703,53 +937,20 @@ def cpdFmax2pCp3(Fmax, n):
     p = numpy.nan
     if numpy.isnan(Fmax) or numpy.isnan(n) or n < 10:
         return p
-    pTable = numpy.array([0.9, 0.95, 0.99])
-    np = len(pTable)
-    nTable = numpy.concatenate([numpy.arange(10, 110, 10),
-                                numpy.arange(150, 600, 50),
-                                numpy.arange(600, 1200, 200),
-                                numpy.arange(2500, 3500, 1000)])
-    FmaxTable = numpy.array([[11.646, 15.559, 28.412],
-                             [9.651, 11.948, 18.043],
-                             [9.379, 11.396, 16.249],
-                             [9.261, 11.148, 15.75],
-                             [9.269, 11.068, 15.237],
-                             [9.296, 11.072, 15.252],
-                             [9.296, 11.059, 14.985],
-                             [9.341, 11.072, 15.013],
-                             [9.397, 11.08, 14.891],
-                             [9.398, 11.085, 14.874],
-                             [9.506, 11.127, 14.828],
-                             [9.694, 11.208, 14.898],
-                             [9.691, 11.31, 14.975],
-                             [9.79, 11.406, 14.998],
-                             [9.794, 11.392, 15.044],
-                             [9.84, 11.416, 14.98],
-                             [9.872, 11.474, 15.072],
-                             [9.929, 11.537, 15.115],
-                             [9.955, 11.552, 15.086],
-                             [9.995, 11.549, 15.164],
-                             [10.102, 11.673, 15.292],
-                             [10.169, 11.749, 15.154],
-                             [10.478, 12.064, 15.519]])
-    FmaxCritical = numpy.full(np, numpy.nan)
-    for ip in numpy.arange(np):
-        interp_func = scipy.interpolate.PchipInterpolator(nTable, FmaxTable[:, ip])
-        FmaxCritical[ip] = interp_func(n)
+    FmaxCritical, pInterp, fLow, fHigh = cpdFmaxCritical(3, n)
     if Fmax < FmaxCritical[0]:
-        fAdj = (scipy.stats.f.ppf(0.95, 3, n)*Fmax) / FmaxCritical[0]
+        fAdj = (fLow*Fmax) / FmaxCritical[0]
         p = 2*(1 - scipy.stats.f.cdf(fAdj, 3, n))
         if p > 1:
             p = 1
         return p
     if Fmax > FmaxCritical[-1]:
-        fAdj = (scipy.stats.f.ppf(0.995, 3, n)*Fmax) / FmaxCritical[2]
+        fAdj = (fHigh*Fmax) / FmaxCritical[2]
         p = 2*(1 - scipy.stats.f.cdf(fAdj, 3, n))
         if p < 0:
             p = 0
         return p
-    interp_func = scipy.interpolate.PchipInterpolator(FmaxCritical, 1 - pTable)
-    p = interp_func(Fmax)
+    p = pInterp(Fmax)
     return numpy.asscalar(p)
 
 def cpdBin(x, y, dx, nPerBin):
@@ -1077,9 +1278,7 @@ def cpdAssignUStarTh20100901(Stats, fPlot, cSiteYr):
     FracModeD = []
     FracSelect = []
     # Compute window sizes etc.
-    nBoot = len(Stats.keys())
-    nWindows = len(Stats[0].keys())
-    nStrata = len(Stats[0][0].keys())
+    nBoot, nWindows, nStrata = Stats.shape
     if nBoot == 1:
         nStrataN = 0.5
     else:
@@ -1097,28 +1296,17 @@ def cpdAssignUStarTh20100901(Stats, fPlot, cSiteYr):
     # Extract variable arrays from Stats structure.
     # Reassign mt and Cp as x* to retain array shape,
     # then convert the extracted arrays to column vectors.
-    mt = numpy.full((nStrata*nWindows*nBoot), numpy.nan)
-    xmt = numpy.full((nWindows, nStrata, nBoot), numpy.nan)
-    Cp = numpy.full((nStrata*nWindows*nBoot), numpy.nan)
-    xCp = numpy.full((nWindows, nStrata, nBoot), numpy.nan)
-    b1 = numpy.full((nStrata*nWindows*nBoot), numpy.nan)
-    c2 = numpy.full((nStrata*nWindows*nBoot), numpy.nan)
-    cib1 = numpy.full((nStrata*nWindows*nBoot), numpy.nan)
-    cic2 = numpy.full((nStrata*nWindows*nBoot), numpy.nan)
-    p = numpy.full((nStrata*nWindows*nBoot), numpy.nan)
-    for boot in range(nBoot):
-        for season in range(nWindows):
-            for tclass in range(nStrata):
-                xmt[season, tclass, boot] = Stats[boot][season][tclass]["mt"]
-                xCp[season, tclass, boot] = Stats[boot][season][tclass]["Cp"]
-                i = season + tclass*nWindows + boot*nWindows*nStrata
-                mt[i] = Stats[boot][season][tclass]["mt"]
-                Cp[i] = Stats[boot][season][tclass]["Cp"]
-                b1[i] = Stats[boot][season][tclass]["b1"]
-                c2[i] = Stats[boot][season][tclass]["c2"]
-                cib1[i] = Stats[boot][season][tclass]["cib1"]
-                cic2[i] = Stats[boot][season][tclass]["cic2"]
-                p[i] = Stats[boot][season][tclass]["p"]
+    # Stats is nBoot x nWindows x nStrata, the x* arrays are nWindows x nStrata x nBoot
+    # and the column vectors are in the order season + tclass*nWindows + boot*nWindows*nStrata
+    xmt = numpy.transpose(Stats["mt"], (1, 2, 0))
+    xCp = numpy.transpose(Stats["Cp"], (1, 2, 0))
+    mt = xmt.flatten(order='F')
+    Cp = xCp.flatten(order='F')
+    b1 = numpy.transpose(Stats["b1"], (1, 2, 0)).flatten(order='F')
+    c2 = numpy.transpose(Stats["c2"], (1, 2, 0)).flatten(order='F')
+    cib1 = numpy.transpose(Stats["cib1"], (1, 2, 0)).flatten(order='F')
+    cic2 = numpy.transpose(Stats["cic2"], (1, 2, 0)).flatten(order='F')
+    p = numpy.transpose(Stats["p"], (1, 2, 0)).flatten(order='F')
     pSig = 0.05
     fP = numpy.where((p <= pSig), 1, 0)
     # Determine if Stats input is from the operational 2-parameter
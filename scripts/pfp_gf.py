@@ -1,17 +1,18 @@
 # standard modules
 import copy
-import datetime
 import os
 import logging
 import sys
 import traceback
 # 3rd party modules
 import dateutil
+import netCDF4
 import numpy
 import matplotlib.dates as mdt
 import xlrd
 # PFP modules
 import constants as c
+import pfp_cache
 import pfp_cfg
 import pfp_gui
 import pfp_io
@@ -294,19 +295,65 @@ def ParseL5ControlFile(cf, ds):
     return l5_info
 
 def ReadAlternateFiles(ds, l4_info):
+    """
+    Purpose:
+     Open the alternate data files and put them on the tower time axis.
+     Only the time and the variable attributes are read when the file is
+     opened, the data for each variable is read the first time it is used
+     and only for the period covered by the tower data.  Each alternate
+     data structure gets a "correlations" dictionary used by
+     pfp_gfALT.gfalternate_getalternatevaratmaxr to cache correlations.
+    Usage:
+     ds_alt = pfp_gf.ReadAlternateFiles(ds, l4_info)
+    Author: PRI
+    Date: Back in the day
+    Modified: October 2026 - read the alternate data lazily
+              October 2026 - check the alternate file overlaps the tower data
+                             before reading the tower period
+    """
     ds_alt = {}
     l4ao = l4_info["GapFillFromAlternate"]["outputs"]
     # get a list of file names
     files = [l4ao[output]["file_name"] for output in l4ao.keys()]
+    dt64 = pfp_utils.get_datetime64(ds)
     # read the alternate files
     for f in files:
         # if the file has not already been read, do it now
         if f not in ds_alt:
-            ds_alternate = pfp_io.nc_read_series(f, fixtimestepmethod="round")
+            if gfalternate_overlaps(f, dt64):
+                ds_alternate = pfp_io.nc_read_series(f, fixtimestepmethod="round", lazy=True,
+                                                     start=dt64[0], end=dt64[-1])
+            else:
+                # no alternate data in the tower period, gfalternate_matchstartendtimes
+                # will create dummy series without reading the data
+                ds_alternate = pfp_io.nc_read_series(f, fixtimestepmethod="round", lazy=True)
             gfalternate_matchstartendtimes(ds, ds_alternate)
+            ds_alternate.correlations = {}
             ds_alt[f] = ds_alternate
     return ds_alt
 
+def gfalternate_overlaps(nc_filename, dt64):
+    """
+    Purpose:
+     Return True if the time variable in an alternate data file has any
+     times in the period covered by the tower data.  Files without a time
+     variable are assumed to overlap and are left to pfp_io.nc_read_series.
+    Usage:
+     if pfp_gf.gfalternate_overlaps(nc_filename, dt64):
+    Author: PRI
+    Date: October 2026
+    """
+    nc_file = netCDF4.Dataset(nc_filename, "r")
+    if "time" not in nc_file.variables:
+        nc_file.close()
+        return True
+    nc_time = nc_file.variables["time"]
+    calendar = getattr(nc_time, "calendar", "gregorian")
+    dt64_alt = pfp_utils.get_datetime64_from_nctime(nc_time[:], nc_time.units, calendar=calendar)
+    nc_file.close()
+    si, ei = pfp_utils.get_datetime64_window(dt64_alt, start=dt64[0], end=dt64[-1])
+    return si is not None
+
 def gfalternate_createdict(cf, ds, l4_info, label, called_by):
     """
     Purpose:
@@ -391,9 +438,11 @@ def gfalternate_createdict_info(cf, ds, l4_info, called_by):
                    "plot_path": plot_path,
                    "call_mode": call_mode,
                    "time_step": int(ds.globalattributes["time_step"]),
-                   "site_name": ds.globalattributes["site_name"]}
+                   "site_name": ds.globalattributes["site_name"],
+                   "processes": pfp_utils.get_number_of_processes(cf)}
     out_filename = pfp_io.get_outfilenamefromcf(cf)
-    xl_file_name = out_filename.replace('.nc', '_AlternateStats.xls')
+    results_format = pfp_io.get_results_format(cf)
+    xl_file_name = pfp_io.get_results_filename(out_filename.replace('.nc', '_AlternateStats.xls'), results_format)
     l4a["info"]["xl_file_name"] = xl_file_name
     return
 
@@ -557,6 +606,7 @@ def gfalternate_matchstartendtimes(ds,ds_alternate):
            ds_alternate is the data structure containing the alternate data
     Author: PRI
     Date: July 2015
+    Modified: October 2026 - lazy variables are aligned when they are read
     """
     # check the time steps are the same
     ts_tower = int(ds.globalattributes["time_step"])
@@ -567,63 +617,49 @@ def gfalternate_matchstartendtimes(ds,ds_alternate):
         ds.returncodes["GapFillFromAlternate"] = "error"
         return
     # get the start and end times of the tower and the alternate data and see if they overlap
-    ldt_alternate = ds_alternate.series["DateTime"]["Data"]
-    start_alternate = ldt_alternate[0]
-    ldt_tower = ds.series["DateTime"]["Data"]
-    end_tower = ldt_tower[-1]
+    dt64_alternate = pfp_utils.get_datetime64(ds_alternate)
+    dt64_tower = pfp_utils.get_datetime64(ds)
+    nRecs_tower = len(dt64_tower)
     # since the datetime is monotonically increasing we need only check the start datetime
-    overlap = start_alternate<=end_tower
+    overlap = dt64_alternate[0] <= dt64_tower[-1]
     # do the alternate and tower data overlap?
     if overlap:
-        # index of alternate datetimes that are also in tower datetimes
-        #alternate_index = pfp_utils.FindIndicesOfBInA(ldt_tower,ldt_alternate)
-        #alternate_index = [pfp_utils.find_nearest_value(ldt_tower, dt) for dt in ldt_alternate]
-        # index of tower datetimes that are also in alternate datetimes
-        #tower_index = pfp_utils.FindIndicesOfBInA(ldt_alternate,ldt_tower)
-        #tower_index = [pfp_utils.find_nearest_value(ldt_alternate, dt) for dt in ldt_tower]
-        tower_index, alternate_index = pfp_utils.FindMatchingIndices(ldt_tower, ldt_alternate)
+        # index of tower datetimes that are also in alternate datetimes and vice versa
+        tower_index, alternate_index = pfp_utils.FindMatchingIndices(dt64_tower, dt64_alternate)
         # check that the indices point to the same times
-        ldta = [ldt_alternate[i] for i in alternate_index]
-        ldtt = [ldt_tower[i] for i in tower_index]
-        if ldta!=ldtt:
+        if not numpy.array_equal(dt64_alternate[alternate_index], dt64_tower[tower_index]):
             # and exit with a helpful message if they dont
             logger.error(" Something went badly wrong and I'm giving up")
             sys.exit()
-        # get a list of alternate series
-        alternate_series_list = [item for item in ds_alternate.series.keys() if "_QCFlag" not in item]
-        # number of records in truncated or padded alternate data
-        nRecs_tower = len(ldt_tower)
-        # force the alternate dattime to be the tower date time
-        ds_alternate.series["DateTime"] = ds.series["DateTime"]
-        # loop over the alternate series and truncate or pad as required
-        # truncation or padding is handled by the indices
-        for series in alternate_series_list:
-            if series in ["DateTime","DateTime_UTC"]: continue
-            # get the alternate data
-            data,flag,attr = pfp_utils.GetSeriesasMA(ds_alternate,series)
-            # create an array of missing data of the required length
-            data_overlap = numpy.full(nRecs_tower,c.missing_value,dtype=numpy.float64)
-            flag_overlap = numpy.ones(nRecs_tower,dtype=numpy.int32)
-            # replace missing data with alternate data where times match
-            data_overlap[tower_index] = data[alternate_index]
-            flag_overlap[tower_index] = flag[alternate_index]
-            # write the truncated or padded series back into the alternate data structure
-            pfp_utils.CreateSeries(ds_alternate,series,data_overlap,flag_overlap,attr)
-        # update the number of records in the file
-        ds_alternate.globalattributes["nc_nrecs"] = nRecs_tower
     else:
         # there is no overlap between the alternate and tower data, create dummy series
-        nRecs = len(ldt_tower)
-        ds_alternate.globalattributes["nc_nrecs"] = nRecs
-        ds_alternate.series["DateTime"] = ds.series["DateTime"]
-        alternate_series_list = [item for item in ds_alternate.series.keys() if "_QCFlag" not in item]
-        for series in alternate_series_list:
-            if series in ["DateTime","DateTime_UTC"]:
-                continue
-            _,  _, attr = pfp_utils.GetSeriesasMA(ds_alternate, series)
-            data = numpy.full(nRecs, c.missing_value, dtype=numpy.float64)
-            flag = numpy.ones(nRecs, dtype=numpy.int32)
-            pfp_utils.CreateSeries(ds_alternate, series, data, flag, attr)
+        tower_index = numpy.array([], dtype=numpy.int64)
+        alternate_index = numpy.array([], dtype=numpy.int64)
+    # get a list of alternate series
+    alternate_series_list = [item for item in ds_alternate.series.keys() if "_QCFlag" not in item]
+    # force the alternate dattime to be the tower date time
+    ds_alternate.series["DateTime"] = ds.series["DateTime"]
+    # loop over the alternate series and truncate or pad as required
+    # truncation or padding is handled by the indices
+    for series in alternate_series_list:
+        if series in ["DateTime","DateTime_UTC"]: continue
+        variable = ds_alternate.series[series]
+        if isinstance(variable, pfp_io.LazyVariable) and not variable.loaded:
+            # the data will be put on the tower time axis when it is read
+            variable.align(nRecs_tower, tower_index, alternate_index)
+            continue
+        # get the alternate data
+        data,flag,attr = pfp_utils.GetSeriesasMA(ds_alternate,series)
+        # create an array of missing data of the required length
+        data_overlap = numpy.full(nRecs_tower,c.missing_value,dtype=numpy.float64)
+        flag_overlap = numpy.ones(nRecs_tower,dtype=numpy.int32)
+        # replace missing data with alternate data where times match
+        data_overlap[tower_index] = data[alternate_index]
+        flag_overlap[tower_index] = flag[alternate_index]
+        # write the truncated or padded series back into the alternate data structure
+        pfp_utils.CreateSeries(ds_alternate,series,data_overlap,flag_overlap,attr)
+    # update the number of records in the file
+    ds_alternate.globalattributes["nc_nrecs"] = nRecs_tower
     ds.returncodes["GapFillFromAlternate"] = "normal"
 
 def gfClimatology_createdict(cf, ds, l4_info, label, called_by):
@@ -717,6 +753,10 @@ def gfMDS_createdict(cf, ds, l5_info, label, called_by, flag_code):
     # file path and input file name
     l5_info[called_by]["info"]["file_path"] = cf["Files"]["file_path"]
     l5_info[called_by]["info"]["in_filename"] = cf["Files"]["in_filename"]
+    # put the MDS files in /dev/shm instead of the temporary directory
+    l5_info[called_by]["info"]["workspace_in_memory"] = pfp_utils.get_optionskeyaslogical(cf, "WorkspaceInMemory", default=False)
+    # MDS output is cached on the input data and the settings
+    l5_info[called_by]["info"]["cache"] = pfp_cache.get_info(cf)
     # get the plot path
     opt = pfp_utils.get_keyvaluefromcf(cf, ["Files"], "plot_path", default="./plots/")
     plot_path = os.path.join(opt, "L5", "")
@@ -1021,6 +1061,19 @@ def gfSOLO_createdict_info(cf, ds, l5_info, called_by):
     # truncate to last date in Imports?
     truncate = pfp_utils.get_keyvaluefromcf(cf, ["Options"], "TruncateToImports", default="Yes")
     l5s["info"]["truncate_to_imports"] = truncate
+    # run SOLO using the executables in solo/bin ("binary") or in-process ("numpy")
+    engine = str(pfp_utils.get_keyvaluefromcf(cf, ["Options"], "SOLOEngine", default="binary")).lower()
+    if engine not in ["binary", "numpy"]:
+        msg = " Unrecognised SOLOEngine (" + engine + "), using binary"
+        logger.warning(msg)
+        engine = "binary"
+    l5s["info"]["engine"] = engine
+    # number of processes to use for the auto (months) and auto (days) windows
+    l5s["info"]["processes"] = pfp_utils.get_number_of_processes(cf)
+    # put the SOLO files in /dev/shm instead of the temporary directory
+    l5s["info"]["workspace_in_memory"] = pfp_utils.get_optionskeyaslogical(cf, "WorkspaceInMemory", default=False)
+    # SOLO output is cached on the input data and the settings
+    l5s["info"]["cache"] = pfp_cache.get_info(cf)
     # number of records per day and maximum lags
     nperhr = int(float(60)/time_step + 0.5)
     l5s["info"]["nperday"] = int(float(24)*nperhr + 0.5)
@@ -1113,6 +1166,8 @@ def GapFillFromClimatology(ds, l4_info, called_by):
     '''
     Gap fill missing data using data from the climatology spreadsheet produced by
     the climatology.py script.
+    The netCDF file written alongside the spreadsheet is used if it exists and is
+    not older than the spreadsheet.
     '''
     if called_by not in l4_info.keys():
         return
@@ -1121,106 +1176,180 @@ def GapFillFromClimatology(ds, l4_info, called_by):
     msg = " Reading climatology file and creating climatology series"
     logger.info(msg)
     # loop over the series to be gap filled using climatology
-    cli_xlbooks = {}
+    cli_files = {}
     for output in l4co.keys():
-        # check to see if there are any gaps in "series"
-        #index = numpy.where(abs(ds.series[label]['Data']-float(c.missing_value))<c.eps)[0]
-        #if len(index)==0: continue                      # no gaps found in "series"
         cli_filename = l4co[output]["file_name"]
-        if not os.path.exists(cli_filename):
-            logger.error(" GapFillFromClimatology: Climatology file %s doesn't exist", cli_filename)
+        if cli_filename not in cli_files:
+            cli_files[cli_filename] = gfClimatology_openfile(cli_filename)
+        if cli_files[cli_filename] is None:
             continue
-        if cli_filename not in cli_xlbooks:
-            cli_xlbooks[cli_filename] = xlrd.open_workbook(cli_filename)
         # local pointers to the series name and climatology method
         label = l4co[output]["target"]
         method = l4co[output]["method"]
         flag_code = l4co[output]["flag_code"]
         # do the gap filling
-        cli_xlbook = cli_xlbooks[cli_filename]
+        cli_file = cli_files[cli_filename]
         # choose the gap filling method
         if method == "interpolated daily":
-            gfClimatology_interpolateddaily(ds, label, output, cli_xlbook, flag_code)
+            gfClimatology_interpolateddaily(ds, label, output, cli_file, flag_code)
         else:
             logger.error(" GapFillFromClimatology: unrecognised method option for %s", label)
             continue
+    for cli_filename in cli_files:
+        if cli_files[cli_filename] is not None and cli_files[cli_filename]["nc_file"] is not None:
+            cli_files[cli_filename]["nc_file"].close()
+
+def gfClimatology_openfile(cli_filename):
+    """
+    Purpose:
+     Open a climatology file and return a dictionary with the netCDF file
+     or the Excel workbook.  If cli_filename is an Excel workbook and there
+     is a netCDF file with the same name that is not older than the workbook,
+     the netCDF file is used.  Only one of the workbook or the netCDF file
+     needs to exist (the workbook is not written when ResultsFormat is csv),
+     returns None if neither exists.
+    Usage:
+     cli_file = pfp_gf.gfClimatology_openfile(cli_filename)
+    Author: PRI
+    Date: October 2026
+    Modified:
+     October 2026 - check for the climatology file here
+    """
+    cli_file = {"file_name": cli_filename, "nc_file": None, "xl_book": None}
+    nc_filename = os.path.splitext(cli_filename)[0] + ".nc"
+    if not os.path.exists(cli_filename) and not os.path.exists(nc_filename):
+        logger.error(" GapFillFromClimatology: Climatology file %s doesn't exist", cli_filename)
+        return None
+    if (os.path.exists(nc_filename) and (not os.path.exists(cli_filename) or
+        os.path.getmtime(nc_filename) >= os.path.getmtime(cli_filename))):
+        cli_file["nc_file"] = netCDF4.Dataset(nc_filename, "r")
+        cli_file["file_name"] = nc_filename
+    else:
+        cli_file["xl_book"] = xlrd.open_workbook(cli_filename)
+    return cli_file
 
-def gfClimatology_interpolateddaily(ds, series, output, xlbook, flag_code):
+def gfClimatology_readdaily(cli_file, series):
+    """
+    Purpose:
+     Read the interpolated daily climatology for series from a climatology
+     file opened by gfClimatology_openfile.  Returns the day of each row
+     (datetime64[D]), the time of day of each column in minutes and the
+     values as a 2D array (day by time of day) or None if series is not in
+     the file.
+    Usage:
+     days, tod, values = pfp_gf.gfClimatology_readdaily(cli_file, series)
+    Author: PRI
+    Date: October 2026
+    """
+    if cli_file["nc_file"] is not None:
+        nc_file = cli_file["nc_file"]
+        if series not in nc_file.variables:
+            return None
+        nc_day = nc_file.variables["day"]
+        days = pfp_utils.get_datetime64_from_nctime(nc_day[:], nc_day.units).astype("datetime64[D]")
+        tod = numpy.rint(nc_file.variables["time_of_day"][:]*60).astype(numpy.int64)
+        values = numpy.ma.filled(nc_file.variables[series][:], float(c.missing_value))
+    else:
+        xl_book = cli_file["xl_book"]
+        sheet_name = series + 'i(day)'
+        if sheet_name not in xl_book.sheet_names():
+            return None
+        xl_sheet = xl_book.sheet_by_name(sheet_name)
+        nts = xl_sheet.ncols - 1
+        # the first column is the date, the second row is the time of day in hours
+        xl_dates = numpy.floor(numpy.array(xl_sheet.col_values(0, start_rowx=2), dtype=numpy.float64))
+        days = pfp_utils.get_datetime64_from_xldate(xl_dates, xl_book.datemode).astype("datetime64[D]")
+        tsteps = numpy.array(xl_sheet.row_values(1, start_colx=1, end_colx=nts+1), dtype=numpy.float64)
+        tod = numpy.rint(tsteps*60).astype(numpy.int64)
+        values = numpy.array([xl_sheet.col_values(col, start_rowx=2) for col in range(1, nts+1)],
+                             dtype=numpy.float64).T
+    return days, tod, values
+
+def gfClimatology_interpolateddaily(ds, series, output, cli_file, flag_code):
     """
     Gap fill using data interpolated over a 2D array where the days are
     the rows and the time of day is the columns.
+    The climatology times are made from the day of each row and the time of
+    day of each column and each missing value is filled with the value at
+    the nearest climatology time, found for all missing values in a single
+    searchsorted.  Missing values outside the climatology get flag_code+1.
+    Modified: October 2026 - vectorised, reads the netCDF climatology file
     """
     # gap fill from interpolated 30 minute data
-    sheet_name = series + 'i(day)'
-    if sheet_name not in xlbook.sheet_names():
-        msg = " gfClimatology: sheet " + sheet_name + " not found, skipping ..."
+    cli_daily = gfClimatology_readdaily(cli_file, series)
+    if cli_daily is None:
+        msg = " gfClimatology: " + series + " not found in "
+        msg += os.path.basename(cli_file["file_name"]) + ", skipping ..."
         logger.warning(msg)
         return
-    ldt = ds.series["DateTime"]["Data"]
-    thissheet = xlbook.sheet_by_name(sheet_name)
-    datemode = xlbook.datemode
-    basedate = datetime.datetime(1899, 12, 30)
-    nts = thissheet.ncols - 1
-    ndays = thissheet.nrows - 2
-    # read the time stamp values from the climatology worksheet
-    tsteps = thissheet.row_values(1, start_colx=1, end_colx=nts+1)
-    # read the data from the climatology workbook
-    val1d = numpy.ma.zeros(ndays*nts, dtype=numpy.float64)
-    # initialise an array for the datetime of the climatological values
-    cdt = [None]*nts*ndays
-    # loop over the rows (days) of data
-    for xlRow in range(ndays):
-        # get the Excel datetime value
-        xldatenumber = int(thissheet.cell_value(xlRow+2, 0))
-        # convert this to a Python Datetime
-        xldatetime = basedate + datetime.timedelta(days=xldatenumber + 1462*datemode)
-        # fill the climatology datetime array
-        cdt[xlRow*nts:(xlRow+1)*nts] = [xldatetime+datetime.timedelta(hours=hh) for hh in tsteps]
-        # fill the climatological value array
-        val1d[xlRow*nts:(xlRow+1)*nts] = thissheet.row_values(xlRow+2, start_colx=1, end_colx=nts+1)
+    days, tod, values = cli_daily
+    # the datetime of each climatological value, in the same order as the values
+    cdt = (days.astype("datetime64[m]")[:, numpy.newaxis] + tod.astype("timedelta64[m]")).ravel()
+    val1d = values.ravel()
     # get the data to be filled with climatological values
     data, flag, attr = pfp_utils.GetSeriesasMA(ds, series)
     # get an index of missing values
     idx = numpy.where(numpy.ma.getmaskarray(data) == True)[0]
-    # there must be a better way to do this ...
-    # simply using the index (idx) to set a slice of the data array to the gap filled values in val1d
-    # does not seem to work (mask stays true on replaced values in data), the work around is to
-    # step through the indices, find the time of the missing value in data, find the same time in the
-    # gap filled values val1d and set the missing element of data to this element of val1d
-    # actually ...
-    # this may not be the fastest but it may be the most robust because it matches dates of missing data
-    # to dates in the climatology file
-    for ii in idx:
-        try:
-            jj = pfp_utils.find_nearest_value(cdt, ldt[ii])
-            data[ii] = val1d[jj]
-            flag[ii] = numpy.int32(flag_code)
-        except ValueError:
-            data[ii] = numpy.float64(c.missing_value)
-            flag[ii] = numpy.int32(flag_code+1)
+    dt64 = pfp_utils.get_datetime64(ds)[idx].astype("datetime64[us]")
+    cdt = cdt.astype("datetime64[us]")
+    # index of the nearest climatology time, as pfp_utils.find_nearest_value
+    jj = numpy.searchsorted(cdt, dt64, side="right") - 1
+    jj = numpy.clip(jj, 0, len(cdt)-1)
+    jn = numpy.minimum(jj + 1, len(cdt)-1)
+    nearer = numpy.abs(cdt[jn] - dt64) <= numpy.abs(cdt[jj] - dt64)
+    jj = numpy.where(nearer, jn, jj)
+    inside = (dt64 >= cdt[0]) & (dt64 <= cdt[-1])
+    data[idx[inside]] = val1d[jj[inside]]
+    flag[idx[inside]] = numpy.int32(flag_code)
+    data[idx[~inside]] = numpy.float64(c.missing_value)
+    flag[idx[~inside]] = numpy.int32(flag_code+1)
     # put the gap filled data back into the data structure
     pfp_utils.CreateSeries(ds, output, data, flag, attr)
-    # PRI_Check - make sure climatology variable is OK
-    #ds.series[output]["Data"] = data
-    #ds.series[output]["Flag"] = flag
     return
 
-def gfClimatology_monthly(ds, series, output, xlbook):
-    """ Gap fill using monthly climatology."""
-    ldt = pfp_utils.GetVariable(ds, "DateTime")
-    Hdh = numpy.array([(d.hour + d.minute/float(60)) for d in ldt["Data"]])
-    Month = numpy.array([d.month for d in ldt["Data"]])
-    thissheet = xlbook.sheet_by_name(series)
-    val1d = numpy.zeros_like(ds.series[series]['Data'])
-    values = numpy.zeros([48, 12])
-    for month in range(1, 13):
-        m = (month - 1)
-        xlCol = m*5 + 2
-        values[:, m] = thissheet.col_values(xlCol)[2:50]
-    for i in range(len(ds.series[series]['Data'])):
-        h = numpy.int(2*Hdh[i])
-        m = numpy.int(Month[i])
-        val1d[i] = values[h, m-1]
+def gfClimatology_readmonthly(cli_file, series):
+    """
+    Purpose:
+     Read the monthly diurnal averages for series from a climatology file
+     opened by gfClimatology_openfile.  Returns a 2D array (time of day by
+     month) or None if series is not in the file.
+    Usage:
+     values = pfp_gf.gfClimatology_readmonthly(cli_file, series)
+    Author: PRI
+    Date: October 2026
+    """
+    if cli_file["nc_file"] is not None:
+        nc_file = cli_file["nc_file"]
+        if series+"_monthly" not in nc_file.variables:
+            return None
+        values = numpy.ma.filled(nc_file.variables[series+"_monthly"][:], float(c.missing_value))
+    else:
+        xl_book = cli_file["xl_book"]
+        if series not in xl_book.sheet_names():
+            return None
+        xl_sheet = xl_book.sheet_by_name(series)
+        nts = xl_sheet.nrows - 2
+        # the averages are in the second of the 5 columns for each month
+        values = numpy.array([xl_sheet.col_values(m*5 + 2, start_rowx=2, end_rowx=nts+2)
+                              for m in range(12)], dtype=numpy.float64).T
+    return values
+
+def gfClimatology_monthly(ds, series, output, cli_file):
+    """
+    Gap fill using monthly climatology.
+    Modified: October 2026 - vectorised using the diurnal groups
+    """
+    values = gfClimatology_readmonthly(cli_file, series)
+    if values is None:
+        msg = " gfClimatology: " + series + " not found in "
+        msg += os.path.basename(cli_file["file_name"]) + ", skipping ..."
+        logger.warning(msg)
+        return
+    # groups are (month-1)*nperday + time of day, the same order as values.T.ravel()
+    groups, ngroups = pfp_utils.get_diurnal_groups(ds)
+    val1d = numpy.full(len(groups), numpy.float64(c.missing_value))
+    ok = (groups >= 0) & (groups < values.size)
+    val1d[ok] = values.T.ravel()[groups[ok]]
     index = numpy.where(abs(ds.series[output]['Data']-c.missing_value) < c.eps)[0]
     ds.series[output]['Data'][index] = val1d[index]
     ds.series[output]['Flag'][index] = numpy.int32(40)
@@ -1259,25 +1388,11 @@ def GapFillUsingInterpolation(cf, ds):
 
 # miscellaneous L4 routines
 def gf_getdiurnalstats(DecHour,Data,ts):
-    nInts = 24*int((60/ts)+0.5)
-    Num = numpy.ma.zeros(nInts,dtype=int)
-    Hr = numpy.ma.zeros(nInts,dtype=float)
-    for i in range(nInts):
-        Hr[i] = float(i)*ts/60.
-    Av = numpy.ma.masked_all(nInts)
-    Sd = numpy.ma.masked_all(nInts)
-    Mx = numpy.ma.masked_all(nInts)
-    Mn = numpy.ma.masked_all(nInts)
-    if numpy.size(Data)!=0:
-        for i in range(nInts):
-            li = numpy.ma.where((abs(DecHour-Hr[i])<c.eps)&(abs(Data-float(c.missing_value))>c.eps))
-            Num[i] = numpy.size(li)
-            if Num[i]!=0:
-                Av[i] = numpy.ma.mean(Data[li])
-                Sd[i] = numpy.ma.std(Data[li])
-                Mx[i] = numpy.ma.max(Data[li])
-                Mn[i] = numpy.ma.min(Data[li])
-    return Num, Hr, Av, Sd, Mx, Mn
+    tod, nInts = pfp_utils.get_tod_index(DecHour, ts)
+    Hr = numpy.ma.array(numpy.arange(nInts)*float(ts)/60.)
+    stats = pfp_utils.get_grouped_stats(Data, tod, nInts)
+    Num = numpy.ma.array(stats["Num"])
+    return Num, Hr, stats["Av"], stats["Sd"], stats["Mx"], stats["Mn"]
 
 def gf_getdateticks(start, end):
     from datetime import timedelta as td
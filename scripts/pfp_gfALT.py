@@ -1,8 +1,8 @@
 # standard modules
 import logging
+import multiprocessing
 import os
 # 3rd party modules
-import dateutil
 import numpy
 import matplotlib
 import matplotlib.pyplot as plt
@@ -12,11 +12,15 @@ import statsmodels.api as sm
 # PFP modules
 import constants as c
 import pfp_io
+import pfp_log
 import pfp_ts
 import pfp_utils
 
 logger = logging.getLogger("pfp_log")
 
+# data structures and settings used by the worker processes
+gfalternate_worker = {}
+
 # functions for GapFillFromAlternate
 def GapFillFromAlternate(main_gui, ds4, ds_alt, l4_info, called_by):
     '''
@@ -250,10 +254,15 @@ def gfalternate_getalternatevaratmaxr(ds_tower, ds_alternate, l4a, mode="verbose
     Purpose:
      Get a list of alternate variable names that are sorted based on correlation
      with the tower data.
+     The correlations for all of the alternate variables are calculated in one
+     go by gfalternate_getcorrelations and, if the alternate data structure has
+     a "correlations" dictionary (see pfp_gf.ReadAlternateFiles), are kept there
+     so they are not calculated again for the same period.
     Usage:
     Side effects:
     Author: PRI
     Date: August 2014
+    Modified: October 2026 - batched correlations with a cache
     """
     # get a list of alternate variables for this tower variable
     label_tower = l4a["run"]["label_tower"]
@@ -274,30 +283,35 @@ def gfalternate_getalternatevaratmaxr(ds_tower, ds_alternate, l4a, mode="verbose
         altvar_list = gfalternate_getalternatevarlist(ds_alternate, l4a["run"]["label_tower"])
     else:
         altvar_list = l4a["outputs"][label_output]["usevars"]
-    r = numpy.zeros(len(altvar_list))
-    # loop over the variables in the alternate file
-    for idx, var in enumerate(altvar_list):
-        # get the alternate data
-        data_alternate, _, _ = pfp_utils.GetSeriesasMA(ds_alternate, var, si=si_alternate, ei=ei_alternate)
-        l4a["run"]["gotminpoints_alternate"] = gfalternate_gotminpoints(data_alternate, l4a,
-                                                                        label_tower, mode="quiet")
-        if numpy.ma.count(data_alternate) > l4a["run"]["min_points"]:
+    cache = getattr(ds_alternate, "correlations", None)
+    key = (label_tower, si_tower, ei_tower, si_alternate, ei_alternate,
+           l4a["run"]["min_points"], tuple(altvar_list))
+    if cache is not None and key in cache:
+        r = cache[key].copy()
+    else:
+        # get the alternate data as a 2D array, one column for each variable
+        data_alternate = numpy.ma.masked_all((len(data_tower), len(altvar_list)), dtype=numpy.float64)
+        for idx, var in enumerate(altvar_list):
+            data, _, _ = pfp_utils.GetSeriesasMA(ds_alternate, var, si=si_alternate, ei=ei_alternate)
             # check the lengths of the tower and alternate data are the same
-            if len(data_alternate) != len(data_tower):
-                msg = "gfalternate_getalternatevaratmaxr: alternate data length is " + str(len(data_alternate))
+            if len(data) != len(data_tower):
+                msg = "gfalternate_getalternatevaratmaxr: alternate data length is " + str(len(data))
                 logger.info(msg)
                 msg = "gfalternate_getalternatevaratmaxr: tower data length is " + str(len(data_tower))
                 logger.info(msg)
                 raise ValueError('gfalternate_getalternatevaratmaxr: data_tower and data_alternate lengths differ')
-            # put the correlation into the r array
-            rval = numpy.ma.corrcoef(data_tower, data_alternate)[0, 1]
-            if rval == "nan": rval = float(0)
-        else:
-            if mode!="quiet":
-                msg = " getalternatevaratmaxr: not enough good data in alternate "+var
-                logger.error(msg)
-            rval = float(0)
-        r[idx] = numpy.ma.filled(rval, float(c.missing_value))
+            data_alternate[:, idx] = data
+        # put the correlations into the r array
+        r = gfalternate_getcorrelations(data_tower, data_alternate)
+        # variables without enough good data get a correlation of 0
+        for idx, var in enumerate(altvar_list):
+            if numpy.ma.count(data_alternate[:, idx]) <= l4a["run"]["min_points"]:
+                if mode!="quiet":
+                    msg = " getalternatevaratmaxr: not enough good data in alternate "+var
+                    logger.error(msg)
+                r[idx] = float(0)
+        if cache is not None:
+            cache[key] = r.copy()
     # save the correlation array for later plotting
     l4a["run"]["r"] = r
     # sort the correlation array and the alternate variable list
@@ -308,6 +322,40 @@ def gfalternate_getalternatevaratmaxr(ds_tower, ds_alternate, l4a, mode="verbose
         altvar_list_sorted = altvar_list_sorted[0:1]
     return altvar_list_sorted
 
+def gfalternate_getcorrelations(data_tower, data_alternate):
+    """
+    Purpose:
+     Return the correlation between the tower data (1D) and each column of
+     the alternate data (2D, one column per variable) using only the times
+     when both are present, the same as numpy.ma.corrcoef for each pair but
+     done for all of the columns with a few matrix operations.
+     Correlations that can not be calculated (fewer than 2 pairs or no
+     variance) are returned as c.missing_value.
+    Usage:
+     r = pfp_gfALT.gfalternate_getcorrelations(data_tower, data_alternate)
+    Author: PRI
+    Date: October 2026
+    """
+    ok = (~numpy.ma.getmaskarray(data_tower))[:, numpy.newaxis] & ~numpy.ma.getmaskarray(data_alternate)
+    w = ok.astype(numpy.float64)
+    # remove the overall mean first to reduce round off
+    x = numpy.ma.filled(data_tower - numpy.ma.mean(data_tower), 0)
+    y = numpy.ma.filled(data_alternate - numpy.ma.mean(data_alternate, axis=0), 0)*w
+    n = numpy.sum(w, axis=0)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        sx = numpy.dot(x, w)
+        sy = numpy.sum(y, axis=0)
+        sxx = numpy.dot(x*x, w)
+        syy = numpy.sum(y*y, axis=0)
+        sxy = numpy.dot(x, y)
+        cov = sxy - sx*sy/n
+        var_x = sxx - sx*sx/n
+        var_y = syy - sy*sy/n
+        r = cov/numpy.sqrt(var_x*var_y)
+    bad = (n < 2) | ~(var_x > 0) | ~(var_y > 0) | ~numpy.isfinite(r)
+    r[bad] = float(c.missing_value)
+    return r
+
 def gfalternate_getalternatevarlist(ds_alternate, label):
     """
     Purpose:
@@ -1123,6 +1171,9 @@ def gfalternate_run(ds_tower, ds_alt, l4_info, called_by):
     Side effects:
     Author: PRI
     Date: Re-written in August 2019
+    Modified:
+     October 2026 - auto (months) and auto (days) windows run in parallel
+                    when [Options] NumberOfProcesses is more than 1
     """
     l4a = l4_info[called_by]
     # get a list of target variables
@@ -1140,49 +1191,167 @@ def gfalternate_run(ds_tower, ds_alt, l4_info, called_by):
         if l4a["info"]["call_mode"] == "interactive":
             gfalternate_plotcoveragelines(ds_tower, l4_info, called_by)
         logger.info(" Finished manual run ...")
-    elif l4a["gui"]["period_option"] == 2:
-        # automated run with window length in months
-        logger.info(" Starting auto (months) run ...")
-        startdate = dateutil.parser.parse(l4a["run"]["startdate"])
-        enddate = startdate + dateutil.relativedelta.relativedelta(months=l4a["gui"]["number_months"])
-        enddate = min([dateutil.parser.parse(l4a["info"]["enddate"]), enddate])
-        l4a["run"]["enddate"] = enddate.strftime("%Y-%m-%d %H:%M")
-        while startdate < enddate:
-            gfalternate_main(ds_tower, ds_alt, l4_info, called_by)
+    elif l4a["gui"]["period_option"] in [2, 3]:
+        # automated run with window length in months or days
+        if l4a["gui"]["period_option"] == 2:
+            run_type = "months"
+            windows = pfp_utils.get_run_windows(l4a["run"]["startdate"], l4a["info"]["enddate"],
+                                                months=l4a["gui"]["number_months"])
+        else:
+            run_type = "days"
+            windows = pfp_utils.get_run_windows(l4a["run"]["startdate"], l4a["info"]["enddate"],
+                                                days=l4a["gui"]["number_days"])
+        logger.info(" Starting auto (" + run_type + ") run ...")
+        if l4a["info"].get("processes", 1) > 1 and len(windows) > 1:
+            # the windows are independent so run them in parallel
+            gfalternate_runwindows(ds_tower, ds_alt, l4_info, called_by, windows)
             if l4a["info"]["call_mode"] == "interactive":
                 gfalternate_plotcoveragelines(ds_tower, l4_info, called_by)
-            startdate = enddate
-            l4a["run"]["startdate"] = startdate.strftime("%Y-%m-%d %H:%M")
-            enddate = startdate + dateutil.relativedelta.relativedelta(months=l4a["gui"]["number_months"])
-            enddate = min([dateutil.parser.parse(l4a["info"]["enddate"]), enddate])
-            l4a["run"]["enddate"] = enddate.strftime("%Y-%m-%d %H:%M")
+        else:
+            for startdate, enddate in windows:
+                l4a["run"]["startdate"] = startdate
+                l4a["run"]["enddate"] = enddate
+                gfalternate_main(ds_tower, ds_alt, l4_info, called_by)
+                if l4a["info"]["call_mode"] == "interactive":
+                    gfalternate_plotcoveragelines(ds_tower, l4_info, called_by)
         # fill long gaps with autocomplete
         gfalternate_autocomplete(ds_tower, ds_alt, l4_info, called_by)
-        logger.info(" Finished auto (months) run ...")
-    elif l4a["gui"]["period_option"] == 3:
-        # automated run with window length in days
-        logger.info(" Starting auto (days) run ...")
-        # get the start datetime entered in the alternate GUI
-        startdate = dateutil.parser.parse(l4a["run"]["startdate"])
-        # get the end datetime from the start datetime
-        enddate = startdate + dateutil.relativedelta.relativedelta(days=l4a["gui"]["number_days"])
-        # clip end datetime to last datetime in tower file
-        enddate = min([dateutil.parser.parse(l4a["info"]["enddate"]), enddate])
-        l4a["run"]["enddate"] = enddate.strftime("%Y-%m-%d %H:%M")
-        while startdate < enddate:
-            gfalternate_main(ds_tower, ds_alt, l4_info, called_by)
-            if l4a["info"]["call_mode"] == "interactive":
-                gfalternate_plotcoveragelines(ds_tower, l4_info, called_by)
-            startdate = enddate
-            l4a["run"]["startdate"] = startdate.strftime("%Y-%m-%d %H:%M")
-            enddate = startdate + dateutil.relativedelta.relativedelta(days=l4a["gui"]["number_days"])
-            enddate = min([dateutil.parser.parse(l4a["info"]["enddate"]), enddate])
-            l4a["run"]["enddate"] = enddate.strftime("%Y-%m-%d %H:%M")
-        gfalternate_autocomplete(ds_tower, ds_alt, l4_info, called_by)
-        logger.info(" Finished auto (days) run ...")
+        logger.info(" Finished auto (" + run_type + ") run ...")
     else:
         logger.error("GapFillFromAlternate: unrecognised period option")
 
+def gfalternate_initworker(ds_tower, ds_alt, l4_info, called_by):
+    """
+    Purpose:
+     Initialise a worker process used by gfalternate_runwindows.  The data
+     structures and the settings are held in gfalternate_worker so that they
+     are passed to each worker once, not once per window.
+    Usage:
+     Used as the initializer for multiprocessing.Pool.
+    Author: PRI
+    Date: October 2026
+    """
+    gfalternate_worker["ds_tower"] = ds_tower
+    gfalternate_worker["ds_alt"] = ds_alt
+    gfalternate_worker["l4_info"] = l4_info
+    gfalternate_worker["called_by"] = called_by
+    # workers must not touch the GUI, plots are saved to file only
+    pfp_log.disable_gui_log("pfp_log")
+    l4_info[called_by]["gui"]["show_plots"] = False
+    matplotlib._pylab_helpers.Gcf.figs.clear()
+    plt.switch_backend("Agg")
+    return
+
+def gfalternate_mergewindow(ds_tower, l4a, result):
+    """
+    Purpose:
+     Merge the results from a window run by gfalternate_runwindow into the
+     data structure and the results dictionaries.  Unless overwrite is set,
+     values are only merged where the data structure is still missing, this
+     is what happens when the windows are run one after the other.
+    Usage:
+     gfalternate_mergewindow(ds_tower, l4a, result)
+    Author: PRI
+    Date: October 2026
+    """
+    for label in sorted(result["series"].keys()):
+        idx, data, flag = result["series"][label]
+        if not l4a["gui"]["overwrite"]:
+            missing = abs(ds_tower.series[label]["Data"][idx] - float(c.missing_value)) < c.eps
+            idx, data, flag = idx[missing], data[missing], flag[missing]
+        ds_tower.series[label]["Data"][idx] = data
+        ds_tower.series[label]["Flag"][idx] = flag
+    for label_output in sorted(result["results"].keys()):
+        results = l4a["outputs"][label_output]["results"]
+        for item in result["results"][label_output].keys():
+            results[item].extend(result["results"][label_output][item])
+    return
+
+def gfalternate_runwindow(window):
+    """
+    Purpose:
+     Run the gap filling from alternate data for a single window in a worker
+     process.  The tower data structure is restored after the run so that the
+     windows run by a worker do not see each other.
+    Usage:
+     Called by multiprocessing.Pool.imap in gfalternate_runwindows.
+     result = gfalternate_runwindow([startdate, enddate])
+     where result is a dictionary with the indices, data and flags of the
+              values changed by the gap filling and the fit statistics
+    Author: PRI
+    Date: October 2026
+    """
+    ds_tower = gfalternate_worker["ds_tower"]
+    ds_alt = gfalternate_worker["ds_alt"]
+    l4_info = gfalternate_worker["l4_info"]
+    called_by = gfalternate_worker["called_by"]
+    l4a = l4_info[called_by]
+    l4a["run"]["startdate"] = window[0]
+    l4a["run"]["enddate"] = window[1]
+    ts = int(ds_tower.globalattributes["time_step"])
+    ldt = ds_tower.series["DateTime"]["Data"]
+    si = pfp_utils.GetDateIndex(ldt, window[0], ts=ts, default=0)
+    ei = pfp_utils.GetDateIndex(ldt, window[1], ts=ts, default=len(ldt)-1)
+    # the composite and output series are written by gfalternate_main
+    labels = []
+    for label_tower in l4a["gui"]["series_list"]:
+        labels.append(label_tower + "_composite")
+        labels += gfalternate_getlabeloutputlist(l4_info, label_tower)
+    original = {}
+    for label in labels:
+        original[label] = [ds_tower.series[label]["Data"][si:ei+1].copy(),
+                           ds_tower.series[label]["Flag"][si:ei+1].copy()]
+    for label_output in l4a["outputs"].keys():
+        results = l4a["outputs"][label_output]["results"]
+        for item in results.keys():
+            results[item] = []
+    gfalternate_main(ds_tower, ds_alt, l4_info, called_by)
+    result = {"series": {}, "results": {}}
+    for label in labels:
+        data = ds_tower.series[label]["Data"][si:ei+1]
+        flag = ds_tower.series[label]["Flag"][si:ei+1]
+        idx = numpy.where((data != original[label][0]) | (flag != original[label][1]))[0]
+        result["series"][label] = [idx + si, data[idx], flag[idx]]
+        data[:] = original[label][0]
+        flag[:] = original[label][1]
+    for label_output in l4a["outputs"].keys():
+        result["results"][label_output] = l4a["outputs"][label_output]["results"]
+    return result
+
+def gfalternate_runwindows(ds_tower, ds_alt, l4_info, called_by, windows):
+    """
+    Purpose:
+     Run the gap filling from alternate data for the auto (months) and auto
+     (days) windows using a pool of worker processes.  The results are merged
+     back into the data structure in window order so the output does not
+     depend on the number of processes.
+    Usage:
+     gfalternate_runwindows(ds_tower, ds_alt, l4_info, called_by, windows)
+     where windows is a list of [startdate, enddate] pairs from
+           pfp_utils.get_run_windows()
+    Author: PRI
+    Date: October 2026
+    """
+    l4a = l4_info[called_by]
+    nprocs = min([l4a["info"]["processes"], len(windows)])
+    msg = " Running " + str(len(windows)) + " windows using " + str(nprocs) + " processes"
+    logger.info(msg)
+    pool = multiprocessing.Pool(processes=nprocs, initializer=gfalternate_initworker,
+                                initargs=(ds_tower, ds_alt, l4_info, called_by))
+    try:
+        for result in pool.imap(gfalternate_runwindow, windows):
+            gfalternate_mergewindow(ds_tower, l4a, result)
+    except:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+    l4a["run"]["startdate"] = windows[-1][0]
+    l4a["run"]["enddate"] = windows[-1][1]
+    return
+
 def gfalternate_update_alternate_info(l4a):
     """Update the l4_info dictionary."""
     label_output = l4a["run"]["label_output"]
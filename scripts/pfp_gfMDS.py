@@ -1,7 +1,6 @@
 # standard Python modules
 import copy
 import datetime
-import glob
 import logging
 import os
 import subprocess
@@ -13,6 +12,7 @@ import matplotlib
 import matplotlib.pyplot as plt
 # PFP modules
 import constants as c
+import pfp_cache
 import pfp_utils
 
 logger = logging.getLogger("pfp_log")
@@ -25,6 +25,9 @@ def GapFillUsingMDS(ds, l5_info, called_by):
     Side effects:
     Author: PRI
     Date: May 2018
+    Modified:
+     October 2026 - MDS files go in a workspace for this run
+     October 2026 - MDS output is cached on the input data and the settings
     """
     l5im = l5_info[called_by]
     # get the file name
@@ -36,85 +39,93 @@ def GapFillUsingMDS(ds, l5_info, called_by):
     ts = int(ds.globalattributes["time_step"])
     site_name = ds.globalattributes["site_name"]
     level = ds.globalattributes["nc_level"]
-    # define the MDS input file location
-    in_base_path = os.path.join("mds", "input")
-    # get a list of CSV files in the input directory
-    in_path_files = glob.glob(os.path.join(in_base_path, "*.csv"))
-    # and clean them out
-    for in_file in in_path_files:
-        if os.path.exists(in_file):
-            os.remove(in_file)
-    # define the MDS output file location
-    out_base_path = os.path.join("mds", "output", "")
-    # get a list of CSV files in the output directory
-    out_path_files = glob.glob(os.path.join(out_base_path, "*.csv"))
-    # and clean them out
-    for out_file in out_path_files:
-        if os.path.exists(out_file):
-            os.remove(out_file)
+    # each run gets its own workspace so that runs for different sites can go at the same time
+    in_memory = l5im["info"].get("workspace_in_memory", False)
+    log_prefix = os.path.splitext(nc_name)[0] + "_"
+    ws = pfp_utils.Workspace("mds", ["input", "output", "log"], in_memory=in_memory,
+                             log_dir=os.path.join("mds", "log"), log_prefix=log_prefix)
+    # define the MDS input and output file locations
+    in_base_path = ws.path("input")
+    out_base_path = ws.path("output", "")
     # get some useful odds and ends
     ldt = pfp_utils.GetVariable(ds, "DateTime")
     first_year = ldt["Data"][0].year
     last_year = ldt["Data"][-2].year
     # now loop over the series to be gap filled using MDS
     # open a log file for the MDS C code output
-    log_file_path = os.path.join("mds", "log", "mds.log")
+    log_file_path = ws.path("log", "mds.log")
     mdslogfile = open(log_file_path, "wb")
-    for fig_num, mds_label in enumerate(l5im["outputs"].keys()):
-        logger.info(" Doing MDS gap filling for %s", l5im["outputs"][mds_label]["target"])
-        l5im["outputs"][mds_label]["out_base_path"] = out_base_path
-        l5im["outputs"][mds_label]["time_step"] = ts
-        # make the output file name
-        out_name = site_name+"_"+level+"_"+mds_label+"_mds.csv"
-        out_file_path = os.path.join(out_base_path, out_name)
-        # first, we write the yearly CSV input files
-        l5im["outputs"][mds_label]["in_file_paths"] = []
-        for current_year in range(first_year, last_year+1):
-            in_name = nc_name.replace(".nc","_"+str(current_year)+"_MDS.csv")
-            #in_name = str(current_year)+".csv"
-            in_file_path = os.path.join(in_base_path, in_name)
-            data, header, fmt = gfMDS_make_data_array(ds, current_year, l5im["outputs"][mds_label])
-            numpy.savetxt(in_file_path, data, header=header, delimiter=",", comments="", fmt=fmt)
-            l5im["outputs"][mds_label]["in_file_paths"].append(in_file_path)
-        # then we construct the MDS C code command options list
-        cmd = gfMDS_make_cmd_string(l5im["outputs"][mds_label])
-        # then we spawn a subprocess for the MDS C code
-        subprocess.call(cmd, stdout=mdslogfile)
-        mds_out_file = os.path.join("mds", "output", "mds.csv")
-        os.rename(mds_out_file, out_file_path)
-        gfMDS_get_mds_output(ds, mds_label, out_file_path, l5_info, called_by)
-        # mask long gaps, if requested
-        gfMDS_mask_long_gaps(ds, mds_label, l5_info, called_by)
-        # plot the MDS results
-        target = l5im["outputs"][mds_label]["target"]
-        drivers = l5im["outputs"][mds_label]["drivers"]
-        title = site_name+' : Comparison of tower and MDS data for '+target
-        pd = gfMDS_initplot(site_name=site_name, label=target, fig_num=fig_num,
-                            title=title, nDrivers=len(drivers), show_plots=True)
-        gfMDS_plot(pd, ds, mds_label, l5_info, called_by)
-
-    # close the log file
-    mdslogfile.close()
+    try:
+        for fig_num, mds_label in enumerate(l5im["outputs"].keys()):
+            logger.info(" Doing MDS gap filling for %s", l5im["outputs"][mds_label]["target"])
+            l5im["outputs"][mds_label]["out_base_path"] = out_base_path
+            l5im["outputs"][mds_label]["time_step"] = ts
+            # make the output file name
+            out_name = site_name+"_"+level+"_"+mds_label+"_mds.csv"
+            out_file_path = os.path.join(out_base_path, out_name)
+            # first, we get the yearly input data
+            years = range(first_year, last_year+1)
+            inputs = [gfMDS_make_data_array(ds, year, l5im["outputs"][mds_label]) for year in years]
+            # the MDS output is cached on the input data and the MDS settings
+            settings = {"header": [header for data, header, fmt in inputs]}
+            for item in ["target_mds", "drivers_mds", "tolerances", "time_step"]:
+                settings[item] = l5im["outputs"][mds_label][item]
+            cache_key = pfp_cache.make_key("GapFillUsingMDS", [data for data, header, fmt in inputs],
+                                           settings, ["pfp_gfMDS"])
+            data_mds = pfp_cache.get(l5im["info"]["cache"], cache_key, "GapFillUsingMDS")
+            if data_mds is None:
+                # write the yearly CSV input files
+                l5im["outputs"][mds_label]["in_file_paths"] = []
+                for current_year, (data, header, fmt) in zip(years, inputs):
+                    in_name = nc_name.replace(".nc","_"+str(current_year)+"_MDS.csv")
+                    in_file_path = os.path.join(in_base_path, in_name)
+                    numpy.savetxt(in_file_path, data, header=header, delimiter=",", comments="", fmt=fmt)
+                    l5im["outputs"][mds_label]["in_file_paths"].append(in_file_path)
+                # then we construct the MDS C code command options list
+                cmd = gfMDS_make_cmd_string(l5im["outputs"][mds_label])
+                # then we spawn a subprocess for the MDS C code
+                subprocess.call(cmd, stdout=mdslogfile)
+                mds_out_file = os.path.join(out_base_path, "mds.csv")
+                os.rename(mds_out_file, out_file_path)
+                data_mds = numpy.genfromtxt(out_file_path, delimiter=",", names=True,
+                                            autostrip=True, dtype=None)
+                pfp_cache.put(l5im["info"]["cache"], cache_key, data_mds)
+            gfMDS_get_mds_output(ds, mds_label, data_mds, l5_info, called_by)
+            # mask long gaps, if requested
+            gfMDS_mask_long_gaps(ds, mds_label, l5_info, called_by)
+            # plot the MDS results
+            target = l5im["outputs"][mds_label]["target"]
+            drivers = l5im["outputs"][mds_label]["drivers"]
+            title = site_name+' : Comparison of tower and MDS data for '+target
+            pd = gfMDS_initplot(site_name=site_name, label=target, fig_num=fig_num,
+                                title=title, nDrivers=len(drivers), show_plots=True)
+            gfMDS_plot(pd, ds, mds_label, l5_info, called_by)
+    finally:
+        # close the log file and remove the workspace
+        mdslogfile.close()
+        ws.cleanup()
     return
 
-def gfMDS_get_mds_output(ds, mds_label, out_file_path, l5_info, called_by):
+def gfMDS_get_mds_output(ds, mds_label, data_mds, l5_info, called_by):
     """
     Purpose:
-     Reads the CSV file output by the MDS C code and puts the contents into
-     the data structure.
+     Puts the contents of the CSV file output by the MDS C code into the
+     data structure.
     Usage:
-     gfMDS_get_mds_output(ds, out_file_path, first_date, last_date, include_qc=False)
+     gfMDS_get_mds_output(ds, mds_label, data_mds, l5_info, called_by)
      where ds is a data structure
-           out_file_path is the full path to the MDS output file
+           data_mds is the MDS output file read by numpy.genfromtxt
     Side effects:
      New series are created in the data structure to hold the MDS data.
     Author: PRI
     Date: May 2018
+    Modified:
+     October 2026 - takes the MDS output instead of the file name so that the
+                    output can come from the cache
     """
     ldt = pfp_utils.GetVariable(ds, "DateTime")
     first_date = ldt["Data"][0]
     last_date = ldt["Data"][-1]
-    data_mds = numpy.genfromtxt(out_file_path, delimiter=",", names=True, autostrip=True, dtype=None)
     dt_mds = numpy.array([dateutil.parser.parse(str(dt)) for dt in data_mds["TIMESTAMP"]])
     si_mds = pfp_utils.GetDateIndex(dt_mds, first_date)
     ei_mds = pfp_utils.GetDateIndex(dt_mds, last_date)
@@ -413,22 +424,8 @@ def mypause(interval):
             return
 
 def gf_getdiurnalstats(DecHour, Data, ts):
-    nInts = 24*int((60/ts)+0.5)
-    Num = numpy.ma.zeros(nInts, dtype=int)
-    Hr = numpy.ma.zeros(nInts, dtype=float)
-    for i in range(nInts):
-        Hr[i] = float(i)*ts/60.
-    Av = numpy.ma.masked_all(nInts)
-    Sd = numpy.ma.masked_all(nInts)
-    Mx = numpy.ma.masked_all(nInts)
-    Mn = numpy.ma.masked_all(nInts)
-    if numpy.size(Data)!=0:
-        for i in range(nInts):
-            li = numpy.ma.where((abs(DecHour-Hr[i])<c.eps)&(abs(Data-float(c.missing_value))>c.eps))
-            Num[i] = numpy.size(li)
-            if Num[i]!=0:
-                Av[i] = numpy.ma.mean(Data[li])
-                Sd[i] = numpy.ma.std(Data[li])
-                Mx[i] = numpy.ma.max(Data[li])
-                Mn[i] = numpy.ma.min(Data[li])
-    return Num, Hr, Av, Sd, Mx, Mn
+    tod, nInts = pfp_utils.get_tod_index(DecHour, ts)
+    Hr = numpy.ma.array(numpy.arange(nInts)*float(ts)/60.)
+    stats = pfp_utils.get_grouped_stats(Data, tod, nInts)
+    Num = numpy.ma.array(stats["Num"])
+    return Num, Hr, stats["Av"], stats["Sd"], stats["Mx"], stats["Mn"]
@@ -2,11 +2,11 @@
 import csv
 import datetime
 import logging
+import multiprocessing
 import os
 import platform
 import subprocess
 # 3rd party modules
-import dateutil
 import numpy
 import matplotlib
 import matplotlib.dates as mdt
@@ -14,13 +14,19 @@ import matplotlib.pyplot as plt
 import pylab
 # PFP modules
 import constants as c
+import pfp_cache
 import pfp_ck
 import pfp_gf
 import pfp_io
+import pfp_log
+import pfp_solo
 import pfp_utils
 
 logger = logging.getLogger("pfp_log")
 
+# data structure and settings used by the worker processes
+gfSOLO_worker = {}
+
 # functions for GapFillUsingSOLO
 def GapFillUsingSOLO(main_gui, ds, l5_info, called_by):
     '''
@@ -213,6 +219,8 @@ def gfSOLO_initplot(nDrivers):
 def gfSOLO_main(ds, l5_info, called_by, outputs=None):
     '''
     This is the main routine for running SOLO, an artifical neural network for gap filling fluxes.
+    Modified:
+     October 2026 - SOLO output for each window is cached on the input data and the settings
     '''
     l5s = l5_info[called_by]
     ts = int(ds.globalattributes["time_step"])
@@ -264,21 +272,49 @@ def gfSOLO_main(ds, l5_info, called_by, outputs=None):
             l5s["gui"]["nda_factor"] = l5s["outputs"][output]["solo_settings"]["nda_factor"]
             l5s["gui"]["learning_rate"] = l5s["outputs"][output]["solo_settings"]["learning_rate"]
             l5s["gui"]["iterations"] = l5s["outputs"][output]["solo_settings"]["iterations"]
-        # write the inf files for sofm, solo and seqsolo
-        gfSOLO_writeinffiles(l5s)
-        # run SOFM
-        result = gfSOLO_runsofm(ds, drivers, target, nRecs, si=si, ei=ei)
-        if result != 1:
-            return
-        # run SOLO
-        result = gfSOLO_runsolo(ds, drivers, target, nRecs, si=si, ei=ei)
-        if result != 1:
-            return
-        # run seqsolo and put the solo_modelled data into the ds series
-        result = gfSOLO_runseqsolo(ds, drivers, target, output, nRecs,
-                                   flag_code, si=si, ei=ei)
-        if result != 1:
-            return
+        # the SOLO output for this window is cached on the input data and the settings
+        arrays = [pfp_utils.GetSeries(ds, label, si=si, ei=ei)[0] for label in drivers + [target]]
+        settings = {"drivers": drivers, "target": target, "flag_code": flag_code,
+                    "engine": l5s["info"]["engine"]}
+        for item in ["nodes_target", "training", "nda_factor", "learning_rate", "iterations"]:
+            settings[item] = l5s["gui"][item]
+        cache_key = pfp_cache.make_key("SOLO", arrays, settings, ["pfp_gfSOLO", "pfp_solo"])
+        cached = pfp_cache.get(l5s["info"]["cache"], cache_key, "SOLO")
+        original = [ds.series[output]["Data"][si:ei+1].copy(), ds.series[output]["Flag"][si:ei+1].copy()]
+        if cached is not None:
+            idx, data, flag = cached
+            ds.series[output]["Data"][si:ei+1][idx] = data
+            ds.series[output]["Flag"][si:ei+1][idx] = flag
+        elif l5s["info"]["engine"] == "numpy":
+            # run SOFM, SOLO and SEQSOLO in-process and put the solo_modelled data into the ds series
+            result = gfSOLO_runnumpy(ds, drivers, target, output, nRecs, flag_code, l5s, si=si, ei=ei)
+            if result != 1:
+                return
+        else:
+            # each run gets its own workspace so that runs can go at the same time
+            in_memory = l5s["info"].get("workspace_in_memory", False)
+            with pfp_utils.Workspace("solo", ["inf", "input", "output", "log"], in_memory=in_memory,
+                                     log_dir=os.path.join("solo", "log")) as ws:
+                # write the inf files for sofm, solo and seqsolo
+                gfSOLO_writeinffiles(l5s, solo_dir=ws.root)
+                # run SOFM
+                result = gfSOLO_runsofm(ds, drivers, target, nRecs, si=si, ei=ei, solo_dir=ws.root)
+                if result != 1:
+                    return
+                # run SOLO
+                result = gfSOLO_runsolo(ds, drivers, target, nRecs, si=si, ei=ei, solo_dir=ws.root)
+                if result != 1:
+                    return
+                # run seqsolo and put the solo_modelled data into the ds series
+                result = gfSOLO_runseqsolo(ds, drivers, target, output, nRecs,
+                                           flag_code, si=si, ei=ei, solo_dir=ws.root)
+                if result != 1:
+                    return
+        if cached is None:
+            data = ds.series[output]["Data"][si:ei+1]
+            flag = ds.series[output]["Flag"][si:ei+1]
+            idx = numpy.where((data != original[0]) | (flag != original[1]))[0]
+            pfp_cache.put(l5s["info"]["cache"], cache_key, [idx, data[idx], flag[idx]])
         # plot the results
         pd = gfSOLO_initplot(len(drivers))
         gfSOLO_plot(pd, ds, drivers, target, output, l5s, si=si, ei=ei)
@@ -691,6 +727,9 @@ def gfSOLO_run(ds, l5_info, called_by):
     Side effects:
     Author: PRI
     Date: Re-written in August 2019
+    Modified:
+     October 2026 - auto (months) and auto (days) windows run in parallel
+                    when [Options] NumberOfProcesses is more than 1
     """
     l5s = l5_info[called_by]
     # get a list of target variables
@@ -710,52 +749,31 @@ def gfSOLO_run(ds, l5_info, called_by):
             l5s["info"]["call_mode"] == "interactive"):
             gfSOLO_plotcoveragelines(ds, l5_info, called_by)
         logger.info(" Finished manual run")
-    elif l5s["gui"]["period_option"] == 2:
-        # automated run with window length in months
-        logger.info(" Starting auto (months) run ...")
-        startdate = dateutil.parser.parse(l5s["run"]["startdate"])
-        enddate = startdate + dateutil.relativedelta.relativedelta(months=l5s["gui"]["number_months"])
-        enddate = min([dateutil.parser.parse(l5s["info"]["enddate"]), enddate])
-        l5s["run"]["enddate"] = enddate.strftime("%Y-%m-%d %H:%M")
-        while startdate < enddate:
-            gfSOLO_main(ds, l5_info, called_by)
-            if (l5s["info"]["called_by"] in ["GapFillUsingSOLO", "GapFillLongSOLO"] and
-                l5s["info"]["call_mode"] == "interactive"):
-                gfSOLO_plotcoveragelines(ds, l5_info, called_by)
-            startdate = enddate
-            l5s["run"]["startdate"] = startdate.strftime("%Y-%m-%d %H:%M")
-            enddate = startdate + dateutil.relativedelta.relativedelta(months=l5s["gui"]["number_months"])
-            enddate = min([dateutil.parser.parse(l5s["info"]["enddate"]), enddate])
-            l5s["run"]["enddate"] = enddate.strftime("%Y-%m-%d %H:%M")
-        # now fill any remaining gaps
-        gfSOLO_autocomplete(ds, l5_info, called_by)
-        if l5s["info"]["called_by"] in ["GapFillUsingSOLO", "GapFillLongSOLO"]:
-            # write Excel spreadsheet with fit statistics
-            pfp_io.xl_write_SOLOStats(ds, l5s)
-            if l5s["info"]["call_mode"] == "interactive":
-                # plot the summary statistics
-                gfSOLO_plotsummary(ds, l5s)
-        logger.info(" Finished auto (months) run ...")
-    elif l5s["gui"]["period_option"] == 3:
-        # automated run with window length in days
-        logger.info(" Starting auto (days) run ...")
-        # get the start datetime entered in the SOLO GUI
-        startdate = dateutil.parser.parse(l5s["run"]["startdate"])
-        # get the end datetime from the start datetime
-        enddate = startdate + dateutil.relativedelta.relativedelta(days=l5s["gui"]["number_days"])
-        # clip end datetime to last datetime in tower file
-        enddate = min([dateutil.parser.parse(l5s["info"]["enddate"]), enddate])
-        l5s["run"]["enddate"] = enddate.strftime("%Y-%m-%d %H:%M")
-        while startdate < enddate:
-            gfSOLO_main(ds, l5_info, called_by)
+    elif l5s["gui"]["period_option"] in [2, 3]:
+        # automated run with window length in months or days
+        if l5s["gui"]["period_option"] == 2:
+            run_type = "months"
+            windows = pfp_utils.get_run_windows(l5s["run"]["startdate"], l5s["info"]["enddate"],
+                                                months=l5s["gui"]["number_months"])
+        else:
+            run_type = "days"
+            windows = pfp_utils.get_run_windows(l5s["run"]["startdate"], l5s["info"]["enddate"],
+                                                days=l5s["gui"]["number_days"])
+        logger.info(" Starting auto (" + run_type + ") run ...")
+        if l5s["info"].get("processes", 1) > 1 and len(windows) > 1:
+            # the windows are independent so run them in parallel
+            gfSOLO_runwindows(ds, l5_info, called_by, windows)
             if (l5s["info"]["called_by"] in ["GapFillUsingSOLO", "GapFillLongSOLO"] and
                 l5s["info"]["call_mode"] == "interactive"):
                 gfSOLO_plotcoveragelines(ds, l5_info, called_by)
-            startdate = enddate
-            l5s["run"]["startdate"] = startdate.strftime("%Y-%m-%d %H:%M")
-            enddate = startdate + dateutil.relativedelta.relativedelta(days=l5s["gui"]["number_days"])
-            enddate = min([dateutil.parser.parse(l5s["info"]["enddate"]), enddate])
-            l5s["run"]["enddate"] = enddate.strftime("%Y-%m-%d %H:%M")
+        else:
+            for startdate, enddate in windows:
+                l5s["run"]["startdate"] = startdate
+                l5s["run"]["enddate"] = enddate
+                gfSOLO_main(ds, l5_info, called_by)
+                if (l5s["info"]["called_by"] in ["GapFillUsingSOLO", "GapFillLongSOLO"] and
+                    l5s["info"]["call_mode"] == "interactive"):
+                    gfSOLO_plotcoveragelines(ds, l5_info, called_by)
         # now fill any remaining gaps
         gfSOLO_autocomplete(ds, l5_info, called_by)
         if l5s["info"]["called_by"] in ["GapFillUsingSOLO", "GapFillLongSOLO"]:
@@ -764,10 +782,173 @@ def gfSOLO_run(ds, l5_info, called_by):
             if l5s["info"]["call_mode"] == "interactive":
                 # plot the summary statistics
                 gfSOLO_plotsummary(ds, l5s)
-        logger.info(" Finished auto (days) run ...")
+        logger.info(" Finished auto (" + run_type + ") run ...")
+
+def gfSOLO_initworker(ds, l5_info, called_by):
+    """
+    Purpose:
+     Initialise a worker process used by gfSOLO_runwindows.  The data
+     structure and the settings are held in gfSOLO_worker so that they are
+     passed to each worker once, not once per window.
+    Usage:
+     Used as the initializer for multiprocessing.Pool.
+    Author: PRI
+    Date: October 2026
+    """
+    gfSOLO_worker["ds"] = ds
+    gfSOLO_worker["l5_info"] = l5_info
+    gfSOLO_worker["called_by"] = called_by
+    # workers must not touch the GUI, plots are saved to file only
+    pfp_log.disable_gui_log("pfp_log")
+    l5_info[called_by]["gui"]["show_plots"] = False
+    matplotlib._pylab_helpers.Gcf.figs.clear()
+    plt.switch_backend("Agg")
+    return
+
+def gfSOLO_mergewindow(ds, l5s, result):
+    """
+    Purpose:
+     Merge the results from a window run by gfSOLO_runwindow into the data
+     structure and the results dictionaries.
+    Usage:
+     gfSOLO_mergewindow(ds, l5s, result)
+    Author: PRI
+    Date: October 2026
+    """
+    for output in sorted(result["outputs"].keys()):
+        idx, data, flag = result["outputs"][output]
+        ds.series[output]["Data"][idx] = data
+        ds.series[output]["Flag"][idx] = flag
+        results = l5s["outputs"][output]["results"]
+        for item in result["results"][output].keys():
+            results[item].extend(result["results"][output][item])
+    return
+
+def gfSOLO_runwindow(window):
+    """
+    Purpose:
+     Run SOLO for a single window in a worker process.  The data structure
+     is restored after the run so that the windows run by a worker do not see
+     each other.
+    Usage:
+     Called by multiprocessing.Pool.imap in gfSOLO_runwindows.
+     result = gfSOLO_runwindow([startdate, enddate])
+     where result is a dictionary with the indices, data and flags of the
+              values changed by SOLO and the fit statistics
+    Author: PRI
+    Date: October 2026
+    """
+    ds = gfSOLO_worker["ds"]
+    l5_info = gfSOLO_worker["l5_info"]
+    called_by = gfSOLO_worker["called_by"]
+    l5s = l5_info[called_by]
+    l5s["run"]["startdate"] = window[0]
+    l5s["run"]["enddate"] = window[1]
+    ts = int(ds.globalattributes["time_step"])
+    ldt = ds.series["DateTime"]["Data"]
+    si = pfp_utils.GetDateIndex(ldt, window[0], ts=ts, default=0, match="exact")
+    ei = pfp_utils.GetDateIndex(ldt, window[1], ts=ts, default=len(ldt)-1, match="exact")
+    original = {}
+    for output in l5s["outputs"].keys():
+        original[output] = [ds.series[output]["Data"][si:ei+1].copy(),
+                            ds.series[output]["Flag"][si:ei+1].copy()]
+        results = l5s["outputs"][output]["results"]
+        for item in results.keys():
+            results[item] = []
+    gfSOLO_main(ds, l5_info, called_by)
+    result = {"outputs": {}, "results": {}}
+    for output in l5s["outputs"].keys():
+        data = ds.series[output]["Data"][si:ei+1]
+        flag = ds.series[output]["Flag"][si:ei+1]
+        idx = numpy.where((data != original[output][0]) | (flag != original[output][1]))[0]
+        result["outputs"][output] = [idx + si, data[idx], flag[idx]]
+        result["results"][output] = l5s["outputs"][output]["results"]
+        data[:] = original[output][0]
+        flag[:] = original[output][1]
+    return result
+
+def gfSOLO_runwindows(ds, l5_info, called_by, windows):
+    """
+    Purpose:
+     Run SOLO for the auto (months) and auto (days) windows using a pool of
+     worker processes.  The results are merged back into the data structure
+     in window order so the output does not depend on the number of processes.
+    Usage:
+     gfSOLO_runwindows(ds, l5_info, called_by, windows)
+     where windows is a list of [startdate, enddate] pairs from
+           pfp_utils.get_run_windows()
+    Author: PRI
+    Date: October 2026
+    """
+    l5s = l5_info[called_by]
+    nprocs = min([l5s["info"]["processes"], len(windows)])
+    msg = " Running " + str(len(windows)) + " windows using " + str(nprocs) + " processes"
+    logger.info(msg)
+    pool = multiprocessing.Pool(processes=nprocs, initializer=gfSOLO_initworker,
+                                initargs=(ds, l5_info, called_by))
+    try:
+        for result in pool.imap(gfSOLO_runwindow, windows):
+            gfSOLO_mergewindow(ds, l5s, result)
+    except:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+    l5s["run"]["startdate"] = windows[-1][0]
+    l5s["run"]["enddate"] = windows[-1][1]
+    return
+
+def gfSOLO_runnumpy(dsb, drivers, targetlabel, outputlabel, nRecs,
+                    flag_code, l5s, si=0, ei=-1):
+    """
+    Purpose:
+     Run SOFM, SOLO and SEQSOLO in-process using pfp_solo instead of the
+     executables in solo/bin.  The data used at each step are the same as
+     those written to the input files by gfSOLO_runsofm, gfSOLO_runsolo and
+     gfSOLO_runseqsolo.
+    Usage:
+     result = gfSOLO_runnumpy(ds, drivers, target, output, nRecs, flag_code, l5s, si=si, ei=ei)
+     where result is 1 if the network ran correctly, 0 if it didn't
+    Author: PRI
+    Date: October 2026
+    """
+    # get the driver and target data
+    data = numpy.zeros((nRecs, len(drivers)))
+    for i, label in enumerate(drivers):
+        data[:, i], _, _ = pfp_utils.GetSeries(dsb, label, si=si, ei=ei)
+    target, _, _ = pfp_utils.GetSeries(dsb, targetlabel, si=si, ei=ei)
+    gui = l5s["gui"]
+    # SOFM uses all records with good drivers
+    bad_sofm = numpy.any(abs(data - float(c.missing_value)) < c.eps, axis=1)
+    if numpy.any(bad_sofm):
+        msg = " GapFillUsingSOLO: removed " + str(numpy.sum(bad_sofm)) + " lines from sofm input"
+        logger.info(msg)
+    Wi = pfp_solo.sofm(data[~bad_sofm], int(gui["nodes_target"]), int(gui["training"]))
+    # SOLO uses the records with good drivers and target
+    good_drivers = numpy.all(data != c.missing_value, axis=1)
+    good_solo = good_drivers & (target != c.missing_value)
+    network = pfp_solo.solo(data[good_solo], target[good_solo], Wi, int(gui["nda_factor"]))
+    if network is None:
+        msg = " SOLO did not run correctly, check the GUI and the log files"
+        logger.error(msg)
+        return 0
+    # SEQSOLO uses the records with good drivers
+    goodindex = numpy.where(good_drivers)[0]
+    seqdata = pfp_solo.seqsolo(data[goodindex], target[goodindex], Wi, network,
+                               float(gui["learning_rate"]), int(gui["iterations"]))
+    # put the SOLO modelled data back into the data series
+    if ei == -1:
+        dsb.series[outputlabel]['Data'][si:][goodindex] = seqdata
+        dsb.series[outputlabel]['Flag'][si:][goodindex] = numpy.int32(flag_code)
+    else:
+        dsb.series[outputlabel]['Data'][si:ei+1][goodindex] = seqdata
+        dsb.series[outputlabel]['Flag'][si:ei+1][goodindex] = numpy.int32(flag_code)
+    return 1
 
 def gfSOLO_runseqsolo(dsb, drivers, targetlabel, outputlabel, nRecs,
-                      flag_code, si=0, ei=-1):
+                      flag_code, si=0, ei=-1, solo_dir="solo"):
     '''
     Run SEQSOLO.
     '''
@@ -802,26 +983,26 @@ def gfSOLO_runseqsolo(dsb, drivers, targetlabel, outputlabel, nRecs,
     # keep track of the good data indices
     goodindex = iind[index]
     # and then write the seqsolo input file
-    seqsolofile = open('solo/input/seqsolo_input.csv', 'wb')
+    seqsolofile = open(solo_dir+'/input/seqsolo_input.csv', 'wb')
     wr = csv.writer(seqsolofile, delimiter=',')
     for i in range(gooddata.shape[0]):
         wr.writerow(gooddata[i, 0:ndrivers + 1])
     seqsolofile.close()
     # if the output file from a previous run exists, delete it
-    if os.path.exists('solo/output/seqOut2.out'):
-        os.remove('solo/output/seqOut2.out')
+    if os.path.exists(solo_dir+'/output/seqOut2.out'):
+        os.remove(solo_dir+'/output/seqOut2.out')
     # now run SEQSOLO
-    seqsolologfile = open('solo/log/seqsolo.log', 'wb')
+    seqsolologfile = open(solo_dir+'/log/seqsolo.log', 'wb')
     if platform.system() == "Windows":
-        subprocess.call(['./solo/bin/seqsolo.exe', 'solo/inf/seqsolo.inf'], stdout=seqsolologfile)
+        subprocess.call(['./solo/bin/seqsolo.exe', solo_dir+'/inf/seqsolo.inf'], stdout=seqsolologfile)
     else:
-        subprocess.call(['./solo/bin/seqsolo', 'solo/inf/seqsolo.inf'], stdout=seqsolologfile)
+        subprocess.call(['./solo/bin/seqsolo', solo_dir+'/inf/seqsolo.inf'], stdout=seqsolologfile)
     seqsolologfile.close()
     # check to see if the solo output file exists, this is used to indicate that solo ran correctly
-    if os.path.exists('solo/output/seqOut2.out'):
+    if os.path.exists(solo_dir+'/output/seqOut2.out'):
         # now read in the seqsolo results, use the seqOut2 file so that the learning capability of
         # seqsolo can be used via the "learning rate" and "Iterations" GUI options
-        seqdata = numpy.genfromtxt('solo/output/seqOut2.out')
+        seqdata = numpy.genfromtxt(solo_dir+'/output/seqOut2.out')
         # put the SOLO modelled data back into the data series
         if ei == -1:
             dsb.series[outputlabel]['Data'][si:][goodindex] = seqdata[:, 1]
@@ -835,7 +1016,7 @@ def gfSOLO_runseqsolo(dsb, drivers, targetlabel, outputlabel, nRecs,
         logger.error(msg)
         return 0
 
-def gfSOLO_runsofm(dsb, drivers, targetlabel, nRecs, si=0, ei=-1):
+def gfSOLO_runsofm(dsb, drivers, targetlabel, nRecs, si=0, ei=-1, solo_dir="solo"):
     '''
     Run SOFM, the pre-processor for SOLO.
     '''
@@ -872,30 +1053,30 @@ def gfSOLO_runsofm(dsb, drivers, targetlabel, nRecs, si=0, ei=-1):
         logger.info(msg)
         nRecs = len(goodlines)
     # now write the drivers to the SOFM input file
-    sofmfile = open('solo/input/sofm_input.csv', 'wb')
+    sofmfile = open(solo_dir+'/input/sofm_input.csv', 'wb')
     wr = csv.writer(sofmfile, delimiter=',')
     for i in range(sofminputdata.shape[0]):
         wr.writerow(sofminputdata[i, 0:ndrivers])
     sofmfile.close()
     # if the output file from a previous run exists, delete it
-    if os.path.exists('solo/output/sofm_4.out'):
-        os.remove('solo/output/sofm_4.out')
+    if os.path.exists(solo_dir+'/output/sofm_4.out'):
+        os.remove(solo_dir+'/output/sofm_4.out')
     # now run SOFM
-    sofmlogfile = open('solo/log/sofm.log', 'wb')
+    sofmlogfile = open(solo_dir+'/log/sofm.log', 'wb')
     if platform.system() == "Windows":
-        subprocess.call(['./solo/bin/sofm.exe', 'solo/inf/sofm.inf'], stdout=sofmlogfile)
+        subprocess.call(['./solo/bin/sofm.exe', solo_dir+'/inf/sofm.inf'], stdout=sofmlogfile)
     else:
-        subprocess.call(['./solo/bin/sofm', 'solo/inf/sofm.inf'], stdout=sofmlogfile)
+        subprocess.call(['./solo/bin/sofm', solo_dir+'/inf/sofm.inf'], stdout=sofmlogfile)
     sofmlogfile.close()
     # check to see if the sofm output file exists, this is used to indicate that sofm ran correctly
-    if os.path.exists('solo/output/sofm_4.out'):
+    if os.path.exists(solo_dir+'/output/sofm_4.out'):
         return 1
     else:
         msg = " SOFM did not run correctly, check the GUI and the log files"
         logger.error(msg)
         return 0
 
-def gfSOLO_runsolo(dsb, drivers, targetlabel, nRecs, si=0, ei=-1):
+def gfSOLO_runsolo(dsb, drivers, targetlabel, nRecs, si=0, ei=-1, solo_dir="solo"):
     '''
     Run SOLO.
     '''
@@ -924,42 +1105,42 @@ def gfSOLO_runsolo(dsb, drivers, targetlabel, nRecs, si=0, ei=-1):
     for i in range(ndrivers + 1):
         gooddata[:, i] = soloinputdata[:, i][index]
     # and then write the solo input file, the name is assumed by the solo.inf control file
-    solofile = open('solo/input/solo_input.csv', 'wb')
+    solofile = open(solo_dir+'/input/solo_input.csv', 'wb')
     wr = csv.writer(solofile, delimiter=',')
     for i in range(gooddata.shape[0]):
         wr.writerow(gooddata[i, 0:ndrivers + 1])
     solofile.close()
     # if the output file from a previous run exists, delete it
-    if os.path.exists('solo/output/eigenValue.out'):
-        os.remove('solo/output/eigenValue.out')
+    if os.path.exists(solo_dir+'/output/eigenValue.out'):
+        os.remove(solo_dir+'/output/eigenValue.out')
     # now run SOLO
-    solologfile = open('solo/log/solo.log', 'wb')
+    solologfile = open(solo_dir+'/log/solo.log', 'wb')
     if platform.system() == "Windows":
-        subprocess.call(['./solo/bin/solo.exe', 'solo/inf/solo.inf'], stdout=solologfile)
+        subprocess.call(['./solo/bin/solo.exe', solo_dir+'/inf/solo.inf'], stdout=solologfile)
     else:
-        subprocess.call(['./solo/bin/solo', 'solo/inf/solo.inf'], stdout=solologfile)
+        subprocess.call(['./solo/bin/solo', solo_dir+'/inf/solo.inf'], stdout=solologfile)
     solologfile.close()
     # check to see if the solo output file exists, this is used to indicate that solo ran correctly
-    if os.path.exists('solo/output/eigenValue.out'):
+    if os.path.exists(solo_dir+'/output/eigenValue.out'):
         return 1
     else:
         msg = " SOLO did not run correctly, check the GUI and the log files"
         logger.error(msg)
         return 0
 
-def gfSOLO_writeinffiles(solo):
+def gfSOLO_writeinffiles(solo, solo_dir="solo"):
     # sofm inf file
-    f = open('solo/inf/sofm.inf','w')
+    f = open(solo_dir+'/inf/sofm.inf','w')
     f.write(str(solo["gui"]["nodes_target"])+'\n')
     f.write(str(solo["gui"]["training"])+'\n')
     f.write(str(20)+'\n')
     f.write(str(0.01)+'\n')
     f.write(str(1234)+'\n')
-    f.write('solo/input/sofm_input.csv'+'\n')
-    f.write('solo/output/sofm_1.out'+'\n')
-    f.write('solo/output/sofm_2.out'+'\n')
-    f.write('solo/output/sofm_3.out'+'\n')
-    f.write('solo/output/sofm_4.out'+'\n')
+    f.write(solo_dir+'/input/sofm_input.csv'+'\n')
+    f.write(solo_dir+'/output/sofm_1.out'+'\n')
+    f.write(solo_dir+'/output/sofm_2.out'+'\n')
+    f.write(solo_dir+'/output/sofm_3.out'+'\n')
+    f.write(solo_dir+'/output/sofm_4.out'+'\n')
     f.write(str(50)+'\n')
     f.write('### Comment lines ###\n')
     f.write('Line 1: No. of nodes - default is the number of drivers plus 1 (changeable via GUI if used)\n')
@@ -975,25 +1156,25 @@ def gfSOLO_writeinffiles(solo):
     f.write('Line 11: No. iterations per write of weights to screen - default is 50\n')
     f.close()
     # solo inf file
-    f = open('solo/inf/solo.inf','w')
+    f = open(solo_dir+'/inf/solo.inf','w')
     f.write(str(solo["gui"]["nodes_target"])+'\n')
     f.write(str(solo["gui"]["nda_factor"])+'\n')
-    f.write('solo/output/sofm_4.out'+'\n')
-    f.write('solo/input/solo_input.csv'+'\n')
+    f.write(solo_dir+'/output/sofm_4.out'+'\n')
+    f.write(solo_dir+'/input/solo_input.csv'+'\n')
     f.write('training'+'\n')
     f.write(str(5678)+'\n')
     f.write(str(0)+'\n')
-    f.write('solo/output/eigenValue.out'+'\n')
-    f.write('solo/output/eigenVector.out'+'\n')
-    f.write('solo/output/accumErr.out'+'\n')
-    f.write('solo/output/accumRR.out'+'\n')
-    f.write('solo/output/trainProcess.out'+'\n')
-    f.write('solo/output/freqTable.out'+'\n')
-    f.write('solo/output/hidOutputWt.out'+'\n')
-    f.write('solo/output/errorMap.out'+'\n')
-    f.write('solo/output/finResult.out'+'\n')
-    f.write('solo/output/trainWin.out'+'\n')
-    f.write('solo/output/trainWout.out'+'\n')
+    f.write(solo_dir+'/output/eigenValue.out'+'\n')
+    f.write(solo_dir+'/output/eigenVector.out'+'\n')
+    f.write(solo_dir+'/output/accumErr.out'+'\n')
+    f.write(solo_dir+'/output/accumRR.out'+'\n')
+    f.write(solo_dir+'/output/trainProcess.out'+'\n')
+    f.write(solo_dir+'/output/freqTable.out'+'\n')
+    f.write(solo_dir+'/output/hidOutputWt.out'+'\n')
+    f.write(solo_dir+'/output/errorMap.out'+'\n')
+    f.write(solo_dir+'/output/finResult.out'+'\n')
+    f.write(solo_dir+'/output/trainWin.out'+'\n')
+    f.write(solo_dir+'/output/trainWout.out'+'\n')
     f.write('### Comment lines ###\n')
     f.write('Line 1: No. of nodes - default is the number of drivers plus 1 (changeable via GUI if used)\n')
     f.write('Line 2: multiplier for minimum number of points per node (NdaFactor) - default is 5 (ie 5*(no. of drivers+1) (changeable via GUI if used)\n')
@@ -1005,28 +1186,28 @@ def gfSOLO_writeinffiles(solo):
     f.write('Lines 8 to 18: output files from SOLO with path relative to current directory\n')
     f.close()
     # seqsolo inf file
-    f = open('solo/inf/seqsolo.inf','w')
+    f = open(solo_dir+'/inf/seqsolo.inf','w')
     f.write(str(solo["gui"]["nodes_target"])+'\n')
     f.write(str(0)+'\n')
     f.write(str(solo["gui"]["learning_rate"])+'\n')
     f.write(str(solo["gui"]["iterations"])+'\n')
-    f.write('solo/output/sofm_4.out'+'\n')
-    f.write('solo/input/seqsolo_input.csv'+'\n')
+    f.write(solo_dir+'/output/sofm_4.out'+'\n')
+    f.write(solo_dir+'/input/seqsolo_input.csv'+'\n')
     f.write('simulation'+'\n')
     f.write(str(9100)+'\n')
     f.write(str(0)+'\n')
-    f.write('solo/output/eigenValue.out'+'\n')
-    f.write('solo/output/eigenVector.out'+'\n')
-    f.write('solo/output/trainWout.out'+'\n')
-    f.write('solo/output/freqTable.out'+'\n')
-    f.write('solo/output/errorMap.out'+'\n')
-    f.write('solo/output/finResult.out'+'\n')
-    f.write('solo/output/trainingRMSE.out'+'\n')
-    f.write('solo/output/seqOut0.out'+'\n')
-    f.write('solo/output/seqOut1.out'+'\n')
-    f.write('solo/output/seqOut2.out'+'\n')
-    f.write('solo/output/seqHidOutW.out'+'\n')
-    f.write('solo/output/seqFreqMap.out'+'\n')
+    f.write(solo_dir+'/output/eigenValue.out'+'\n')
+    f.write(solo_dir+'/output/eigenVector.out'+'\n')
+    f.write(solo_dir+'/output/trainWout.out'+'\n')
+    f.write(solo_dir+'/output/freqTable.out'+'\n')
+    f.write(solo_dir+'/output/errorMap.out'+'\n')
+    f.write(solo_dir+'/output/finResult.out'+'\n')
+    f.write(solo_dir+'/output/trainingRMSE.out'+'\n')
+    f.write(solo_dir+'/output/seqOut0.out'+'\n')
+    f.write(solo_dir+'/output/seqOut1.out'+'\n')
+    f.write(solo_dir+'/output/seqOut2.out'+'\n')
+    f.write(solo_dir+'/output/seqHidOutW.out'+'\n')
+    f.write(solo_dir+'/output/seqFreqMap.out'+'\n')
     f.write(str(c.missing_value)+'\n')
     f.write('### Comment lines ###\n')
     f.write('Line 1: No. of nodes - default is the number of drivers plus 1 (changeable via GUI if used)\n')
@@ -1043,25 +1224,11 @@ def gfSOLO_writeinffiles(solo):
     f.close()
 
 def gf_getdiurnalstats(DecHour,Data,ts):
-    nInts = 24*int((60/ts)+0.5)
-    Num = numpy.ma.zeros(nInts,dtype=int)
-    Hr = numpy.ma.zeros(nInts,dtype=float)
-    for i in range(nInts):
-        Hr[i] = float(i)*ts/60.
-    Av = numpy.ma.masked_all(nInts)
-    Sd = numpy.ma.masked_all(nInts)
-    Mx = numpy.ma.masked_all(nInts)
-    Mn = numpy.ma.masked_all(nInts)
-    if numpy.size(Data)!=0:
-        for i in range(nInts):
-            li = numpy.ma.where((abs(DecHour-Hr[i])<c.eps)&(abs(Data-float(c.missing_value))>c.eps))
-            Num[i] = numpy.size(li)
-            if Num[i]!=0:
-                Av[i] = numpy.ma.mean(Data[li])
-                Sd[i] = numpy.ma.std(Data[li])
-                Mx[i] = numpy.ma.max(Data[li])
-                Mn[i] = numpy.ma.min(Data[li])
-    return Num, Hr, Av, Sd, Mx, Mn
+    tod, nInts = pfp_utils.get_tod_index(DecHour, ts)
+    Hr = numpy.ma.array(numpy.arange(nInts)*float(ts)/60.)
+    stats = pfp_utils.get_grouped_stats(Data, tod, nInts)
+    Num = numpy.ma.array(stats["Num"])
+    return Num, Hr, stats["Av"], stats["Sd"], stats["Mx"], stats["Mn"]
 
 def trap_masked_constant(num):
     if numpy.ma.is_masked(num):
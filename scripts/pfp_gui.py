@@ -2399,6 +2399,11 @@ class edit_cfg_concatenate(QtWidgets.QWidget):
                     self.context_menu.actionAddSeriesToCheck.setText("SeriesToCheck")
                     self.context_menu.addAction(self.context_menu.actionAddSeriesToCheck)
                     self.context_menu.actionAddSeriesToCheck.triggered.connect(self.add_seriestocheck)
+                if "Streaming" not in existing_entries:
+                    self.context_menu.actionAddStreaming = QtWidgets.QAction(self)
+                    self.context_menu.actionAddStreaming.setText("Streaming")
+                    self.context_menu.addAction(self.context_menu.actionAddStreaming)
+                    self.context_menu.actionAddStreaming.triggered.connect(self.add_streaming)
         elif level == 1:
             parent = selected_item.parent()
             if (str(parent.text()) == "Options") and (selected_item.column() == 0):
@@ -2593,6 +2598,12 @@ class edit_cfg_concatenate(QtWidgets.QWidget):
         # add the subsubsection (GapFillFromAlternate)
         self.add_subsection(dict_to_add)
 
+    def add_streaming(self):
+        """ Add the Streaming option to the context menu."""
+        # add the option to the [Options] section
+        dict_to_add = {"Streaming": "Yes"}
+        self.add_subsection(dict_to_add)
+
     def browse_input_file(self):
         """ Browse for the input data file path."""
         # get the index of the selected item
@@ -3,16 +3,22 @@ from collections import OrderedDict
 import copy
 import csv
 import datetime
+import gzip
+import hashlib
+import json
 import logging
 import ntpath
 import os
 import platform
+import re
 import time
+import weakref
 # 3rd party modules
 from configobj import ConfigObj
 import dateutil
 import netCDF4
 import numpy
+import pandas
 import scipy.stats
 import xlrd
 import xlwt
@@ -29,6 +35,17 @@ import pfp_utils
 
 logger = logging.getLogger("pfp_log")
 
+# file extensions read by the CSV reader, with or without .gz
+csv_extensions = [".csv", ".dat", ".txt", ".tsv"]
+# strings treated as missing data by the CSV reader
+csv_missing_values = ["NA", "N/A", "NAN", "NaN", "nan", "#NAME?", "#VALUE!", "#DIV/0!",
+                      "#REF!", "Infinity", "-Infinity", "INF", "-INF"]
+# time stamp formats tried by csv_parse_datetime, in order
+csv_datetime_formats = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S",
+                        "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M", "%d/%m/%Y %H:%M:%S",
+                        "%d/%m/%Y %H:%M", "%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M",
+                        "%Y%m%d%H%M", "%Y-%m-%d %H:%M:%S.%f"]
+
 class DataStructure(object):
     def __init__(self):
         self.series = {}
@@ -38,6 +55,552 @@ class DataStructure(object):
         self.intermediate = []
         self.returncodes = {"value":0,"message":"OK"}
 
+class ColumnarVariable(dict):
+    """
+    Purpose:
+     A variable dictionary ({"Data", "Flag", "Attr"}) whose "Data" and "Flag"
+     entries are views into the 2D blocks held by a ColumnarSeries.
+     Assigning to "Data" or "Flag" writes the values into the block in place
+     if they fit (float64 data or integer flags with the block length),
+     otherwise the array is stored as it is (masked arrays are filled with
+     the missing value), the same as a plain dictionary.
+    Author: PRI
+    Date: October 2026
+    """
+    def __init__(self, series, label):
+        super(ColumnarVariable, self).__init__()
+        # weak reference so the blocks are freed as soon as the series is
+        self._series = weakref.ref(series)
+        self._label = label
+
+    def __setitem__(self, key, value):
+        series = self._series()
+        if series is not None and key == "Data":
+            value = series._write_data(self._label, value)
+        elif series is not None and key == "Flag":
+            value = series._write_flag(self._label, value)
+        super(ColumnarVariable, self).__setitem__(key, value)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __deepcopy__(self, memo):
+        # a deep copy of a single variable is a plain dictionary
+        return copy.deepcopy(dict(self), memo)
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+class ColumnarSeries(dict):
+    """
+    Purpose:
+     A replacement for the ds.series dictionary that stores the float64 data
+     of all variables in a single 2D array (one row per variable) and the
+     int32 QC flags in a parallel 2D array.  Variables are located in the
+     blocks using a label to row map.
+     ds.series[label]["Data"] returns a view of the row so existing code
+     that reads from or writes to ds.series directly keeps working.
+     Variables that do not fit the blocks (eg the DateTime series or the
+     integer Year, Month etc series) are stored as they are.
+    Usage:
+     ds = pfp_io.ColumnarDataStructure()
+     ds.series is then an instance of ColumnarSeries
+    Author: PRI
+    Date: October 2026
+    """
+    columnar = True
+    # rows added to the blocks each time they grow
+    growth_factor = 1.5
+    def __init__(self, nrecs=None, nvars=0):
+        super(ColumnarSeries, self).__init__()
+        self.nrecs = nrecs
+        self.data = numpy.empty((0, 0), dtype=numpy.float64)
+        self.flag = numpy.empty((0, 0), dtype=numpy.int32)
+        self.rows = {}
+        self.free_rows = []
+        if nrecs is not None:
+            self._allocate(nrecs, nvars)
+
+    def _allocate(self, nrecs, nvars):
+        """ Allocate empty blocks with room for nvars variables."""
+        self.nrecs = nrecs
+        self.data = numpy.full((nvars, nrecs), float(c.missing_value), dtype=numpy.float64)
+        self.flag = numpy.ones((nvars, nrecs), dtype=numpy.int32)
+        self.rows = {}
+        self.free_rows = list(range(nvars-1, -1, -1))
+
+    def _grow(self):
+        """ Grow the blocks and re-point the variable views at the new blocks."""
+        nvars_old = self.data.shape[0]
+        nvars_new = max(nvars_old + 1, int(nvars_old*self.growth_factor))
+        data = numpy.full((nvars_new, self.nrecs), float(c.missing_value), dtype=numpy.float64)
+        flag = numpy.ones((nvars_new, self.nrecs), dtype=numpy.int32)
+        data[:nvars_old] = self.data
+        flag[:nvars_old] = self.flag
+        self.data = data
+        self.flag = flag
+        self.free_rows = list(range(nvars_new-1, nvars_old-1, -1)) + self.free_rows
+        for label, row in self.rows.items():
+            self._rebind(label, row)
+
+    def _rebind(self, label, row):
+        """ Point the "Data" and "Flag" entries for label at the current blocks."""
+        variable = dict.get(self, label)
+        if variable is None:
+            return
+        if "Data" in variable:
+            dict.__setitem__(variable, "Data", self.data[row])
+        if "Flag" in variable:
+            dict.__setitem__(variable, "Flag", self.flag[row])
+
+    def _get_row(self, label):
+        """ Return the block row for label, assigning a free row if needed."""
+        if label not in self.rows:
+            if len(self.free_rows) == 0:
+                self._grow()
+            row = self.free_rows.pop()
+            self.data[row] = float(c.missing_value)
+            self.flag[row] = numpy.int32(1)
+            self.rows[label] = row
+        return self.rows[label]
+
+    def _release_row(self, label):
+        """ Return the block row used by label to the pool of free rows."""
+        if label in self.rows:
+            self.free_rows.append(self.rows.pop(label))
+
+    def _fits(self, value):
+        """ Return True if value can be stored as a row in the blocks."""
+        if not isinstance(value, numpy.ndarray) or value.ndim != 1:
+            return False
+        if self.nrecs is None:
+            self._allocate(len(value), 0)
+        return len(value) == self.nrecs
+
+    def _write_data(self, label, value):
+        if (self._fits(value) and value.dtype == numpy.float64):
+            row = self._get_row(label)
+            view = self.data[row]
+            if numpy.ma.isMA(value):
+                # fill masked elements with the missing value in place
+                numpy.copyto(view, numpy.ma.getdata(value))
+                view[numpy.ma.getmaskarray(value)] = float(c.missing_value)
+            elif not numpy.may_share_memory(view, value):
+                numpy.copyto(view, value)
+            return view
+        # does not fit in the block, keep the array as it is but filled so
+        # that "Data" is never a masked array
+        self._release_row(label)
+        if numpy.ma.isMA(value):
+            value = numpy.ma.filled(value, float(c.missing_value))
+        return value
+
+    def _write_flag(self, label, value):
+        if (self._fits(value) and label in self.rows and
+            numpy.issubdtype(value.dtype, numpy.number)):
+            view = self.flag[self.rows[label]]
+            if not numpy.may_share_memory(view, value):
+                numpy.copyto(view, value, casting="unsafe")
+            return view
+        return value
+
+    def __setitem__(self, label, variable):
+        if isinstance(variable, pfp_utils.DateTimeVariable):
+            # keep the time axis as it is so the Python datetimes stay lazy
+            self._release_row(label)
+            dict.__setitem__(self, label, variable)
+            return
+        # keep the existing row (if any) so that CreateVariable writes in place
+        entry = ColumnarVariable(self, label)
+        dict.__setitem__(self, label, entry)
+        # write "Data" first so that "Flag" can go into the same row
+        for key in ["Data", "Flag"]:
+            if key in variable:
+                entry[key] = variable[key]
+        for key in variable:
+            if key not in ["Data", "Flag"]:
+                entry[key] = variable[key]
+
+    def __delitem__(self, label):
+        dict.__delitem__(self, label)
+        self._release_row(label)
+
+    def pop(self, label, *args):
+        self._release_row(label)
+        return dict.pop(self, label, *args)
+
+    def clear(self):
+        dict.clear(self)
+        self.rows = {}
+        self.free_rows = list(range(self.data.shape[0]-1, -1, -1))
+
+    def update(self, *args, **kwargs):
+        for label, variable in dict(*args, **kwargs).items():
+            self[label] = variable
+
+    def pack(self):
+        """
+        Purpose:
+         Rebuild the blocks so they contain exactly one row per block variable.
+         Variables with float64 data of the most common length are moved into
+         the blocks, the rest stay as they are.
+        Usage:
+         ds.series.pack()
+        Author: PRI
+        Date: October 2026
+        """
+        variables = [(label, dict.__getitem__(self, label)) for label in dict.keys(self)]
+        lengths = [len(v["Data"]) for l, v in variables
+                   if not isinstance(v, pfp_utils.DateTimeVariable) and
+                   isinstance(v.get("Data"), numpy.ndarray) and v["Data"].dtype == numpy.float64]
+        if len(lengths) == 0:
+            return
+        nrecs = max(set(lengths), key=lengths.count)
+        nvars = lengths.count(nrecs)
+        dict.clear(self)
+        self._allocate(nrecs, nvars)
+        for label, variable in variables:
+            self[label] = variable
+            # release the original arrays as we go to limit peak memory
+            if not isinstance(variable, pfp_utils.DateTimeVariable):
+                dict.clear(variable)
+        return
+
+    def __deepcopy__(self, memo):
+        # one copy of each block rather than one copy per variable
+        new = ColumnarSeries()
+        memo[id(self)] = new
+        new.nrecs = self.nrecs
+        new.data = self.data.copy()
+        new.flag = self.flag.copy()
+        new.rows = dict(self.rows)
+        new.free_rows = list(self.free_rows)
+        for label in dict.keys(self):
+            variable = dict.__getitem__(self, label)
+            if isinstance(variable, pfp_utils.DateTimeVariable):
+                dict.__setitem__(new, label, copy.deepcopy(variable, memo))
+                continue
+            entry = ColumnarVariable(new, label)
+            for key in dict.keys(variable):
+                if key in ["Data", "Flag"] and label in self.rows:
+                    block = new.data if key == "Data" else new.flag
+                    value = block[self.rows[label]]
+                else:
+                    value = copy.deepcopy(dict.__getitem__(variable, key), memo)
+                dict.__setitem__(entry, key, value)
+            dict.__setitem__(new, label, entry)
+        return new
+
+    def __reduce__(self):
+        # pickle as a plain dictionary, the blocks are rebuilt by pack()
+        series = {}
+        for label, variable in self.items():
+            if isinstance(variable, pfp_utils.DateTimeVariable):
+                series[label] = variable
+            else:
+                series[label] = dict(variable)
+        return (_unpickle_columnar_series, (series,))
+
+def _unpickle_columnar_series(series):
+    new = ColumnarSeries()
+    for label in series:
+        dict.__setitem__(new, label, series[label])
+    new.pack()
+    return new
+
+class ColumnarDataStructure(DataStructure):
+    """
+    Purpose:
+     A data structure that keeps the data and QC flags of all float64
+     variables in contiguous 2D blocks (see ColumnarSeries).  The usual
+     ds.series[label]["Data"] access pattern is unchanged.
+    Usage:
+     ds = pfp_io.ColumnarDataStructure()
+     or, to convert an existing data structure,
+     ds = pfp_io.ColumnarDataStructure(ds)
+     The original data structure should not be used after the conversion.
+    Author: PRI
+    Date: October 2026
+    """
+    def __init__(self, ds=None):
+        super(ColumnarDataStructure, self).__init__()
+        self.series = ColumnarSeries()
+        if ds is not None:
+            self.globalattributes = ds.globalattributes
+            self.mergeserieslist = ds.mergeserieslist
+            self.averageserieslist = ds.averageserieslist
+            self.intermediate = ds.intermediate
+            self.returncodes = ds.returncodes
+            for label in list(ds.series.keys()):
+                dict.__setitem__(self.series, label, ds.series[label])
+            self.series.pack()
+
+class LazyVariable(dict):
+    """
+    Purpose:
+     A variable dictionary ({"Data", "Flag", "Attr"}) whose "Data" and "Flag"
+     entries are only read from the netCDF file the first time they are
+     asked for.  The "Attr" entry is read when the file is opened so the
+     variable attributes can be checked without reading the data.
+     Only the records si to ei (inclusive) are read from the file.
+     If align has been called, the data and QC flag are put on to another
+     time axis when they are read (see align).
+    Usage:
+     Created by pfp_io.nc_read_series(nc_name, lazy=True)
+    Author: PRI
+    Date: October 2026
+    """
+    def __init__(self, nc_name, label, attr, si=0, ei=None):
+        super(LazyVariable, self).__init__()
+        dict.__setitem__(self, "Attr", attr)
+        self._source = [nc_name, label, si, ei]
+        self._align = None
+
+    def align(self, nrecs, to_index, from_index):
+        """
+        Put the data on to a time axis with nrecs records when it is read,
+        record from_index[i] of the data read from the file goes to record
+        to_index[i], records with no match are missing with a QC flag of 1.
+        Nothing is read from the file if to_index is empty.
+        """
+        if self._source is None:
+            raise RuntimeError("LazyVariable.align: variable has already been read")
+        self._align = [nrecs, to_index, from_index]
+
+    def _load(self):
+        """ Read the data and QC flag from the netCDF file."""
+        if self._source is None:
+            return
+        nc_name, label, si, ei = self._source
+        self._source = None
+        if self._align is not None and len(self._align[1]) == 0:
+            data = numpy.full(self._align[0], c.missing_value, dtype=numpy.float64)
+            flag = numpy.ones(self._align[0], dtype=numpy.int32)
+        else:
+            ncFile = netCDF4.Dataset(nc_name, "r")
+            ncFile.set_auto_mask(False)
+            data, flag, attr = nc_read_var(ncFile, label, si=si, ei=ei)
+            ncFile.close()
+            if self._align is not None:
+                nrecs, to_index, from_index = self._align
+                data_aligned = numpy.full(nrecs, c.missing_value, dtype=numpy.float64)
+                flag_aligned = numpy.ones(nrecs, dtype=numpy.int32)
+                data_aligned[to_index] = data[from_index]
+                flag_aligned[to_index] = flag[from_index]
+                data, flag = data_aligned, flag_aligned
+        dict.__setitem__(self, "Data", data)
+        dict.__setitem__(self, "Flag", flag)
+
+    @property
+    def loaded(self):
+        return self._source is None
+
+    def __getitem__(self, key):
+        if key in ["Data", "Flag"]:
+            self._load()
+        return dict.__getitem__(self, key)
+
+    def __setitem__(self, key, value):
+        # read the other half of the Data/Flag pair before it is replaced
+        self._load()
+        dict.__setitem__(self, key, value)
+
+    def __contains__(self, key):
+        if key in ["Data", "Flag"] and self._source is not None:
+            return True
+        return dict.__contains__(self, key)
+
+    def has_key(self, key):
+        return self.__contains__(key)
+
+    def keys(self):
+        if self._source is not None:
+            return ["Data", "Flag"] + dict.keys(self)
+        return dict.keys(self)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def items(self):
+        self._load()
+        return dict.items(self)
+
+    def iteritems(self):
+        self._load()
+        return dict.iteritems(self)
+
+    def values(self):
+        self._load()
+        return dict.values(self)
+
+    def pop(self, key, *args):
+        self._load()
+        return dict.pop(self, key, *args)
+
+    def update(self, *args, **kwargs):
+        self._load()
+        dict.update(self, *args, **kwargs)
+
+    def copy(self):
+        self._load()
+        return dict(self)
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        # a deep copy of a lazy variable is a plain dictionary
+        self._load()
+        return copy.deepcopy(dict(self), memo)
+
+    def __reduce__(self):
+        self._load()
+        return (dict, (dict(self),))
+
+def load_lazy_variables(ds):
+    """
+    Purpose:
+     Read the data for any variables in a data structure that have not been
+     read from the netCDF file yet, see nc_read_series(lazy=True).
+     Used before operations that change the length of every series.
+    Usage:
+     pfp_io.load_lazy_variables(ds)
+    Author: PRI
+    Date: October 2026
+    """
+    for label in list(ds.series.keys()):
+        if isinstance(ds.series[label], LazyVariable):
+            ds.series[label] = ds.series[label].copy()
+    return
+
+class ResultsSheet(object):
+    """
+    Purpose:
+     A worksheet in a ResultsWorkbook.  Single cells, columns and rows are
+     held as blocks and are only written to the file when the workbook is
+     saved.  Where blocks overlap, the last one written wins.
+    Usage:
+     xl_sheet = xl_file.add_sheet("Monthly")
+     xl_sheet.write(0, 0, "Hour")
+     xl_sheet.write_column(2, 0, data, num_format="0.00")
+     xl_sheet.write_row(1, 1, ["Num", "Av", "Sd"])
+     where data is a list, a numpy array or a masked array (masked values
+           are written as NaN)
+           num_format is an Excel number format eg "0.00" or "dd/mm/yyyy"
+    Author: PRI
+    Date: October 2026
+    """
+    def __init__(self, name):
+        self.name = name
+        self.blocks = []
+
+    def write(self, row, col, value, num_format=None):
+        self.blocks.append((row, col, [results_value(value)], num_format, True))
+
+    def write_column(self, row, col, values, num_format=None):
+        values = results_values(values)
+        if len(values) != 0:
+            self.blocks.append((row, col, values, num_format, True))
+
+    def write_row(self, row, col, values, num_format=None):
+        values = results_values(values)
+        if len(values) != 0:
+            self.blocks.append((row, col, values, num_format, False))
+
+    def rows(self):
+        """
+        Purpose:
+         Generator that returns the cells of the sheet one row at a time, in
+         row order, as (row, {col: (value, num_format)}).  Used by the
+         backends that have to write the rows in order.
+        Author: PRI
+        Date: October 2026
+        """
+        blocks = self.blocks
+        order = sorted(range(len(blocks)), key=lambda i: blocks[i][0])
+        active = []
+        n = 0
+        row = 0
+        while n < len(order) or len(active) != 0:
+            if len(active) == 0:
+                row = max([row, blocks[order[n]][0]])
+            while n < len(order) and blocks[order[n]][0] <= row:
+                active.append(order[n])
+                n = n + 1
+            # blocks written later replace blocks written earlier
+            active.sort()
+            cells = {}
+            for i in active:
+                row0, col0, values, num_format, vertical = blocks[i]
+                if vertical:
+                    cells[col0] = (values[row-row0], num_format)
+                else:
+                    for j, value in enumerate(values):
+                        cells[col0+j] = (value, num_format)
+            yield row, cells
+            active = [i for i in active if blocks[i][4] and row-blocks[i][0] < len(blocks[i][2])-1]
+            row = row + 1
+
+class ResultsWorkbook(object):
+    """
+    Purpose:
+     A workbook for the results files (climatology, flag statistics, gap
+     filling statistics, L6 summary etc) with a column oriented write API
+     and a choice of backend:
+      "xls"  - Excel 97 workbook written with xlwt, limited to 65536 rows
+      "xlsx" - Excel 2007 workbook written with xlsxwriter in constant
+               memory mode
+      "csv"  - one CSV file per worksheet, <file_name>_<sheet_name>.csv
+     The sheets are held in memory and the file is written by save().
+     xlsxwriter's constant memory mode needs the cells to be written in
+     row order so the blocks are sorted by row when the workbook is saved.
+    Usage:
+     xl_file = pfp_io.ResultsWorkbook(xl_name, results_format="xlsx")
+     xl_sheet = xl_file.add_sheet("Daily")
+     xl_sheet.write_column(2, 0, data, num_format="0.00")
+     xl_file.save()
+     where xl_name is the file name, the extension is changed to match
+           the format
+           results_format is "xls", "xlsx" or "csv", if it is None the
+           format is taken from the extension of xl_name
+    Author: PRI
+    Date: October 2026
+    """
+    def __init__(self, file_name, results_format=None, datemode=0):
+        if results_format is None:
+            results_format = os.path.splitext(file_name)[1].lower().lstrip(".")
+            if results_format not in ["xls", "xlsx", "csv"]:
+                results_format = "xls"
+        self.results_format = results_format
+        self.file_name = get_results_filename(file_name, results_format)
+        self.datemode = int(datemode)
+        self.sheets = []
+
+    def add_sheet(self, sheet_name):
+        xl_sheet = ResultsSheet(sheet_name)
+        self.sheets.append(xl_sheet)
+        return xl_sheet
+
+    def save(self, file_name=None):
+        if file_name is not None:
+            self.file_name = get_results_filename(file_name, self.results_format)
+        if self.results_format == "xlsx":
+            results_write_xlsx(self)
+        elif self.results_format == "csv":
+            results_write_csv(self)
+        else:
+            results_write_xls(self)
+        return
+
 def copy_datastructure(cf,ds_in):
     '''
     Return a copy of a data structure based on the following rules:
@@ -56,6 +619,9 @@ def copy_datastructure(cf,ds_in):
     # modificatons to be made:
     #  - check the modification datetime of the L3 and L4 files:
     #     - if the L3 file is newer than the L4 file the disregard the "UseExistingOutFile" setting
+    # incremental runs splice the new data into the existing output file, see incremental_write()
+    if pfp_utils.get_optionskeyaslogical(cf, "Incremental", default=False):
+        return copy.deepcopy(ds_in)
     # get the output (L4) file name
     ct_filename = cf['Files']['file_path']+cf['Files']['out_filename']
     # if the L4 file does not exist then create the L4 data structure as a copy
@@ -118,6 +684,257 @@ def copy_datastructure(cf,ds_in):
                         pass
     return ds_out
 
+def incremental_get_info(cf):
+    """
+    Purpose:
+     Return the settings for incremental processing.
+     When the Incremental option is "Yes", each level records a watermark (the
+     last time in the output file) and a hash of the control file and inputs
+     as global attributes of its output file.  On the next run, if the output
+     file exists, the hash has not changed and the data in the input file that
+     was used for the last run has not changed (see incremental_fingerprint),
+     only the data after the watermark is needed.  The data from SpinUpDays
+     before the watermark is processed as well so that the gap filling etc
+     has some history to work with and the new data is spliced into the
+     existing output file, see incremental_write().
+     The returned dictionary contains;
+      "enabled" - True if the Incremental option is "Yes"
+      "mode" - "full" to process all of the data, "append" to process the tail
+      "start" - the first time to be processed, None for a full run
+      "watermark" - the last time in the existing output file
+      "hash" - the hash of the control file and the other input files
+      "input" - the fingerprint of the input file, see incremental_fingerprint()
+    Usage:
+     incremental = pfp_io.incremental_get_info(cf)
+     ds = pfp_io.nc_read_series(in_filename, start=incremental["start"])
+    Author: PRI
+    Date: October 2026
+    Modified:
+     October 2026 - check the input data used by the last run has not changed
+    """
+    incremental = {"enabled": False, "mode": "full", "start": None,
+                   "watermark": None, "hash": None, "input": None}
+    if not pfp_utils.get_optionskeyaslogical(cf, "Incremental", default=False):
+        return incremental
+    incremental["enabled"] = True
+    incremental["hash"] = incremental_hash(cf)
+    out_filename = get_outfilenamefromcf(cf)
+    in_filename = get_infilenamefromcf(cf)
+    if not os.path.isfile(out_filename) or not os.path.isfile(in_filename):
+        if os.path.isfile(in_filename):
+            incremental["input"] = incremental_fingerprint(in_filename)
+        msg = " Incremental: " + os.path.basename(out_filename) + " not found, processing all data"
+        logger.info(msg)
+        return incremental
+    nc_file = netCDF4.Dataset(out_filename, "r")
+    gattrs = dict([(gattr, getattr(nc_file, gattr)) for gattr in nc_file.ncattrs()])
+    nc_file.close()
+    if "incremental_watermark" not in gattrs:
+        msg = " Incremental: no watermark in " + os.path.basename(out_filename) + ", processing all data"
+        logger.info(msg)
+        return incremental
+    # the input data used for the last run must not have changed, only new data can be added
+    prefix_size = None
+    if "incremental_input_size" in gattrs:
+        prefix_size = int(gattrs["incremental_input_size"])
+    incremental["input"] = incremental_fingerprint(in_filename, prefix_size=prefix_size)
+    if gattrs.get("incremental_hash") != incremental["hash"]:
+        msg = " Incremental: control file or inputs changed, processing all data"
+        logger.info(msg)
+        return incremental
+    if (incremental["input"]["prefix_sha1"] is None or
+        incremental["input"]["prefix_sha1"] != gattrs.get("incremental_input_sha1")):
+        msg = " Incremental: data in " + os.path.basename(in_filename)
+        msg += " used by the last run has changed, processing all data"
+        logger.info(msg)
+        return incremental
+    # the spin-up margin defaults to a day for L1 to L3 and 90 days for the gap filling levels
+    level = str(cf.get("level", "")).upper()
+    default = {"L4": 90, "L5": 90, "L6": 90}.get(level, 1)
+    opt = pfp_utils.get_keyvaluefromcf(cf, ["Options"], "SpinUpDays", default=default)
+    watermark = numpy.datetime64(str(gattrs["incremental_watermark"]).replace(" ", "T"), "s")
+    incremental["mode"] = "append"
+    incremental["watermark"] = watermark
+    incremental["start"] = watermark - numpy.timedelta64(int(float(opt)*86400), "s")
+    msg = " Incremental: processing data after " + str(watermark).replace("T", " ")
+    msg += " with a spin-up from " + str(incremental["start"]).replace("T", " ")
+    logger.info(msg)
+    return incremental
+
+def incremental_hash(cf):
+    """
+    Purpose:
+     Return a hash of the control file contents and of the contents of the
+     other files named in the control file (eg the CPD results, climatology
+     and alternate data files used by the gap filling and partitioning).
+     The input file is not included because new data is added to it between
+     runs, it is checked by incremental_fingerprint() instead.
+     Options set at run time (call_mode, show_plots) are not included.
+    Usage:
+     hash = pfp_io.incremental_hash(cf)
+    Author: PRI
+    Date: October 2026
+    Modified:
+     October 2026 - hash the contents of the other input files
+    """
+    cfd = cf.dict()
+    if "Options" in cfd:
+        for item in ["call_mode", "show_plots"]:
+            cfd["Options"].pop(item, None)
+    sha = hashlib.sha1(json.dumps(cfd, sort_keys=True))
+    for file_name in incremental_get_side_files(cf):
+        sha.update(file_name)
+        sha.update(incremental_fingerprint(file_name, raw=True)["sha1"])
+    return sha.hexdigest()
+
+def incremental_get_side_files(cf):
+    """
+    Purpose:
+     Return a sorted list of the files, other than the input and output
+     files, that are named anywhere in the control file ([Files] section,
+     gap filling and partitioning sections etc).  File names can be given
+     as full paths or relative to file_path.  The netCDF file alongside an
+     Excel workbook (eg the climatology) is included if it exists because
+     it is read in place of the workbook.
+    Usage:
+     file_names = pfp_io.incremental_get_side_files(cf)
+    Author: PRI
+    Date: October 2026
+    """
+    file_path = str(pfp_utils.get_keyvaluefromcf(cf, ["Files"], "file_path", default=""))
+    exclude = [os.path.abspath(get_infilenamefromcf(cf)), os.path.abspath(get_outfilenamefromcf(cf))]
+    values = []
+    sections = [cf.dict()]
+    while len(sections) != 0:
+        section = sections.pop()
+        for value in section.values():
+            if isinstance(value, dict):
+                sections.append(value)
+            elif isinstance(value, list):
+                values.extend([item for item in value if isinstance(item, basestring)])
+            elif isinstance(value, basestring):
+                values.append(value)
+    file_names = set()
+    for value in values:
+        for candidate in [value, os.path.join(file_path, value)]:
+            names = [candidate]
+            if os.path.splitext(candidate)[1].lower() in [".xls", ".xlsx"]:
+                names.append(os.path.splitext(candidate)[0] + ".nc")
+            for name in names:
+                if os.path.isfile(name) and os.path.abspath(name) not in exclude:
+                    file_names.add(os.path.abspath(name))
+    return sorted(file_names)
+
+def incremental_fingerprint(file_name, prefix_size=None, raw=False):
+    """
+    Purpose:
+     Return a fingerprint of the contents of an input file as a dictionary;
+      "size" - the size of the file, records for netCDF files and bytes for
+               other files
+      "sha1" - a hash of the contents of the file
+      "prefix_sha1" - a hash of the first prefix_size records or bytes, None
+                      if prefix_size is not given or the file is too short
+     For netCDF files the hashes are of the time variable and of the data
+     and QC flags of all variables with a time dimension, so records added
+     by an incremental run of the previous level do not change the hash of
+     the records that were there before.  Other files (eg the logger files
+     read at L1) are hashed byte by byte, so a file that has only had data
+     appended to it has the same prefix hash.  Files that are rewritten when
+     data is added (eg Excel workbooks) will always look changed.
+     If raw is True, all files are hashed byte by byte.
+    Usage:
+     fingerprint = pfp_io.incremental_fingerprint(in_filename, prefix_size=nrecs)
+    Author: PRI
+    Date: October 2026
+    """
+    sha = hashlib.sha1()
+    prefix_sha = hashlib.sha1()
+    if file_name.endswith(".nc") and not raw:
+        nc_file = netCDF4.Dataset(file_name, "r")
+        nc_file.set_auto_mask(False)
+        size = len(nc_file.dimensions["time"])
+        labels = sorted([label for label in nc_file.variables.keys()
+                         if nc_file.variables[label].dimensions[:1] == ("time",)])
+        for label in labels:
+            data = numpy.ascontiguousarray(nc_file.variables[label][:])
+            sha.update(label)
+            sha.update(data.tobytes())
+            if prefix_size is not None and prefix_size <= size:
+                prefix_sha.update(label)
+                prefix_sha.update(numpy.ascontiguousarray(data[:prefix_size]).tobytes())
+        nc_file.close()
+    else:
+        size = 0
+        with open(file_name, "rb") as f:
+            while True:
+                block = f.read(1048576)
+                if len(block) == 0:
+                    break
+                if prefix_size is not None and size <= prefix_size:
+                    prefix_sha.update(block[:prefix_size-size])
+                sha.update(block)
+                size = size + len(block)
+    fingerprint = {"size": size, "sha1": sha.hexdigest(), "prefix_sha1": None}
+    if prefix_size is not None and prefix_size <= size:
+        fingerprint["prefix_sha1"] = prefix_sha.hexdigest()
+    return fingerprint
+
+def incremental_truncate(ds, incremental):
+    """
+    Purpose:
+     Drop the records before the incremental start time from a data
+     structure, used at L1 where the whole input file has to be read.
+    Usage:
+     pfp_io.incremental_truncate(ds, incremental)
+     where incremental is the dictionary returned by incremental_get_info()
+    Author: PRI
+    Date: October 2026
+    """
+    if incremental["mode"] != "append":
+        return
+    dt64 = pfp_utils.get_datetime64(ds)
+    si = numpy.searchsorted(dt64, incremental["start"])
+    if si == len(dt64):
+        # nothing new, incremental_write() will leave the output file alone
+        return
+    for label in list(ds.series.keys()):
+        if label == "DateTime":
+            ds.series[label]["Data64"] = dt64[si:]
+        else:
+            ds.series[label]["Data"] = ds.series[label]["Data"][si:]
+        ds.series[label]["Flag"] = ds.series[label]["Flag"][si:]
+    ds.globalattributes["nc_nrecs"] = len(dt64) - si
+    return
+
+def incremental_write(cf, ds, incremental):
+    """
+    Purpose:
+     Write the output data structure to the netCDF file given in the control
+     file.  For a full run, the file is written as usual.  For an incremental
+     run, the records after the watermark are spliced into the existing file,
+     see nc_splice_series().
+     Returns True if the output file was written.
+    Usage:
+     pfp_io.incremental_write(cf, ds, incremental)
+     where incremental is the dictionary returned by incremental_get_info()
+    Author: PRI
+    Date: October 2026
+    """
+    out_filename = get_outfilenamefromcf(cf)
+    nc_options = get_nc_write_options(cf)
+    if incremental["enabled"]:
+        dt64 = pfp_utils.get_datetime64(ds)
+        ds.globalattributes["incremental_hash"] = incremental["hash"]
+        ds.globalattributes["incremental_watermark"] = str(dt64[-1].astype("datetime64[s]")).replace("T", " ")
+        if incremental["input"] is not None:
+            ds.globalattributes["incremental_input_size"] = str(incremental["input"]["size"])
+            ds.globalattributes["incremental_input_sha1"] = incremental["input"]["sha1"]
+    if incremental["mode"] == "append":
+        return nc_splice_series(out_filename, ds, incremental["watermark"], nc_options=nc_options)
+    nc_file = nc_open_write(out_filename)
+    nc_write_series(nc_file, ds, nc_options=nc_options)
+    return True
+
 def csv_read_parse_cf(cf):
     info = {"cf_ok":False}
     if "DateTime" not in cf["Variables"]:
@@ -286,6 +1103,189 @@ def csv_read_series(cf):
     ds.returncodes = {"value":0,"message":"OK"}
     return ds
 
+def csv_is_text_file(file_name):
+    """ Return True if file_name is a CSV or TOA5 file (optionally gzipped) read by the CSV reader."""
+    base_name = file_name.lower()
+    if base_name.endswith(".gz"):
+        base_name = base_name[:-3]
+    return os.path.splitext(base_name)[1] in csv_extensions
+
+def csv_open(file_name):
+    """ Open a text file for reading in binary mode, gzipped files are decompressed on the fly."""
+    with open(file_name, "rb") as f:
+        magic = f.read(2)
+    if magic == "\x1f\x8b":
+        return gzip.open(file_name, "rb")
+    return open(file_name, "rb")
+
+def csv_count_lines(file_name):
+    """ Return the number of lines in a text file, read in blocks to keep it fast."""
+    nlines = 0
+    last = "\n"
+    with csv_open(file_name) as f:
+        while True:
+            block = f.read(1024*1024)
+            if len(block) == 0:
+                break
+            nlines += block.count("\n")
+            last = block[-1]
+    if last != "\n":
+        nlines += 1
+    return nlines
+
+def csv_read_header(file_name, header_row, first_data_row, nsample=1000):
+    """
+    Purpose:
+     Read the header of a CSV or TOA5 file.  Returns a dictionary with the
+     delimiter (found by csv.Sniffer from the header line), the list of
+     column names and a sample of up to nsample data rows used to find the
+     time stamp column.
+    Usage:
+     info = pfp_io.csv_read_header(file_name, header_row, first_data_row)
+     where header_row and first_data_row are 0-based line numbers
+    Author: PRI
+    Date: October 2026
+    """
+    info = {"file_name": file_name, "header_row": header_row, "first_data_row": first_data_row}
+    lines = []
+    with csv_open(file_name) as f:
+        for i in range(first_data_row + nsample):
+            line = f.readline()
+            if len(line) == 0:
+                break
+            lines.append(line.rstrip("\r\n"))
+    if len(lines) <= header_row:
+        msg = " CSV file " + os.path.basename(file_name) + " has no header row " + str(header_row+1)
+        logger.error(msg)
+        return None
+    try:
+        info["delimiter"] = csv.Sniffer().sniff(lines[header_row], ",\t;").delimiter
+    except csv.Error:
+        info["delimiter"] = ","
+    reader = csv.reader(lines[header_row:header_row+1], delimiter=info["delimiter"])
+    info["header_list"] = [h.strip() for h in next(reader)]
+    reader = csv.reader(lines[first_data_row:], delimiter=info["delimiter"])
+    info["sample"] = [row for row in reader if len(row) != 0]
+    return info
+
+def csv_parse_datetime(values, fmt=None):
+    """
+    Purpose:
+     Parse an array of time stamp strings to datetime64.  The format is the
+     first of csv_datetime_formats that parses all of the non-empty strings,
+     or the one that parses the most if none parse all (unless fmt is given), and the strings are then parsed in one vectorised
+     call.  Strings that do not match the format are parsed one at a time
+     with dateutil, strings that can not be parsed at all are NaT.
+    Usage:
+     dt64, fmt = pfp_io.csv_parse_datetime(values)
+    Author: PRI
+    Date: October 2026
+    """
+    values = pandas.Series(numpy.asarray(values, dtype=object)).fillna("").astype(str).str.strip()
+    not_empty = (values != "").values
+    if fmt is None:
+        nbest = 0
+        for item in csv_datetime_formats:
+            parsed = pandas.to_datetime(values[not_empty], format=item, errors="coerce")
+            nparsed = numpy.sum(~pandas.isnull(parsed))
+            if nparsed > nbest:
+                fmt, nbest = item, nparsed
+            if nparsed == numpy.sum(not_empty):
+                break
+    if fmt is None:
+        dt64 = numpy.full(len(values), numpy.datetime64("NaT"), dtype="datetime64[us]")
+    else:
+        dt64 = pandas.to_datetime(values, format=fmt, errors="coerce").values.astype("datetime64[us]")
+    # fall back to dateutil for the strings the format did not match
+    for i in numpy.where(numpy.isnat(dt64) & not_empty)[0]:
+        try:
+            dt64[i] = numpy.datetime64(dateutil.parser.parse(values.iat[i]), "us")
+        except (ValueError, OverflowError):
+            pass
+    return dt64, fmt
+
+def csv_find_timestamp(info, threshold=75):
+    """
+    Purpose:
+     Return the index of the time stamp column of a CSV file, this is the
+     first column where more than threshold percent of the sample rows
+     parse as a time stamp.  Returns None if there is no time stamp.
+    Usage:
+     col = pfp_io.csv_find_timestamp(info)
+    Author: PRI
+    Date: October 2026
+    """
+    for col in range(len(info["header_list"])):
+        values = [row[col] if len(row) > col else "" for row in info["sample"]]
+        if len(values) == 0:
+            break
+        # time stamps are not numbers, except for formats like 201801010030
+        numbers = pandas.to_numeric(pandas.Series(values), errors="coerce")
+        if not numpy.any(numpy.isnan(numbers)) and not all([len(v.strip()) == 12 for v in values]):
+            continue
+        dt64, fmt = csv_parse_datetime(values)
+        if fmt is not None and 100*numpy.sum(~numpy.isnat(dt64)) > threshold*len(values):
+            return col
+    return None
+
+def csv_read_columns(info, columns, timestamp_column, chunk_size=50000):
+    """
+    Purpose:
+     Read the time stamp and the numeric columns of a CSV or TOA5 file.
+     The file is read in chunks of chunk_size rows by the pandas C parser
+     and each chunk is put into float64 arrays allocated before reading
+     starts.  Strings in csv_missing_values, empty fields and anything that
+     is not a number are returned as NaN.  The time stamps are parsed with
+     csv_parse_datetime using the format found in the first chunk.
+     The number of rows read per second is written to the log.
+    Usage:
+     dt64, data = pfp_io.csv_read_columns(info, [2, 3, 5], 0)
+     where info is from csv_read_header
+           columns is a list of column numbers
+           timestamp_column is the column number of the time stamp
+     dt64 is a datetime64 array and data is a dictionary of float64 arrays
+     keyed on the column number
+    Author: PRI
+    Date: October 2026
+    """
+    start = time.time()
+    file_name = info["file_name"]
+    nrows = max([csv_count_lines(file_name) - info["first_data_row"], 0])
+    dt64 = numpy.full(nrows, numpy.datetime64("NaT"), dtype="datetime64[us]")
+    data = {}
+    for col in columns:
+        data[col] = numpy.full(nrows, numpy.nan, dtype=numpy.float64)
+    usecols = sorted(set(columns + [timestamp_column]))
+    fmt = None
+    n = 0
+    with csv_open(file_name) as f:
+        reader = pandas.read_csv(f, sep=info["delimiter"], header=None, skiprows=info["first_data_row"],
+                                 usecols=usecols, dtype={timestamp_column: str}, na_values=csv_missing_values,
+                                 chunksize=chunk_size, engine="c", skip_blank_lines=True,
+                                 error_bad_lines=False, warn_bad_lines=False)
+        for chunk in reader:
+            m = len(chunk)
+            if n + m > nrows:
+                # more rows than lines, can happen with quoted line breaks
+                extra = n + m - nrows
+                dt64 = numpy.concatenate((dt64, numpy.full(extra, numpy.datetime64("NaT"), dtype=dt64.dtype)))
+                for col in columns:
+                    data[col] = numpy.concatenate((data[col], numpy.full(extra, numpy.nan)))
+                nrows = n + m
+            dt64[n:n+m], fmt = csv_parse_datetime(chunk[timestamp_column].values, fmt=fmt)
+            for col in columns:
+                data[col][n:n+m] = pandas.to_numeric(chunk[col], errors="coerce").values
+            n = n + m
+    # blank and bad lines are dropped so there may be fewer rows than lines
+    dt64 = dt64[:n]
+    for col in columns:
+        data[col] = data[col][:n]
+    elapsed = max([time.time() - start, 1E-6])
+    msg = " Read " + str(n) + " rows from " + os.path.basename(file_name)
+    msg += " in " + str(round(elapsed, 2)) + " s (" + str(int(n/elapsed)) + " rows/s)"
+    logger.info(msg)
+    return dt64, data
+
 def nc_2xls(ncfilename,outputlist=None):
     # read the netCDF file
     ds = nc_read_series(ncfilename,checktimestep=False)
@@ -942,6 +1942,85 @@ def ep_biomet_get_data(cfg, ds):
         data[ep_series]["format"] = strfmt
     return data
 
+def CSVToDataStructures(l1_info):
+    """
+    Purpose:
+     Read a CSV or TOA5 file (optionally gzipped) and return a dictionary
+     with a data structure for the file, the same as ExcelToDataStructures
+     does for a workbook.  The file name, header row and first data row
+     come from the [Files] section of the L1 control file and the column
+     names from the "name" key of the "xl" subsection of each variable, the
+     "sheet" key is not used.  The time stamp column is found from the data.
+    Usage:
+     ds_dict = pfp_io.CSVToDataStructures(l1_info)
+    Side effects:
+    Author: PRI
+    Date: October 2026
+    """
+    l1ire = l1_info["read_excel"]
+    file_name = l1ire["Files"]["file_name"]
+    base_name = os.path.basename(file_name)
+    msg = " Reading CSV file " + base_name
+    logger.info(msg)
+    # first data row and header row, 0-based
+    fdr = int(l1ire["Files"]["in_firstdatarow"])
+    hdr = int(l1ire["Files"]["in_headerrow"])
+    l1ire["Global"]["xl_datemode"] = str(0)
+    info = csv_read_header(file_name, hdr, fdr)
+    if info is None:
+        return {}
+    headers = info["header_list"]
+    # find the time stamp
+    ts_col = csv_find_timestamp(info)
+    if ts_col is None:
+        msg = " Time stamp not found in " + base_name + ", skipping ..."
+        logger.warning(msg)
+        return {}
+    msg = " Getting time stamp " + headers[ts_col] + " from " + base_name
+    logger.info(msg)
+    # get the requested columns that are present in the file
+    labels = {}
+    for nc_label in list(l1ire["Variables"].keys()):
+        if "xl" not in list(l1ire["Variables"][nc_label].keys()):
+            continue
+        csv_label = l1ire["Variables"][nc_label]["xl"]["name"]
+        if csv_label not in headers:
+            msg = " Variable " + csv_label + " not found in " + base_name + ", skipping ..."
+            logger.warning(msg)
+            continue
+        col = headers.index(csv_label)
+        if col == ts_col:
+            continue
+        labels[nc_label] = col
+    dt64, data = csv_read_columns(info, sorted(set(labels.values())), ts_col)
+    # drop rows without a time stamp and round to the nearest second
+    idx = numpy.where(~numpy.isnat(dt64))[0]
+    dt64 = (dt64[idx] + numpy.timedelta64(500000, "us")).astype("datetime64[s]")
+    nrecs = len(idx)
+    ds = DataStructure()
+    ds.globalattributes = copy.deepcopy(l1ire["Global"])
+    ds.globalattributes["nc_nrecs"] = nrecs
+    attr = {"long_name": "Datetime in local timezone",
+            "cf_role": "timeseries_id",
+            "units": "days since 1899-12-31 00:00:00"}
+    ds.series["DateTime"] = pfp_utils.DateTimeVariable({"Data64": dt64, "Flag": numpy.zeros(nrecs, dtype=numpy.int32),
+                                                        "Attr": attr})
+    for nc_label in sorted(labels.keys()):
+        values = data[labels[nc_label]][idx]
+        values[~numpy.isfinite(values)] = c.missing_value
+        var = pfp_utils.CreateEmptyVariable(nc_label, nrecs)
+        var["Label"] = nc_label
+        # mask missing data codes
+        var["Data"] = numpy.ma.masked_values(values, c.missing_value)
+        # set the quality control flag
+        var["Flag"] = numpy.where(numpy.ma.getmaskarray(var["Data"]) == True,
+                                  numpy.ones(nrecs, dtype=numpy.int32),
+                                  numpy.zeros(nrecs, dtype=numpy.int32))
+        # copy the attributes
+        var["Attr"] = l1ire["Variables"][nc_label]["Attr"]
+        pfp_utils.CreateVariable(ds, var)
+    return {base_name: ds}
+
 def ExcelToDataStructures(xl_data, l1_info):
     """
     Purpose:
@@ -1208,8 +2287,51 @@ def get_ncdtype(Series):
     if sd=='float64': dt = 'd'
     if sd=='int32': dt = 'i'
     if sd=='int64': dt = 'l'
+    if sd=='int8': dt = 'b'
     return dt
 
+def get_nc_chunksizes(nrecs, ts, dims):
+    """
+    Purpose:
+     Return the chunk sizes for a compressed netCDF variable.  Chunks are one
+     year of records long, or the whole series if it is shorter than a year,
+     this keeps the chunk index small for long files while reading a year at
+     a time only decompresses that year.
+    Usage:
+     chunksizes = pfp_io.get_nc_chunksizes(nrecs, ts, ("time", "latitude", "longitude"))
+    Author: PRI
+    Date: October 2026
+    """
+    nperyear = int(365*24*60/int(ts))
+    chunksizes = [max(1, min(nrecs, nperyear))] + [1]*(len(dims)-1)
+    return tuple(chunksizes)
+
+def get_nc_write_options(cf):
+    """
+    Purpose:
+     Get the netCDF write options from the [Options] section of the control file.
+      NetCDFCompressionLevel - zlib compression level, 0 (no compression, the
+                               default) to 9
+      NetCDFInt8Flags        - write QC flags as int8 when all the flag values
+                               fit, default is No
+     The shuffle filter is used with compression.
+    Usage:
+     nc_options = pfp_io.get_nc_write_options(cf)
+    Author: PRI
+    Date: October 2026
+    """
+    nc_options = {"zlib_level": 0, "shuffle": True, "int8_flags": False}
+    if cf is None:
+        return nc_options
+    opt = pfp_utils.get_keyvaluefromcf(cf, ["Options"], "NetCDFCompressionLevel", default=0)
+    try:
+        nc_options["zlib_level"] = min(max(int(opt), 0), 9)
+    except ValueError:
+        msg = " Unrecognised NetCDFCompressionLevel (" + str(opt) + "), writing uncompressed"
+        logger.warning(msg)
+    nc_options["int8_flags"] = pfp_utils.get_optionskeyaslogical(cf, "NetCDFInt8Flags")
+    return nc_options
+
 def get_filename_dialog(file_path='.', title='Choose a file', ext="*.*"):
     """
     Purpose:
@@ -1238,36 +2360,58 @@ def get_outfilenamefromcf(cf):
     name = pfp_utils.get_keyvaluefromcf(cf,["Files"],"out_filename",default="")
     return str(path)+str(name)
 
+def get_results_format(cf):
+    """
+    Purpose:
+     Get the format for the results workbooks (climatology, flag statistics,
+     gap filling statistics, L6 summary etc) from the [Options] section of
+     the control file.
+      ResultsFormat - xls (the default), xlsx or csv
+     xlsx workbooks do not have the 65536 row limit of xls workbooks, csv
+     writes one file per worksheet.
+    Usage:
+     results_format = pfp_io.get_results_format(cf)
+    Author: PRI
+    Date: October 2026
+    """
+    if cf is None:
+        return "xls"
+    opt = str(pfp_utils.get_keyvaluefromcf(cf, ["Options"], "ResultsFormat", default="xls"))
+    results_format = opt.strip().lower().lstrip(".")
+    if results_format not in ["xls", "xlsx", "csv"]:
+        msg = " Unrecognised ResultsFormat (" + opt + "), using xls"
+        logger.warning(msg)
+        results_format = "xls"
+    return results_format
+
+def get_results_filename(file_name, results_format):
+    """ Return file_name with the extension changed to match the results format."""
+    if results_format == "csv":
+        return os.path.splitext(file_name)[0]
+    return os.path.splitext(file_name)[0] + "." + results_format
+
 def get_seriesstats(cf,ds):
     # open an Excel file for the flag statistics
     level = ds.globalattributes['nc_level']
     out_filename = get_outfilenamefromcf(cf)
-    xl_filename = out_filename.replace('.nc','_FlagStats.xls')
+    results_format = get_results_format(cf)
+    xl_filename = get_results_filename(out_filename.replace('.nc','_FlagStats.xls'), results_format)
     file_name = os.path.split(xl_filename)
     logger.info(' Writing flag stats to '+file_name[1])
-    xlFile = xlwt.Workbook()
+    xlFile = ResultsWorkbook(xl_filename, results_format=results_format)
     xlFlagSheet = xlFile.add_sheet('Flag')
     # get the flag statistics
     bins = numpy.arange(-0.5,23.5)
-    xlRow = 5
-    xlCol = 1
-    for Value in bins[:len(bins)-1]:
-        xlFlagSheet.write(xlRow,xlCol,int(Value+0.5))
-        xlCol = xlCol + 1
-    xlRow = xlRow + 1
-    xlCol = 0
+    xlFlagSheet.write_row(5, 1, numpy.arange(len(bins)-1))
+    xlRow = 6
     dsVarNames = sorted(ds.series.keys())
     for ThisOne in dsVarNames:
         data,flag,attr = pfp_utils.GetSeries(ds, ThisOne)
         hist, bin_edges = numpy.histogram(flag, bins=bins)
-        xlFlagSheet.write(xlRow,xlCol,ThisOne)
-        xlCol = xlCol + 1
-        for Value in hist:
-            xlFlagSheet.write(xlRow,xlCol,float(Value))
-            xlCol = xlCol + 1
-        xlCol = 0
+        xlFlagSheet.write(xlRow, 0, ThisOne)
+        xlFlagSheet.write_row(xlRow, 1, hist.astype(numpy.float64))
         xlRow = xlRow + 1
-    xlFile.save(xl_filename)
+    xlFile.save()
 
 def load_controlfile(path='.', title='Choose a control file'):
     """
@@ -1297,31 +2441,22 @@ def NetCDFConcatenate(info):
      pfp_io.netcdf_concatenate_read_input_files(info)
      pfp_utils.GetVariable()
      pfp_io.netcdf_concatenate_create_ds_out(data, dt_out, chrono_files, labels)
+     If the Streaming option is "Yes", the concatenation is done one variable
+     at a time, see netcdf_concatenate_streaming().
     Side effects:
     Author: PRI
     Date: November 2019
+    Modified:
+     October 2026 - added the streaming option
     """
     inc = info["NetCDFConcatenate"]
+    if inc.get("Streaming", "No") == "Yes":
+        netcdf_concatenate_streaming(info)
+        return
     # read the input files (data is an OrderedDict)
     data = netcdf_concatenate_read_input_files(info)
-    # get the file names in data
-    file_names = list(data.keys())
-    # get the earliest start time, the latest end time and a list of unique variable names
-    for file_name in file_names:
-        # get the start and end times
-        dt = pfp_utils.GetVariable(data[file_name], "DateTime")
-        inc["start_date"].append(dt["Data"][0])
-        inc["end_date"].append(dt["Data"][-1])
-        inc["labels"] = inc["labels"] + data[file_name].series.keys()
-    # get a list of files with start times in chronological order
-    inc["chrono_files"] = [f for d, f in sorted(zip(inc["start_date"], inc["in_file_names"]))]
-    # get a list of unique variable names and remove unwanted labels
-    inc["labels"] = list(set(inc["labels"]))
-    items = ["xlDateTime", "DateTime", "Year", "Month", "Day",
-             "Hour", "Minute", "Second", "Hdh", "Ddd", "time"]
-    for item in items:
-        if item in inc["labels"]:
-            inc["labels"].remove(item)
+    # get the start and end times, the chronological order and the variable names
+    netcdf_concatenate_get_labels(data, info)
     # create the output data structure from the input files
     ds_out = netcdf_concatenate_create_ds_out(data, info)
     # truncate the start and the end of the output data structure
@@ -1346,7 +2481,7 @@ def NetCDFConcatenate(info):
     logger.info(" Writing data to " + os.path.split(inc["out_file_name"])[1])
     # write the concatenated data structure to file
     nc_file = nc_open_write(inc["out_file_name"])
-    nc_write_series(nc_file, ds_out, ndims=inc["NumberOfDimensions"])
+    nc_write_series(nc_file, ds_out, ndims=inc["NumberOfDimensions"], nc_options=inc["nc_options"])
     return
 
 def netcdf_concatenate_create_ds_out(data, info):
@@ -1364,40 +2499,15 @@ def netcdf_concatenate_create_ds_out(data, info):
     """
     logger.info(" Creating the output data structure")
     inc = info["NetCDFConcatenate"]
-    # get the time step
-    # get the file names in data
-    file_names = list(data.keys())
-    ts = int(data[file_names[0]].globalattributes["time_step"])
-    tsd = datetime.timedelta(minutes=ts)
-    # get a continuous time variable
-    nsd = min(inc["start_date"])
-    xed = max(inc["end_date"])
-    dt_out = numpy.array([r for r in pfp_utils.perdelta(nsd, xed, tsd)])
-    nrecs = len(dt_out)
-    zeros = numpy.zeros(nrecs, dtype=numpy.int32)
-    # get the output data structure
-    ds_out = DataStructure()
-    # create the DateTime variable
-    dt = {"Data": dt_out, "Flag": zeros,
-          "Attr": {"long_name": "Datetime in local timezone", "units": "None"},
-          "Label": "DateTime"}
-    pfp_utils.CreateVariable(ds_out, dt)
-    # create the netCDF time variable
-    time_in = pfp_utils.GetVariable(data[inc["chrono_files"][0]], "time")
-    units = time_in["Attr"]["units"]
-    calendar = time_in["Attr"]["calendar"]
-    time_out = {"Data": netCDF4.date2num(dt_out, units, calendar=calendar),
-                "Flag": zeros, "Attr": copy.deepcopy(time_in["Attr"]),
-                "Label": "time"}
-    pfp_utils.CreateVariable(ds_out, time_out)
+    # get the output data structure with a continuous time variable
+    ds_out = netcdf_concatenate_create_time(data, info)
+    nrecs = int(ds_out.globalattributes["nc_nrecs"])
+    time_out = ds_out.series["time"]
     # make the empty variables
     for label in inc["labels"]:
         ds_out.series[label] = pfp_utils.CreateEmptyVariable(label, nrecs, out_type="ndarray")
     # now loop over the files in chronological order
     for n, file_name in enumerate(inc["chrono_files"]):
-        # copy the global attributes
-        for gattr in data[file_name].globalattributes:
-            ds_out.globalattributes[gattr] = data[file_name].globalattributes[gattr]
         # get the time from the input file
         time_in = pfp_utils.GetVariable(data[file_name], "time")
         # find the indices of matching times
@@ -1414,10 +2524,92 @@ def netcdf_concatenate_create_ds_out(data, info):
                 dout["Flag"][indsa] = din["Flag"][indsb]
                 # copy the variable attributes but only if they don't already exist
                 netcdf_concatenate_variable_attributes(dout["Attr"], din["Attr"], info)
+    return ds_out
+
+def netcdf_concatenate_create_time(data, info):
+    """
+    Purpose:
+     Create the output data structure with a continuous time axis that
+     spans all of the input files.  The global attributes are copied from
+     the input files in chronological order.
+    Usage:
+     ds_out = netcdf_concatenate_create_time(data, info)
+     where;
+      data is a dictionary of data structures with the netCDF file names as the keys.
+      info is the settings dictionary from pfp_compliance.ParseConcatenateControlFile()
+    Side effects:
+    Author: PRI
+    Date: October 2026
+    """
+    inc = info["NetCDFConcatenate"]
+    # get the time step
+    # get the file names in data
+    file_names = list(data.keys())
+    ts = int(data[file_names[0]].globalattributes["time_step"])
+    tsd = numpy.timedelta64(ts, "m")
+    # get a continuous time variable
+    nsd = numpy.datetime64(min(inc["start_date"]), "s")
+    xed = numpy.datetime64(max(inc["end_date"]), "s")
+    nrecs = int((xed - nsd)//tsd) + 1
+    dt64_out = nsd + numpy.arange(nrecs)*tsd
+    zeros = numpy.zeros(nrecs, dtype=numpy.int32)
+    # get the output data structure
+    ds_out = DataStructure()
+    # create the DateTime variable
+    ds_out.series["DateTime"] = pfp_utils.DateTimeVariable({"Data64": dt64_out, "Flag": zeros,
+        "Attr": {"long_name": "Datetime in local timezone", "units": "None"}})
+    # create the netCDF time variable
+    time_in = pfp_utils.GetVariable(data[inc["chrono_files"][0]], "time")
+    units = time_in["Attr"]["units"]
+    calendar = time_in["Attr"]["calendar"]
+    time_out = {"Data": pfp_utils.get_nctime_from_datetime64(dt64_out, units, calendar=calendar),
+                "Flag": zeros, "Attr": copy.deepcopy(time_in["Attr"]),
+                "Label": "time"}
+    pfp_utils.CreateVariable(ds_out, time_out)
+    # copy the global attributes from the files in chronological order
+    for file_name in inc["chrono_files"]:
+        for gattr in data[file_name].globalattributes:
+            ds_out.globalattributes[gattr] = data[file_name].globalattributes[gattr]
     # update the global attributes
     ds_out.globalattributes["nc_nrecs"] = nrecs
     return ds_out
 
+def netcdf_concatenate_get_labels(data, info):
+    """
+    Purpose:
+     Get the start and end times of the input files, the list of files in
+     chronological order and a list of the unique variable names.  These
+     are stored in the info dictionary.
+    Usage:
+     netcdf_concatenate_get_labels(data, info)
+     where;
+      data is a dictionary of data structures with the netCDF file names as the keys.
+      info is the settings dictionary from pfp_compliance.ParseConcatenateControlFile()
+    Side effects:
+    Author: PRI
+    Date: November 2019
+    """
+    inc = info["NetCDFConcatenate"]
+    # get the file names in data
+    file_names = list(data.keys())
+    # get the earliest start time, the latest end time and a list of unique variable names
+    for file_name in file_names:
+        # get the start and end times
+        dt = pfp_utils.GetVariable(data[file_name], "DateTime")
+        inc["start_date"].append(dt["Data"][0])
+        inc["end_date"].append(dt["Data"][-1])
+        inc["labels"] = inc["labels"] + data[file_name].series.keys()
+    # get a list of files with start times in chronological order
+    inc["chrono_files"] = [f for d, f in sorted(zip(inc["start_date"], file_names))]
+    # get a list of unique variable names and remove unwanted labels
+    inc["labels"] = list(set(inc["labels"]))
+    items = ["xlDateTime", "DateTime", "Year", "Month", "Day",
+             "Hour", "Minute", "Second", "Hdh", "Ddd", "time"]
+    for item in items:
+        if item in inc["labels"]:
+            inc["labels"].remove(item)
+    return
+
 def netcdf_concatenate_variable_attributes(attr_out, attr_in, info):
     """
     Purpose:
@@ -1439,12 +2631,14 @@ def netcdf_concatenate_variable_attributes(attr_out, attr_in, info):
             attr_out[attr] = attr_in[attr]
     return
 
-def netcdf_concatenate_read_input_files(info):
+def netcdf_concatenate_read_input_files(info, lazy=False):
     """
     Purpose:
      Read the list of input files given in info and return a dictionary
      of data structures.
      The files do not need to be in chronological order.
+     If lazy is True, only the time and the variable attributes are read,
+     see nc_read_series().
     Usage:
      data = netcdf_concatenate_read_input_files(info)
      where;
@@ -1455,13 +2649,15 @@ def netcdf_concatenate_read_input_files(info):
     Side effects:
     Author: PRI
     Date: November 2019
+    Modified:
+     October 2026 - added lazy
     """
     data = OrderedDict()
     file_name = info["NetCDFConcatenate"]["in_file_names"][0]
-    data[file_name] = nc_read_series(file_name)
+    data[file_name] = nc_read_series(file_name, lazy=lazy)
     ts0 = int(data[file_name].globalattributes["time_step"])
     for file_name in info["NetCDFConcatenate"]["in_file_names"][1:]:
-        ds = nc_read_series(file_name)
+        ds = nc_read_series(file_name, lazy=lazy)
         tsn = int(ds.globalattributes["time_step"])
         if tsn == ts0:
             data[file_name] = ds
@@ -1473,6 +2669,160 @@ def netcdf_concatenate_read_input_files(info):
             logger.warning(msg)
     return data
 
+def netcdf_concatenate_read_variable(data, nc_files, indices, label, nrecs, info, si=0, ei=None):
+    """
+    Purpose:
+     Read a variable from each of the input files and return it on the
+     output time axis.  Variables that have not been read yet are read
+     directly from the open netCDF files and are not kept in the input
+     data structures.
+     Only the records si to ei (inclusive) of the output are returned.
+    Usage:
+     var = netcdf_concatenate_read_variable(data, nc_files, indices, label, nrecs, info)
+     where;
+      data is a dictionary of data structures read with lazy=True
+      nc_files is a dictionary of open netCDF files
+      indices is a dictionary of the matching output and input indices
+      label is the variable label
+      nrecs is the length of the output time axis
+    Author: PRI
+    Date: October 2026
+    """
+    var = pfp_utils.CreateEmptyVariable(label, nrecs, out_type="ndarray")
+    for file_name in indices:
+        if label not in data[file_name].series.keys():
+            continue
+        din = data[file_name].series[label]
+        if isinstance(din, LazyVariable) and not din.loaded:
+            data_in, flag_in, attr_in = nc_read_var(nc_files[file_name], label)
+        else:
+            data_in, flag_in = din["Data"], din["Flag"]
+        indsa, indsb = indices[file_name]
+        var["Data"][indsa] = data_in[indsb]
+        var["Flag"][indsa] = flag_in[indsb]
+        # copy the variable attributes but only if they don't already exist
+        netcdf_concatenate_variable_attributes(var["Attr"], din["Attr"], info)
+    if ei is None:
+        ei = nrecs - 1
+    var["Data"] = var["Data"][si:ei+1]
+    var["Flag"] = var["Flag"][si:ei+1]
+    return var
+
+def netcdf_concatenate_streaming(info):
+    """
+    Purpose:
+     Concatenate multiple single year files in a single, multiple year file
+     one variable at a time.
+     Only the time and the variable attributes are read from the input files
+     to start with.  The output time axis and the truncation indices are
+     worked out from these, then each variable is read from the input files,
+     processed and written to the output file before the next one is read.
+     Peak memory use is set by the size of a single variable rather than the
+     whole data set.  The humidities and the meteorological variables are
+     calculated from a data structure that holds only the variables they need.
+    Usage:
+     pfp_io.netcdf_concatenate_streaming(info)
+    Called by:
+     pfp_io.NetCDFConcatenate()
+    Side effects:
+     Writes the concatenated netCDF file.
+    Author: PRI
+    Date: October 2026
+    """
+    inc = info["NetCDFConcatenate"]
+    # scan the input files, only the time and the variable attributes are read
+    data = netcdf_concatenate_read_input_files(info, lazy=True)
+    # get the start and end times, the chronological order and the variable names
+    netcdf_concatenate_get_labels(data, info)
+    # get the output time axis and the indices of matching times in each input file
+    logger.info(" Creating the output time axis")
+    ds_out = netcdf_concatenate_create_time(data, info)
+    nrecs = int(ds_out.globalattributes["nc_nrecs"])
+    indices = OrderedDict()
+    for file_name in inc["chrono_files"]:
+        time_in = pfp_utils.GetVariable(data[file_name], "time")
+        indices[file_name] = pfp_utils.FindMatchingIndices(ds_out.series["time"]["Data"], time_in["Data"])
+    # keep the input files open while the output file is written
+    nc_files = OrderedDict()
+    for file_name in inc["chrono_files"]:
+        nc_files[file_name] = netCDF4.Dataset(file_name, "r")
+        nc_files[file_name].set_auto_mask(False)
+    try:
+        # get the truncation indices, one variable at a time
+        si, ei = 0, nrecs - 1
+        if inc["Truncate"] == "Yes":
+            cidx = numpy.zeros(nrecs)
+            for item in inc["SeriesToCheck"]:
+                if item not in inc["labels"]:
+                    continue
+                var = netcdf_concatenate_read_variable(data, nc_files, indices, item, nrecs, info)
+                idx = numpy.where(abs(var["Data"] - float(c.missing_value)) > c.eps)[0]
+                cidx[idx] = cidx[idx] + 1
+            si, ei = netcdf_concatenate_truncate_indices(ds_out, cidx, info)
+            netcdf_concatenate_truncate_series(ds_out, si, ei)
+        # the humidities and meteorological variables need several variables at once
+        ds_met = DataStructure()
+        ds_met.globalattributes = ds_out.globalattributes
+        ds_met.series["DateTime"] = ds_out.series["DateTime"]
+        met_labels = ["Ah", "SH", "RH", "Ta", "ps", "Tv_SONIC_Av", "Tv_CSAT_Av", "Tv_CSAT"]
+        met_labels = [l for l in met_labels if l in inc["labels"]]
+        for label in met_labels:
+            ds_met.series[label] = netcdf_concatenate_read_variable(data, nc_files, indices, label,
+                                                                    nrecs, info, si=si, ei=ei)
+        pfp_ts.InterpolateOverMissing(ds_met, met_labels, max_length_hours=inc["MaxGapInterpolate"],
+                                      int_type="Akima")
+        # make sure we have all of the humidities
+        pfp_ts.CalculateHumidities(ds_met)
+        # and make sure we have all of the meteorological variables
+        pfp_ts.CalculateMeteorologicalVariables(ds_met, info)
+        # remove intermediate series
+        labels = list(ds_met.series.keys())
+        pfp_ts.RemoveIntermediateSeries(ds_met, info)
+        removed = [l for l in labels if l not in ds_met.series.keys()]
+        # get the list of variables to be written
+        labels = [l for l in set(inc["labels"] + labels) if l not in ["DateTime"] + removed]
+        labels = sorted(labels)
+        logger.info(" Writing data to " + os.path.split(inc["out_file_name"])[1])
+        nc_file = nc_open_write(inc["out_file_name"])
+        dims, nc_options = nc_write_coordinates(nc_file, ds_out, labels, ndims=inc["NumberOfDimensions"],
+                                                nc_options=inc["nc_options"])
+        # now process and write each variable
+        msg = " Checking missing data and QC flags are consistent"
+        logger.info(msg)
+        Fc_list = ["Fc", "Fc_single", "Fc_profile", "Fc_storage"]
+        ds_cov = DataStructure()
+        ds_cov.globalattributes = ds_out.globalattributes
+        for label in labels:
+            ds_var = DataStructure()
+            ds_var.globalattributes = ds_out.globalattributes
+            ds_var.series["DateTime"] = ds_out.series["DateTime"]
+            if label in ds_met.series.keys():
+                ds_var.series[label] = ds_met.series.pop(label)
+            else:
+                ds_var.series[label] = netcdf_concatenate_read_variable(data, nc_files, indices, label,
+                                                                        nrecs, info, si=si, ei=ei)
+                pfp_ts.InterpolateOverMissing(ds_var, label, max_length_hours=inc["MaxGapInterpolate"],
+                                              int_type="Akima")
+            # check units of Fc and convert if necessary
+            pfp_utils.CheckUnits(ds_var, Fc_list, "umol/m2/s", convert_units=True)
+            # check missing data and QC flags are consistent
+            pfp_utils.CheckQCFlags(ds_var, mode="quiet")
+            # update the coverage statistics
+            pfp_utils.get_coverage_individual(ds_var)
+            nc_write_var(nc_file, ds_var, label, dims, nc_options=nc_options)
+            ds_cov.series[label] = {"Attr": ds_var.series[label]["Attr"]}
+        pfp_utils.get_coverage_groups(ds_cov)
+        # write the coordinate reference system (crs) variable
+        if "crs" not in labels:
+            nc_write_crs(nc_file)
+        # the global attributes go in last because the coverage is only known now
+        nc_write_globalattributes(nc_file, ds_out)
+        nc_file.close()
+    finally:
+        for file_name in nc_files:
+            nc_files[file_name].close()
+    return
+
 def netcdf_concatenate_truncate(ds_in, info):
     """
     Purpose:
@@ -1491,8 +2841,6 @@ def netcdf_concatenate_truncate(ds_in, info):
         return ds_in
     # copy the input data structure
     ds_out = copy.deepcopy(ds_in)
-    # get the datetime
-    ldt = pfp_utils.GetVariable(ds_out, "DateTime")
     nrecs = int(ds_out.globalattributes["nc_nrecs"])
     cidx = numpy.zeros(nrecs)
     for item in inc["SeriesToCheck"]:
@@ -1501,8 +2849,27 @@ def netcdf_concatenate_truncate(ds_in, info):
         var = pfp_utils.GetVariable(ds_out, item)
         idx = numpy.where(numpy.ma.getmaskarray(var["Data"]) == False)[0]
         cidx[idx] = cidx[idx] + 1
-    cidx = cidx/float(len(inc["SeriesToCheck"]))
     # find the first and last element where more than 50% data is present
+    si, ei = netcdf_concatenate_truncate_indices(ds_out, cidx, info)
+    # now loop over the data series and truncate
+    netcdf_concatenate_truncate_series(ds_out, si, ei)
+    return ds_out
+
+def netcdf_concatenate_truncate_indices(ds, cidx, info):
+    """
+    Purpose:
+     Return the indices of the first and last elements where the fraction
+     of the SeriesToCheck with data is at least the truncation threshold.
+     cidx is the number of the SeriesToCheck with data at each time.
+    Usage:
+     si, ei = pfp_io.netcdf_concatenate_truncate_indices(ds, cidx, info)
+    Author: PRI
+    Date: November 2019
+    """
+    inc = info["NetCDFConcatenate"]
+    ldt = pfp_utils.GetVariable(ds, "DateTime")
+    nrecs = int(ds.globalattributes["nc_nrecs"])
+    cidx = cidx/float(len(inc["SeriesToCheck"]))
     threshold = float(inc["TruncateThreshold"])/float(100)
     idx = numpy.where(cidx >= threshold)[0]
     si = idx[0]
@@ -1513,15 +2880,27 @@ def netcdf_concatenate_truncate(ds_in, info):
     if ei != nrecs-1:
         msg = " End date truncated from " + str(ldt["Data"][-1]) + " to " + str(ldt["Data"][ei])
         logger.info(msg)
-    # now loop over the data series and truncate
-    for item in list(ds_out.series.keys()):
-        ds_out.series[item]["Data"] = ds_out.series[item]["Data"][si:ei+1]
-        ds_out.series[item]["Flag"] = ds_out.series[item]["Flag"][si:ei+1]
+    return si, ei
+
+def netcdf_concatenate_truncate_series(ds, si, ei):
+    """
+    Purpose:
+     Truncate all of the series in a data structure to the records si to
+     ei (inclusive) and update the global attributes.
+    Usage:
+     pfp_io.netcdf_concatenate_truncate_series(ds, si, ei)
+    Author: PRI
+    Date: November 2019
+    """
+    ldt = pfp_utils.GetVariable(ds, "DateTime")
+    for item in list(ds.series.keys()):
+        ds.series[item]["Data"] = ds.series[item]["Data"][si:ei+1]
+        ds.series[item]["Flag"] = ds.series[item]["Flag"][si:ei+1]
     # update the relevent global attributes
-    ds_out.globalattributes["start_date"] = ldt["Data"][si]
-    ds_out.globalattributes["end_date"] = ldt["Data"][ei]
-    ds_out.globalattributes["nc_nrecs"] = len(ds_out.series["DateTime"]["Data"])
-    return ds_out
+    ds.globalattributes["start_date"] = ldt["Data"][si]
+    ds.globalattributes["end_date"] = ldt["Data"][ei]
+    ds.globalattributes["nc_nrecs"] = len(ds.series["DateTime"]["Data"])
+    return
 
 def ncsplit_run(split_gui):
     infilename = split_gui.info["input_file_path"]
@@ -1574,7 +2953,8 @@ def ncsplit_run(split_gui):
     msg = " Finished splitting " + os.path.basename(infilename)
     logger.info(msg)
 
-def nc_read_series(ncFullName,checktimestep=True,fixtimestepmethod="round"):
+def nc_read_series(ncFullName,checktimestep=True,fixtimestepmethod="round",columnar=False,
+                   variables=None,lazy=False,start=None,end=None):
     """
     Purpose:
      Reads a netCDF file and returns the meta-data and data in a DataStructure.
@@ -1608,8 +2988,19 @@ def nc_read_series(ncFullName,checktimestep=True,fixtimestepmethod="round"):
      is not implemented yet but will interpolate the data from the original time
      step to a regular time step.  Rounding will round any non-itegral time steps
      to the nearest time step.
+     If columnar is True, the data are returned in a ColumnarDataStructure with
+     the float64 data and QC flags stored in contiguous 2D blocks.
+     If variables is a list of labels, only those variables are read.  The
+     variables used to get the datetime (eg "time") are always read.
+     If lazy is True, the data and QC flag of each variable are only read
+     from the file the first time they are used (see LazyVariable).
+     If start and/or end are given, only the records between start and end
+     (inclusive) are read from the file.
+     eg ds = pfp_io.nc_read_series(nc_name, variables=["Fc", "ustar"], start="2015-01-01")
     Author: PRI
     Date: Back in the day
+    Modified:
+     October 2026 - added the variables, lazy, start and end arguments
     """
     logger.info(" Reading netCDF file " + ntpath.split(ncFullName)[1])
     netCDF4.default_encoding = 'latin-1'
@@ -1630,49 +3021,89 @@ def nc_read_series(ncFullName,checktimestep=True,fixtimestepmethod="round"):
         for gattr in gattrlist:
             ds.globalattributes[gattr] = getattr(ncFile, gattr)
     # get a list of the variables in the netCDF file (not their QC flags)
+    # that have time as a dimension
     varlist = [x for x in ncFile.variables.keys() if "_QCFlag" not in x]
-    for ThisOne in varlist:
-        # skip variables that do not have time as a dimension
-        dimlist = [x.lower() for x in ncFile.variables[ThisOne].dimensions]
-        if "time" not in dimlist: continue
-        # create the series in the data structure
-        ds.series[unicode(ThisOne)] = {}
-        # get the data and the QC flag
-        data, flag, attr = nc_read_var(ncFile, ThisOne)
-        ds.series[ThisOne]["Data"] = data
-        ds.series[ThisOne]["Flag"] = flag
-        ds.series[ThisOne]["Attr"] = attr
-    ncFile.close()
-    # get a series of Python datetime objects
-    if "time" in ds.series.keys():
-        pfp_utils.get_datetime_from_nctime(ds)
-    elif "xlDateTime" in ds.series.keys():
-        pfp_utils.get_datetime_from_xldatetime(ds)
-    elif (("Year" in ds.series.keys()) and ("Month" in ds.series.keys()) and
-          ("Day" in ds.series.keys()) and ("Hour" in ds.series.keys()) and
-          ("Minute" in ds.series.keys()) and ("Second" in ds.series.keys())):
-        pfp_utils.get_datetime_from_ymdhms(ds)
+    varlist = [x for x in varlist
+               if "time" in [d.lower() for d in ncFile.variables[x].dimensions]]
+    # get the variables needed for the datetime, these are always read
+    ymdhms = ["Year", "Month", "Day", "Hour", "Minute", "Second"]
+    if "time" in varlist:
+        time_labels = ["time"]
+    elif "xlDateTime" in varlist:
+        time_labels = ["xlDateTime"]
+    elif all([x in varlist for x in ymdhms]):
+        time_labels = ymdhms
     else:
+        ncFile.close()
         msg = " Unable to find datetime variable in netCDF file"
         logger.error(msg)
         raise Exception("No datetime in netCDF file")
+    for ThisOne in time_labels:
+        data, flag, attr = nc_read_var(ncFile, ThisOne)
+        ds.series[unicode(ThisOne)] = {"Data": data, "Flag": flag, "Attr": attr}
+    # get the datetime
+    if "time" in time_labels:
+        pfp_utils.get_datetime_from_nctime(ds)
+    elif "xlDateTime" in time_labels:
+        pfp_utils.get_datetime_from_xldatetime(ds)
+    else:
+        pfp_utils.get_datetime_from_ymdhms(ds)
     # round the Python datetime to the nearest second
     pfp_utils.round_datetime(ds, mode="nearest_second")
+    # get the records to be read
+    si, ei = 0, None
+    if start is not None or end is not None:
+        dt64 = pfp_utils.get_datetime64(ds)
+        si, ei = pfp_utils.get_datetime64_window(dt64, start=start, end=end)
+        if si is None:
+            ncFile.close()
+            msg = " No data between " + str(start) + " and " + str(end)
+            msg += " in " + ntpath.split(ncFullName)[1]
+            logger.error(msg)
+            raise Exception("nc_read_series: no data in time window")
+        for label in time_labels + ["DateTime"]:
+            ds.series[label]["Flag"] = ds.series[label]["Flag"][si:ei+1]
+        for label in time_labels:
+            ds.series[label]["Data"] = ds.series[label]["Data"][si:ei+1]
+        ds.series["DateTime"]["Data64"] = dt64[si:ei+1]
+        ds.globalattributes["nc_nrecs"] = ei - si + 1
+        for gattr, idx in [["start_date", si], ["end_date", ei]]:
+            if gattr in ds.globalattributes:
+                ds.globalattributes[gattr] = str(dt64[idx]).replace("T", " ")
+    # now get the data and QC flags
+    if variables is not None:
+        varlist = [x for x in varlist if x in variables]
+    for ThisOne in [x for x in varlist if x not in time_labels]:
+        if lazy:
+            attr = {}
+            for vattr in ncFile.variables[ThisOne].ncattrs():
+                attr[vattr] = getattr(ncFile.variables[ThisOne], vattr)
+            ds.series[unicode(ThisOne)] = LazyVariable(ncFullName, ThisOne, attr, si=si, ei=ei)
+        else:
+            data, flag, attr = nc_read_var(ncFile, ThisOne, si=si, ei=ei)
+            ds.series[unicode(ThisOne)] = {"Data": data, "Flag": flag, "Attr": attr}
+    ncFile.close()
     # check the time step and fix it required
     if checktimestep:
         if pfp_utils.CheckTimeStep(ds):
+            # fixing the time step changes every series so read them all now
+            load_lazy_variables(ds)
             pfp_utils.FixTimeStep(ds, fixtimestepmethod=fixtimestepmethod)
     # tell the user when the data starts and ends
-    ldt = ds.series["DateTime"]["Data"]
-    msg = " Got data from " + ldt[0].strftime("%Y-%m-%d %H:%M:%S")
-    msg += " to " + ldt[-1].strftime("%Y-%m-%d %H:%M:%S")
+    dt64 = pfp_utils.get_datetime64(ds).astype("datetime64[s]")
+    msg = " Got data from " + str(dt64[0]).replace("T", " ")
+    msg += " to " + str(dt64[-1]).replace("T", " ")
     logger.info(msg)
+    if columnar:
+        ds = ColumnarDataStructure(ds)
     return ds
 
-def nc_read_var(ncFile,ThisOne):
+def nc_read_var(ncFile,ThisOne,si=0,ei=None):
     """ Reads a variable from a netCDF file and returns the data, the QC flag and the variable
         attribute dictionary.
+        Only records si to ei (inclusive) are read, ei=None reads to the end of the file.
     """
+    rs = slice(si, None if ei is None else ei+1)
     # check the number of dimensions
     nDims = len(ncFile.variables[ThisOne].shape)
     if nDims not in [1,3]:
@@ -1681,14 +3112,14 @@ def nc_read_var(ncFile,ThisOne):
         raise Exception(msg)
     if nDims==1:
         # single dimension
-        data = ncFile.variables[ThisOne][:]
+        data = ncFile.variables[ThisOne][rs]
         # netCDF4 returns a masked array if the "missing_variable" attribute has been set
         # for the variable, here we trap this and force the array in ds.series to be ndarray
         if numpy.ma.isMA(data): data,dummy = pfp_utils.MAtoSeries(data)
         # check for a QC flag
         if ThisOne+'_QCFlag' in ncFile.variables.keys():
             # load it from the netCDF file
-            flag = ncFile.variables[ThisOne+'_QCFlag'][:]
+            flag = ncFile.variables[ThisOne+'_QCFlag'][rs]
         else:
             # create an empty flag series if it does not exist
             nRecs = numpy.size(data)
@@ -1701,7 +3132,7 @@ def nc_read_var(ncFile,ThisOne):
             flag[idx] = numpy.int32(8)
     elif nDims==3:
         # 3 dimensions
-        data = ncFile.variables[ThisOne][:,0,0]
+        data = ncFile.variables[ThisOne][rs,0,0]
         # netCDF4 returns a masked array if the "missing_variable" attribute has been set
         # for the variable, here we trap this and force the array in ds.series to be ndarray
         # may not be needed after adding ncFile.set_auto_mask(False) in nc_read_series().
@@ -1709,7 +3140,7 @@ def nc_read_var(ncFile,ThisOne):
         # check for a QC flag
         if ThisOne+'_QCFlag' in ncFile.variables.keys():
             # load it from the netCDF file
-            flag = ncFile.variables[ThisOne+'_QCFlag'][:,0,0]
+            flag = ncFile.variables[ThisOne+'_QCFlag'][rs,0,0]
         else:
             # create an empty flag series if it does not exist
             nRecs = numpy.size(data)
@@ -1722,6 +3153,8 @@ def nc_read_var(ncFile,ThisOne):
             flag[idx] = numpy.int32(8)
     # force float32 to float64
     if data.dtype=="float32": data = data.astype(numpy.float64)
+    # QC flags may have been written as int8 to save space
+    if flag.dtype in ["int8", "int16"]: flag = flag.astype(numpy.int32)
     # check for Year, Month etc as int64, force to int32 if required
     if ThisOne in ["Year","Month","Day","Hour","Minute","Second"]:
         if data.dtype=="int64": data = data.astype(numpy.int32)
@@ -1811,7 +3244,7 @@ def nc_write_globalattributes(nc_file, ds, flag_defs=True):
     Author: PRI
     Date: Back in the day
     """
-    ldt = ds.series["DateTime"]["Data"]
+    ldt = pfp_utils.get_datetime_from_datetime64(pfp_utils.get_datetime64(ds)[[0, -1]])
     ds.globalattributes['QC_version'] = str(cfg.version_name)+' '+str(cfg.version_number)
     ds.globalattributes["start_date"] = str(ldt[0])
     ds.globalattributes["end_date"] = str(ldt[-1])
@@ -1845,7 +3278,7 @@ def nc_write_globalattributes(nc_file, ds, flag_defs=True):
             setattr(nc_file,item,attr)
     return
 
-def nc_write_series(ncFile, ds, outputlist=None, ndims=3):
+def nc_write_series(ncFile, ds, outputlist=None, ndims=3, nc_options=None):
     """
     Purpose:
      Write the contents of a data structure to a netCDF file.
@@ -1854,11 +3287,66 @@ def nc_write_series(ncFile, ds, outputlist=None, ndims=3):
      pfp_io.nc_write_series(nc_file,ds)
      where nc_file is a netCDF file object returned by pfp_io.nc_open_write
            ds is a data structure
+     The data and QC flags can be compressed by passing the options read
+     from the control file by get_nc_write_options();
+     pfp_io.nc_write_series(nc_file, ds, nc_options=pfp_io.get_nc_write_options(cf))
     Author: PRI
     Date: Back in the day
+    Modified:
+     October 2026 - write numpy arrays directly, optional compression
     """
     # write the global attributes to the netCDF file
     nc_write_globalattributes(ncFile, ds)
+    if outputlist is None:
+        outputlist = ds.series.keys()
+    else:
+        for ThisOne in outputlist:
+            if ThisOne not in ds.series.keys():
+                logger.warning(" Requested series "+ThisOne+" not found in data structure")
+                outputlist.remove(ThisOne)
+        if len(outputlist)==0: outputlist = ds.series.keys()
+    # can't write an array of Python datetime objects to a netCDF file
+    # actually, this could be written as characters
+    for ThisOne in ["DateTime","DateTime_UTC"]:
+        if ThisOne in outputlist: outputlist.remove(ThisOne)
+    # create the dimensions and write the time, latitude and longitude variables
+    dims, nc_options = nc_write_coordinates(ncFile, ds, outputlist, ndims=ndims, nc_options=nc_options)
+    if "time" in outputlist: outputlist.remove("time")
+    # now make sure the date and time series are in outputlist
+    datetimelist = ['xlDateTime','Year','Month','Day','Hour','Minute','Second','Hdh','Ddd']
+    # and write them to the netCDF file
+    for ThisOne in sorted(datetimelist):
+        if ThisOne in outputlist:
+            outputlist.remove(ThisOne)
+    # write everything else to the netCDF file
+    for ThisOne in sorted(outputlist):
+        nc_write_var(ncFile,ds,ThisOne,dims,nc_options=nc_options)
+    # write the coordinate reference system (crs) variable
+    if "crs" not in outputlist:
+        nc_write_crs(ncFile)
+    ncFile.close()
+
+def nc_write_coordinates(ncFile, ds, outputlist, ndims=3, nc_options=None):
+    """
+    Purpose:
+     Create the dimensions of a netCDF file and write the time, latitude and
+     longitude variables.  Returns the dimension tuple and a copy of the write
+     options with the chunk sizes added, these are passed to nc_write_var().
+    Usage:
+     dims, nc_options = pfp_io.nc_write_coordinates(nc_file, ds, outputlist, ndims=3)
+     where nc_file is a netCDF file object returned by pfp_io.nc_open_write
+           ds is a data structure
+           outputlist is the list of variables to be written
+    Author: PRI
+    Date: Back in the day
+    Modified:
+     October 2026 - moved out of nc_write_series so the netCDF file can be
+                    written one variable at a time
+    """
+    # copy the options, the chunk sizes are added below
+    if nc_options is None:
+        nc_options = get_nc_write_options(None)
+    nc_options = dict(nc_options)
     # we specify the size of the Time dimension because netCDF4 is slow to write files
     # when the Time dimension is unlimited
     if "nc_nrecs" in ds.globalattributes.keys():
@@ -1872,28 +3360,21 @@ def nc_write_series(ncFile, ds, outputlist=None, ndims=3):
         dims = ("time","latitude","longitude")
     else:
         dims = ("time",)
-    if outputlist is None:
-        outputlist = ds.series.keys()
+    # chunk sizes for compressed variables, chunking only pays off when compressing
+    if nc_options["zlib_level"] > 0:
+        ts = int(ds.globalattributes.get("time_step", 30))
+        nc_options["chunksizes"] = get_nc_chunksizes(nRecs, ts, dims)
     else:
-        for ThisOne in outputlist:
-            if ThisOne not in ds.series.keys():
-                logger.warning(" Requested series "+ThisOne+" not found in data structure")
-                outputlist.remove(ThisOne)
-        if len(outputlist)==0: outputlist = ds.series.keys()
-    # can't write an array of Python datetime objects to a netCDF file
-    # actually, this could be written as characters
-    for ThisOne in ["DateTime","DateTime_UTC"]:
-        if ThisOne in outputlist: outputlist.remove(ThisOne)
+        nc_options["chunksizes"] = None
     # write the time variable
-    ldt = ds.series["DateTime"]["Data"]
-    nc_time = netCDF4.date2num(ldt,"days since 1800-01-01 00:00:00.0",calendar="gregorian")
+    dt64 = pfp_utils.get_datetime64(ds)
+    nc_time = pfp_utils.get_nctime_from_datetime64(dt64,"days since 1800-01-01 00:00:00.0",calendar="gregorian")
     ncVar = ncFile.createVariable("time","d",("time",))
     ncVar[:] = nc_time
     setattr(ncVar,"long_name","time")
     setattr(ncVar,"standard_name","time")
     setattr(ncVar,"units","days since 1800-01-01 00:00:00.0")
     setattr(ncVar,"calendar","gregorian")
-    if "time" in outputlist: outputlist.remove("time")
     # now write the latitude and longitude variables
     if "latitude" not in ds.globalattributes: ndims = 1
     if "longitude" not in ds.globalattributes: ndims = 1
@@ -1910,26 +3391,103 @@ def nc_write_series(ncFile, ds, outputlist=None, ndims=3):
             setattr(ncVar,'long_name','longitude')
             setattr(ncVar,'standard_name','longitude')
             setattr(ncVar,'units','degrees east')
-    # now make sure the date and time series are in outputlist
-    datetimelist = ['xlDateTime','Year','Month','Day','Hour','Minute','Second','Hdh','Ddd']
-    # and write them to the netCDF file
-    for ThisOne in sorted(datetimelist):
-        if ThisOne in outputlist:
-            outputlist.remove(ThisOne)
-    # write everything else to the netCDF file
-    for ThisOne in sorted(outputlist):
-        nc_write_var(ncFile,ds,ThisOne,dims)
-    # write the coordinate reference system (crs) variable
-    if "crs" not in outputlist:
-        ncVar = ncFile.createVariable("crs","i",())
-        setattr(ncVar,"grid_mapping_name","latitude_longitude")
-        setattr(ncVar,"long_name","WGS 1984 datum")
-        setattr(ncVar,"longitude_of_prime_meridian","0.0")
-        setattr(ncVar,"semi_major_axis","6378137.0")
-        setattr(ncVar,"inverse_flattening","298.257223563")
-    ncFile.close()
+    return dims, nc_options
 
-def nc_write_var(ncFile, ds, ThisOne, dim):
+def nc_write_crs(ncFile):
+    """ Write the coordinate reference system (crs) variable to a netCDF file."""
+    ncVar = ncFile.createVariable("crs","i",())
+    setattr(ncVar,"grid_mapping_name","latitude_longitude")
+    setattr(ncVar,"long_name","WGS 1984 datum")
+    setattr(ncVar,"longitude_of_prime_meridian","0.0")
+    setattr(ncVar,"semi_major_axis","6378137.0")
+    setattr(ncVar,"inverse_flattening","298.257223563")
+    return
+
+def nc_splice_series(nc_name, ds, watermark, ndims=3, nc_options=None):
+    """
+    Purpose:
+     Splice the records after the watermark in a data structure into an
+     existing netCDF file.  The existing file is copied one variable at a
+     time, the records up to and including the watermark come from the
+     existing file and the records after it from the data structure.
+     Variables that are only in one of the two are padded with missing data.
+     The coverage attributes are updated for the whole of the new file.
+     Returns False if there is no data after the watermark.
+    Usage:
+     pfp_io.nc_splice_series(nc_name, ds, watermark)
+    Author: PRI
+    Date: October 2026
+    """
+    file_name = os.path.basename(nc_name)
+    dt64_new = pfp_utils.get_datetime64(ds).astype("datetime64[s]")
+    nsi = numpy.searchsorted(dt64_new, watermark, side="right")
+    if nsi == len(dt64_new):
+        msg = " No data after " + str(watermark).replace("T", " ") + ", " + file_name + " not changed"
+        logger.info(msg)
+        return False
+    ds_old = nc_read_series(nc_name, checktimestep=False, lazy=True, end=watermark)
+    dt64_old = pfp_utils.get_datetime64(ds_old).astype("datetime64[s]")
+    # get a continuous time axis from the start of the old data to the end of the new data
+    ts = int(ds.globalattributes["time_step"])
+    tsd = numpy.timedelta64(ts, "m")
+    nrecs = int((dt64_new[-1] - dt64_old[0])//tsd) + 1
+    dt64_out = dt64_old[0] + numpy.arange(nrecs)*tsd
+    iold = ((dt64_old - dt64_old[0])//tsd).astype(numpy.int64)
+    inew = ((dt64_new[nsi:] - dt64_old[0])//tsd).astype(numpy.int64)
+    ds_out = DataStructure()
+    ds_out.globalattributes.update(ds.globalattributes)
+    ds_out.globalattributes["nc_nrecs"] = nrecs
+    ds_out.series["DateTime"] = pfp_utils.DateTimeVariable({"Data64": dt64_out,
+        "Flag": numpy.zeros(nrecs, dtype=numpy.int32), "Attr": ds.series["DateTime"]["Attr"]})
+    # the date and time variables are not written to the netCDF file
+    not_written = ["DateTime", "DateTime_UTC", "time", "xlDateTime", "Year", "Month", "Day",
+                   "Hour", "Minute", "Second", "Hdh", "Ddd"]
+    labels = set(list(ds_old.series.keys()) + list(ds.series.keys()))
+    labels = sorted([l for l in labels if l not in not_written])
+    level = str(ds.globalattributes.get("nc_level", "L1"))
+    msg = " Splicing " + str(len(inew)) + " new records into " + file_name
+    logger.info(msg)
+    # write to a temporary file and replace the existing file when done
+    tmp_name = nc_name + ".tmp"
+    nc_file = nc_open_write(tmp_name)
+    dims, nc_options = nc_write_coordinates(nc_file, ds_out, labels, ndims=ndims, nc_options=nc_options)
+    ds_cov = DataStructure()
+    ds_cov.globalattributes = ds_out.globalattributes
+    # only one variable from the existing file is in memory at a time
+    nc_old = netCDF4.Dataset(nc_name, "r")
+    nc_old.set_auto_mask(False)
+    for label in labels:
+        var = pfp_utils.CreateEmptyVariable(label, nrecs, out_type="ndarray")
+        if label in ds_old.series.keys():
+            data, flag, attr = nc_read_var(nc_old, label, si=0, ei=len(dt64_old)-1)
+            var["Data"][iold] = data
+            var["Flag"][iold] = flag
+            var["Attr"] = attr
+        if label in ds.series.keys():
+            var["Data"][inew] = numpy.asarray(ds.series[label]["Data"])[nsi:]
+            var["Flag"][inew] = numpy.asarray(ds.series[label]["Flag"])[nsi:]
+            var["Attr"] = copy.deepcopy(ds.series[label]["Attr"])
+        ds_var = DataStructure()
+        ds_var.globalattributes = ds_out.globalattributes
+        ds_var.series[label] = var
+        # update the coverage for the whole file
+        if "coverage_" + level in var["Attr"]:
+            pfp_utils.get_coverage_individual(ds_var)
+            ds_cov.series[label] = {"Attr": var["Attr"]}
+        nc_write_var(nc_file, ds_var, label, dims, nc_options=nc_options)
+    if len(ds_cov.series.keys()) != 0:
+        pfp_utils.get_coverage_groups(ds_cov)
+    if "crs" not in labels:
+        nc_write_crs(nc_file)
+    nc_write_globalattributes(nc_file, ds_out)
+    nc_file.close()
+    nc_old.close()
+    # os.rename() won't replace an existing file on Windows
+    os.remove(nc_name)
+    os.rename(tmp_name, nc_name)
+    return True
+
+def nc_write_var(ncFile, ds, ThisOne, dim, nc_options=None):
     """
     Purpose:
      Function to write data from a series in the data structure to a netCDF variable.
@@ -1939,11 +3497,22 @@ def nc_write_var(ncFile, ds, ThisOne, dim):
             ds is the data structure
             ThisOne is the label of a series in ds
             ("time","latitude","longitude") is the dimension tuple
+            nc_options is the dictionary from get_nc_write_options() plus
+                       the chunk sizes, optional
     Author: PRI
     Date: August 2014
+    Modified:
+     October 2026 - write numpy arrays directly, optional compression and int8 QC flags
     """
+    if nc_options is None:
+        nc_options = get_nc_write_options(None)
+    zlib = (nc_options["zlib_level"] > 0)
+    compression = {"zlib": zlib, "complevel": max(1, nc_options["zlib_level"]),
+                   "shuffle": zlib and nc_options["shuffle"],
+                   "chunksizes": nc_options.get("chunksizes") if zlib else None}
     # get the data type of the series in ds
-    dt = get_ncdtype(ds.series[ThisOne]["Data"])
+    data = numpy.asarray(ds.series[ThisOne]["Data"])
+    dt = get_ncdtype(data)
     # force data type to float64 or int32
     if dt not in ["d", "i"]:
         dt = "d"
@@ -1951,15 +3520,15 @@ def nc_write_var(ncFile, ds, ThisOne, dim):
             dt = "i"
     # create the netCDF variable
     try:
-        ncVar = ncFile.createVariable(ThisOne, dt, dim)
+        ncVar = ncFile.createVariable(ThisOne, dt, dim, **compression)
     except RuntimeError:
         msg = "Error writing variable to netCDF file: "+ThisOne
         raise Exception(msg)
     # different writes to the variable depending on whether it is 1D or 3D
     if len(dim)==1:
-        ncVar[:] = ds.series[ThisOne]["Data"].tolist()
+        ncVar[:] = data
     elif len(dim)==3:
-        ncVar[:, 0, 0] = ds.series[ThisOne]["Data"].tolist()
+        ncVar[:, 0, 0] = data
     else:
         msg = "Unrecognised dimension request for netCDF variable: "+ThisOne
         raise RuntimeError(msg)
@@ -1975,14 +3544,19 @@ def nc_write_var(ncFile, ds, ThisOne, dim):
     else:
         ncVar.setncattr("missing_value", repr(int(c.missing_value)))
     # get the data type of the QC flag
-    dt = get_ncdtype(ds.series[ThisOne]["Flag"])
+    flag = numpy.asarray(ds.series[ThisOne]["Flag"])
+    if (nc_options["int8_flags"] and numpy.issubdtype(flag.dtype, numpy.integer) and
+        len(flag) > 0 and numpy.min(flag) >= -128 and numpy.max(flag) <= 127):
+        # all flag values fit in a byte
+        flag = flag.astype(numpy.int8)
+    dt = get_ncdtype(flag)
     # create the variable
-    ncVar = ncFile.createVariable(ThisOne+"_QCFlag", dt, dim)
+    ncVar = ncFile.createVariable(ThisOne+"_QCFlag", dt, dim, **compression)
     # write 1D or 3D
     if len(dim)==1:
-        ncVar[:] = ds.series[ThisOne]["Flag"].tolist()
+        ncVar[:] = flag
     elif len(dim)==3:
-        ncVar[:, 0, 0] = ds.series[ThisOne]["Flag"].tolist()
+        ncVar[:, 0, 0] = flag
     else:
         msg = "Unrecognised dimension request for netCDF variable: "+ThisOne
         raise RuntimeError(msg)
@@ -1990,11 +3564,157 @@ def nc_write_var(ncFile, ds, ThisOne, dim):
     ncVar.setncattr("long_name", ThisOne+"QC flag")
     ncVar.setncattr("units", "none")
 
-def xl_open_write(xl_name):
-    xl_filename = os.path.basename(xl_name)
-    logger.info(' Opening '+xl_filename+' for writing')
+def results_value(value):
+    """ Return a value that can be written to a results sheet by all of the backends."""
+    if value is numpy.ma.masked:
+        return float("NaN")
+    if isinstance(value, numpy.generic):
+        return value.item()
+    return value
+
+def results_values(values):
+    """ Return a list of values that can be written to a results sheet by all of the backends."""
+    if numpy.ma.isMA(values):
+        if values.dtype.kind in ["i", "u", "f", "b"]:
+            values = numpy.ma.filled(values.astype(numpy.float64), numpy.NaN)
+        else:
+            values = numpy.ma.filled(values)
+    if isinstance(values, numpy.ndarray):
+        # tolist() converts to Python types, datetime64 to datetime
+        return values.tolist()
+    return [results_value(value) for value in values]
+
+def results_write_xls(xl_file):
+    """
+    Purpose:
+     Write a ResultsWorkbook to an Excel 97 workbook using xlwt.  The sheets
+     are written a row at a time, the first and last cells in each row go
+     through Row.write() so that xlwt can set the row bounds and height and
+     the numbers in between are inserted directly with the style index
+     worked out once for each number format.
+    Author: PRI
+    Date: October 2026
+    """
+    xl_book = xlwt.Workbook(encoding="latin-1")
+    xl_book.dates_1904 = xl_file.datemode
+    styles = {None: xlwt.Style.default_style}
+    xf_index = {}
+    for sheet in xl_file.sheets:
+        xl_sheet = xl_book.add_sheet(sheet.name, cell_overwrite_ok=True)
+        truncated = False
+        for row, cells in sheet.rows():
+            if row > 65535:
+                truncated = True
+                break
+            xl_row = xl_sheet.row(row)
+            cols = sorted(cells.keys())
+            for n, col in enumerate(cols):
+                value, num_format = cells[col]
+                if num_format not in styles:
+                    styles[num_format] = xlwt.easyxf(num_format_str=num_format)
+                if type(value) is float and 0 < n < len(cols)-1:
+                    if num_format not in xf_index:
+                        xf_index[num_format] = xl_book.add_style(styles[num_format])
+                    xl_row.insert_cell(col, xlwt.Cell.NumberCell(row, col, xf_index[num_format], value))
+                else:
+                    xl_row.write(col, value, styles[num_format])
+        if truncated:
+            msg = " Too many rows for an xls workbook, " + sheet.name
+            msg += " truncated at 65536 rows (use ResultsFormat = xlsx)"
+            logger.warning(msg)
+    xl_book.save(xl_file.file_name)
+    return
+
+def results_write_xlsx(xl_file):
+    """ Write a ResultsWorkbook to an Excel 2007 workbook using xlsxwriter in constant memory mode."""
+    options = {"constant_memory": True, "nan_inf_to_errors": True,
+               "date_1904": bool(xl_file.datemode)}
+    xl_book = xlsxwriter.Workbook(xl_file.file_name, options)
+    formats = {None: None}
+    for sheet in xl_file.sheets:
+        xl_sheet = xl_book.add_worksheet(sheet.name)
+        for row, cells in sheet.rows():
+            for col in sorted(cells.keys()):
+                value, num_format = cells[col]
+                if num_format not in formats:
+                    formats[num_format] = xl_book.add_format({"num_format": num_format})
+                if type(value) is float:
+                    # missing data (NaN) is left as an empty cell
+                    if value == value:
+                        xl_sheet.write_number(row, col, value, formats[num_format])
+                elif isinstance(value, str):
+                    xl_sheet.write_string(row, col, value.decode("latin-1"), formats[num_format])
+                elif value is not None:
+                    xl_sheet.write(row, col, value, formats[num_format])
+    xl_book.close()
+    return
+
+def results_csv_format(num_format):
+    """
+    Return a function that converts a cell value to a CSV string.  The Excel
+    number format is only used for dates, numbers are written at full
+    precision so the CSV files do not lose information.
+    """
+    if num_format is None:
+        num_format = ""
+    num_format = str(num_format)
+    if "y" in num_format.lower() or "d" in num_format.lower():
+        dt_format = "%Y-%m-%d %H:%M" if "h" in num_format.lower() else "%Y-%m-%d"
+    else:
+        dt_format = "%Y-%m-%d %H:%M:%S"
+    def to_string(value):
+        if isinstance(value, float):
+            if numpy.isnan(value) or numpy.isinf(value):
+                return ""
+            return repr(value)
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.strftime(dt_format)
+        if value is None:
+            return ""
+        if isinstance(value, unicode):
+            return value.encode("utf-8")
+        return str(value)
+    return to_string
+
+def results_write_csv(xl_file):
+    """ Write each sheet of a ResultsWorkbook to a CSV file, <file_name>_<sheet_name>.csv."""
+    converters = {}
+    for sheet in xl_file.sheets:
+        sheet_name = "_".join([s for s in re.split("[^A-Za-z0-9]+", sheet.name) if len(s) != 0])
+        csv_name = xl_file.file_name + "_" + sheet_name + ".csv"
+        csv_file = open(csv_name, "wb")
+        writer = csv.writer(csv_file)
+        last_row = -1
+        for row, cells in sheet.rows():
+            # blank rows between blocks are written as empty lines
+            for _ in range(row-last_row-1):
+                writer.writerow([])
+            line = [""]*(max(cells.keys())+1)
+            for col, (value, num_format) in cells.items():
+                if num_format not in converters:
+                    converters[num_format] = results_csv_format(num_format)
+                line[col] = converters[num_format](value)
+            writer.writerow(line)
+            last_row = row
+        csv_file.close()
+    return
+
+def xl_open_write(xl_name, results_format=None):
+    """
+    Purpose:
+     Return a ResultsWorkbook for writing, the format is taken from the
+     extension of xl_name if results_format is None.
+    Usage:
+     xl_file = pfp_io.xl_open_write(xl_name, results_format="xlsx")
+    Author: PRI
+    Date: Back in the day
+    Modified:
+     October 2026 - return a ResultsWorkbook instead of an xlwt workbook
+    """
     try:
-        xl_file = xlwt.Workbook()
+        xl_file = ResultsWorkbook(xl_name, results_format=results_format)
+        xl_filename = os.path.basename(xl_file.file_name)
+        logger.info(' Opening '+xl_filename+' for writing')
     except:
         logger.error(' Unable to open Excel file '+xl_name+' for writing')
         xl_file = ''
@@ -2118,12 +3838,12 @@ def xl_write_AlternateStats(ds, l4_info):
     l4a = l4_info["GapFillFromAlternate"]
     file_name = os.path.split(l4a["info"]["xl_file_name"])
     logger.info(' Writing alternate fit statistics to ' + file_name[1])
-    # open the Excel file
-    xlfile = xlwt.Workbook()
+    # open the Excel file, the format is given by the file extension
+    xlfile = ResultsWorkbook(l4a["info"]["xl_file_name"])
     # list of outputs to write to the Excel file
     date_list = ["startdate", "enddate"]
     # loop over the series that have been gap filled using alternate data
-    d_xf = xlwt.easyxf(num_format_str='dd/mm/yyyy hh:mm')
+    d_xf = 'dd/mm/yyyy hh:mm'
     label_list = sorted(l4a["outputs"].keys())
     for label in label_list:
         # get the list of values to output with the start and end dates removed
@@ -2136,22 +3856,15 @@ def xl_write_AlternateStats(ds, l4_info):
         xlCol = 0
         for dt in date_list:
             xlResultsSheet.write(xlRow, xlCol, dt)
-            for item in l4a["outputs"][label]["results"][dt]:
-                xlRow = xlRow + 1
-                xlResultsSheet.write(xlRow, xlCol, item, d_xf)
-            xlRow = 9
+            xlResultsSheet.write_column(xlRow+1, xlCol, l4a["outputs"][label]["results"][dt], num_format=d_xf)
             xlCol = xlCol + 1
         for output in output_list:
             xlResultsSheet.write(xlRow, xlCol, output)
             # convert masked array to ndarray
             output_array = numpy.ma.filled(l4a["outputs"][label]["results"][output], float(c.missing_value))
-            for item in output_array:
-                xlRow = xlRow + 1
-                # xlwt under Anaconda seems to only allow float64!
-                xlResultsSheet.write(xlRow, xlCol, numpy.float64(item))
-            xlRow = 9
+            xlResultsSheet.write_column(xlRow+1, xlCol, numpy.asarray(output_array, dtype=numpy.float64))
             xlCol = xlCol + 1
-    xlfile.save(l4a["info"]["xl_file_name"])
+    xlfile.save()
 
 def xl_write_SOLOStats(ds, l5_info):
     if "solo" not in l5_info.keys():
@@ -2159,15 +3872,16 @@ def xl_write_SOLOStats(ds, l5_info):
     # get the output file name
     out_filename = get_outfilenamefromcf(l5_info["cf"])
     # get the Excel file name
-    xl_filename = out_filename.replace('.nc', '_SOLOStats.xls')
+    results_format = get_results_format(l5_info["cf"])
+    xl_filename = get_results_filename(out_filename.replace('.nc', '_SOLOStats.xls'), results_format)
     xl_name = os.path.split(xl_filename)
     logger.info(' Writing SOLO statistics to ' + xl_name[1])
     # open the Excel file
-    xlfile = xlwt.Workbook()
+    xlfile = ResultsWorkbook(xl_filename, results_format=results_format)
     # list of outputs to write to the Excel file
     date_list = ["startdate", "enddate"]
     # loop over the series that have been gap filled using ACCESS data
-    d_xf = xlwt.easyxf(num_format_str='dd/mm/yyyy hh:mm')
+    d_xf = 'dd/mm/yyyy hh:mm'
     outputs = l5_info["solo"]["outputs"].keys()
     outputs.sort()
     for output in outputs:
@@ -2182,10 +3896,8 @@ def xl_write_SOLOStats(ds, l5_info):
         xlCol = 0
         for dt in date_list:
             xlResultsSheet.write(xlRow, xlCol, dt)
-            for item in l5_info["solo"]["outputs"][output]["results"][dt]:
-                xlRow = xlRow + 1
-                xlResultsSheet.write(xlRow, xlCol, item, d_xf)
-            xlRow = 10
+            xlResultsSheet.write_column(xlRow+1, xlCol, l5_info["solo"]["outputs"][output]["results"][dt],
+                                        num_format=d_xf)
             xlCol = xlCol + 1
             # remove startdate and enddate from the list of outputs
             stats.remove(dt)
@@ -2194,13 +3906,9 @@ def xl_write_SOLOStats(ds, l5_info):
             # convert masked array to ndarray
             output_array = numpy.ma.filled(l5_info["solo"]["outputs"][output]["results"][stat],
                                            float(c.missing_value))
-            for item in output_array:
-                xlRow = xlRow + 1
-                # xlwt under Anaconda seems to only allow float64!
-                xlResultsSheet.write(xlRow, xlCol, numpy.float64(item))
-            xlRow = 10
+            xlResultsSheet.write_column(xlRow+1, xlCol, numpy.asarray(output_array, dtype=numpy.float64))
             xlCol = xlCol + 1
-    xlfile.save(xl_filename)
+    xlfile.save()
 
 def xl_write_ISD_timesteps(xl_file_path, data):
     """
@@ -2257,43 +3965,41 @@ def xl_write_data(xl_sheet, data, xlCol=0):
                                       be written tp the first column of the
                                       worksheet
          data["DateTime"]["units"]  - units of the date time eg "Days", "Years"
-         data["DateTime"]["format"] - a format string for xlwt.easyxf eg "dd/mm/yyy"
+         data["DateTime"]["format"] - an Excel number format eg "dd/mm/yyy"
       2) data[variable]["data"]     - a numpy array of data values
          data[variable]["units"]    - units of the data
-         data[variable]["format"]   - an xlwt.easyxf format string eg "0.00" for 2 decimal places
+         data[variable]["format"]   - an Excel number format eg "0.00" for 2 decimal places
          There can be multiple variables but each must follow the above template.
     Usage:
      pfp_io.xl_write_data(xl_sheet, data)
-      where xl_sheet is an Excel worksheet instance
+      where xl_sheet is a ResultsSheet instance
             data     is a dictionary as defined above
     Side effects:
-     Writes to an Excel worksheet instance
+     Writes to a ResultsSheet instance
     Called by:
     Calls:
     Author: PRI
     Date: June 2015
+    Modified:
+     October 2026 - write whole columns to a ResultsSheet
     """
     #xlCol = 0
     # write the data to the xl file
     series_list = data.keys()
     xl_sheet.write(1,xlCol,data["DateTime"]["attr"]["units"])
     nrows = len(data["DateTime"]["data"])
-    d_xf = xlwt.easyxf(num_format_str=data["DateTime"]["attr"]["format"])
-    for j in range(nrows):
-        xl_sheet.write(j+2,xlCol,data["DateTime"]["data"][j],d_xf)
+    xl_sheet.write_column(2, xlCol, data["DateTime"]["data"], num_format=data["DateTime"]["attr"]["format"])
     series_list.remove("DateTime")
     series_list.sort()
     for item in series_list:
         xlCol = xlCol + 1
         xl_sheet.write(0,xlCol,data[item]["attr"]["units"])
         xl_sheet.write(1,xlCol,item)
-        d_xf = xlwt.easyxf(num_format_str=data[item]["attr"]["format"])
         if numpy.ma.isMA(data[item]["data"]):
             tmp = numpy.ma.filled(data[item]["data"],fill_value=numpy.NaN)
         else:
             tmp = data[item]["data"]
-        for j in range(nrows):
-            xl_sheet.write(j+2,xlCol,tmp[j],d_xf)
+        xl_sheet.write_column(2, xlCol, tmp[:nrows], num_format=data[item]["attr"]["format"])
 
 def xl_write_series(ds, xlfullname, outputlist=None):
     if "nc_nrecs" in ds.globalattributes.keys():
@@ -2304,14 +4010,21 @@ def xl_write_series(ds, xlfullname, outputlist=None):
     # open the Excel file
     msg = " Opening and writing Excel file " + os.path.basename(xlfullname)
     logger.info(msg)
-    xlfile = xlwt.Workbook(encoding="latin-1")
     # set the datemode
     if "xl_datemode" not in ds.globalattributes:
         if platform.system() == "darwin":
             ds.globalattributes["xl_datemode"] = 0
         else:
             ds.globalattributes["xl_datemode"] = 1
-    xlfile.dates_1904 = int(ds.globalattributes["xl_datemode"])
+    # the format is given by the file extension
+    xlfile = ResultsWorkbook(xlfullname, datemode=int(ds.globalattributes["xl_datemode"]))
+    # the data does not fit in an xls workbook (65536 rows including the 3 header
+    # rows), write an xlsx workbook rather than leave out some of the data
+    if xlfile.results_format == "xls" and nRecs + 3 > 65536:
+        xlfullname = get_results_filename(xlfullname, "xlsx")
+        xlfile = ResultsWorkbook(xlfullname, datemode=int(ds.globalattributes["xl_datemode"]))
+        msg = " Too many records for an xls workbook, writing " + os.path.basename(xlfullname) + " instead"
+        logger.warning(msg)
     # add sheets to the Excel file
     xlAttrSheet = xlfile.add_sheet("Attr")
     xlDataSheet = xlfile.add_sheet("Data")
@@ -2367,11 +4080,10 @@ def xl_write_series(ds, xlfullname, outputlist=None):
         pfp_utils.get_xldatefromdatetime(ds)
     xlDateTime, f, a = pfp_utils.GetSeries(ds, "xlDateTime")
     logger.info(" Writing the datetime to the Excel file")
-    d_xf = xlwt.easyxf(num_format_str='dd/mm/yyyy hh:mm')
+    d_xf = 'dd/mm/yyyy hh:mm'
     xlDataSheet.write(2,xlcol,'xlDateTime')
-    for j in range(nRecs):
-        xlDataSheet.write(j+3,xlcol,xlDateTime[j],d_xf)
-        xlFlagSheet.write(j+3,xlcol,xlDateTime[j],d_xf)
+    xlDataSheet.write_column(3, xlcol, xlDateTime[:nRecs], num_format=d_xf)
+    xlFlagSheet.write_column(3, xlcol, xlDateTime[:nRecs], num_format=d_xf)
     # remove xlDateTime from the list of variables to be written to the Excel file
     if "xlDateTime" in outputlist: outputlist.remove("xlDateTime")
     # now start looping over the other variables in the xl file
@@ -2398,18 +4110,16 @@ def xl_write_series(ds, xlfullname, outputlist=None):
         xlDataSheet.write(0, xlcol, longname)
         xlDataSheet.write(1, xlcol, units)
         xlDataSheet.write(2, xlcol, ThisOne)
-        # loop over the values in the variable series (array writes don't seem to work)
-        for j in range(nRecs):
-            xlDataSheet.write(j+3, xlcol, float(ds.series[ThisOne]["Data"][j]))
+        # write the values in the variable series as a column
+        data = numpy.asarray(ds.series[ThisOne]["Data"][:nRecs], dtype=numpy.float64)
+        xlDataSheet.write_column(3, xlcol, data)
         # check to see if this variable has a quality control flag
         if "Flag" in ds.series[ThisOne].keys():
             # write the QC flag name to the xls file
             xlFlagSheet.write(2, xlcol, ThisOne)
-            # specify the format of the QC flag (integer)
-            d_xf = xlwt.easyxf(num_format_str="0")
-            # loop over QC flag values and write to xls file
-            for j in range(nRecs):
-                xlFlagSheet.write(j+3, xlcol, int(ds.series[ThisOne]['Flag'][j]), d_xf)
+            # write the QC flag values as integers
+            flag = numpy.asarray(ds.series[ThisOne]["Flag"][:nRecs], dtype=numpy.int64)
+            xlFlagSheet.write_column(3, xlcol, flag, num_format="0")
         # increment the column pointer
         xlcol = xlcol + 1
     xlfile.save(xlfullname)
@@ -27,6 +27,7 @@ def l1qc(cf):
      control file.
     Author: PRI
     Date: February 2020
+    Modified: October 2026 - CSV and TOA5 files are read by pfp_io.CSVToDataStructures
     """
     # get a new data structure
     ds = pfp_io.DataStructure()
@@ -34,10 +35,17 @@ def l1qc(cf):
     l1_info = pfp_compliance.ParseL1ControlFile(cf)
     # return if parsing throws an error
     if not pfp_compliance.check_status_ok(ds, l1_info): return ds
-    # check the Excel workbook
-    xl_data = pfp_compliance.CheckExcelWorkbook(l1_info)
-    # copy data from the worksheets to individual data structures
-    ds_dict = pfp_io.ExcelToDataStructures(xl_data, l1_info)
+    if pfp_io.csv_is_text_file(l1_info["read_excel"]["Files"]["file_name"]):
+        # read the CSV or TOA5 file to a data structure
+        ds_dict = pfp_io.CSVToDataStructures(l1_info)
+        if len(ds_dict) == 0:
+            ds.returncodes = {"value": 1, "message": "Unable to read CSV file"}
+            return ds
+    else:
+        # check the Excel workbook
+        xl_data = pfp_compliance.CheckExcelWorkbook(l1_info)
+        # copy data from the worksheets to individual data structures
+        ds_dict = pfp_io.ExcelToDataStructures(xl_data, l1_info)
     # merge the individual data structures to a single data structure
     ds = pfp_ts.MergeDataStructures(ds_dict, l1_info)
     # write the processing level to a global attribute
@@ -337,7 +345,7 @@ def l5qc(main_gui, cf, ds4):
 
     return ds5
 
-def l6qc(main_gui, cf, ds5):
+def l6qc(main_gui, cf, ds5, summary=True):
     ds6 = pfp_io.copy_datastructure(cf, ds5)
     # ds6 will be empty (logical false) if an error occurs in copy_datastructure
     # return from this routine if this is the case
@@ -384,7 +392,8 @@ def l6qc(main_gui, cf, ds5):
     pfp_utils.get_coverage_groups(ds6)
     # remove intermediate series from the data structure
     pfp_ts.RemoveIntermediateSeries(ds6, l6_info)
-    # do the L6 summary
-    pfp_rp.L6_summary(cf, ds6)
+    # do the L6 summary, incremental runs do this after the new data is in the output file
+    if summary:
+        pfp_rp.L6_summary(cf, ds6)
 
     return ds6
@@ -1,22 +1,174 @@
 # standard modules
+import collections
+import copy
 import datetime
 import logging
 import os
+import Queue
+import threading
+import time
 # 3rd party modules
 from PyQt5 import QtCore, QtGui, QtWidgets
 
 class QPlainTextEditLogger(logging.Handler):
-    def __init__(self, parent):
+    """
+    Purpose:
+     Log handler that writes to a QPlainTextEdit in the GUI.  emit() puts the
+     formatted message on a queue and the queue is written to the text box in
+     one go by a QTimer every interval milliseconds.  The processing runs in
+     the GUI thread so the timer can not fire while a level is being run,
+     emit() flushes the queue and processes the Qt events itself if more than
+     interval milliseconds have passed since the last flush.  This limits the
+     repaints to 1000/interval per second however many messages are logged.
+     Only the last max_lines lines are kept in the text box.
+     Messages from other threads are queued and shown by the timer, messages
+     from forked processes (eg multiprocessing workers) are dropped.
+    Usage:
+     logTextBox = pfp_log.QPlainTextEditLogger(parent, interval=100, max_lines=10000)
+     logger.addHandler(logTextBox)
+    Author: PRI
+    Date: Back in the day
+    Modified:
+     October 2026 - queue the messages and flush them at a bounded rate
+    """
+    def __init__(self, parent, interval=100, max_lines=10000):
         super(QPlainTextEditLogger, self).__init__()
         self.textBox = QtWidgets.QPlainTextEdit(parent)
         self.textBox.setReadOnly(True)
+        self.textBox.setMaximumBlockCount(max_lines)
         logfmt = logging.Formatter('%(asctime)s %(levelname)s %(message)s','%H:%M:%S')
         self.setFormatter(logfmt)
+        # messages older than the last max_lines will not be shown anyway
+        self.queue = collections.deque(maxlen=max_lines)
+        self.interval = interval
+        self.last_flush = time.time()
+        self.pid = os.getpid()
+        self.thread_id = threading.current_thread().ident
+        self.timer = QtCore.QTimer(self.textBox)
+        self.timer.timeout.connect(self.flush_queue)
+        self.timer.start(interval)
 
     def emit(self, record):
-        msg = self.format(record)
-        self.textBox.appendPlainText(msg)
-        QtWidgets.QApplication.processEvents()
+        if os.getpid() != self.pid:
+            return
+        try:
+            self.queue.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+            return
+        if threading.current_thread().ident != self.thread_id:
+            return
+        if 1000*(time.time() - self.last_flush) >= self.interval:
+            self.flush_queue()
+            QtWidgets.QApplication.processEvents()
+
+    def flush_queue(self):
+        """ Write the queued messages to the text box, only called in the GUI thread."""
+        self.last_flush = time.time()
+        if len(self.queue) == 0:
+            return
+        msgs = []
+        while len(self.queue) != 0:
+            msgs.append(self.queue.popleft())
+        self.textBox.appendPlainText("\n".join(msgs))
+
+class QueueHandler(logging.Handler):
+    """
+    Purpose:
+     Log handler that puts the log records on a queue, the records are taken
+     off the queue and passed to the real handlers (log files, console) by a
+     QueueListener running in another thread so that logging does not block
+     the processing thread.  The queue can also be a multiprocessing.Queue,
+     in which case the messages are formatted before they are put on the
+     queue so that the records can be pickled.
+     If the handler is used in a process forked from the one that created it
+     (the listener thread is not copied by fork) the records are passed
+     straight to the listener's handlers.
+    Usage:
+     See start_queued_logging()
+    Author: PRI
+    Date: October 2026
+    """
+    def __init__(self, queue, listener=None):
+        super(QueueHandler, self).__init__()
+        self.queue = queue
+        self.listener = listener
+        self.pid = os.getpid()
+
+    def prepare(self, record):
+        # records on an in-process queue are passed as they are
+        if isinstance(self.queue, Queue.Queue):
+            return record
+        # records sent to another process are pickled so the arguments and
+        # any traceback are merged into the message, the record is copied
+        # because the other handlers on the logger also see it
+        record = copy.copy(record)
+        record.msg = self.format(record)
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        return record
+
+    def emit(self, record):
+        if self.listener is not None and os.getpid() != self.pid:
+            self.listener.handle(record)
+            return
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+class QueueListener(object):
+    """
+    Purpose:
+     Takes log records off a queue in a separate thread and passes them to
+     a list of handlers.  The lock must be held when the list of handlers
+     is changed (see change_logger_filename()) so that a record is not
+     passed to a handler that is being replaced.
+    Usage:
+     See start_queued_logging()
+    Author: PRI
+    Date: October 2026
+    """
+    def __init__(self, queue, handlers):
+        self.queue = queue
+        self.handlers = list(handlers)
+        self.thread = None
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.monitor, name="pfp_log_listener")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def handle(self, record):
+        # there is no listener thread in a forked process and the lock may
+        # have been copied while it was held
+        if os.getpid() != self.pid:
+            self.dispatch(record)
+            return
+        with self.lock:
+            self.dispatch(record)
+
+    def dispatch(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def monitor(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                break
+            self.handle(record)
+
+    def stop(self):
+        # the None sentinel stops the thread once the queue has been emptied
+        if self.thread is not None:
+            self.queue.put_nowait(None)
+            self.thread.join()
+            self.thread = None
 
 def init_logger(logger_name, log_file_name, to_file=True, to_screen=False):
     """
@@ -53,18 +205,91 @@ def init_logger(logger_name, log_file_name, to_file=True, to_screen=False):
         logger.addHandler(console)
     return logger
 
+def start_queued_logging(logger_name):
+    """
+    Purpose:
+     Move the handlers of a logger (except the GUI handler, which has its
+     own queue) behind a queue so that logging calls return without waiting
+     for the log files or the console to be written.  The records are
+     written by a QueueListener thread in the same order as they were logged.
+     Used by the batch processing, in the main process and in the worker
+     processes.
+    Usage:
+     pfp_log.start_queued_logging("pfp_log")
+     ...
+     pfp_log.stop_queued_logging("pfp_log")
+    Author: PRI
+    Date: October 2026
+    """
+    logger = logging.getLogger(name=logger_name)
+    handlers = [handler for handler in logger.handlers
+                if not isinstance(handler, (QPlainTextEditLogger, QueueHandler))]
+    if len(handlers) == 0:
+        return logger
+    queue = Queue.Queue()
+    listener = QueueListener(queue, handlers)
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(QueueHandler(queue, listener=listener))
+    listener.start()
+    return logger
+
+def stop_queued_logging(logger_name):
+    """
+    Purpose:
+     Write any queued log records, stop the QueueListener thread and put the
+     handlers back on the logger, see start_queued_logging().
+    Usage:
+     pfp_log.stop_queued_logging("pfp_log")
+    Author: PRI
+    Date: October 2026
+    """
+    logger = logging.getLogger(name=logger_name)
+    for handler in list(logger.handlers):
+        if isinstance(handler, QueueHandler) and handler.listener is not None:
+            logger.removeHandler(handler)
+            handler.listener.stop()
+            for listener_handler in handler.listener.handlers:
+                logger.addHandler(listener_handler)
+    return logger
+
 def change_logger_filename(logger_name, new_file_name):
     # get the logger
     logger = logging.getLogger(name=logger_name)
-    # create formatter
-    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', '%H:%M:%S')
-    # remove the existing file handlers
+    # file handlers behind a queue are changed in the listener's list while
+    # holding the listener's lock so the listener thread does not write to
+    # a handler that is being closed
+    handler_lists = [[logger.handlers, None]]
     for handler in logger.handlers:
+        if isinstance(handler, QueueHandler) and handler.listener is not None:
+            handler_lists.append([handler.listener.handlers, handler.listener.lock])
+    # remove the existing file handlers
+    for handlers, lock in handler_lists:
+        if lock is not None:
+            lock.acquire()
+        try:
+            swap_file_handlers(handlers, new_file_name)
+        finally:
+            if lock is not None:
+                lock.release()
+    return logger
+
+def swap_file_handlers(handlers, new_file_name):
+    """
+    Purpose:
+     Replace the file handlers in a list of handlers with handlers that
+     write to new_file_name in the same directory, keeping the level, the
+     formatter and the order of the handlers.  The old handlers are closed.
+    Usage:
+     pfp_log.swap_file_handlers(logger.handlers, new_file_name)
+    Author: PRI
+    Date: October 2026
+    """
+    for n, handler in enumerate(list(handlers)):
         if isinstance(handler, logging.FileHandler):
             old_log_path = handler.baseFilename
             old_log_level = handler.level
             old_log_formatter = handler.formatter
-            logger.removeHandler(handler)
             old_dir_name = os.path.dirname(os.path.abspath(old_log_path))
             old_base_name = os.path.basename(os.path.abspath(old_log_path))
             old_file_name = os.path.splitext(old_base_name)[0]
@@ -73,8 +298,9 @@ def change_logger_filename(logger_name, new_file_name):
             fh = logging.FileHandler(new_log_path)
             fh.setLevel(old_log_level)
             fh.setFormatter(old_log_formatter)
-            logger.addHandler(fh)
-    return logger
+            # swap the handlers in place so the order is kept
+            handlers[n] = fh
+            handler.close()
 
 def disable_console_log(logger_name):
     console_handler = None
@@ -92,6 +318,22 @@ def enable_console_log(logger_name, console_handler):
     logger.addHandler(console_handler)
     return
 
+def disable_gui_log(logger_name):
+    """
+    Purpose:
+     Remove the handlers that write to the GUI log window.  Used in worker
+     processes, which must not touch the Qt widgets of the parent process.
+    Usage:
+     pfp_log.disable_gui_log("pfp_log")
+    Author: PRI
+    Date: October 2026
+    """
+    logger = logging.getLogger(name=logger_name)
+    for handler in list(logger.handlers):
+        if isinstance(handler, QPlainTextEditLogger):
+            logger.removeHandler(handler)
+    return
+
 def get_batch_log_path(log_path):
     if not os.path.isdir(log_path):
         os.mkdir(log_path)
@@ -7,6 +7,7 @@ import subprocess
 import numpy
 import xlwt
 # PFP modules
+import pfp_cache
 import pfp_io
 import pfp_utils
 
@@ -64,45 +65,67 @@ def make_data_array(cf, ds, current_year):
     ts = int(ds.globalattributes["time_step"])
     start = datetime.datetime(current_year, 1, 1, 0, 0, 0) + datetime.timedelta(minutes=ts)
     end = datetime.datetime(current_year+1, 1, 1, 0, 0, 0)
-    cdt = numpy.array([dt for dt in pfp_utils.perdelta(start, end, datetime.timedelta(minutes=ts))])
-    mt = numpy.ones(len(cdt))*float(-9999)
-    mt_list = [cdt] + [mt for n in cf["Variables"].keys()]
-    data = numpy.stack(mt_list, axis=-1)
+    # complete datetime64 series for this year
+    step = numpy.timedelta64(ts, "m")
+    cdt = numpy.datetime64(start, "s") + numpy.arange(int((end - start).total_seconds())//(ts*60) + 1)*step
+    data = numpy.full((len(cdt), len(cf["Variables"].keys()) + 1), float(-9999))
     si = pfp_utils.GetDateIndex(ldt["Data"], start, default=0)
     ei = pfp_utils.GetDateIndex(ldt["Data"], end, default=nrecs)
-    dt = pfp_utils.GetVariable(ds, "DateTime", start=si, end=ei)
-    idx1, idx2 = pfp_utils.FindMatchingIndices(cdt, dt["Data"])
+    dt64 = pfp_utils.get_datetime64(ds)[si:ei+1]
+    idx1, idx2 = pfp_utils.FindMatchingIndices(cdt, dt64)
     for n, cf_label in enumerate(cf["Variables"].keys()):
         label = cf["Variables"][cf_label]["name"]
         var = pfp_utils.GetVariable(ds, label, start=si, end=ei)
         data[idx1,n+1] = var["Data"]
-    # convert datetime to ISO dates
-    data[:,0] = numpy.array([int(xdt.strftime("%Y%m%d%H%M")) for xdt in cdt])
+    # convert datetime to ISO dates (YYYYMMDDHHMM)
+    ymdhms = pfp_utils.get_ymdhms_from_datetime64(cdt)
+    data[:,0] = (ymdhms["Year"].astype(numpy.int64)*100000000 + ymdhms["Month"]*1000000 +
+                 ymdhms["Day"]*10000 + ymdhms["Hour"]*100 + ymdhms["Minute"])
     return data
 
 def mpt_main(cf):
     base_file_path = cf["Files"]["file_path"]
     nc_file_name = cf["Files"]["in_filename"]
     nc_file_path = os.path.join(base_file_path, nc_file_name)
-    ds = pfp_io.nc_read_series(nc_file_path)
-    out_file_paths = run_mpt_code(cf, ds, nc_file_name)
-    if len(out_file_paths) == 0:
-        return
-    ustar_results = read_mpt_output(out_file_paths)
+    labels = [cf["Variables"][label]["name"] for label in cf["Variables"].keys()]
+    ds = pfp_io.nc_read_series(nc_file_path, variables=labels)
     mpt_file_path = nc_file_path.replace(".nc", "_MPT.xls")
+    # the results are cached on the input data and the options
+    cache_info = pfp_cache.get_info(cf)
+    arrays = [pfp_utils.GetVariable(ds, label)["Data"] for label in ["DateTime"] + labels]
+    settings = pfp_cache.get_cf_settings(cf, ["Options", "Variables"])
+    cache_key = pfp_cache.make_key("mpt_main", arrays, settings, ["pfp_mpt"])
+    ustar_results = pfp_cache.get(cache_info, cache_key, "mpt_main")
+    if ustar_results is not None:
+        xl_write_mpt(mpt_file_path, ustar_results)
+        return
+    # each run gets its own workspace so that runs for different sites can go at the same time
+    in_memory = pfp_utils.get_optionskeyaslogical(cf, "WorkspaceInMemory", default=False)
+    log_prefix = os.path.splitext(os.path.basename(nc_file_name))[0] + "_"
+    with pfp_utils.Workspace("mpt", ["input", "output", "log"], in_memory=in_memory,
+                             log_dir=os.path.join("mpt", "log"), log_prefix=log_prefix) as ws:
+        out_file_paths = run_mpt_code(cf, ds, nc_file_name, ws)
+        if len(out_file_paths) == 0:
+            return
+        ustar_results = read_mpt_output(out_file_paths)
+    pfp_cache.put(cache_info, cache_key, ustar_results)
     xl_write_mpt(mpt_file_path, ustar_results)
     return
 
-def run_mpt_code(cf, ds, nc_file_name):
+def run_mpt_code(cf, ds, nc_file_name, ws):
     """
     Purpose:
      Runs the MPT u* threshold detection code for each year in the data set.
     Usage:
+     out_file_paths = run_mpt_code(cf, ds, nc_file_name, ws)
+     where ws is the pfp_utils.Workspace for this run
     Side effects:
-     Writes an ASCII file of results which is read by later code.
+     Writes an ASCII file of results in the workspace which is read by later code.
     Author: Alessio Ribeca wrote the C code
             PRI wrote this wrapper
     Date: Back in the day
+    Modified:
+     October 2026 - MPT files go in the workspace ws
     """
     # set up file paths, headers and formats etc
     out_file_paths = {}
@@ -115,29 +138,29 @@ def run_mpt_code(cf, ds, nc_file_name):
             logger.error(msg)
             return out_file_paths
     fmt = "%12i,%f,%f,%f,%f,%f,%f,%f"
-    log_file_path = os.path.join("mpt", "log", "mpt.log")
-    mptlogfile = open(log_file_path, "wb")
-    in_base_path = os.path.join("mpt", "input", "")
-    out_base_path = os.path.join("mpt", "output", "")
     # get the time step
     ts = int(ds.globalattributes["time_step"])
     if (ts != 30) and (ts != 60):
         msg = "MPT: time step must be 30 or 60 minutes (" + str(ts) + "), skipping MPT ..."
         logger.error(msg)
         return out_file_paths
+    log_file_path = ws.path("log", "mpt.log")
+    mptlogfile = open(log_file_path, "wb")
+    in_base_path = ws.path("input", "")
+    out_base_path = ws.path("output", "")
     # get the datetime
-    dt = pfp_utils.GetVariable(ds, "DateTime")
+    dt64 = pfp_utils.get_datetime64(ds)
     # subtract 1 time step to avoid orphan years
-    cdt = dt["Data"] - datetime.timedelta(minutes=ts)
+    cdt = dt64 - numpy.timedelta64(ts, "m")
     # get a list of the years in the data set
-    years = sorted(list(set([ldt.year for ldt in cdt])))
+    years = sorted(numpy.unique(pfp_utils.get_year_from_datetime64(cdt)).tolist())
     # loop over years
     for year in years:
         msg = " MPT: processing year " + str(year)
         logger.info(msg)
         in_name = nc_file_name.replace(".nc","_"+str(year)+"_MPT.csv")
         in_full_path = os.path.join(in_base_path, in_name)
-        out_full_path = in_full_path.replace("input", "output").replace(".csv", "_ut.txt")
+        out_full_path = os.path.join(out_base_path, in_name.replace(".csv", "_ut.txt"))
         data = make_data_array(cf, ds, year)
         numpy.savetxt(in_full_path, data, header=header, delimiter=",", comments="", fmt=fmt)
         ustar_mp_exe = os.path.join(".", "mpt", "bin", "ustar_mp")
@@ -21,20 +21,13 @@ import pfp_utils
 logger = logging.getLogger("pfp_log")
 
 def get_diurnalstats(DecHour,Data,dt):
-    nInts = 24*int((60/dt)+0.5)
-    Hr = numpy.array([c.missing_value]*nInts,dtype=numpy.float64)
-    Av = numpy.array([c.missing_value]*nInts,dtype=numpy.float64)
-    Sd = numpy.array([c.missing_value]*nInts,dtype=numpy.float64)
-    Mx = numpy.array([c.missing_value]*nInts,dtype=numpy.float64)
-    Mn = numpy.array([c.missing_value]*nInts,dtype=numpy.float64)
-    for i in range(nInts):
-        Hr[i] = float(i)*dt/60.
-        li = numpy.where((abs(DecHour-Hr[i])<c.eps)&(abs(Data-float(c.missing_value))>c.eps))
-        if numpy.size(li)!=0:
-            Av[i] = numpy.mean(Data[li])
-            Sd[i] = numpy.std(Data[li])
-            Mx[i] = numpy.max(Data[li])
-            Mn[i] = numpy.min(Data[li])
+    tod, nInts = pfp_utils.get_tod_index(DecHour, dt)
+    Hr = numpy.arange(nInts)*float(dt)/60.
+    stats = pfp_utils.get_grouped_stats(Data, tod, nInts, stats=["Av", "Sd", "Mx", "Mn"])
+    Av = numpy.ma.filled(stats["Av"], float(c.missing_value))
+    Sd = numpy.ma.filled(stats["Sd"], float(c.missing_value))
+    Mx = numpy.ma.filled(stats["Mx"], float(c.missing_value))
+    Mn = numpy.ma.filled(stats["Mn"], float(c.missing_value))
     return Hr, Av, Sd, Mx, Mn
 
 def get_ticks(start, end):
@@ -305,12 +298,12 @@ def pltfingerprint_readncfiles(cf):
     ds = {}
     if "Files" in cf:
         infilename = pfp_io.get_infilenamefromcf(cf)
-        ds[infilename] = pfp_io.nc_read_series(infilename)
+        ds[infilename] = pfp_io.nc_read_series(infilename, lazy=True)
     for var in cf["Variables"].keys():
         if "in_filename" in cf["Variables"][var]:
             if cf["Variables"][var]["in_filename"] not in ds:
                 infilename = cf["Variables"][var]["in_filename"]
-                ds[cf["Variables"][var]["in_filename"]] = pfp_io.nc_read_series(infilename)
+                ds[cf["Variables"][var]["in_filename"]] = pfp_io.nc_read_series(infilename, lazy=True)
     return ds
 
 def plot_fingerprint(cf):
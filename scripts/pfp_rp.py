@@ -14,6 +14,7 @@ import pylab
 import xlrd
 # PFP modules
 import constants as c
+import pfp_cache
 import pfp_cfg
 import pfp_gf
 import pfp_gfSOLO
@@ -170,6 +171,8 @@ def ERUsingLasslop(ds, l6_info):
     Side effects:
     Author: IMcH, PRI
     Date: Back in the day
+    Modified:
+     October 2026 - the LT and LL parameters are cached on the input data and the settings
     """
     if "ERUsingLasslop" not in l6_info:
         return
@@ -216,9 +219,19 @@ def ERUsingLasslop(ds, l6_info):
     # synchronise the gaps and apply the ustar filter
     T_night = numpy.ma.masked_where(indicator_night == 0, T)
     ER = numpy.ma.masked_where(indicator_night == 0, Fc)
+    # the LT and LL parameters are cached on the input data and the settings
+    settings = {"time_step": ts}
+    for item in ["window_size_days", "step_size_days", "fsd_threshold"]:
+        settings[item] = ielo[output][item]
+    cache_key = pfp_cache.make_key("ERUsingLasslop", [ldt, Fsd, D, T, Fc, indicator],
+                                   settings, ["pfp_rpLL"])
+    cached = pfp_cache.get(iel["info"]["cache"], cache_key, "ERUsingLasslop")
     # loop over the windows and get E0
-    logger.info(" Estimating the rb and E0 parameters")
-    LT_results = pfp_rpLL.get_LT_params(ldt, ER, T_night, l6_info, output)
+    if cached is None:
+        logger.info(" Estimating the rb and E0 parameters")
+        LT_results = pfp_rpLL.get_LT_params(ldt, ER, T_night, l6_info, output)
+    else:
+        LT_results = cached["LT_results"]
     # interpolate parameters
     # this should have a check to make sure we are not interpolating with a small
     # number of points
@@ -248,8 +261,12 @@ def ERUsingLasslop(ds, l6_info):
     T_day = numpy.ma.masked_where(indicator_day==0,T)
     NEE_day = numpy.ma.masked_where(indicator_day==0,Fc)
     # get the Lasslop parameters
-    logger.info(" Estimating the Lasslop parameters")
-    LL_results = pfp_rpLL.get_LL_params(ldt, Fsd_day, D_day, T_day, NEE_day, ER, LT_results, l6_info, output)
+    if cached is None:
+        logger.info(" Estimating the Lasslop parameters")
+        LL_results = pfp_rpLL.get_LL_params(ldt, Fsd_day, D_day, T_day, NEE_day, ER, LT_results, l6_info, output)
+        pfp_cache.put(iel["info"]["cache"], cache_key, {"LT_results": LT_results, "LL_results": LL_results})
+    else:
+        LL_results = cached["LL_results"]
     # interpolate parameters
     LL_results["alpha_int"] = pfp_rpLL.interp_params(LL_results["alpha"])
     LL_results["beta_int"] = pfp_rpLL.interp_params(LL_results["beta"])
@@ -344,6 +361,10 @@ def ERUsingLloydTaylor(cf, ds, l6_info):
     Usage:
     Author: IMcH, PRI
     Date: October 2015
+    Modified:
+     October 2026 - the E0 and rb parameters are cached on the input data and the settings
+     October 2026 - rb for all windows in one pass, window plots only when requested
+     October 2026 - results workbook format set by [Options] ResultsFormat
     """
     if "ERUsingLloydTaylor" not in l6_info:
         return
@@ -360,6 +381,7 @@ def ERUsingLloydTaylor(cf, ds, l6_info):
     iel = l6_info["ERUsingLloydTaylor"]
     iel["time_step"] = ts
     iel["nperday"] = nperday
+    cache_info = pfp_cache.get_info(cf)
     # set the figure number
     if len(plt.get_fignums()) == 0:
         fig_num = 0
@@ -368,7 +390,7 @@ def ERUsingLloydTaylor(cf, ds, l6_info):
     # open the Excel file
     nc_name = pfp_io.get_outfilenamefromcf(cf)
     xl_name = nc_name.replace(".nc", "_L&T.xls")
-    xl_file = pfp_io.xl_open_write(xl_name)
+    xl_file = pfp_io.xl_open_write(xl_name, results_format=pfp_io.get_results_format(cf))
     if xl_file == '':
         msg = "ERUsingLloydTaylor: error opening Excel file " + xl_name
         logger.error(msg)
@@ -424,16 +446,31 @@ def ERUsingLloydTaylor(cf, ds, l6_info):
         series_est_dict['date_time'] = datetime_array
         # Create a dictionary containing initial guesses for each parameter
         params_dict = pfp_rpLT.make_initial_guess_dict(data_dict)
+        # the E0 and rb parameters are cached on the input data and the settings,
+        # the cache is not used when the window plots are wanted
+        settings = {}
+        for item in ["target", "drivers", "minimum_temperature_spread", "step_size_days",
+                     "window_size_days", "minimum_pct_annual", "minimum_pct_noct_window",
+                     "measurement_interval"]:
+            settings[item] = configs_dict[item]
+        arrays = [datetime_array] + [data_dict[item] for item in sorted(data_dict.keys())]
+        cache_key = pfp_cache.make_key("ERUsingLloydTaylor", arrays, settings, ["pfp_rpLT"])
+        cached = None
+        if not configs_dict["output_plots"]:
+            cached = pfp_cache.get(cache_info, cache_key, "ERUsingLloydTaylor")
         # *** start of annual estimates of E0 code ***
         # this section could be a separate routine
         # Get the annual estimates of Eo
-        logger.info(" Optimising fit for Eo for each year")
-        Eo_dict, EoQC_dict, Eo_raw_dict, EoQC_raw_dict, status = pfp_rpLT.optimise_annual_Eo(data_dict,params_dict,configs_dict,year_index_dict)
-        if status["code"] != 0:
-            msg = " Estimation of ER using Lloyd-Taylor failed with message"
-            logger.error(msg)
-            logger.error(status["message"])
-            return
+        if cached is None:
+            logger.info(" Optimising fit for Eo for each year")
+            Eo_dict, EoQC_dict, Eo_raw_dict, EoQC_raw_dict, status = pfp_rpLT.optimise_annual_Eo(data_dict,params_dict,configs_dict,year_index_dict)
+            if status["code"] != 0:
+                msg = " Estimation of ER using Lloyd-Taylor failed with message"
+                logger.error(msg)
+                logger.error(status["message"])
+                return
+        else:
+            Eo_dict, EoQC_dict, Eo_raw_dict, EoQC_raw_dict = cached["Eo"]
         # Write to result arrays
         year_array = numpy.array([i.year for i in date_array])
         for yr in year_array:
@@ -459,35 +496,46 @@ def ERUsingLloydTaylor(cf, ds, l6_info):
         params_dict = {'fixed_rb': pfp_rpLT.make_initial_guess_dict(data_dict),
                        'free_rb': pfp_rpLT.make_initial_guess_dict(data_dict)}
         # Do nocturnal optimisation for each window
-        logger.info(" Optimising fit for rb using nocturnal data")
-        for date in step_date_array:
-            # Get Eo for the relevant year and write to the parameters dictionary
-            param_index = numpy.where(date_array == date)
-            params_dict['fixed_rb']['Eo_default'] = opt_params_dict['Eo'][param_index]
-            # Subset the data and check length
-            sub_dict = pfp_rpLT.subset_window(data_dict, step_date_index_dict[date])
-            noct_dict = pfp_rpLT.subset_window(data_dict, step_date_index_dict[date])
-            # Subset again to remove daytime and then nan
-            #noct_dict = pfp_rpLT.subset_daynight(sub_dict, noct_flag = True)
-            len_all_noct = len(noct_dict['NEE'])
-            noct_dict = pfp_rpLT.subset_nan(noct_dict)
-            len_valid_noct = len(noct_dict['NEE'])
-            # Do optimisation only if data passes minimum threshold
-            if round(float(len_valid_noct) / len_all_noct * 100) > \
-            configs_dict['minimum_pct_noct_window']:
-                params, error_state = pfp_rpLT.optimise_rb(noct_dict,params_dict['fixed_rb'])
-            else:
-                params, error_state = [numpy.nan], 10
+        if cached is None:
+            logger.info(" Optimising fit for rb using nocturnal data")
+            # the windows for all step dates are done in one pass using the indices
+            # of the window start and end and the closed form solution for rb
+            param_index = numpy.searchsorted(date_array, step_date_array)
+            starts = numpy.array([step_date_index_dict[date][0] for date in step_date_array], dtype=numpy.int64)
+            ends = numpy.array([step_date_index_dict[date][1] for date in step_date_array], dtype=numpy.int64)
+            valid = pfp_rpLT.get_valid_mask(data_dict)
+            rb_noct, len_valid_noct = pfp_rpLT.get_rb_windows(data_dict['TempC'], data_dict['NEE'], valid,
+                                                              starts, ends, opt_params_dict['Eo'][param_index])
+            len_all_noct = ends - starts + 1
+            # Do optimisation only if data passes minimum threshold, round half away from zero
+            pct_noct = numpy.floor(len_valid_noct.astype(numpy.float64) / len_all_noct * 100 + 0.5)
+            error_state = numpy.where(pct_noct > configs_dict['minimum_pct_noct_window'], 0, 10)
+            # If negative rb returned, set to nan
+            idx = numpy.where(error_state == 0)[0]
+            error_state[idx[rb_noct[idx] < 0]] = 9
+            rb_noct[error_state != 0] = numpy.nan
             # Send data to the results dict
-            opt_params_dict['rb_noct'][param_index] = params
+            opt_params_dict['rb_noct'][param_index] = rb_noct
             opt_params_dict['Nocturnal rb error code'][param_index] = error_state
             # Estimate time series and plot if requested
-            if error_state == 0 and configs_dict['output_plots']:
-                this_params_dict = {'Eo': opt_params_dict['Eo'][param_index],
-                                    'rb': opt_params_dict['rb_noct'][param_index]}
-                est_series_dict = pfp_rpLT.estimate_Re_GPP(sub_dict, this_params_dict)
-                combine_dict = dict(sub_dict, **est_series_dict)
-                pfp_rpLT.plot_windows(combine_dict, configs_dict, date, noct_flag = True)
+            if configs_dict['output_plots']:
+                for n, date in enumerate(step_date_array):
+                    if error_state[n] != 0:
+                        continue
+                    sub_dict = pfp_rpLT.subset_window(data_dict, step_date_index_dict[date])
+                    this_params_dict = {'Eo': opt_params_dict['Eo'][param_index[n]],
+                                        'rb': opt_params_dict['rb_noct'][param_index[n]]}
+                    est_series_dict = pfp_rpLT.estimate_Re_GPP(sub_dict, this_params_dict)
+                    combine_dict = dict(sub_dict, **est_series_dict)
+                    pfp_rpLT.plot_windows(combine_dict, configs_dict, date, noct_flag = True)
+        else:
+            opt_params_dict['rb_noct'] = cached["rb_noct"]
+            opt_params_dict['Nocturnal rb error code'] = cached["rb_noct_error_code"]
+        if cached is None:
+            cached = {"Eo": [Eo_dict, EoQC_dict, Eo_raw_dict, EoQC_raw_dict],
+                      "rb_noct": opt_params_dict['rb_noct'],
+                      "rb_noct_error_code": opt_params_dict['Nocturnal rb error code']}
+            pfp_cache.put(cache_info, cache_key, cached)
         # get a copy of the rb data before interpolation so we can write it to file
         rb_date = opt_params_dict["date"]
         rb_data = opt_params_dict["rb_noct"]
@@ -1019,6 +1067,9 @@ def L6_summary(cf, ds):
     Usage:
     Author: PRI
     Date: June 2015
+    Modified:
+     October 2026 - workbook format set by [Options] ResultsFormat, the cumulative
+                    sheets are only skipped for xls workbooks
     """
     logger.info("Doing the L6 summary")
     # set up a dictionary of lists
@@ -1026,8 +1077,9 @@ def L6_summary(cf, ds):
     # open the Excel workbook
     out_name = pfp_io.get_outfilenamefromcf(cf)
     xl_name = out_name.replace(".nc", "_Summary.xls")
+    results_format = pfp_io.get_results_format(cf)
     try:
-        xl_file = pfp_io.xl_open_write(xl_name)
+        xl_file = pfp_io.xl_open_write(xl_name, results_format=results_format)
     except IOError:
         logger.error(" L6_summary: error opening Excel file "+xl_name)
         return 0
@@ -1077,7 +1129,7 @@ def L6_summary(cf, ds):
     years = sorted(list(cumulative_dict.keys()))
     for year in years:
         nrecs = len(cumulative_dict[year]["variables"]["DateTime"]["data"])
-        if nrecs < 65530:
+        if nrecs < 65530 or results_format != "xls":
             L6_summary_write_xlfile(xl_file, "Cummulative("+str(year)+")", cumulative_dict[str(year)])
         else:
             msg = "L6 cumulative: too many rows for .xls workbook, skipping "+year
@@ -1378,6 +1430,7 @@ def L6_summary_daily(ds, series_dict):
            series_dict is a dictionary of various variable lists
     Author: PRI
     Date: June 2015
+    Modified: October 2026 - all days done in one pass by L6_summary_groupvariables
     """
     logger.info(" Doing the daily summary (data) at L6")
     dt = ds.series["DateTime"]["Data"]
@@ -1390,6 +1443,9 @@ def L6_summary_daily(ds, series_dict):
     # create an empty data array and an array of zeros for the flag
     f0 = numpy.zeros(nDays, dtype=numpy.int32)
     ldt_daily = [ldt[0]+datetime.timedelta(days=i) for i in range(0,nDays)]
+    # the group for each time step is the day number, -1 outside the whole days
+    group = numpy.full(len(dt), -1, dtype=numpy.int64)
+    group[si:si+nDays*ntsInDay] = numpy.arange(nDays*ntsInDay)//ntsInDay
     # create a dictionary to hold the daily statistics
     daily_dict = {"globalattributes":{},"variables":{}}
     # copy the global attributes
@@ -1399,44 +1455,9 @@ def L6_summary_daily(ds, series_dict):
                                            "flag":f0,
                                            "attr":{"units":"Days","format":"dd/mm/yyyy",
                                                    "time_step":"Daily"}}
-    series_list = series_dict["daily"].keys()
-    series_list.sort()
-    for item in series_list:
-        if item not in ds.series.keys(): continue
-        daily_dict["variables"][item] = {"data":[],"attr":{}}
-        variable = pfp_utils.GetVariable(ds, item, start=si, end=ei)
-        if item in series_dict["lists"]["co2"]:
-            variable = pfp_utils.convert_units_func(ds, variable, "gC/m2")
-            daily_dict["variables"][item]["attr"]["units"] = "gC/m2"
-        else:
-            daily_dict["variables"][item]["attr"]["units"] = variable["Attr"]["units"]
-        data_2d = variable["Data"].reshape(nDays, ntsInDay)
-        if series_dict["daily"][item]["operator"].lower() == "average":
-            daily_dict["variables"][item]["data"] = numpy.ma.average(data_2d, axis=1)
-        elif series_dict["daily"][item]["operator"].lower() == "sum":
-            daily_dict["variables"][item]["data"] = numpy.ma.sum(data_2d, axis=1)
-            daily_dict["variables"][item]["attr"]["units"] = daily_dict["variables"][item]["attr"]["units"]+"/day"
-        else:
-            msg = "Unrecognised operator ("+series_dict["daily"][item]["operator"]
-            msg = msg+") for series "+item
-            logger.error(msg)
-            continue
-        # add the format to be used
-        daily_dict["variables"][item]["attr"]["format"] = series_dict["daily"][item]["format"]
-        # copy some of the variable attributes
-        default_list = ["long_name", "standard_name", "height", "instrument", "group_name"]
-        descr_list = [d for d in variable["Attr"].keys() if "description" in d]
-        vattr_list = default_list + descr_list
-        for attr in vattr_list:
-            if attr in variable["Attr"]:
-                daily_dict["variables"][item]["attr"][attr] = variable["Attr"][attr]
-            else:
-                daily_dict["variables"][item]["attr"][attr] = "not defined"
-        # now do the flag, this is the fraction of data with QC flag = 0 in the day
-        daily_dict["variables"][item]["flag"] = numpy.zeros(nDays, dtype=numpy.float64)
-        flag_2d = variable["Flag"].reshape(nDays, ntsInDay)
-        for i in range(nDays):
-            daily_dict["variables"][item]["flag"][i] = 1-float(numpy.count_nonzero(flag_2d[i,:]))/float(ntsInDay)
+    # the flag is the fraction of data with QC flag = 0 in the day
+    variables = L6_summary_groupvariables(ds, series_dict, "daily", group, nDays, "/day")
+    daily_dict["variables"].update(variables)
     return daily_dict
 
 def L6_summary_co2andh2o_fluxes(ds, series_dict, daily_dict):
@@ -1516,6 +1537,101 @@ def L6_summary_write_xlfile(xl_file,sheet_name,data_dict):
     xl_sheet = xl_file.add_sheet(sheet_name)
     pfp_io.xl_write_data(xl_sheet,data_dict["variables"])
 
+def L6_summary_groupstats(data, flag, group, ngroups, operator):
+    """
+    Purpose:
+     Return the sum or the average of the data in each group and the
+     fraction of the time steps in each group with a QC flag of 0.  The
+     statistics for all groups are done in one pass with numpy.bincount,
+     time steps with a group of -1 are not used.  Groups with no data are
+     masked, the same as numpy.ma.sum and numpy.ma.average.
+    Usage:
+     data_group, flag_group = pfp_rp.L6_summary_groupstats(data, flag, group, ngroups, "sum")
+     where data is a masked array
+           flag is the QC flag array
+           group is the group number of each time step
+           ngroups is the number of groups
+           operator is "sum" or "average"
+    Author: PRI
+    Date: October 2026
+    """
+    use = group >= 0
+    good = use & ~numpy.ma.getmaskarray(data)
+    values = numpy.ma.getdata(data)
+    count = numpy.bincount(group[good], minlength=ngroups)
+    total = numpy.bincount(group[good], weights=values[good], minlength=ngroups)
+    if operator == "average":
+        total[count != 0] = total[count != 0]/count[count != 0]
+    data_group = numpy.ma.masked_where(count == 0, total)
+    nsteps = numpy.bincount(group[use], minlength=ngroups)
+    ngood = numpy.bincount(group[use & (flag == 0)], minlength=ngroups)
+    flag_group = numpy.zeros(ngroups, dtype=numpy.float64)
+    flag_group[nsteps != 0] = ngood[nsteps != 0]/numpy.float64(nsteps[nsteps != 0])
+    return data_group, flag_group
+
+def L6_summary_getvariable(ds, series_dict, item):
+    """
+    Purpose:
+     Return a variable for the L6 summaries, CO2 fluxes are converted to gC/m2.
+    Usage:
+     variable = pfp_rp.L6_summary_getvariable(ds, series_dict, "NEE_SOLO")
+    Author: PRI
+    Date: October 2026
+    """
+    variable = pfp_utils.GetVariable(ds, item)
+    if item in series_dict["lists"]["co2"]:
+        variable = pfp_utils.convert_units_func(ds, variable, "gC/m2")
+    return variable
+
+def L6_summary_copyattributes(variable, attr):
+    """ Copy some of the variable attributes to the summary attributes."""
+    default_list = ["long_name", "standard_name", "height", "instrument", "group_name"]
+    descr_list = [d for d in variable["Attr"].keys() if "description" in d]
+    vattr_list = default_list + descr_list
+    for item in vattr_list:
+        if item in variable["Attr"]:
+            attr[item] = variable["Attr"][item]
+        else:
+            attr[item] = "not defined"
+    return
+
+def L6_summary_groupvariables(ds, series_dict, period, group, ngroups, units_suffix):
+    """
+    Purpose:
+     Return a dictionary of the sums or averages, and the fraction of good
+     data, in each group for the variables listed in series_dict[period].
+     Each variable is read and converted once for the whole time series,
+     the statistics for all groups are then done in one pass by
+     L6_summary_groupstats.
+    Usage:
+     variables = pfp_rp.L6_summary_groupvariables(ds, series_dict, "monthly", group, nMonths, "/month")
+     where group is the group number of each time step, -1 for time steps
+                 not in any group
+           ngroups is the number of groups
+           units_suffix is added to the units of summed variables
+    Author: PRI
+    Date: October 2026
+    """
+    variables = {}
+    series_list = series_dict[period].keys()
+    series_list.sort()
+    for item in series_list:
+        if item not in ds.series.keys(): continue
+        operator = series_dict[period][item]["operator"].lower()
+        if operator not in ["average", "sum"]:
+            msg = "Unrecognised operator ("+series_dict[period][item]["operator"]
+            msg = msg+") for series "+item
+            logger.error(msg)
+            continue
+        variable = L6_summary_getvariable(ds, series_dict, item)
+        data, flag = L6_summary_groupstats(variable["Data"], variable["Flag"], group, ngroups, operator)
+        attr = {"units":variable["Attr"]["units"], "format":series_dict[period][item]["format"]}
+        if operator == "sum":
+            attr["units"] = attr["units"]+units_suffix
+        L6_summary_copyattributes(variable, attr)
+        variables[item] = {"data":data, "flag":flag, "attr":attr}
+    return variables
+
 def L6_summary_monthly(ds,series_dict):
     """
     Purpose:
@@ -1527,68 +1643,31 @@ def L6_summary_monthly(ds,series_dict):
            series_dict is a dictionary of various variable lists
     Author: PRI
     Date: July 2015
+    Modified: October 2026 - all months done in one pass by L6_summary_groupvariables
     """
     logger.info(" Doing the monthly summaries at L6")
     dt = ds.series["DateTime"]["Data"]
     ts = int(ds.globalattributes["time_step"])
     si = pfp_utils.GetDateIndex(dt,str(dt[0]),ts=ts,default=0,match="startnextmonth")
-    ldt = dt[si:]
+    # *** The Elise Pendall bug fix ***
+    # the month of each time step is taken from the time at the start of the
+    # time step so the month runs from 00:30 on the first day to 00:00 on the
+    # first day of the next month (for a 30 minute time step)
+    dt64 = pfp_utils.get_datetime64(ds)
+    months = (dt64[si:] - numpy.timedelta64(ts, "m")).astype("datetime64[M]").astype(numpy.int64)
+    _, first, month_group = numpy.unique(months, return_index=True, return_inverse=True)
+    nMonths = len(first)
+    group = numpy.full(len(dt), -1, dtype=numpy.int64)
+    group[si:] = month_group
     monthly_dict = {"globalattributes":{}, "variables":{}}
     # copy the global attributes
     monthly_dict["globalattributes"] = copy.deepcopy(ds.globalattributes)
-    monthly_dict["variables"]["DateTime"] = {"data":[],
-                                             "flag":numpy.array([]),
+    monthly_dict["variables"]["DateTime"] = {"data":[dt[si+i] for i in first],
+                                             "flag":numpy.zeros(nMonths, dtype=numpy.int32),
                                              "attr":{"units":"Months", "format":"dd/mm/yyyy",
                                                      "time_step":"Monthly"}}
-    # create arrays in monthly_dict
-    series_list = series_dict["monthly"].keys()
-    series_list.sort()
-    # create the data arrays
-    for item in series_list:
-        monthly_dict["variables"][item] = {"data":numpy.ma.array([]),
-                                           "flag":numpy.array([]),
-                                           "attr":{"units":'',"format":''}}
-    # loop over the months in the data file
-    start_date = ldt[0]
-    end_date = start_date+dateutil.relativedelta.relativedelta(months=1)
-    end_date = end_date-dateutil.relativedelta.relativedelta(minutes=ts)
-    last_date = ldt[-1]
-    while start_date<=last_date:
-        # *** The Elise Pendall bug fix ***
-        si = pfp_utils.GetDateIndex(dt, str(start_date), ts=ts, default=0)
-        ei = pfp_utils.GetDateIndex(dt, str(end_date), ts=ts, default=len(dt)-1)
-        monthly_dict["variables"]["DateTime"]["data"].append(dt[si])
-        for item in series_list:
-            if item not in ds.series.keys(): continue
-            variable = pfp_utils.GetVariable(ds, item, start=si, end=ei)
-            if item in series_dict["lists"]["co2"]:
-                variable = pfp_utils.convert_units_func(ds, variable, "gC/m2")
-                monthly_dict["variables"][item]["attr"]["units"] = "gC/m2"
-            else:
-                monthly_dict["variables"][item]["attr"]["units"] = variable["Attr"]["units"]
-            if series_dict["monthly"][item]["operator"].lower()=="average":
-                monthly_dict["variables"][item]["data"] = numpy.append(monthly_dict["variables"][item]["data"],
-                                                                       numpy.ma.average(variable["Data"]))
-            elif series_dict["monthly"][item]["operator"].lower()=="sum":
-                monthly_dict["variables"][item]["data"] = numpy.append(monthly_dict["variables"][item]["data"],
-                                                                       numpy.ma.sum(variable["Data"]))
-                monthly_dict["variables"][item]["attr"]["units"] = monthly_dict["variables"][item]["attr"]["units"]+"/month"
-            else:
-                msg = "L6_summary_monthly: unrecognised operator"
-                logger.error(msg)
-            monthly_dict["variables"][item]["attr"]["format"] = series_dict["monthly"][item]["format"]
-            # copy some of the variable attributes
-            default_list = ["long_name", "standard_name", "height", "instrument", "group_name"]
-            descr_list = [d for d in variable["Attr"].keys() if "description" in d]
-            vattr_list = default_list + descr_list
-            for attr in vattr_list:
-                if attr in variable["Attr"]:
-                    monthly_dict["variables"][item]["attr"][attr] = variable["Attr"][attr]
-                else:
-                    monthly_dict["variables"][item]["attr"][attr] = "not defined"
-        start_date = end_date+dateutil.relativedelta.relativedelta(minutes=ts)
-        end_date = start_date+dateutil.relativedelta.relativedelta(months=1)
-        end_date = end_date-dateutil.relativedelta.relativedelta(minutes=ts)
+    variables = L6_summary_groupvariables(ds, series_dict, "monthly", group, nMonths, "/month")
+    monthly_dict["variables"].update(variables)
     return monthly_dict
 
 def L6_summary_annual(ds, series_dict):
@@ -1602,6 +1681,7 @@ def L6_summary_annual(ds, series_dict):
            series_dict is a dictionary of various variable lists
     Author: PRI
     Date: June 2015
+    Modified: October 2026 - all years done in one pass by L6_summary_groupvariables
     """
     logger.info(" Doing the annual summaries at L6")
     dt = ds.series["DateTime"]["Data"]
@@ -1614,6 +1694,12 @@ def L6_summary_annual(ds, series_dict):
     end_year = ldt[-1].year
     year_list = range(start_year, end_year+1, 1)
     nYears = len(year_list)
+    # the year of each time step is taken from the time at the start of the
+    # time step so the year runs from 00:30 on 1 January to 00:00 on 1 January
+    # of the next year (for a 30 minute time step)
+    dt64 = pfp_utils.get_datetime64(ds)
+    years = (dt64 - numpy.timedelta64(ts, "m")).astype("datetime64[Y]").astype(numpy.int64) + 1970
+    group = numpy.where((years >= start_year) & (years <= end_year), years - start_year, -1)
     annual_dict = {"globalattributes":{}, "variables":{}}
     # copy the global attributes
     annual_dict["globalattributes"] = copy.deepcopy(ds.globalattributes)
@@ -1621,52 +1707,12 @@ def L6_summary_annual(ds, series_dict):
                                             "flag":numpy.zeros(nYears, dtype=numpy.int32),
                                             "attr":{"units":"Years", "format":"dd/mm/yyyy",
                                                     "time_step":"Annual"}}
-    annual_dict["variables"]["nDays"] = {"data":numpy.full(nYears, c.missing_value, dtype=numpy.float64),
+    nsteps = numpy.bincount(group[group >= 0], minlength=nYears)
+    annual_dict["variables"]["nDays"] = {"data":numpy.floor(nsteps/float(nperDay)+0.5),
                                          "flag":numpy.zeros(nYears, dtype=numpy.int32),
                                          "attr":{"units":"Number of days","format":"0"}}
-    # create arrays in annual_dict
-    series_list = series_dict["annual"].keys()
-    series_list.sort()
-    for item in series_list:
-        annual_dict["variables"][item] = {"data":numpy.ma.array([float(-9999)]*len(year_list)),
-                                          "flag":numpy.zeros(nYears, dtype=numpy.int32),
-                                          "attr":{"units":"Number of days","format":"0"}}
-    for i,year in enumerate(year_list):
-        if ts==30:
-            start_date = str(year)+"-01-01 00:30"
-        elif ts==60:
-            start_date = str(year)+"-01-01 01:00"
-        end_date = str(year+1)+"-01-01 00:00"
-        si = pfp_utils.GetDateIndex(dt,start_date,ts=ts,default=0)
-        ei = pfp_utils.GetDateIndex(dt,end_date,ts=ts,default=len(dt)-1)
-        nDays = int((ei-si+1)/nperDay+0.5)
-        annual_dict["variables"]["nDays"]["data"][i] = nDays
-        for item in series_list:
-            if item not in ds.series.keys(): continue
-            variable = pfp_utils.GetVariable(ds, item, start=si, end=ei)
-            if item in series_dict["lists"]["co2"]:
-                variable = pfp_utils.convert_units_func(ds, variable, "gC/m2")
-                annual_dict["variables"][item]["attr"]["units"] = "gC/m2"
-            else:
-                annual_dict["variables"][item]["attr"]["units"] = variable["Attr"]["units"]
-            if series_dict["annual"][item]["operator"].lower()=="average":
-                annual_dict["variables"][item]["data"][i] = numpy.ma.average(variable["Data"])
-            elif series_dict["annual"][item]["operator"].lower()=="sum":
-                annual_dict["variables"][item]["data"][i] = numpy.ma.sum(variable["Data"])
-                annual_dict["variables"][item]["attr"]["units"] = annual_dict["variables"][item]["attr"]["units"]+"/year"
-            else:
-                msg = "L6_summary_annual: unrecognised operator"
-                logger.error(msg)
-            annual_dict["variables"][item]["attr"]["format"] = series_dict["annual"][item]["format"]
-            # copy some of the variable attributes
-            default_list = ["long_name", "standard_name", "height", "instrument", "group_name"]
-            descr_list = [d for d in variable["Attr"].keys() if "description" in d]
-            vattr_list = default_list + descr_list
-            for attr in vattr_list:
-                if attr in variable["Attr"]:
-                    annual_dict["variables"][item]["attr"][attr] = variable["Attr"][attr]
-                else:
-                    annual_dict["variables"][item]["attr"][attr] = "not defined"
+    variables = L6_summary_groupvariables(ds, series_dict, "annual", group, nYears, "/year")
+    annual_dict["variables"].update(variables)
     return annual_dict
 
 #def L6_summary_cumulative(ds, series_dict):
@@ -1734,74 +1780,52 @@ def L6_summary_cumulative(ds, series_dict):
            series_dict is a dictionary of various variable lists
     Author: PRI
     Date: June 2015
+    Modified: October 2026 - each variable is read and converted once, the
+                             years are slices of the whole time series
     """
     logger.info(" Doing the cumulative summaries at L6")
     # get the datetime series and the time step
     dt = pfp_utils.GetVariable(ds, "DateTime")
     ts = int(ds.globalattributes["time_step"])
-    nrecs = int(ds.globalattributes["nc_nrecs"])
     # subtract 1 time step from the datetime to avoid orphan years
-    cdt = dt["Data"] - datetime.timedelta(minutes=ts)
-    years = sorted(list(set([ldt.year for ldt in cdt])))
+    dt64 = pfp_utils.get_datetime64(ds)
+    cdt = (dt64 - numpy.timedelta64(ts, "m")).astype("datetime64[Y]").astype(numpy.int64) + 1970
+    years, year_si = numpy.unique(cdt, return_index=True)
+    year_ei = numpy.append(year_si[1:], len(cdt)) - 1
     series_list = series_dict["cumulative"].keys()
+    # read and convert each variable once
+    variables = {}
+    for item in series_list:
+        variables[item] = L6_summary_getvariable(ds, series_dict, item)
     cumulative_dict = {}
-    for year in years:
+    for year, si, ei in zip(years, year_si, year_ei):
         cumulative_dict[str(year)] = cdyr = {"globalattributes":{}, "variables":{}}
         # copy the global attributes
         cdyr["globalattributes"] = copy.deepcopy(ds.globalattributes)
-        start_date = datetime.datetime(year, 1, 1, 0, 0, 0) + datetime.timedelta(minutes=ts)
-        end_date = datetime.datetime(year+1, 1, 1, 0, 0, 0)
-        si = pfp_utils.GetDateIndex(dt["Data"], start_date, ts=ts, default=0)
-        ei = pfp_utils.GetDateIndex(dt["Data"], end_date, ts=ts, default=nrecs-1)
         ldt = dt["Data"][si:ei+1]
         f0 = numpy.zeros(len(ldt), dtype=numpy.int32)
         cdyr["variables"]["DateTime"] = {"data":ldt, "flag":f0,
                                          "attr":{"units":"Year", "format":"dd/mm/yyyy HH:MM",
                                                  "time_step":str(ts)}}
         for item in series_list:
+            variable = variables[item]
             cdyr["variables"][item] = {"data":[], "attr":{}}
-            variable = pfp_utils.GetVariable(ds, item, start=si, end=ei)
-            if item in series_dict["lists"]["co2"]:
-                variable = pfp_utils.convert_units_func(ds, variable, "gC/m2")
-                cdyr["variables"][item]["attr"]["units"] = "gC/m2"
-            else:
-                cdyr["variables"][item]["attr"]["units"] = variable["Attr"]["units"]
-            cdyr["variables"][item]["data"] = numpy.ma.cumsum(variable["Data"])
+            cdyr["variables"][item]["data"] = numpy.ma.cumsum(variable["Data"][si:ei+1])
             cdyr["variables"][item]["attr"]["format"] = series_dict["cumulative"][item]["format"]
-            cdyr["variables"][item]["attr"]["units"] = cdyr["variables"][item]["attr"]["units"]+"/year"
-            # copy some of the variable attributes
-            default_list = ["long_name", "standard_name", "height", "instrument", "group_name"]
-            descr_list = [d for d in variable["Attr"].keys() if "description" in d]
-            vattr_list = default_list + descr_list
-            for attr in vattr_list:
-                if attr in variable["Attr"]:
-                    cdyr["variables"][item]["attr"][attr] = variable["Attr"][attr]
-                else:
-                    cdyr["variables"][item]["attr"][attr] = "not defined"
+            cdyr["variables"][item]["attr"]["units"] = variable["Attr"]["units"]+"/year"
+            L6_summary_copyattributes(variable, cdyr["variables"][item]["attr"])
     # cumulative total over all data
     cdyr = cumulative_dict["all"] = {"globalattributes":{}, "variables":{}}
     cdyr["globalattributes"] = copy.deepcopy(ds.globalattributes)
     cdyr["variables"]["DateTime"] = {"data":dt["Data"], "flag":dt["Flag"], "attr":dt["Attr"]}
     cdyr["variables"]["DateTime"]["attr"]["format"] = "dd/mm/yyyy HH:MM"
     for item in series_list:
+        variable = variables[item]
         cdyr["variables"][item] = {"data":[],"attr":{}}
-        variable = pfp_utils.GetVariable(ds, item)
-        if item in series_dict["lists"]["co2"]:
-            variable = pfp_utils.convert_units_func(ds, variable, "gC/m2")
-            cdyr["variables"][item]["attr"]["units"] = "gC/m2"
-        else:
-            cdyr["variables"][item]["attr"]["units"] = variable["Attr"]["units"]
+        cdyr["variables"][item]["attr"]["units"] = variable["Attr"]["units"]
         cdyr["variables"][item]["data"] = numpy.ma.cumsum(variable["Data"])
         cdyr["variables"][item]["attr"]["format"] = series_dict["cumulative"][item]["format"]
-        # copy some of the variable attributes
-        default_list = ["long_name", "standard_name", "height", "instrument", "group_name"]
-        descr_list = [d for d in variable["Attr"].keys() if "description" in d]
-        vattr_list = default_list + descr_list
-        for attr in vattr_list:
-            if attr in variable["Attr"]:
-                cdyr["variables"][item]["attr"][attr] = variable["Attr"][attr]
-            else:
-                cdyr["variables"][item]["attr"][attr] = "not defined"
+        L6_summary_copyattributes(variable, cdyr["variables"][item]["attr"])
     return cumulative_dict
 
 def ParseL6ControlFile(cf, ds):
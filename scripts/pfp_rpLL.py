@@ -2,6 +2,7 @@
 # standard modules
 import datetime
 import logging
+import multiprocessing
 import os
 import warnings
 # 3rd party modules
@@ -11,8 +12,10 @@ import numpy
 from scipy.optimize import curve_fit, OptimizeWarning
 # PFP modules
 import constants as c
+import pfp_cache
 import pfp_cfg
 import pfp_gui
+import pfp_rpLT
 import pfp_utils
 
 warnings.simplefilter("ignore", OptimizeWarning)
@@ -33,6 +36,62 @@ def NEE_RHLRC_D(data,alpha,beta,k,D0,rb,E0):
     NEE = -1*GPP_RHLRC_D(Fsd,D,alpha,beta,k,D0) + ER_LloydTaylor(T,rb,E0)
     return NEE
 
+def NEE_RHLRC_D_jacobian(data,alpha,beta,k,D0,rb,E0,free):
+    """
+    Purpose:
+     Return the analytic Jacobian of NEE_RHLRC_D with respect to the
+     parameters named in free (any of "alpha", "beta", "k" and "rb"), one
+     column per parameter in the order given in free.
+    Usage:
+     jac = pfp_rpLL.NEE_RHLRC_D_jacobian(data,alpha,beta,k,D0,rb,E0,["alpha","beta","k","rb"])
+    Author: PRI
+    Date: October 2026
+    """
+    Fsd = data["Fsd"]
+    D = data["D"]
+    T = data["T"]
+    SHD = SHD_func_Lasslop(D,k,D0)
+    b = beta*SHD
+    u = alpha*Fsd + b
+    # GPP = alpha*b*Fsd/u so dGPP/dalpha = (b/u)**2*Fsd and dGPP/db = (alpha*Fsd/u)**2
+    dGPP_db = (alpha*Fsd/u)**2
+    columns = {"alpha": -1*(b/u)**2*Fsd,
+               "beta": -1*dGPP_db*SHD,
+               "k": dGPP_db*beta*SHD*numpy.where(D>D0,D-D0,0),
+               "rb": numpy.exp(E0*(1/(c.Tref-c.T0)-1/(T-c.T0)))}
+    return numpy.column_stack([columns[name] for name in free])
+
+def fit_NEE_RHLRC_D(drivers,NEE,params,free,D0,E0):
+    """
+    Purpose:
+     Fit NEE_RHLRC_D to NEE with the parameters named in free varying and
+     the others fixed at their values in params, the values in params of the
+     free parameters are the first guess.  The analytic Jacobian is passed to
+     the optimiser.  Returns a dictionary of the fitted parameters, raises
+     RuntimeError if no solution is found (from curve_fit).
+     The drivers are passed to the model by closure, not as curve_fit's
+     xdata, because newer versions of scipy convert xdata to a float array.
+    Usage:
+     popt = pfp_rpLL.fit_NEE_RHLRC_D(drivers,NEE,{"alpha":0.01,"beta":10,"k":0,"rb":1},
+                                     ["alpha","beta","rb"],D0,E0)
+    Author: PRI
+    Date: October 2026
+    """
+    def unpack(p):
+        values = dict(params)
+        values.update(zip(free,p))
+        return values
+    def fopt(x,*p):
+        v = unpack(p)
+        return NEE_RHLRC_D(drivers,v["alpha"],v["beta"],v["k"],D0,v["rb"],E0)
+    def jopt(x,*p):
+        v = unpack(p)
+        return NEE_RHLRC_D_jacobian(drivers,v["alpha"],v["beta"],v["k"],D0,v["rb"],E0,free)
+    p0 = [params[name] for name in free]
+    x = numpy.arange(len(NEE), dtype=numpy.float64)
+    popt,pcov = curve_fit(fopt,x,NEE,p0=p0,jac=jopt)
+    return dict(zip(free,popt))
+
 def GPP_RHLRC_D(Fsd,D,alpha,beta,k,D0):
     beta = beta*SHD_func_Lasslop(D,k,D0)
     GPP = alpha*beta*Fsd/(alpha*Fsd+beta)
@@ -68,6 +127,20 @@ def interp_params(param_rslt_array):
     return arr
 
 def get_LL_params(ldt, Fsd, D, T, NEE, ER, LT_results, l6_info, output):
+    """
+    Purpose:
+     Returns the Lasslop et al (2010) light response parameters for each
+     window.  The windows, the E0 values from the Lloyd-Taylor fit and the
+     rb priors are worked out first, the fits for each window are then done
+     by get_LL_window, in parallel when [Options] NumberOfProcesses is more
+     than 1.  The only link between windows in the fits is the alpha of the
+     previous window, used when alpha is out of range, windows that need it
+     are done again in window order once the previous window is known.
+    Usage:
+    Author: PRI
+    Date: April 2016
+    Modified: October 2026 - parallel fits with analytic Jacobians, preallocated results
+    """
     # Lasslop as it was written in Lasslop et al (2010), mostly ...
     # Actually, the only intended difference is the window length and offset
     # Lasslop et al used window_length=4, window_offset=2
@@ -78,212 +151,266 @@ def get_LL_params(ldt, Fsd, D, T, NEE, ER, LT_results, l6_info, output):
     # window and step sizes
     window_size_days = ielo[output]["window_size_days"]
     step_size_days = ielo[output]["step_size_days"]
-    # initialise results, missed dates and prior dictionaries
-    mta = numpy.array([])
-    LL_results = {"start_date": mta, "mid_date": mta, "end_date": mta,
-                  "alpha": mta, "beta": mta, "k": mta, "rb": mta,
-                  "alpha_low": mta, "rb_low": mta, "rb_prior": mta, "E0": mta}
-    LL_prior = {"rb":1.0, "alpha":0.01, "beta":10, "k":0}
     LL_fixed = {"D0":1}
     D0 = LL_fixed["D0"]
-    drivers = {}
+    # get the windows
+    windows = []
     start_date = ldt[0]
     last_date = ldt[-1]
     end_date = start_date+datetime.timedelta(days=window_size_days)
     while end_date <= last_date:
-        sub_results = {"RMSE":[], "alpha":[], "beta":[], "k":[], "rb":[]}
+        windows.append([start_date, start_date+(end_date-start_date)/2, end_date])
+        # update the start and end datetimes
+        start_date = start_date+datetime.timedelta(days=window_size_days)
+        end_date = start_date+datetime.timedelta(days=step_size_days)
+    nwindows = len(windows)
+    # initialise the results
+    LL_results = {"start_date": numpy.array([w[0] for w in windows], dtype=object),
+                  "mid_date": numpy.array([w[1] for w in windows], dtype=object),
+                  "end_date": numpy.array([w[2] for w in windows], dtype=object)}
+    for item in ["alpha", "beta", "k", "rb", "alpha_low", "rb_low", "rb_prior", "E0"]:
+        LL_results[item] = numpy.full(nwindows, numpy.nan)
+    # get the value of E0 for the period closest to the mid-point of each period
+    LT_mid_date = numpy.array(list(LT_results["mid_date"]), dtype="datetime64[us]")
+    # the prior for rb is the mean ER from the last window with enough points
+    rb_prior = 1.0
+    tasks = []
+    for n, [start_date, mid_date, end_date] in enumerate(windows):
         si = pfp_utils.GetDateIndex(ldt, str(start_date), ts=ieli["time_step"])
         ei = pfp_utils.GetDateIndex(ldt, str(end_date), ts=ieli["time_step"])
-        drivers["Fsd"] = numpy.ma.compressed(Fsd[si:ei+1])
-        drivers["D"] = numpy.ma.compressed(D[si:ei+1])
-        drivers["T"] = numpy.ma.compressed(T[si:ei+1])
+        drivers = {"Fsd": numpy.ma.compressed(Fsd[si:ei+1]),
+                   "D": numpy.ma.compressed(D[si:ei+1]),
+                   "T": numpy.ma.compressed(T[si:ei+1])}
         NEEsub = numpy.ma.compressed(NEE[si:ei+1])
         ERsub = numpy.ma.compressed(ER[si:ei+1])
-        mid_date = start_date+(end_date-start_date)/2
-        # get the value of E0 for the period closest to the mid-point of this period
-        diffs = [abs(dt-mid_date) for dt in LT_results["mid_date"]]
-        val, idx = min((val, idx) for (idx, val) in enumerate(diffs))
-        LL_results["E0"] = numpy.append(LL_results["E0"], LT_results["E0_int"][idx])
-        LL_results["start_date"] = numpy.append(LL_results["start_date"], start_date)
-        LL_results["mid_date"] = numpy.append(LL_results["mid_date"], mid_date)
-        LL_results["end_date"] = numpy.append(LL_results["end_date"], end_date)
+        idx = numpy.argmin(numpy.abs(LT_mid_date - numpy.datetime64(mid_date, "us")))
+        LL_results["E0"][n] = LT_results["E0_int"][idx]
+        if len(NEEsub) >= 10 and len(ERsub) >= 10:
+            rb_prior = numpy.mean(ERsub)
+        LL_results["rb_prior"][n] = rb_prior
         if len(NEEsub) >= 10:
-            # alpha and rb from linear fit between NEE and Fsd at low light levels
-            idx = numpy.where(drivers["Fsd"] < 100)[0]
-            if len(idx) >= 2:
-                alpha_low, rb_low = numpy.polyfit(drivers["Fsd"][idx], NEEsub[idx], 1)
-            else:
-                alpha_low, rb_low = numpy.nan, numpy.nan
-            if len(ERsub) >= 10: LL_prior["rb"] = numpy.mean(ERsub)
-            for bm in [0.5, 1,2]:
-                LL_prior["beta"] = numpy.abs(numpy.percentile(NEEsub, 3)-numpy.percentile(NEEsub, 97))
-                LL_prior["beta"] = bm*LL_prior["beta"]
-                E0 = LL_results["E0"][-1]
-                p0 = [LL_prior["alpha"],LL_prior["beta"],LL_prior["k"],LL_prior["rb"]]
-                try:
-                    fopt = lambda x,alpha,beta,k,rb:NEE_RHLRC_D(x,alpha,beta,k,D0,rb,E0)
-                    popt,pcov = curve_fit(fopt,drivers,NEEsub,p0=p0)
-                    alpha,beta,k,rb = popt[0],popt[1],popt[2],popt[3]
-                    last_alpha_OK = True
-                except RuntimeError:
-                    alpha,beta,k,rb = numpy.nan,numpy.nan,numpy.nan,numpy.nan
-                    last_alpha_OK = False
-                # QC the parameters
-                # k first
-                if numpy.isnan(k) or k<0 or k>2:
-                    k = 0
-                    try:
-                        p0 = [LL_prior["alpha"],LL_prior["beta"],LL_prior["rb"]]
-                        fopt = lambda x,alpha,beta,rb:NEE_RHLRC_D(x,alpha,beta,k,D0,rb,E0)
-                        popt,pcov = curve_fit(fopt,drivers,NEEsub,p0=p0)
-                        alpha,beta,rb = popt[0],popt[1],popt[2]
-                        last_alpha_OK = True
-                    except RuntimeError:
-                        alpha,beta,k,rb = numpy.nan,numpy.nan,numpy.nan,numpy.nan
-                        last_alpha_OK = False
-                # then alpha
-                if numpy.isnan(alpha) or alpha<0 or alpha>0.22:
-                    if last_alpha_OK==True and len(LL_results["alpha"]) > 0:
-                        alpha = LL_results["alpha"][-1]
-                    else:
-                        alpha = 0
-                    try:
-                        p0 = [LL_prior["beta"],LL_prior["k"],LL_prior["rb"]]
-                        fopt = lambda x,beta,k,rb:NEE_RHLRC_D(x,alpha,beta,k,D0,rb,E0)
-                        popt,pcov = curve_fit(fopt,drivers,NEEsub,p0=p0)
-                        beta,k,rb = popt[0],popt[1],popt[2]
-                    except RuntimeError:
-                        alpha,beta,k,rb = numpy.nan,numpy.nan,numpy.nan,numpy.nan
-                # then beta
-                if beta<0:
-                    beta = 0
-                    try:
-                        p0 = [LL_prior["alpha"],LL_prior["k"],LL_prior["rb"]]
-                        fopt = lambda x,alpha,k,rb:NEE_RHLRC_D(x,alpha,beta,k,D0,rb,E0)
-                        popt,pcov = curve_fit(fopt,drivers,NEEsub,p0=p0)
-                        alpha,k,rb = popt[0],popt[1],popt[2]
-                    except RuntimeError:
-                        alpha,beta,k,rb = numpy.nan,numpy.nan,numpy.nan,numpy.nan
-                elif beta>250:
-                    alpha,beta,k,rb = numpy.nan,numpy.nan,numpy.nan,numpy.nan
-                # and finally rb
-                if rb<0:
-                    alpha,beta,k,rb = numpy.nan,numpy.nan,numpy.nan,numpy.nan
-                # now get the RMSE for this set of parameters
-                if not numpy.isnan(alpha) and not numpy.isnan(beta) and not numpy.isnan(k) and not numpy.isnan(rb):
-                    NEEest = NEE_RHLRC_D(drivers,alpha,beta,k,D0,rb,E0)
-                    sub_results["RMSE"].append(numpy.sqrt(numpy.mean((NEEsub-NEEest)**2)))
-                    sub_results["alpha"].append(alpha)
-                    sub_results["beta"].append(beta)
-                    sub_results["k"].append(k)
-                    sub_results["rb"].append(rb)
-            # now find the minimum RMSE and the set of parameters for the minimum
-            if len(sub_results["RMSE"])!=0:
-                min_RMSE = min(sub_results["RMSE"])
-                idx = sub_results["RMSE"].index(min_RMSE)
-                LL_results["alpha"] = numpy.append(LL_results["alpha"],sub_results["alpha"][idx])
-                LL_results["alpha_low"] = numpy.append(LL_results["alpha_low"],float(-1)*alpha_low)
-                LL_results["rb"] = numpy.append(LL_results["rb"],sub_results["rb"][idx])
-                LL_results["rb_low"] = numpy.append(LL_results["rb_low"],rb_low)
-                LL_results["rb_prior"] = numpy.append(LL_results["rb_prior"],LL_prior["rb"])
-                LL_results["beta"] = numpy.append(LL_results["beta"],sub_results["beta"][idx])
-                LL_results["k"] = numpy.append(LL_results["k"],sub_results["k"][idx])
-            else:
-                LL_results["alpha"] = numpy.append(LL_results["alpha"],numpy.nan)
-                LL_results["alpha_low"] = numpy.append(LL_results["alpha_low"],float(-1)*alpha_low)
-                LL_results["rb"] = numpy.append(LL_results["rb"],numpy.nan)
-                LL_results["rb_low"] = numpy.append(LL_results["rb_low"],rb_low)
-                LL_results["rb_prior"] = numpy.append(LL_results["rb_prior"],LL_prior["rb"])
-                LL_results["beta"] = numpy.append(LL_results["beta"],numpy.nan)
-                LL_results["k"] = numpy.append(LL_results["k"],numpy.nan)
+            tasks.append([n, drivers, NEEsub, LL_results["E0"][n], rb_prior, D0])
+    # do the fits, the alpha from the previous window is not known yet
+    results = {}
+    nprocs = min([ieli.get("processes", 1), len(tasks)])
+    if nprocs > 1:
+        msg = " Fitting " + str(len(tasks)) + " windows using " + str(nprocs) + " processes"
+        logger.info(msg)
+        pool = multiprocessing.Pool(processes=nprocs)
+        try:
+            for n, result in pool.imap(get_LL_window_worker, tasks, chunksize=8):
+                results[n] = result
+        except:
+            pool.terminate()
+            raise
         else:
-            LL_results["alpha"] = numpy.append(LL_results["alpha"],numpy.nan)
-            LL_results["alpha_low"] = numpy.append(LL_results["alpha_low"],numpy.nan)
-            LL_results["rb"] = numpy.append(LL_results["rb"],numpy.nan)
-            LL_results["rb_low"] = numpy.append(LL_results["rb_low"],numpy.nan)
-            LL_results["rb_prior"] = numpy.append(LL_results["rb_prior"],LL_prior["rb"])
-            LL_results["beta"] = numpy.append(LL_results["beta"],numpy.nan)
-            LL_results["k"] = numpy.append(LL_results["k"],numpy.nan)
-        # update the start and end datetimes
-        start_date = start_date+datetime.timedelta(days=window_size_days)
-        end_date = start_date+datetime.timedelta(days=step_size_days)
+            pool.close()
+        finally:
+            pool.join()
+    else:
+        for task in tasks:
+            n, result = get_LL_window_worker(task)
+            results[n] = result
+    # put the results into the arrays in window order, redoing the windows
+    # that needed the alpha from the previous window
+    for task in tasks:
+        n = task[0]
+        result = results[n]
+        if result is None:
+            previous_alpha = LL_results["alpha"][n-1] if n > 0 else None
+            result = get_LL_window(*task[1:], previous_alpha=previous_alpha)
+        for item in ["alpha", "beta", "k", "rb", "alpha_low", "rb_low"]:
+            LL_results[item][n] = result[item]
     LL_results["D0"] = D0
     return LL_results
 
+def get_LL_window_worker(task):
+    """ Fit one window for get_LL_params, returns None for the fit if the previous alpha is needed."""
+    n = task[0]
+    try:
+        result = get_LL_window(*task[1:], previous_alpha="unknown")
+    except PreviousAlphaNeeded:
+        result = None
+    return n, result
+
+class PreviousAlphaNeeded(Exception):
+    """ Raised by get_LL_window when it needs the alpha from the previous window."""
+    pass
+
+def get_LL_window(drivers, NEEsub, E0, rb_prior, D0, previous_alpha=None):
+    """
+    Purpose:
+     Fit the Lasslop et al (2010) light response to the data in a window
+     starting from 3 priors for beta, the parameters with the lowest RMSE
+     are returned.  The alpha from the previous window is used when alpha is
+     out of range, previous_alpha is None for the first window (alpha is set
+     to 0) and "unknown" when it is not known yet (PreviousAlphaNeeded is
+     raised if it is needed).
+    Usage:
+     result = pfp_rpLL.get_LL_window(drivers, NEEsub, E0, rb_prior, D0, previous_alpha=alpha)
+     where drivers is a dictionary of the Fsd, D and T data in the window
+           NEEsub is the NEE data in the window
+    Author: PRI
+    Date: October 2026
+    """
+    LL_prior = {"rb":rb_prior, "alpha":0.01, "beta":10, "k":0}
+    sub_results = {"RMSE":[], "alpha":[], "beta":[], "k":[], "rb":[]}
+    # alpha and rb from linear fit between NEE and Fsd at low light levels
+    idx = numpy.where(drivers["Fsd"] < 100)[0]
+    if len(idx) >= 2:
+        alpha_low, rb_low = numpy.polyfit(drivers["Fsd"][idx], NEEsub[idx], 1)
+    else:
+        alpha_low, rb_low = numpy.nan, numpy.nan
+    beta_range = numpy.abs(numpy.percentile(NEEsub, 3)-numpy.percentile(NEEsub, 97))
+    for bm in [0.5, 1,2]:
+        LL_prior["beta"] = bm*beta_range
+        try:
+            popt = fit_NEE_RHLRC_D(drivers,NEEsub,LL_prior,["alpha","beta","k","rb"],D0,E0)
+            alpha,beta,k,rb = popt["alpha"],popt["beta"],popt["k"],popt["rb"]
+            last_alpha_OK = True
+        except RuntimeError:
+            alpha,beta,k,rb = numpy.nan,numpy.nan,numpy.nan,numpy.nan
+            last_alpha_OK = False
+        # QC the parameters
+        # k first
+        if numpy.isnan(k) or k<0 or k>2:
+            k = 0
+            try:
+                params = dict(LL_prior, k=k)
+                popt = fit_NEE_RHLRC_D(drivers,NEEsub,params,["alpha","beta","rb"],D0,E0)
+                alpha,beta,rb = popt["alpha"],popt["beta"],popt["rb"]
+                last_alpha_OK = True
+            except RuntimeError:
+                alpha,beta,k,rb = numpy.nan,numpy.nan,numpy.nan,numpy.nan
+                last_alpha_OK = False
+        # then alpha
+        if numpy.isnan(alpha) or alpha<0 or alpha>0.22:
+            if last_alpha_OK==True and previous_alpha is not None:
+                if isinstance(previous_alpha, basestring):
+                    raise PreviousAlphaNeeded
+                alpha = previous_alpha
+            else:
+                alpha = 0
+            try:
+                params = dict(LL_prior, alpha=alpha)
+                popt = fit_NEE_RHLRC_D(drivers,NEEsub,params,["beta","k","rb"],D0,E0)
+                beta,k,rb = popt["beta"],popt["k"],popt["rb"]
+            except RuntimeError:
+                alpha,beta,k,rb = numpy.nan,numpy.nan,numpy.nan,numpy.nan
+        # then beta
+        if beta<0:
+            beta = 0
+            try:
+                params = dict(LL_prior, beta=beta)
+                popt = fit_NEE_RHLRC_D(drivers,NEEsub,params,["alpha","k","rb"],D0,E0)
+                alpha,k,rb = popt["alpha"],popt["k"],popt["rb"]
+            except RuntimeError:
+                alpha,beta,k,rb = numpy.nan,numpy.nan,numpy.nan,numpy.nan
+        elif beta>250:
+            alpha,beta,k,rb = numpy.nan,numpy.nan,numpy.nan,numpy.nan
+        # and finally rb
+        if rb<0:
+            alpha,beta,k,rb = numpy.nan,numpy.nan,numpy.nan,numpy.nan
+        # now get the RMSE for this set of parameters
+        if not numpy.isnan(alpha) and not numpy.isnan(beta) and not numpy.isnan(k) and not numpy.isnan(rb):
+            NEEest = NEE_RHLRC_D(drivers,alpha,beta,k,D0,rb,E0)
+            sub_results["RMSE"].append(numpy.sqrt(numpy.mean((NEEsub-NEEest)**2)))
+            sub_results["alpha"].append(alpha)
+            sub_results["beta"].append(beta)
+            sub_results["k"].append(k)
+            sub_results["rb"].append(rb)
+    result = {"alpha_low": float(-1)*alpha_low, "rb_low": rb_low}
+    # now find the minimum RMSE and the set of parameters for the minimum
+    if len(sub_results["RMSE"])!=0:
+        idx = sub_results["RMSE"].index(min(sub_results["RMSE"]))
+        for item in ["alpha", "beta", "k", "rb"]:
+            result[item] = sub_results[item][idx]
+    else:
+        for item in ["alpha", "beta", "k", "rb"]:
+            result[item] = numpy.nan
+    return result
+
 def get_LT_params(ldt, ER, T, l6_info, output, mode="verbose"):
     """
     Purpose:
      Returns rb and E0 for the Lloyd & Taylor respiration function.
+     E0 and rb are fitted for all windows at once by
+     pfp_rpLT.get_Eo_rb_windows, the QC of E0 depends on the previous
+     window so it is done in window order afterwards and rb is then
+     recalculated, again for all windows at once, for the windows where E0
+     was replaced.
     Usage:
     Author: PRI
     Date: April 2016
+    Modified: October 2026 - batched fits for all windows, preallocated results
     """
     # local pointers to entries in the info dictionary
     iel = l6_info["ERUsingLasslop"]
     ielo = iel["outputs"]
     ieli = iel["info"]
     # window and step sizes
-    window_step_size = ielo[output]["window_size_days"]
+    window_size_days = ielo[output]["window_size_days"]
     step_size_days = ielo[output]["step_size_days"]
-    # initialise results, missed dates and prior dictionaries
-    mta = numpy.array([])
-    LT_results = {"start_date": mta, "mid_date": mta, "end_date": mta,
-                  "rb": mta, "E0": mta, "rb_prior": mta, "E0_prior": mta}
     missed_dates = {"start_date":[], "end_date":[]}
     LT_prior = {"rb": 1.0, "E0": 100}
-    # get the start and end date
+    # get the windows
+    windows = []
     start_date = ldt[0]
     last_date = ldt[-1]
-    end_date = start_date+datetime.timedelta(days=ielo[output]["window_size_days"])
-    last_E0_OK = False
+    end_date = start_date+datetime.timedelta(days=window_size_days)
     while end_date <= last_date:
-        LT_results["start_date"] = numpy.append(LT_results["start_date"], start_date)
-        LT_results["mid_date"] = numpy.append(LT_results["mid_date"], start_date+(end_date-start_date)/2)
-        LT_results["end_date"] = numpy.append(LT_results["end_date"], end_date)
-        si = pfp_utils.GetDateIndex(ldt, str(start_date), ts=ieli["time_step"])
-        ei = pfp_utils.GetDateIndex(ldt, str(end_date), ts=ieli["time_step"])
-        Tsub = numpy.ma.compressed(T[si: ei+1])
-        ERsub = numpy.ma.compressed(ER[si: ei+1])
-        if len(ERsub) >= 10:
-            LT_prior["rb"] = numpy.mean(ERsub)
-            p0 = [LT_prior["rb"], LT_prior["E0"]]
-            try:
-                popt, pcov = curve_fit(ER_LloydTaylor, Tsub, ERsub, p0=p0)
-            except RuntimeError:
-                missed_dates["start_date"].append(start_date)
-                missed_dates["end_date"].append(end_date)
-            # QC E0 results
-            if popt[1] < 50 or popt[1] > 400:
-                if last_E0_OK:
-                    popt[1] = LT_results["E0"][-1]
-                    last_E0_OK = False
-                else:
-                    if popt[1] <50: popt[1] = float(50)
-                    if popt[1] > 400: popt[1] = float(400)
-                    last_E0_OK = False
-                # now recalculate rb
-                p0 = LT_prior["rb"]
-                if numpy.isnan(popt[1]): popt[1] = float(50)
-                E0 = numpy.ones(len(Tsub))*float(popt[1])
-                popt1, pcov1 = curve_fit(ER_LloydTaylor_fixedE0, [Tsub,E0], ERsub, p0=p0)
-                popt[0] = popt1[0]
+        windows.append([start_date, start_date+(end_date-start_date)/2, end_date])
+        start_date = start_date+datetime.timedelta(days=window_size_days)
+        end_date = start_date+datetime.timedelta(days=step_size_days)
+    nwindows = len(windows)
+    # initialise the results
+    LT_results = {"start_date": numpy.array([w[0] for w in windows], dtype=object),
+                  "mid_date": numpy.array([w[1] for w in windows], dtype=object),
+                  "end_date": numpy.array([w[2] for w in windows], dtype=object)}
+    for item in ["rb", "E0", "rb_prior", "E0_prior"]:
+        LT_results[item] = numpy.full(nwindows, numpy.nan)
+    # fit E0 and rb for all windows with enough points
+    starts = numpy.array([pfp_utils.GetDateIndex(ldt, str(w[0]), ts=ieli["time_step"]) for w in windows],
+                         dtype=numpy.int64)
+    ends = numpy.array([pfp_utils.GetDateIndex(ldt, str(w[2]), ts=ieli["time_step"]) for w in windows],
+                       dtype=numpy.int64)
+    valid = ~numpy.ma.getmaskarray(ER) & ~numpy.ma.getmaskarray(T)
+    ER_data = numpy.ma.getdata(ER)
+    T_data = numpy.ma.getdata(T)
+    E0, rb, error_state, npts = pfp_rpLT.get_Eo_rb_windows(T_data, ER_data, valid, starts, ends,
+                                                            LT_prior["E0"], Tref=c.Tref)
+    window, index, _ = pfp_rpLT.get_window_points(valid, starts, ends)
+    sum_ER = numpy.bincount(window, weights=ER_data[index], minlength=nwindows)
+    fitted = npts >= 10
+    LT_results["rb_prior"][fitted] = sum_ER[fitted]/npts[fitted]
+    LT_results["E0_prior"][fitted] = LT_prior["E0"]
+    # QC E0 results, this depends on the previous window so is done in window order
+    last_E0_OK = False
+    refit = numpy.zeros(nwindows, dtype=bool)
+    for n in numpy.flatnonzero(fitted):
+        if error_state[n] != 0:
+            missed_dates["start_date"].append(windows[n][0])
+            missed_dates["end_date"].append(windows[n][2])
+            last_E0_OK = False
+            continue
+        if E0[n] < 50 or E0[n] > 400:
+            if last_E0_OK and n > 0:
+                E0[n] = LT_results["E0"][n-1]
             else:
-                last_E0_OK = True
-            # QC rb results
-            if popt[0] < 0: popt[0] = float(0)
-            LT_results["rb"] = numpy.append(LT_results["rb"], popt[0])
-            LT_results["E0"] = numpy.append(LT_results["E0"], popt[1])
-            LT_results["rb_prior"] = numpy.append(LT_results["rb_prior"], numpy.mean(ERsub))
-            LT_results["E0_prior"] = numpy.append(LT_results["E0_prior"], LT_prior["E0"])
+                E0[n] = min([max([E0[n], float(50)]), float(400)])
+            last_E0_OK = False
+            if numpy.isnan(E0[n]): E0[n] = float(50)
+            refit[n] = True
         else:
-            LT_results["rb"] = numpy.append(LT_results["rb"], numpy.nan)
-            LT_results["E0"] = numpy.append(LT_results["E0"], numpy.nan)
-            LT_results["rb_prior"] = numpy.append(LT_results["rb_prior"], numpy.nan)
-            LT_results["E0_prior"] = numpy.append(LT_results["E0_prior"], numpy.nan)
-        start_date = start_date+datetime.timedelta(days=ielo[output]["window_size_days"])
-        end_date = start_date+datetime.timedelta(days=ielo[output]["step_size_days"])
-    #    start_date = end_date
-    #    end_date = start_date+dateutil.relativedelta.relativedelta(years=1)
+            last_E0_OK = True
+        LT_results["E0"][n] = E0[n]
+    # now recalculate rb for the windows where E0 was replaced
+    if numpy.any(refit):
+        rb[refit], _ = pfp_rpLT.get_rb_windows(T_data, ER_data, valid, starts[refit], ends[refit],
+                                               E0[refit], Tref=c.Tref)
+    # QC rb results
+    ok = fitted & (error_state == 0)
+    LT_results["rb"][ok] = numpy.maximum(rb[ok], float(0))
     if mode == "verbose":
         if len(missed_dates["start_date"]) != 0:
             msg = " No solution found for the following dates:"
@@ -393,6 +520,10 @@ def rpLL_createdict_info(cf, ds, erll, called_by):
     erll["info"]["time_step"] = time_step
     erll["info"]["source"] = "Fc"
     erll["info"]["target"] = "ER"
+    # the Lloyd-Taylor and Lasslop parameters are cached on the input data and the settings
+    erll["info"]["cache"] = pfp_cache.get_info(cf)
+    # number of processes used for the window fits
+    erll["info"]["processes"] = pfp_utils.get_number_of_processes(cf)
     # check to see if this is a batch or an interactive run
     call_mode = pfp_utils.get_keyvaluefromcf(cf, ["Options"], "call_mode", default="interactive")
     erll["info"]["call_mode"] = call_mode
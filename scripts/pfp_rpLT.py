@@ -9,7 +9,6 @@ import sys
 import numpy
 import matplotlib
 import matplotlib.pyplot as plt
-import scipy
 # PFP modules
 import constants as c
 import pfp_cfg
@@ -61,18 +60,13 @@ def optimise_rb(data_dict, params_dict):
     # Initialise error state variable
     error_state = 0
 
-    # Get drivers and response
-    drivers_dict = {driver: data_dict[driver] for driver in ['TempC']}
-    response_array = data_dict['NEE']
-
-    try:
-        params = scipy.optimize.curve_fit(lambda x, b:
-                           TRF(x, params_dict['Eo_default'], b),
-                           drivers_dict,
-                           response_array,
-                           p0 = [params_dict['rb_prior']])[0]
-    except RuntimeError:
-        params = [numpy.nan]
+    # rb for a fixed Eo is a linear least squares problem, use the closed form
+    # solution for a single window covering all of the data
+    nrecs = len(data_dict['NEE'])
+    Eo = numpy.ravel(params_dict['Eo_default'])[:1]
+    rb, npts = get_rb_windows(data_dict['TempC'], data_dict['NEE'], numpy.ones(nrecs, dtype=bool),
+                              [0], [nrecs-1], Eo)
+    params = [rb[0]]
 
     # If negative rb returned, set to nan
     if params[0] < 0:
@@ -81,6 +75,150 @@ def optimise_rb(data_dict, params_dict):
 
     return params, error_state
 
+def get_window_points(valid, starts, ends):
+    """
+    Purpose:
+     Return the indices of the valid points in each window as 2 flat arrays,
+     the window number and the index into the data, plus the number of valid
+     points in each window.  The windows are given by the start and end
+     indices (both inclusive) and may overlap.  This replaces subsetting the
+     data dictionary once per window.
+    Usage:
+     window, index, npts = pfp_rpLT.get_window_points(valid, starts, ends)
+     where valid is a boolean array, True where the data can be used
+           starts, ends are the first and last indices of each window
+    Author: PRI
+    Date: October 2026
+    """
+    valid_index = numpy.flatnonzero(valid)
+    lo = numpy.searchsorted(valid_index, numpy.asarray(starts), side="left")
+    hi = numpy.searchsorted(valid_index, numpy.asarray(ends), side="right")
+    npts = hi - lo
+    window = numpy.repeat(numpy.arange(len(npts)), npts)
+    # position of each point in its window plus the first valid point of the window
+    offsets = numpy.cumsum(npts) - npts
+    position = numpy.arange(len(window)) - offsets[window] + lo[window]
+    return window, valid_index[position], npts
+
+def get_LT_x(T, Tref=10.0):
+    """ Return the Lloyd-Taylor temperature term, ER = rb*exp(Eo*x)."""
+    return 1/(Tref - c.T0) - 1/(numpy.asarray(T, dtype=numpy.float64) - c.T0)
+
+def get_rb_windows(T, ER, valid, starts, ends, Eo, Tref=10.0):
+    """
+    Purpose:
+     Return rb for the Lloyd-Taylor respiration function with Eo fixed for
+     every window in one pass.  For a fixed Eo, rb is the solution of a
+     linear least squares problem, rb = sum(ER*f)/sum(f*f) with
+     f = exp(Eo*(1/(Tref-T0) - 1/(T-T0))), so no iteration is needed.  rb
+     is NaN for windows with no valid points.
+    Usage:
+     rb, npts = pfp_rpLT.get_rb_windows(T, ER, valid, starts, ends, Eo)
+     where T and ER are the temperature and respiration arrays
+           valid is a boolean array, True where T and ER can be used
+           starts, ends are the first and last indices of each window
+           Eo is an array of Eo values, one per window
+           Tref is the reference temperature, 10C for pfp_rpLT and
+                c.Tref for pfp_rpLL
+    Author: PRI
+    Date: October 2026
+    """
+    window, index, npts = get_window_points(valid, starts, ends)
+    nwindows = len(npts)
+    f = numpy.exp(numpy.asarray(Eo, dtype=numpy.float64)[window]*get_LT_x(T, Tref=Tref)[index])
+    sum_yf = numpy.bincount(window, weights=numpy.asarray(ER, dtype=numpy.float64)[index]*f,
+                            minlength=nwindows)
+    sum_ff = numpy.bincount(window, weights=f*f, minlength=nwindows)
+    rb = numpy.full(nwindows, numpy.nan)
+    ok = sum_ff > 0
+    rb[ok] = sum_yf[ok]/sum_ff[ok]
+    return rb, npts
+
+def get_Eo_rb_windows(T, ER, valid, starts, ends, Eo_prior, Tref=10.0,
+                      max_iterations=200, tolerance=1E-6):
+    """
+    Purpose:
+     Fit Eo and rb of the Lloyd-Taylor respiration function for every window
+     at once using Gauss-Newton with Levenberg-Marquardt damping.  The
+     normal equations for all windows are built with numpy.bincount over
+     the valid points so each iteration is a single pass through the data
+     and the 2 by 2 systems are solved explicitly.  The starting value of
+     rb is the closed form solution for Eo_prior.
+     The error state is 0 for a window that converged and 3 for one that
+     did not or that has fewer than 2 valid points, Eo and rb are NaN for
+     these windows.
+    Usage:
+     Eo, rb, error_state, npts = pfp_rpLT.get_Eo_rb_windows(T, ER, valid, starts, ends, 100)
+     where the arguments are as for get_rb_windows and Eo_prior is the
+           starting value for Eo
+    Author: PRI
+    Date: October 2026
+    """
+    window, index, npts = get_window_points(valid, starts, ends)
+    nwindows = len(npts)
+    x = get_LT_x(T, Tref=Tref)[index]
+    y = numpy.asarray(ER, dtype=numpy.float64)[index]
+    Eo = numpy.full(nwindows, float(Eo_prior))
+    rb, _ = get_rb_windows(T, ER, valid, starts, ends, Eo, Tref=Tref)
+    def get_sse(Eo, rb):
+        with numpy.errstate(over="ignore", invalid="ignore"):
+            r = y - rb[window]*numpy.exp(Eo[window]*x)
+            sse = numpy.bincount(window, weights=r*r, minlength=nwindows)
+        return numpy.where(numpy.isfinite(sse), sse, numpy.inf)
+    sse = get_sse(Eo, rb)
+    lam = numpy.full(nwindows, 1E-3)
+    active = (npts >= 2) & numpy.isfinite(rb)
+    rb[~active] = 0.0
+    converged = numpy.zeros(nwindows, dtype=bool)
+    for i in range(max_iterations):
+        if not numpy.any(active):
+            break
+        e = numpy.exp(Eo[window]*x)
+        f = rb[window]*e
+        r = y - f
+        # columns of the Jacobian are d(ER)/d(rb) = e and d(ER)/d(Eo) = f*x
+        j2 = f*x
+        a11 = numpy.bincount(window, weights=e*e, minlength=nwindows)
+        a12 = numpy.bincount(window, weights=e*j2, minlength=nwindows)
+        a22 = numpy.bincount(window, weights=j2*j2, minlength=nwindows)
+        g1 = numpy.bincount(window, weights=e*r, minlength=nwindows)
+        g2 = numpy.bincount(window, weights=j2*r, minlength=nwindows)
+        # converged when the undamped Gauss-Newton step is small
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            det = a11*a22 - a12*a12
+            small = ((numpy.abs((a22*g1 - a12*g2)/det) <= tolerance*(numpy.abs(rb) + tolerance)) &
+                     (numpy.abs((a11*g2 - a12*g1)/det) <= tolerance*(numpy.abs(Eo) + tolerance)))
+        done = active & small
+        converged[done] = True
+        active[done] = False
+        d11 = a11*(1 + lam)
+        d22 = a22*(1 + lam)
+        det = d11*d22 - a12*a12
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            drb = numpy.where(active, (d22*g1 - a12*g2)/det, 0.0)
+            dEo = numpy.where(active, (d11*g2 - a12*g1)/det, 0.0)
+        bad = active & ~(numpy.isfinite(drb) & numpy.isfinite(dEo))
+        active[bad] = False
+        drb[bad] = 0.0
+        dEo[bad] = 0.0
+        sse_new = get_sse(Eo + dEo, rb + drb)
+        better = active & (sse_new <= sse)
+        Eo[better] = Eo[better] + dEo[better]
+        rb[better] = rb[better] + drb[better]
+        # also converged when the sum of squares has stopped going down
+        done = better & (sse - sse_new <= tolerance*tolerance*sse)
+        sse[better] = sse_new[better]
+        lam[better] = lam[better]/10
+        lam[active & ~better] = lam[active & ~better]*10
+        # windows where the damping has grown this large are at a minimum to round off
+        done = done | (active & ~better & (lam > 1E10))
+        converged[done] = True
+        active[done] = False
+    error_state = numpy.where(converged, 0, 3)
+    Eo[~converged] = numpy.nan
+    rb[~converged] = numpy.nan
+    return Eo, rb, error_state, npts
+
 # code from Partition_NEE.py
 def get_dates(datetime_array, configs_dict):
 
@@ -179,22 +317,13 @@ def make_initial_guess_dict(data_d):
 
 def optimise_all(data_dict, params_dict):
 
-    # Initialise error state variable
-    error_state = 0
-
-    drivers_dict = {driver: data_dict[driver] for driver in ['TempC']}
-    response_array = data_dict['NEE']
-
-    try:
-        params = scipy.optimize.curve_fit(lambda x, a, b:
-                           TRF(x, a, b),
-                           drivers_dict,
-                           response_array,
-                           p0 = [params_dict['Eo_prior'],
-                                 params_dict['rb_prior']])[0]
-    except RuntimeError:
-        params = [np.nan, np.nan]
-        error_state = 3
+    # fit Eo and rb for a single window covering all of the data
+    nrecs = len(data_dict['NEE'])
+    Eo, rb, error_state, npts = get_Eo_rb_windows(data_dict['TempC'], data_dict['NEE'],
+                                                  numpy.ones(nrecs, dtype=bool), [0], [nrecs-1],
+                                                  params_dict['Eo_prior'])
+    params = [Eo[0], rb[0]]
+    error_state = int(error_state[0])
 
     return params, error_state
 
@@ -214,26 +343,26 @@ def optimise_annual_Eo(data_dict, params_dict, configs_dict, year_index_dict):
     Eo_range_fail_keys = []
     Eo_nan_fail_keys = []
     year_list = year_index_dict.keys()
+    # fit Eo and rb for all years at once, the years are windows over the valid data
+    # no need to subset for day/night when input data is ER
+    valid = get_valid_mask(data_dict)
+    starts = [year_index_dict[yr][0] for yr in year_list]
+    ends = [year_index_dict[yr][1] for yr in year_list]
+    Eo_all, rb_all, error_all, npts = get_Eo_rb_windows(data_dict['TempC'], data_dict['NEE'], valid,
+                                                        starts, ends, params_dict['Eo_prior'])
     logger.info(" E0 optimised using whole year is as follows")
-    for yr in year_list:
+    for n, yr in enumerate(year_list):
 
         # Calculate number of recs for year
         days = 366 if calendar.isleap(yr) else 365
         recs = days * (24 / msmt_int) / 2
 
-        # Subset data
-        sub_dict = subset_window(data_dict, year_index_dict[yr])
-        sub_dict = subset_nan(sub_dict)
-        noct_flag = True
-        # no need to subset for day/night when input data is ER
-        #sub_dict = subset_daynight(sub_dict, noct_flag)
-
         # Calculate percent of potential annual data that the subset contains
-        pct = round(float(len(sub_dict['NEE'])) / recs * 100)
+        pct = round(float(npts[n]) / recs * 100)
 
-        # Fit L&T parameters if minimum data criterion satisfied, otherwise nan
+        # Use the L&T parameters if minimum data criterion satisfied, otherwise nan
         if pct >= min_pct:
-            params, error_code = optimise_all(sub_dict, params_dict)
+            params, error_code = [Eo_all[n], rb_all[n]], int(error_all[n])
         else:
             msg = " Less than "+str(min_pct)+ "% for year "+str(yr)+" ("+str(pct)+"%)"
             logger.warning(msg)
@@ -611,6 +740,21 @@ def subset_daynight(data_dict, noct_flag):
 
     return sub_dict
 
+def get_valid_mask(data_dict):
+    """
+    Purpose:
+     Return a boolean array that is True where none of the variables in
+     data_dict are NaN, the same points kept by subset_nan.
+    Usage:
+     valid = pfp_rpLT.get_valid_mask(data_dict)
+    Author: PRI
+    Date: October 2026
+    """
+    valid = numpy.ones(len(data_dict['NEE']), dtype=bool)
+    for var in data_dict.keys():
+        valid = valid & ~numpy.isnan(data_dict[var])
+    return valid
+
 def subset_nan(data_dict):
 
     # Turn dictionary into an array
@@ -0,0 +1,196 @@
+""" Vectorised solar position and clear sky radiation using the same algorithms as pysolar."""
+# 3rd party modules
+import numpy
+# PFP modules
+import pysolar
+
+def to_datetime64(utc_datetime):
+    """
+    Purpose:
+     Return a numpy datetime64[us] array from a datetime64 array or from a
+     sequence of Python datetimes.  Time zone aware datetimes are converted
+     to UTC, naive datetimes are assumed to be UTC.
+    Usage:
+     dt64 = pfp_solar.to_datetime64(ldt_UTC)
+    Author: PRI
+    Date: October 2026
+    """
+    dt = numpy.asarray(utc_datetime)
+    if dt.dtype.kind == "M":
+        return dt.astype("datetime64[us]")
+    dt = [d.replace(tzinfo=None) - d.utcoffset() if d.tzinfo is not None else d for d in dt]
+    return numpy.array(dt, dtype="datetime64[us]")
+
+def get_coefficient(jme, constant_array):
+    """ Vectorised pysolar.GetCoefficient, loops over the terms not the times."""
+    result = numpy.zeros(len(jme))
+    for a, b, c in constant_array:
+        result += a*numpy.cos(b + c*jme)
+    return result
+
+def get_julian_day(dt64):
+    """ Vectorised pysolar.GetJulianDay for a datetime64[us] array."""
+    month_start = dt64.astype("datetime64[M]")
+    day_start = dt64.astype("datetime64[D]")
+    year = (dt64.astype("datetime64[Y]").astype(numpy.int64) + 1970).astype(numpy.float64)
+    month = (month_start.astype(numpy.int64) % 12 + 1).astype(numpy.float64)
+    day = (day_start - month_start.astype("datetime64[D]")).astype(numpy.int64) + 1
+    microseconds = (dt64 - day_start).astype(numpy.int64)
+    day = day + (microseconds/1000000.0)/86400.0
+    # shift January and February to the end of the previous year
+    jf = month <= 2
+    year[jf] = year[jf] - 1.0
+    month[jf] = month[jf] + 12.0
+    gregorian_offset = 2.0 - (year // 100.0) + ((year // 100.0) // 4.0)
+    julian_day = numpy.floor(365.25*(year + 4716.0)) + numpy.floor(30.6001*(month + 1.0)) + day - 1524.5
+    return numpy.where(julian_day <= 2299160.0, julian_day, julian_day + gregorian_offset)
+
+def get_nutation(jde):
+    """ Vectorised pysolar.GetNutation, returns the nutation in longitude and obliquity."""
+    jce = (jde - 2451545.0)/36525.0
+    polynomials = dict(pysolar.coeff_list)
+    x = []
+    # order is the same as pysolar.PrecalculateAberrations
+    for name in ["MeanElongationOfMoon", "MeanAnomalyOfSun", "MeanAnomalyOfMoon",
+                 "ArgumentOfLatitudeOfMoon", "LongitudeOfAscendingNode"]:
+        a, b, c, d = polynomials[name]
+        x.append(a + b*jce + c*jce**2 + (jce**3)/d)
+    nutation_longitude = numpy.zeros(len(jde))
+    nutation_obliquity = numpy.zeros(len(jde))
+    for abcd, y in zip(pysolar.nutation_coefficients, pysolar.aberration_sin_terms):
+        sigmaxy = numpy.zeros(len(jde))
+        for j in range(len(x)):
+            sigmaxy += x[j]*y[j]
+        nutation_longitude += (abcd[0] + abcd[1]*jce)*numpy.sin(numpy.radians(sigmaxy))
+        nutation_obliquity += (abcd[2] + abcd[3]*jce)*numpy.cos(numpy.radians(sigmaxy))
+    # 36000000 scales from 0.0001 arcseconds to degrees
+    return nutation_longitude/36000000.0, nutation_obliquity/36000000.0
+
+def get_day_of_year(dt64):
+    """ Vectorised pysolar.GetDayOfYear, days since the start of the year (0 on 1 January)."""
+    day_start = dt64.astype("datetime64[D]")
+    return (day_start - dt64.astype("datetime64[Y]").astype("datetime64[D]")).astype(numpy.int64)
+
+def get_solar_position(latitude_deg, longitude_deg, utc_datetime, elevation=0,
+                       temperature_celsius=25, pressure_millibars=1013.25):
+    """
+    Purpose:
+     Return the solar altitude and azimuth (degrees) for all times in
+     utc_datetime in one call.  The algorithm and constants are those used by
+     pysolar.GetAltitude and pysolar.GetAzimuth (Reda and Andreas, 2005,
+     including the pysolar simplifications) so the results agree with pysolar
+     to round off.
+    Usage:
+     altitude, azimuth = pfp_solar.get_solar_position(lat, lon, dt_UTC)
+     where lat and lon are the latitude and longitude in decimal degrees
+           dt_UTC is a datetime64 array or a sequence of datetimes in UTC
+    Author: PRI
+    Date: October 2026
+    """
+    dt64 = to_datetime64(utc_datetime)
+    # location-dependent calculations
+    projected_radial_distance = pysolar.GetProjectedRadialDistance(elevation, latitude_deg)
+    projected_axial_distance = pysolar.GetProjectedAxialDistance(elevation, latitude_deg)
+    latitude_rad = numpy.radians(latitude_deg)
+    # time-dependent calculations
+    jd = get_julian_day(dt64)
+    jde = jd + 65/86400.0
+    jce = (jde - 2451545.0)/36525.0
+    jme = jce/10.0
+    geocentric_latitude = -1*numpy.degrees((get_coefficient(jme, pysolar.B0) +
+                                            get_coefficient(jme, pysolar.B1)*jme)/10**8)
+    l = numpy.zeros(len(jme))
+    for n, table in enumerate([pysolar.L0, pysolar.L1, pysolar.L2, pysolar.L3, pysolar.L4, pysolar.L5]):
+        l += get_coefficient(jme, table)*jme**n
+    geocentric_longitude = (numpy.degrees(l/10**8) % 360 + 180) % 360
+    radius_vector = numpy.zeros(len(jme))
+    for n, table in enumerate([pysolar.R0, pysolar.R1, pysolar.R2, pysolar.R3, pysolar.R4]):
+        radius_vector += get_coefficient(jme, table)*jme**n
+    radius_vector = radius_vector/10**8
+    aberration_correction = -20.4898/(3600.0*radius_vector)
+    equatorial_horizontal_parallax = 8.794/(3600/radius_vector)
+    nutation_longitude, nutation_obliquity = get_nutation(jde)
+    u = jme/10.0
+    mean_obliquity = (84381.448 - (4680.93*u) - (1.55*u**2) + (1999.25*u**3) - (51.38*u**4) -
+                      (249.67*u**5) - (39.05*u**6) + (7.12*u**7) + (27.87*u**8) + (5.79*u**9) +
+                      (2.45*u**10))
+    true_ecliptic_obliquity = (mean_obliquity/3600.0) + nutation_obliquity
+    jc = (jd - 2451545.0)/36525.0
+    mean_sidereal_time = (280.46061837 + (360.98564736629*(jd - 2451545.0)) +
+                          (0.000387933*jc**2) - (jc**3/38710000)) % 360
+    # pysolar takes the cosine of the obliquity in degrees here, we do the same
+    apparent_sidereal_time = mean_sidereal_time + nutation_longitude*numpy.cos(true_ecliptic_obliquity)
+    # calculations dependent on location and time
+    apparent_sun_longitude = geocentric_longitude + nutation_longitude + aberration_correction
+    asl_rad = numpy.radians(apparent_sun_longitude)
+    teo_rad = numpy.radians(true_ecliptic_obliquity)
+    gl_rad = numpy.radians(geocentric_latitude)
+    a = numpy.sin(asl_rad)*numpy.cos(teo_rad)
+    b = numpy.tan(gl_rad)*numpy.sin(teo_rad)
+    geocentric_sun_right_ascension = numpy.degrees(numpy.arctan2(a - b, numpy.cos(asl_rad))) % 360
+    a = numpy.sin(gl_rad)*numpy.cos(teo_rad)
+    b = numpy.cos(gl_rad)*numpy.sin(teo_rad)*numpy.sin(asl_rad)
+    geocentric_sun_declination = numpy.degrees(numpy.arcsin(a + b))
+    local_hour_angle = (apparent_sidereal_time + longitude_deg - geocentric_sun_right_ascension) % 360
+    ehp_rad = numpy.radians(equatorial_horizontal_parallax)
+    lha_rad = numpy.radians(local_hour_angle)
+    gsd_rad = numpy.radians(geocentric_sun_declination)
+    a = -1*projected_radial_distance*numpy.sin(ehp_rad)*numpy.sin(lha_rad)
+    b = numpy.cos(gsd_rad) - projected_radial_distance*numpy.sin(ehp_rad)*numpy.cos(lha_rad)
+    parallax_sun_right_ascension = numpy.degrees(numpy.arctan2(a, b))
+    topocentric_local_hour_angle = local_hour_angle - parallax_sun_right_ascension
+    psra_rad = numpy.radians(parallax_sun_right_ascension)
+    a = (numpy.sin(gsd_rad) - projected_axial_distance*numpy.sin(ehp_rad))*numpy.cos(psra_rad)
+    b = numpy.cos(gsd_rad) - (projected_axial_distance*numpy.sin(ehp_rad)*numpy.cos(lha_rad))
+    topocentric_sun_declination = numpy.degrees(numpy.arctan2(a, b))
+    tsd_rad = numpy.radians(topocentric_sun_declination)
+    tlha_rad = numpy.radians(topocentric_local_hour_angle)
+    topocentric_elevation_angle = numpy.degrees(numpy.arcsin((numpy.sin(latitude_rad)*numpy.sin(tsd_rad)) +
+                                                             numpy.cos(latitude_rad)*numpy.cos(tsd_rad)*numpy.cos(tlha_rad)))
+    # refraction correction
+    tea = topocentric_elevation_angle
+    a = pressure_millibars*283.0*1.02
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        b = 1010.0*(temperature_celsius + 273.15)*60.0*numpy.tan(numpy.radians(tea + (10.3/(tea + 5.11))))
+        altitude = tea + a/b
+    # azimuth, measured as in pysolar.GetAzimuth
+    a = numpy.sin(tlha_rad)
+    b = numpy.cos(tlha_rad)*numpy.sin(latitude_rad) - numpy.tan(tsd_rad)*numpy.cos(latitude_rad)
+    azimuth = 180 - (180.0 + numpy.degrees(numpy.arctan2(a, b)) % 360)
+    return altitude, azimuth
+
+def get_altitude(latitude_deg, longitude_deg, utc_datetime, elevation=0,
+                 temperature_celsius=25, pressure_millibars=1013.25):
+    """
+    Purpose:
+     Vectorised pysolar.GetAltitude, returns the solar altitude in degrees
+     for all times in utc_datetime.
+    Usage:
+     altitude = pfp_solar.get_altitude(lat, lon, dt_UTC)
+    Author: PRI
+    Date: October 2026
+    """
+    altitude, _ = get_solar_position(latitude_deg, longitude_deg, utc_datetime, elevation=elevation,
+                                     temperature_celsius=temperature_celsius,
+                                     pressure_millibars=pressure_millibars)
+    return altitude
+
+def get_radiation_direct(utc_datetime, altitude_deg):
+    """
+    Purpose:
+     Vectorised pysolar.GetRadiationDirect, returns the clear sky downwelling
+     shortwave radiation (W/m2) from the solar altitude (degrees).
+    Usage:
+     Fsd_syn = pfp_solar.get_radiation_direct(dt_UTC, altitude)
+    Author: PRI
+    Date: October 2026
+    """
+    day = get_day_of_year(to_datetime64(utc_datetime))
+    altitude_deg = numpy.asarray(altitude_deg, dtype=numpy.float64)
+    flux = 1160 + (75*numpy.sin(numpy.radians((360./365)*(day - 275))))
+    optical_depth = 0.174 + (0.035*numpy.sin(numpy.radians((360./365)*(day - 100))))
+    radiation = numpy.zeros(len(altitude_deg))
+    idx = numpy.where(altitude_deg > 0)[0]
+    sin_altitude = numpy.sin(numpy.radians(altitude_deg[idx]))
+    radiation[idx] = flux[idx]*numpy.exp(-1*optical_depth[idx]/sin_altitude)*sin_altitude
+    return radiation
@@ -0,0 +1,357 @@
+""" In-process versions of the SOFM, SOLO and SEQSOLO neural network codes."""
+# standard modules
+import hashlib
+import logging
+import platform
+# 3rd party modules
+import numpy
+# PFP modules
+import constants as c
+
+logger = logging.getLogger("pfp_log")
+
+# trained SOFM maps, the same drivers are often used for several targets
+sofm_maps = {}
+
+# This module reproduces the C++ code under solo/ (Kuo-lin Hsu) using numpy
+# so that gfSOLO can run the network without writing input files, launching
+# the executables and reading the output files back for every window.
+# The C++ code works in single precision and passes the network between the
+# three programs as text files; both are reproduced here (see round_trip) so
+# that the results agree with the executables to within the precision of
+# the seqOut2.out file.
+
+def c_rand(seed, n):
+    """
+    Purpose:
+     Return the first n values of rand()/RAND_MAX after srand(seed) using
+     the C library the executables are built with, the Microsoft C runtime
+     linear congruential generator on Windows and the glibc additive feedback
+     generator elsewhere.
+    Usage:
+     r = pfp_solo.c_rand(1234, 100)
+    Author: PRI
+    Date: October 2026
+    """
+    if platform.system() == "Windows":
+        values = []
+        state = seed
+        for i in range(n):
+            state = (214013*state + 2531011) & 0xffffffff
+            values.append((state >> 16) & 0x7fff)
+        return numpy.array(values, dtype=numpy.float64)/32767.0
+    r = [seed if seed != 0 else 1]
+    for i in range(1, 31):
+        hi, lo = divmod(r[i-1], 127773)
+        word = 16807*lo - 2836*hi
+        if word < 0:
+            word += 2147483647
+        r.append(word)
+    for i in range(31, 34):
+        r.append(r[i-31])
+    for i in range(34, 344 + n):
+        r.append((r[i-31] + r[i-3]) & 0xffffffff)
+    return numpy.array([x >> 1 for x in r[344:]], dtype=numpy.float64)/2147483647.0
+
+def round_trip(values, fmt):
+    """
+    Purpose:
+     Return single precision values as they would be after being written to
+     a text file with the C format fmt (eg "%8.5f") and read back in.
+    Usage:
+     Wi = pfp_solo.round_trip(Wi, "%8.5f")
+    Author: PRI
+    Date: October 2026
+    """
+    values = numpy.asarray(values)
+    out = numpy.array([float(fmt % v) for v in values.ravel()], dtype=numpy.float32)
+    return out.reshape(values.shape)
+
+def normalise(data):
+    """ Scale each column of data to the range 0 to 1, as readDataPC::normalData."""
+    data = numpy.array(data, dtype=numpy.float32)
+    dmin = data.min(axis=0)
+    dmax = data.max(axis=0)
+    return (data - dmin)/(dmax - dmin)
+
+def get_distances(x, W):
+    """
+    Purpose:
+     Return the Euclidean distance between each row of x (nda, nvars) and
+     each node weight vector in W (nnodes, nvars), accumulated in single
+     precision over the variables in the same order as the C++ code.
+    Author: PRI
+    Date: October 2026
+    """
+    dist = numpy.zeros((x.shape[0], W.shape[0]), dtype=numpy.float32)
+    for k in range(x.shape[1]):
+        d = x[:, k][:, numpy.newaxis] - W[:, k][numpy.newaxis, :]
+        dist += d*d
+    return numpy.sqrt(dist)
+
+def get_last_minimum(dist):
+    """ Index of the last minimum in each row, as the "<=" test in findMinDisHiddenOutput."""
+    ncols = dist.shape[1]
+    return ncols - 1 - numpy.argmin(dist[:, ::-1], axis=1)
+
+def get_neighbourhoods(node, Nc, coef):
+    """
+    Purpose:
+     For each node of a node x node map, return the slices of the map within
+     Nc of it (clipped at the edges of the map) and the learning rate coef
+     weighted by 1/(distance+1) used by the SOFM training.
+    Author: PRI
+    Date: October 2026
+    """
+    neighbourhoods = []
+    for i in range(node):
+        for j in range(node):
+            i0, i1 = max(i-Nc, 0), min(i+Nc, node-1) + 1
+            j0, j1 = max(j-Nc, 0), min(j+Nc, node-1) + 1
+            ii, jj = numpy.meshgrid(numpy.arange(i0, i1), numpy.arange(j0, j1), indexing="ij")
+            mxy = numpy.maximum(abs(ii - i), abs(jj - j))
+            factor = (1.0/(mxy + 1.0)).astype(numpy.float32)*coef
+            neighbourhoods.append([slice(i0, i1), slice(j0, j1), factor[:, :, numpy.newaxis]])
+    return neighbourhoods
+
+def sofm(drivers, node, ncyc, width=0.01, seed=1234):
+    """
+    Purpose:
+     Train a node x node Kohonen self-organising feature map on the drivers,
+     as solo/sofm/sofm.cc.  The drivers are normalised to the range 0 to 1
+     and the training is sequential so the loop over the data remains but
+     the distance and update calculations are vectorised over the nodes.
+     Maps are cached so that targets with the same drivers over the same
+     period share a map instead of training it again.
+    Usage:
+     Wi = pfp_solo.sofm(drivers, node, ncyc)
+     where drivers is a (nda, nvars) array
+           node is the size of the map (node x node)
+           ncyc is the number of training cycles
+           Wi is the (node, node, nvars) array of weights
+    Author: PRI
+    Date: October 2026
+    """
+    x = normalise(drivers)
+    key = (hashlib.sha1(x.tobytes()).hexdigest(), x.shape, node, ncyc, width, seed)
+    if key in sofm_maps:
+        return sofm_maps[key].copy()
+    if len(sofm_maps) > 50:
+        sofm_maps.clear()
+    nda, nvars = x.shape
+    # initial weights, the random numbers are used in k, i, j order
+    width = numpy.float32(width)
+    r = c_rand(seed, node*node*nvars).reshape((nvars, node, node))
+    tmp = (r*numpy.float64(width)).astype(numpy.float32)
+    Wi = (0.5 + (tmp.astype(numpy.float64) - numpy.float64(width)/2.0)).astype(numpy.float32)
+    Wi = numpy.ascontiguousarray(Wi.transpose((1, 2, 0)))
+    # W is a 2D view of the map used for the distances, the updates are
+    # done on slices of the 3D map
+    W = Wi.reshape((node*node, nvars))
+    Nc0 = node//2
+    d = numpy.empty_like(W)
+    for i1 in range(ncyc):
+        coef = numpy.float32(max(0.5*(1.0 - float(i1)/float(ncyc)), 0.02))
+        Nc = int(Nc0*(1.0 - float(i1)/float(ncyc)))
+        neighbourhoods = get_neighbourhoods(node, Nc, coef)
+        for i2 in range(nda):
+            xi = x[i2]
+            numpy.subtract(xi, W, out=d)
+            # sqrt is monotonic so the first minimum is unchanged by it
+            si, sj, factor = neighbourhoods[numpy.argmin(numpy.einsum("ij,ij->i", d, d))]
+            Wn = Wi[si, sj]
+            Wn += factor*(xi - Wn)
+    # the weights are written to sofm_4.out with "%8.5f"
+    sofm_maps[key] = round_trip(Wi, "%8.5f")
+    return sofm_maps[key].copy()
+
+def pc_regression(x, z, pc_fraction=1.0):
+    """
+    Purpose:
+     Principal component regression of z on x, as LLSSearchClass::linearLeastSquare.
+     The principal components explaining pc_fraction of the variance of x
+     are used.  The C++ code sets this to 99% but the sum used for the test
+     is not initialised and the optimised builds of the executables use all
+     of the components, the default here does the same.
+     Returns the regression parameters (nvars+1, the last is the intercept),
+     the eigenvalues and the eigenvectors (one per column) of the covariance
+     matrix of x or None if the regression matrix is singular.
+    Author: PRI
+    Date: October 2026
+    """
+    nda, nvars = x.shape
+    xd = x.astype(numpy.float64)
+    xt = xd - xd.mean(axis=0)
+    cov = (numpy.dot(xt.T, xt)/float(nda)).astype(numpy.float32)
+    evalue, evector = numpy.linalg.eigh(cov.astype(numpy.float64))
+    # sort the eigenvalues and eigenvectors into descending order
+    order = numpy.argsort(-evalue, kind="mergesort")
+    evalue = evalue[order].astype(numpy.float32)
+    evector = evector[:, order].astype(numpy.float32)
+    # number of principal components for pc_fraction of the variance
+    total = numpy.sum(evalue, dtype=numpy.float64)
+    fraction = numpy.cumsum(evalue, dtype=numpy.float64)/total
+    nls = nvars
+    if numpy.any(fraction[:-1] >= pc_fraction):
+        nls = int(numpy.argmax(fraction >= pc_fraction)) + 1
+    if total <= 1.0E-6 and nls == 1:
+        nls = 0
+    X = numpy.ones((nda, nls + 1), dtype=numpy.float64)
+    X[:, :nls] = numpy.dot(xd, evector[:, :nls].astype(numpy.float64))
+    try:
+        xtx_inv = numpy.linalg.inv(numpy.dot(X.T, X))
+    except numpy.linalg.LinAlgError:
+        return None
+    para_reg = numpy.dot(xtx_inv, numpy.dot(X.T, z.astype(numpy.float64)))
+    para = numpy.zeros(nvars + 1, dtype=numpy.float32)
+    para[:nls] = para_reg[:nls]
+    para[nvars] = para_reg[nls]
+    return para, evalue, evector
+
+def solo(drivers, target, Wi, nda_factor):
+    """
+    Purpose:
+     Train the hidden to output weights of the SOLO network, as solo/solo/solo.cc.
+     Each observation is assigned to the nearest SOFM node and a principal
+     component regression is fitted at each node using the observations at
+     the node and, if there are not enough, its neighbours.
+    Usage:
+     network = pfp_solo.solo(drivers, target, Wi, nda_factor)
+     where drivers is a (nda, nvars) array, target is a (nda,) array with
+           no missing data, Wi is the SOFM weights and network is a
+           dictionary of the network weights or None if the training failed.
+    Author: PRI
+    Date: October 2026
+    """
+    x = normalise(drivers)
+    z = numpy.array(target, dtype=numpy.float32)
+    nda, nvars = x.shape
+    node = Wi.shape[0]
+    nnodes = node*node
+    W = Wi.reshape((nnodes, nvars))
+    # frequency table and the data at each node
+    bmu = get_last_minimum(get_distances(x, W))
+    freq = numpy.bincount(bmu, minlength=nnodes).reshape((node, node))
+    order = numpy.argsort(bmu, kind="mergesort")
+    bounds = numpy.concatenate(([0], numpy.cumsum(freq.ravel())))
+    # untrained nodes keep the initial values
+    Wo = numpy.full((nnodes, nvars + 1), -1.0, dtype=numpy.float32)
+    eValue = numpy.ones((nnodes, nvars), dtype=numpy.float32)
+    eVector = numpy.zeros((nnodes, nvars, nvars), dtype=numpy.float32)
+    threshold = (nvars + 1)*nda_factor
+    for i in range(node):
+        for j in range(node):
+            # grow the window around the node until there are enough data
+            nWn = -1
+            nd0 = 0
+            stop = False
+            while nd0 <= threshold and not stop:
+                nWn += 1
+                nd0 = freq[max(i-nWn, 0):i+nWn+1, max(j-nWn, 0):j+nWn+1].sum()
+                if nWn >= node:
+                    stop = True
+            if stop:
+                continue
+            idx = [order[bounds[ix*node+jy]:bounds[ix*node+jy+1]]
+                   for ix in range(max(i-nWn, 0), min(i+nWn, node-1)+1)
+                   for jy in range(max(j-nWn, 0), min(j+nWn, node-1)+1)]
+            idx = numpy.concatenate(idx)
+            result = pc_regression(x[idx], z[idx])
+            if result is None:
+                msg = " SOLO: singular matrix at node (" + str(i) + "," + str(j) + ")"
+                logger.error(msg)
+                return None
+            Wo[i*node+j], eValue[i*node+j], eVector[i*node+j] = result
+    # the network is written to text files with 6 significant digits
+    network = {"Wo": round_trip(Wo, "%.6g"), "freq": freq,
+               "eValue": round_trip(eValue, "%.6g"),
+               "eVector": round_trip(eVector, "%.6g")}
+    return network
+
+def seqsolo(drivers, target, Wi, network, learning_rate, iterations,
+            cal_threshold=0, missing_value=c.missing_value):
+    """
+    Purpose:
+     Run the SOLO network in simulation mode with sequential training of the
+     hidden to output weights, as solo/seqsolo/seqsolo.cc, and return the
+     modelled target from the final, adaptive pass (the seqOut2.out file).
+     The hidden node and the principal components of each record do not
+     change during the training and the updates at different nodes are
+     independent, so each pass over the data is an affine map of the
+     weights at each node that is found once and then applied iterations
+     times.
+    Usage:
+     output = pfp_solo.seqsolo(drivers, target, Wi, network, learning_rate, iterations)
+     where target contains missing_value where there are no observations.
+    Author: PRI
+    Date: October 2026
+    """
+    x = normalise(drivers)
+    z = numpy.array(target, dtype=numpy.float32)
+    nda, nvars = x.shape
+    nnodes = Wi.shape[0]*Wi.shape[1]
+    W = Wi.reshape((nnodes, nvars))
+    Wo = network["Wo"].copy()
+    eVector = network["eVector"]
+    lr = numpy.float32(learning_rate)
+    # hidden node for each record, only nodes above the threshold are used
+    dist = get_distances(x, W)
+    dist[:, network["freq"].ravel() < cal_threshold] = numpy.inf
+    bmu = get_last_minimum(dist)
+    # principal components and inputs to the output node for each record
+    ypc = numpy.einsum("nj,nji->ni", x, eVector[bmu])
+    a = numpy.concatenate((ypc, numpy.ones((nda, 1), dtype=numpy.float32)), axis=1)
+    observed = (z != numpy.float32(missing_value))
+    # records grouped by rank within their node, records of the same rank
+    # are at different nodes and can be updated together
+    ranks = get_node_ranks(bmu, observed)
+    if lr > 0.0 and int(iterations) > 1:
+        # w -> M.w + b for one pass over the observations at each node
+        nw = nvars + 1
+        M = numpy.tile(numpy.eye(nw), (nnodes, 1, 1))
+        b = numpy.zeros((nnodes, nw), dtype=numpy.float64)
+        for idx in ranks:
+            n = bmu[idx]
+            ai = a[idx].astype(numpy.float64)
+            lr_a = float(lr)*ai
+            M[n] -= lr_a[:, :, numpy.newaxis]*numpy.einsum("ni,nij->nj", ai, M[n])[:, numpy.newaxis, :]
+            b[n] += lr_a*(z[idx] - numpy.einsum("ni,ni->n", ai, b[n]))[:, numpy.newaxis]
+        w = Wo.astype(numpy.float64)
+        for k in range(int(iterations)):
+            w = numpy.einsum("nij,nj->ni", M, w) + b
+        Wo = w.astype(numpy.float32)
+    # final pass, the output for each record is from the weights before the
+    # update for that record
+    output = numpy.zeros(nda, dtype=numpy.float32)
+    for idx in get_node_ranks(bmu, numpy.ones(nda, dtype=bool)):
+        n = bmu[idx]
+        zout = numpy.einsum("ni,ni->n", a[idx], Wo[n])
+        output[idx] = zout
+        obs = observed[idx]
+        error = (z[idx] - zout)*obs
+        Wo[n] += (lr*error)[:, numpy.newaxis]*a[idx]
+    # seqOut2.out is written with 4 decimal places
+    return numpy.array([float("%.4f" % v) for v in output])
+
+def get_node_ranks(bmu, mask):
+    """
+    Purpose:
+     Group the records selected by mask by their order of appearance at their
+     node, returns a list whose n'th element is the indices of the n'th
+     record at each node.
+    Author: PRI
+    Date: October 2026
+    """
+    idx = numpy.where(mask)[0]
+    order = idx[numpy.argsort(bmu[idx], kind="mergesort")]
+    nodes = bmu[order]
+    starts = numpy.flatnonzero(numpy.concatenate(([True], nodes[1:] != nodes[:-1])))
+    counts = numpy.diff(numpy.concatenate((starts, [len(order)])))
+    rank = numpy.arange(len(order)) - numpy.repeat(starts, counts)
+    ranks = []
+    if len(order) > 0:
+        by_rank = numpy.argsort(rank, kind="mergesort")
+        bounds = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(rank))))
+        for r in range(len(bounds) - 1):
+            ranks.append(order[by_rank[bounds[r]:bounds[r+1]]])
+    return ranks
@@ -15,6 +15,7 @@ import pfp_mpt
 import pfp_io
 import pfp_levels
 import pfp_plot
+import pfp_rp
 import pfp_utils
 import split_dialog
 
@@ -413,11 +414,11 @@ def do_run_l1(cfg):
     """
     try:
         logger.info("Starting L1 processing")
+        incremental = pfp_io.incremental_get_info(cfg)
         ds1 = pfp_levels.l1qc(cfg)
         if ds1.returncodes["value"] == 0:
-            outfilename = pfp_io.get_outfilenamefromcf(cfg)
-            ncFile = pfp_io.nc_open_write(outfilename)
-            pfp_io.nc_write_series(ncFile, ds1)
+            pfp_io.incremental_truncate(ds1, incremental)
+            pfp_io.incremental_write(cfg, ds1, incremental)
             logger.info("Finished L1 processing")
         else:
             msg = "An error occurred during L1 processing"
@@ -449,15 +450,14 @@ def do_run_l2(cfg):
             in_filename = os.path.split(in_filepath)
             logger.error("File "+in_filename[1]+" not found")
             return
-        ds1 = pfp_io.nc_read_series(in_filepath)
+        incremental = pfp_io.incremental_get_info(cfg)
+        ds1 = pfp_io.nc_read_series(in_filepath, start=incremental["start"])
         ds2 = pfp_levels.l2qc(cfg, ds1)
         if ds2.returncodes["value"] != 0:
             logger.error("An error occurred during L2 processing")
             logger.error("")
             return
-        out_filepath = pfp_io.get_outfilenamefromcf(cfg)
-        nc_file = pfp_io.nc_open_write(out_filepath)
-        pfp_io.nc_write_series(nc_file, ds2)
+        pfp_io.incremental_write(cfg, ds2, incremental)
         logger.info("Finished L2 processing")
         if "Plots" in list(cfg.keys()):
             logger.info("Plotting L1 and L2 data")
@@ -498,15 +498,15 @@ def do_run_l3(cfg):
             in_filename = os.path.split(in_filepath)
             logger.error("File "+in_filename[1]+" not found")
             return
-        ds2 = pfp_io.nc_read_series(in_filepath)
+        columnar = pfp_utils.get_optionskeyaslogical(cfg, "ColumnarDataStructure")
+        incremental = pfp_io.incremental_get_info(cfg)
+        ds2 = pfp_io.nc_read_series(in_filepath, columnar=columnar, start=incremental["start"])
         ds3 = pfp_levels.l3qc(cfg, ds2)
         if ds3.returncodes["value"] != 0:
             logger.error("An error occurred during L3 processing")
             logger.error("")
             return
-        out_filepath = pfp_io.get_outfilenamefromcf(cfg)
-        nc_file = pfp_io.nc_open_write(out_filepath)
-        pfp_io.nc_write_series(nc_file, ds3)
+        pfp_io.incremental_write(cfg, ds3, incremental)
         logger.info("Finished L3 processing")
         if "Plots" in list(cfg.keys()):
             logger.info("Plotting L3 data")
@@ -547,7 +547,9 @@ def do_run_l4(main_gui, cfg):
             in_filename = os.path.split(in_filepath)
             logger.error("File "+in_filename[1]+" not found")
             return
-        ds3 = pfp_io.nc_read_series(in_filepath)
+        columnar = pfp_utils.get_optionskeyaslogical(cfg, "ColumnarDataStructure")
+        incremental = pfp_io.incremental_get_info(cfg)
+        ds3 = pfp_io.nc_read_series(in_filepath, columnar=columnar, start=incremental["start"])
         #ds3.globalattributes['controlfile_name'] = cfg['controlfile_name']
         sitename = ds3.globalattributes['site_name']
         if "Options" not in cfg:
@@ -558,9 +560,7 @@ def do_run_l4(main_gui, cfg):
             logger.info("Quitting L4: " + sitename)
         else:
             logger.info("Finished L4: " + sitename)
-            out_filepath = pfp_io.get_outfilenamefromcf(cfg)
-            nc_file = pfp_io.nc_open_write(out_filepath)
-            pfp_io.nc_write_series(nc_file, ds4)         # save the L4 data
+            pfp_io.incremental_write(cfg, ds4, incremental)
             logger.info("Finished saving L4 gap filled data")
         logger.info("")
     except Exception:
@@ -589,7 +589,9 @@ def do_run_l5(main_gui, cfg):
             in_filename = os.path.split(in_filepath)
             logger.error("File "+in_filename[1]+" not found")
             return
-        ds4 = pfp_io.nc_read_series(in_filepath)
+        columnar = pfp_utils.get_optionskeyaslogical(cfg, "ColumnarDataStructure")
+        incremental = pfp_io.incremental_get_info(cfg)
+        ds4 = pfp_io.nc_read_series(in_filepath, columnar=columnar, start=incremental["start"])
         #ds4.globalattributes['controlfile_name'] = cfg['controlfile_name']
         sitename = ds4.globalattributes['site_name']
         if "Options" not in cfg:
@@ -600,9 +602,7 @@ def do_run_l5(main_gui, cfg):
             logger.info("Quitting L5: "+sitename)
         else:
             logger.info("Finished L5: "+sitename)
-            out_filepath = pfp_io.get_outfilenamefromcf(cfg)
-            nc_file = pfp_io.nc_open_write(out_filepath)
-            pfp_io.nc_write_series(nc_file, ds5)
+            pfp_io.incremental_write(cfg, ds5, incremental)
             logger.info("Finished saving L5 gap filled data")
         logger.info("")
     except Exception:
@@ -631,22 +631,27 @@ def do_run_l6(main_gui, cfg):
             in_filename = os.path.split(in_filepath)
             logger.error("File "+in_filename[1]+" not found")
             return
-        ds5 = pfp_io.nc_read_series(in_filepath)
+        columnar = pfp_utils.get_optionskeyaslogical(cfg, "ColumnarDataStructure")
+        incremental = pfp_io.incremental_get_info(cfg)
+        ds5 = pfp_io.nc_read_series(in_filepath, columnar=columnar, start=incremental["start"])
         #ds5.globalattributes['controlfile_name'] = cfg['controlfile_name']
         sitename = ds5.globalattributes['site_name']
         if "Options" not in cfg:
             cfg["Options"] = {}
         cfg["Options"]["call_mode"] = "interactive"
         cfg["Options"]["show_plots"] = "Yes"
-        ds6 = pfp_levels.l6qc(main_gui, cfg, ds5)
+        summary = (incremental["mode"] != "append")
+        ds6 = pfp_levels.l6qc(main_gui, cfg, ds5, summary=summary)
         if ds6.returncodes["value"] != 0:
             logger.info("Quitting L6: "+sitename)
         else:
             logger.info("Finished L6: "+sitename)
-            out_filepath = pfp_io.get_outfilenamefromcf(cfg)
-            nc_file = pfp_io.nc_open_write(out_filepath)
-            pfp_io.nc_write_series(nc_file, ds6)
+            pfp_io.incremental_write(cfg, ds6, incremental)
             logger.info("Finished saving L6 gap filled data")
+            if not summary:
+                # the summary is for the whole of the spliced file
+                ds6 = pfp_io.nc_read_series(pfp_io.get_outfilenamefromcf(cfg))
+                pfp_rp.L6_summary(cfg, ds6)
         logger.info("")
     except Exception:
         msg = " Error running L6, see below for details ..."
@@ -2,6 +2,7 @@
 import ast
 import copy
 import datetime
+import hashlib
 import inspect
 import logging
 # 3d party
@@ -14,8 +15,8 @@ import meteorologicalfunctions as pfp_mf
 import pfp_cfg
 import pfp_func
 import pfp_io
+import pfp_solar
 import pfp_utils
-import pysolar
 
 logger = logging.getLogger("pfp_log")
 
@@ -1116,8 +1117,7 @@ def CalculateFcStorageSinglePoint(cf, ds, Fc_out="Fc_single", CO2_in="CO2"):
             # convert the CO2 concentration difference from umol/mol to umol/m3
             dc = pfp_mf.co2_umolpm3fromppm(dc, Ta["Data"], ps["Data"])
             # calculate the time step in seconds
-            epoch = datetime.datetime(1970, 1, 1, 0, 0, 0)
-            seconds = numpy.array([(dt-epoch).total_seconds() for dt in ldt["Data"]])
+            seconds = pfp_utils.get_datetime64(ds).astype("datetime64[s]").astype(numpy.int64)
             dt = numpy.ediff1d(seconds, to_begin=float(ts)*60)
             # calculate the CO2 flux based on storage below the measurement height
             Fc_single["Data"] = zms*dc/dt
@@ -2123,6 +2123,40 @@ def get_qcflag(ds):
         index = numpy.where(ds.series[ThisOne]['Data']==c.missing_value)[0]
         ds.series[ThisOne]['Flag'][index] = numpy.int32(1)
 
+def get_solar_variables(ds):
+    """
+    Purpose:
+     Return a dictionary with the solar altitude, the solar azimuth and the
+     synthetic (clear sky) downwelling shortwave for the time axis of the
+     data structure.  The results are cached on the data structure so that
+     repeated calls (eg from the day, night and evening indicators) do not
+     calculate them again.  The cache is keyed on the latitude, longitude,
+     time zone and the time axis so it is not used after any of these change.
+     Returns None if the UTC time can not be found.
+    Usage:
+     solar = pfp_ts.get_solar_variables(ds)
+     altitude = solar["altitude"]
+    Author: PRI
+    Date: October 2026
+    """
+    lat = float(ds.globalattributes["latitude"])
+    lon = float(ds.globalattributes["longitude"])
+    dt64 = pfp_utils.get_datetime64(ds)
+    key = hashlib.sha1(numpy.ascontiguousarray(dt64).tobytes()).hexdigest()
+    key = (lat, lon, ds.globalattributes.get("time_zone", ""), key)
+    cache = getattr(ds, "solar_variables", None)
+    if cache is not None and cache["key"] == key:
+        return cache
+    dt_utc = pfp_utils.get_UTCfromlocaltime64(ds)
+    if dt_utc is None:
+        return None
+    altitude, azimuth = pfp_solar.get_solar_position(lat, lon, dt_utc)
+    Fsd_syn = pfp_solar.get_radiation_direct(dt_utc, altitude)
+    # the key uses the time zone found by get_UTCfromlocaltime64
+    key = (lat, lon, ds.globalattributes.get("time_zone", ""), key[3])
+    ds.solar_variables = {"key": key, "altitude": altitude, "azimuth": azimuth, "Fsd_syn": Fsd_syn}
+    return ds.solar_variables
+
 def get_synthetic_fsd(ds):
     """
     Purpose:
@@ -2132,18 +2166,18 @@ def get_synthetic_fsd(ds):
      pfp_ts.get_synthetic_fsd(ds)
     Author: PRI
     Date: Sometime in 2014
+    Modified:
+     October 2026 - solar altitude and synthetic Fsd from get_solar_variables, these
+                    are cached on the data structure
     """
     logger.info(' Calculating synthetic Fsd')
-    # get the latitude and longitude
-    lat = float(ds.globalattributes["latitude"])
-    lon = float(ds.globalattributes["longitude"])
-    # get the UTC time from the local time
-    ldt_UTC = pfp_utils.get_UTCfromlocaltime(ds)
-    # get the solar altitude
-    alt_solar = [pysolar.GetAltitude(lat,lon,dt) for dt in ldt_UTC]
-    # get the synthetic downwelling shortwave radiation
-    Fsd_syn = [pysolar.GetRadiationDirect(dt,alt) for dt,alt in zip(ldt_UTC,alt_solar)]
-    Fsd_syn = numpy.ma.array(Fsd_syn)
+    # get the solar altitude and the synthetic downwelling shortwave radiation
+    solar = get_solar_variables(ds)
+    if solar is None:
+        logger.error(" get_synthetic_fsd: unable to get UTC time, synthetic Fsd not calculated")
+        return
+    alt_solar = numpy.ma.array(solar["altitude"])
+    Fsd_syn = numpy.ma.array(solar["Fsd_syn"])
     # get the QC flag
     nRecs = len(Fsd_syn)
     flag = numpy.zeros(nRecs,dtype=numpy.int32)
@@ -2500,10 +2534,10 @@ def MergeDataStructures(ds_dict, l1_info):
     end = max(end)
     # put the datetime into the data structure
     ts = int(ds.globalattributes["time_step"])
-    dts = datetime.timedelta(minutes=ts)
+    dts = numpy.timedelta64(ts, "m")
     # generate an aray of datetime from start to end with spacing of ts
-    dt = numpy.array([d for d in pfp_utils.perdelta(start, end, dts)])
-    nrecs = len(dt)
+    nrecs = int((numpy.datetime64(end, "s") - numpy.datetime64(start, "s"))//dts) + 1
+    dt = pfp_utils.get_datetime_from_datetime64(numpy.datetime64(start, "s") + numpy.arange(nrecs)*dts)
     var = pfp_utils.CreateEmptyVariable("DateTime", nrecs)
     var["Label"] = "DateTime"
     var["Data"] = dt
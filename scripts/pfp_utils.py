@@ -5,10 +5,14 @@ import copy
 import datetime
 import logging
 import math
+import multiprocessing
 import numbers
 import os
+import shutil
 import sys
+import tempfile
 import time
+import weakref
 # third party modules
 import cftime
 import dateutil
@@ -23,6 +27,349 @@ import pfp_func
 
 logger = logging.getLogger("pfp_log")
 
+class DateTimeVariable(dict):
+    """
+    Purpose:
+     The variable dictionary used for ds.series["DateTime"].  The time axis is
+     held as a numpy datetime64 array in "Data64" and the array of Python
+     datetimes in "Data" is only created the first time it is asked for.
+     Assigning to either "Data" or "Data64" replaces the time axis and drops
+     the other representation, it is re-created from the new values when
+     needed.
+     The datetime64 array has a unit of seconds unless the time stamps contain
+     fractions of a second (eg times read from Excel before rounding), in which
+     case the unit is microseconds.
+    Usage:
+     ds.series["DateTime"] = pfp_utils.DateTimeVariable({"Data64": dt64, "Flag": flag, "Attr": attr})
+     dt64 = ds.series["DateTime"]["Data64"]
+     ldt = ds.series["DateTime"]["Data"]
+    Author: PRI
+    Date: October 2026
+    """
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        # "Data64" takes precedence if both are given
+        if dict.__contains__(self, "Data64") and dict.__contains__(self, "Data"):
+            dict.__delitem__(self, "Data")
+
+    def __getitem__(self, key):
+        if key == "Data" and not dict.__contains__(self, "Data") and dict.__contains__(self, "Data64"):
+            dt64 = dict.__getitem__(self, "Data64")
+            ldt = get_datetime_from_datetime64(dt64)
+            # lookups on the Python datetimes use the index of the datetime64 array
+            register_time_index(ldt, get_time_index(dt64))
+            dict.__setitem__(self, "Data", ldt)
+        elif key == "Data64" and not dict.__contains__(self, "Data64") and dict.__contains__(self, "Data"):
+            dict.__setitem__(self, "Data64", get_datetime64_from_datetime(dict.__getitem__(self, "Data")))
+        return dict.__getitem__(self, key)
+
+    def __setitem__(self, key, value):
+        # the two representations of the time axis must stay in step
+        if key == "Data":
+            dict.pop(self, "Data64", None)
+        elif key == "Data64":
+            dict.pop(self, "Data", None)
+        dict.__setitem__(self, key, value)
+
+    def __contains__(self, key):
+        if key in ["Data", "Data64"]:
+            return dict.__contains__(self, "Data") or dict.__contains__(self, "Data64")
+        return dict.__contains__(self, key)
+
+    def has_key(self, key):
+        return self.__contains__(key)
+
+    def keys(self):
+        keys = [key for key in dict.keys(self) if key not in ["Data", "Data64"]]
+        if "Data" in self:
+            keys = ["Data", "Data64"] + keys
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def copy(self):
+        return DateTimeVariable(dict.copy(self))
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        # Python datetimes are immutable so the object array is copied but
+        # the datetimes in it are not, this saves re-creating them
+        new = DateTimeVariable()
+        memo[id(self)] = new
+        for key in dict.keys(self):
+            value = dict.__getitem__(self, key)
+            if key in ["Data", "Data64"] and isinstance(value, numpy.ndarray):
+                dict.__setitem__(new, key, value.copy())
+            else:
+                dict.__setitem__(new, key, copy.deepcopy(value, memo))
+        return new
+
+    def __reduce__(self):
+        # only the datetime64 array is pickled
+        d = {key: dict.__getitem__(self, key) for key in dict.keys(self)
+             if key not in ["Data", "Data64"]}
+        if "Data64" in self:
+            d["Data64"] = self["Data64"]
+        return (DateTimeVariable, (d,))
+
+class TimeIndex(object):
+    """
+    Purpose:
+     An index of a time axis used by GetDateIndex.  Exact and nearest lookups
+     are done by binary search on the datetime64 array and the start of the
+     next day/hour/month and end of the previous day/hour/month are found
+     from tables of the indices of those boundaries.  The tables are built
+     the first time they are needed and kept for later lookups.
+     The index is for the values in the array, a new index is made when the
+     time axis in the data structure is replaced.
+    Usage:
+     index = pfp_utils.get_time_index(ds)
+     i = index.get_index(date, ts=30, default=0, match="exact")
+    Author: PRI
+    Date: October 2026
+    """
+    def __init__(self, dt64):
+        self.dt64 = dt64
+        self.unit = numpy.datetime_data(dt64.dtype)[0]
+        self.nrecs = len(dt64)
+        self.tables = {}
+
+    def _table(self, match, ts):
+        """ Return the sorted indices of the time axis boundaries for match."""
+        key = (match, ts)
+        if key not in self.tables:
+            dt64 = self.dt64
+            day = dt64.astype("datetime64[D]")
+            # minutes since midnight and since the start of the hour, ignoring seconds
+            tod = (dt64.astype("datetime64[m]") - day).astype(numpy.int64)
+            if match == "startnextday":
+                condition = (tod == ts)
+            elif match == "endpreviousday":
+                condition = (tod == 0)
+            elif match == "startnextmonth":
+                condition = (tod == ts) & (day == day.astype("datetime64[M]"))
+            elif match == "endpreviousmonth":
+                condition = (tod == 0) & (day == day.astype("datetime64[M]"))
+            elif match == "startnexthour":
+                condition = (tod % 60 == ts)
+            elif match == "endprevioushour":
+                condition = (tod % 60 == 0)
+            self.tables[key] = numpy.flatnonzero(condition)
+        return self.tables[key]
+
+    def find_nearest(self, date):
+        """ Return the index of the time closest to date, as find_nearest_value."""
+        value = numpy.datetime64(date, "us")
+        # search in the units of the array to avoid converting the whole array,
+        # truncating value to these units does not change the result
+        i = int(numpy.searchsorted(self.dt64, value.astype("datetime64["+self.unit+"]"), side="right")) - 1
+        if i < self.nrecs-1:
+            if abs(self.dt64[i+1]-value) <= abs(self.dt64[i]-value):
+                i = i + 1
+        return i
+
+    def in_range(self, date):
+        """ Return True if date is between the first and last times."""
+        value = numpy.datetime64(date, "us")
+        return (value >= self.dt64[0]) and (value <= self.dt64[-1])
+
+    def get_index(self, date, ts=30, default=0, match="exact"):
+        """ Same as pfp_utils.GetDateIndex."""
+        # trap default values of -1 since -1 + 1 = 0
+        if default == -1:
+            default = self.nrecs-1
+        if (isinstance(date, numbers.Number)):
+            if date >= 0 and date <= self.nrecs:
+                i = date
+            else:
+                i = default
+        elif isinstance(date, str):
+            date = parse_date_string(date)
+            if date is not None and date.tzinfo is None and self.in_range(date):
+                i = self.find_nearest(date)
+            else:
+                # set to default if parsing failed or not within the range of the data
+                i = default
+        elif isinstance(date, datetime.datetime) and date.tzinfo is None:
+            if self.in_range(date):
+                i = self.find_nearest(date)
+            else:
+                i = default
+        else:
+            msg = " Unrecognised object passed in as date, returning default index"
+            logger.warning(msg)
+            i = default
+        if match == "exact":
+            return i
+        if match in ["startnexthour", "endprevioushour"] and int(ts) == 60:
+            # if the time step is 60 then it is always the start or end of an hour
+            return i
+        if match in ["startnextday", "startnexthour", "startnextmonth"]:
+            table = self._table(match, int(ts))
+            k = numpy.searchsorted(table, i, side="left")
+        elif match in ["endpreviousday", "endprevioushour", "endpreviousmonth"]:
+            table = self._table(match, int(ts))
+            k = numpy.searchsorted(table, i, side="right") - 1
+        else:
+            logger.error("GetDateIndex: Unrecognised match option")
+            return i
+        if k < 0 or k >= len(table):
+            msg = " GetDateIndex: no " + match + " boundary found, returning index unchanged"
+            logger.warning(msg)
+            return i
+        return int(table[k])
+
+class Workspace(object):
+    """
+    Purpose:
+     A scratch directory for one run of the external programs (MDS, MPT and
+     SOLO).  Each run gets its own directory so that runs for different sites,
+     or for different windows of the same site, can go at the same time
+     without overwriting each other's input and output files.  The directory
+     is made in the system temporary directory, or in /dev/shm when in_memory
+     is True and /dev/shm exists.  The external programs read some paths from
+     text files with spaces as separators, so if the temporary directory path
+     has spaces in it the workspace is made in <name>/scratch instead.
+     The directory is removed by cleanup(), or on leaving a "with" block.
+     Files in the "log" sub-directory are first copied to log_dir, if given,
+     with log_prefix added to the front of the file name.
+    Usage:
+     with pfp_utils.Workspace("mds", ["input", "output", "log"]) as ws:
+         in_file_path = ws.path("input", "data.csv")
+    Author: PRI
+    Date: October 2026
+    """
+    def __init__(self, name, sub_directories, in_memory=False, log_dir=None, log_prefix=""):
+        base = tempfile.gettempdir()
+        if in_memory and os.path.isdir("/dev/shm"):
+            base = "/dev/shm"
+        if " " in os.path.abspath(base):
+            base = os.path.join(name, "scratch")
+            if not os.path.isdir(base):
+                os.makedirs(base)
+        self.root = tempfile.mkdtemp(prefix=name + "_", dir=base)
+        for item in sub_directories:
+            os.mkdir(os.path.join(self.root, item))
+        self.log_dir = log_dir
+        self.log_prefix = log_prefix
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+        return False
+
+    def path(self, *parts):
+        """ Return the path of parts in the workspace."""
+        return os.path.join(self.root, *parts)
+
+    def cleanup(self):
+        """ Copy the log files to log_dir and remove the workspace."""
+        log_path = self.path("log")
+        if (self.log_dir is not None and os.path.isdir(self.log_dir) and
+            os.path.isdir(log_path)):
+            for item in os.listdir(log_path):
+                shutil.copy(os.path.join(log_path, item),
+                            os.path.join(self.log_dir, self.log_prefix + item))
+        shutil.rmtree(self.root, ignore_errors=True)
+        return
+
+# time indices of the datetime arrays in use, keyed on id() of the array
+time_indices = {}
+# datetimes parsed from date strings, GetDateIndex gets the same strings many times
+parsed_dates = {}
+
+def register_time_index(array, index):
+    """
+    Purpose:
+     Remember the time index for array so that later calls to GetDateIndex
+     with array use it.  The entry is removed when array is deleted.
+    Usage:
+     pfp_utils.register_time_index(ldt, index)
+    Author: PRI
+    Date: October 2026
+    """
+    key = id(array)
+    def forget(ref, key=key, indices=time_indices):
+        if key in indices and indices[key][0] is ref:
+            del indices[key]
+    time_indices[key] = (weakref.ref(array, forget), index)
+    return index
+
+def get_time_index(source):
+    """
+    Purpose:
+     Return the TimeIndex for the time axis of a data structure or for a
+     datetime64 array.  The index is made once and re-used until the time
+     axis is replaced.
+     For any other array, the index is returned if one has been registered
+     for it (eg the Python datetimes in ds.series["DateTime"]["Data"]),
+     otherwise None is returned.
+    Usage:
+     index = pfp_utils.get_time_index(ds)
+    Author: PRI
+    Date: October 2026
+    """
+    if hasattr(source, "series"):
+        dt64 = get_datetime64(source)
+        index = get_time_index(dt64)
+        variable = source.series["DateTime"]
+        if dict.__contains__(variable, "Data"):
+            ldt = dict.__getitem__(variable, "Data")
+            if get_time_index(ldt) is None and isinstance(ldt, numpy.ndarray):
+                register_time_index(ldt, index)
+        return index
+    entry = time_indices.get(id(source))
+    if entry is not None and entry[0]() is source:
+        return entry[1]
+    if isinstance(source, numpy.ndarray) and source.dtype.kind == "M" and source.ndim == 1:
+        return register_time_index(source, TimeIndex(source))
+    return None
+
+def parse_date_string(date_string):
+    """
+    Purpose:
+     Parse a date string with dateutil and cache the result, returns None
+     if the string can't be parsed.
+    Usage:
+     date = pfp_utils.parse_date_string("2015-01-01 00:30")
+    Author: PRI
+    Date: October 2026
+    """
+    if date_string not in parsed_dates:
+        if len(parsed_dates) > 10000:
+            parsed_dates.clear()
+        try:
+            parsed_dates[date_string] = dateutil.parser.parse(date_string)
+        except Exception:
+            parsed_dates[date_string] = None
+    return parsed_dates[date_string]
+
 def append_string(attr, string_to_add, caps=True):
     """
     Purpose:
@@ -95,7 +442,7 @@ def get_optionskeyaslogical(cf, key, default=False):
             returnValue = cf.get("Options").as_bool(key)
     return returnValue
 
-def CheckQCFlags(ds):
+def CheckQCFlags(ds, mode="verbose"):
     """
     Purpose:
      Make sure that all values of -9999 in a data series have a non-zero QC flag value.
@@ -103,13 +450,16 @@ def CheckQCFlags(ds):
      pfp_utils.CheckQCFlags(ds)
     Author: PRI
     Date: August 2014
+    Modified:
+     October 2026 - added mode, mode="quiet" does not log the opening message
     """
-    msg = " Checking missing data and QC flags are consistent"
-    logger.info(msg)
+    if mode == "verbose":
+        msg = " Checking missing data and QC flags are consistent"
+        logger.info(msg)
     labels = [label for label in ds.series.keys() if label not in ["DateTime"]]
     # force any values of -9999 with QC flags of 0 to have a QC flag of 8
     for label in labels:
-        var = GetVariable(ds, label)
+        var = GetVariable(ds, label, copy=False)
         condition = numpy.ma.getmaskarray(var["Data"]) & (numpy.mod(var["Flag"],10) == 0)
         idx = numpy.ma.where(condition == True)[0]
         if len(idx)!=0:
@@ -120,7 +470,7 @@ def CheckQCFlags(ds):
     # force all values != -9999 to have QC flag = 0, 10, 20 etc
     nRecs = int(ds.globalattributes["nc_nrecs"])
     for label in labels:
-        var = GetVariable(ds, label)
+        var = GetVariable(ds, label, copy=False)
         condition = (numpy.ma.getmaskarray(var["Data"]) == False) & (numpy.mod(var["Flag"],10) != 0)
         idx = numpy.where(condition == True)[0]
         if len(idx)!=0:
@@ -1215,9 +1565,11 @@ def CreateVariable(ds, variable, over_write=True):
     # create a temporary series to avoid premature overwrites
     ds.series[label] = {}
     # put the data into the temporary series
-    if numpy.ma.isMA(variable["Data"]):
+    if numpy.ma.isMA(variable["Data"]) and not getattr(ds.series, "columnar", False):
         ds.series[label]["Data"] = numpy.ma.filled(variable["Data"], float(c.missing_value))
     else:
+        # columnar data structures fill masked values as they are written,
+        # see pfp_io.ColumnarSeries._write_data
         ds.series[label]["Data"] = variable["Data"]
     # copy or make the QC flag
     ds.series[label]["Flag"] = variable["Flag"]
@@ -1380,15 +1732,15 @@ def FindMatchingIndices(a, b):
 
 def RemoveDuplicateRecords(ds):
     """ Remove duplicate records."""
-    # the ds.series["DateTime"]["Data"] series is actually a list
-    for item in ["DateTime","DateTime_UTC"]:
-        if item in ds.series.keys():
-            ldt,ldt_flag,ldt_attr = GetSeries(ds,item)
-            # ldt_nodups is returned as an ndarray
-            ldt_nodups,idx_nodups = numpy.unique(ldt,return_index=True)
-            # and put it back into the data structure
-            ds.series[item]["Data"] = ldt_nodups
-            ds.series[item]["Flag"] = ldt_flag[idx_nodups]
+    # find the unique times using the datetime64 series
+    dt64_nodups,idx_nodups = numpy.unique(get_datetime64(ds),return_index=True)
+    ds.series["DateTime"]["Data64"] = dt64_nodups
+    ds.series["DateTime"]["Flag"] = ds.series["DateTime"]["Flag"][idx_nodups]
+    # the UTC datetimes are time zone aware Python datetimes, use the same indices
+    if "DateTime_UTC" in ds.series.keys():
+        ldt_utc = numpy.array(ds.series["DateTime_UTC"]["Data"])
+        ds.series["DateTime_UTC"]["Data"] = ldt_utc[idx_nodups]
+        ds.series["DateTime_UTC"]["Flag"] = ds.series["DateTime_UTC"]["Flag"][idx_nodups]
     # get a list of the series in the data structure
     series_list = [item for item in ds.series.keys() if '_QCFlag' not in item]
     # remove the DateTime
@@ -1400,7 +1752,7 @@ def RemoveDuplicateRecords(ds):
         data_nodups = data_dups[idx_nodups]
         flag_nodups = flag_dups[idx_nodups]
         CreateSeries(ds,ThisOne,data_nodups,flag_nodups,attr)
-    ds.globalattributes['nc_nrecs'] = len(ds.series["DateTime"]["Data"])
+    ds.globalattributes['nc_nrecs'] = len(dt64_nodups)
 
 def FixNonIntegralTimeSteps(ds,fixtimestepmethod=""):
     """
@@ -1419,8 +1771,8 @@ def FixNonIntegralTimeSteps(ds,fixtimestepmethod=""):
      Implement [I]nterpolate
     """
     ts = int(ds.globalattributes["time_step"])
-    ldt = ds.series["DateTime"]["Data"]
-    dt_diffs = numpy.array([(ldt[i]-rounddttots(ldt[i],ts=ts)).total_seconds() for i in range(1,len(ldt))])
+    dt64 = get_datetime64(ds)
+    dt_diffs = (dt64[1:]-round_datetime64(dt64[1:],ts=ts))/numpy.timedelta64(1, "s")
     logger.info(" Maximum drift is "+str(numpy.max(dt_diffs))+" seconds, minimum drift is "+str(numpy.min(dt_diffs))+" seconds")
     ans = fixtimestepmethod
     if ans=="": ans = raw_input("Do you want to [Q]uit, [I]nterploate or [R]ound? ")
@@ -1434,12 +1786,12 @@ def FixNonIntegralTimeSteps(ds,fixtimestepmethod=""):
         return
     if ans.lower()[0]=="r":
         logger.info(" Rounding to the nearest time step")
-        ldt_rounded = numpy.array([rounddttots(dt,ts=ts) for dt in ldt])
-        rdt = numpy.array([(ldt_rounded[i]-ldt_rounded[i-1]).total_seconds() for i in range(1,len(ldt))])
+        dt64_rounded = round_datetime64(dt64,ts=ts)
+        rdt = numpy.diff(dt64_rounded)/numpy.timedelta64(1, "s")
         logger.info(" Maximum time step is now "+str(numpy.max(rdt))+" seconds, minimum time step is now "+str(numpy.min(rdt)))
         # replace the existing datetime series with the datetime series rounded to the nearest time step
-        ds.series["DateTime"]["Data"] = ldt_rounded
-    ds.globalattributes['nc_nrecs'] = len(ds.series["DateTime"]["Data"])
+        ds.series["DateTime"]["Data64"] = dt64_rounded
+    ds.globalattributes['nc_nrecs'] = len(get_datetime64(ds))
 
 def FixTimeGaps(ds):
     """
@@ -1456,22 +1808,18 @@ def FixTimeGaps(ds):
      February 2015 - and again ...
     """
     ts = int(ds.globalattributes["time_step"])
-    #ldt_gaps,ldt_flag,ldt_attr = GetSeries(ds,"DateTime")
-    ldt_gaps = ds.series["DateTime"]["Data"]
-    # generate a datetime list from the start datetime to the end datetime
-    ldt_start = ldt_gaps[0]
-    ldt_end = ldt_gaps[-1]
-    nogaps = [result for result in perdelta(ldt_start,ldt_end,datetime.timedelta(minutes=ts))]
-    ldt_nogaps = numpy.array(nogaps)
-    ldt_gaps = numpy.array(ldt_gaps)
+    dt64_gaps = get_datetime64(ds)
+    # generate a gap-free datetime64 series from the start datetime to the end datetime
+    step = numpy.timedelta64(ts, "m")
+    nRecs = int((dt64_gaps[-1]-dt64_gaps[0])//step) + 1
+    dt64_nogaps = dt64_gaps[0] + numpy.arange(nRecs)*step
     # update the global attribute containing the number of records
-    nRecs = len(ldt_nogaps)
     ds.globalattributes['nc_nrecs'] = nRecs
-    # find the indices of the no-gap data in the original data
-    idx_gaps = FindIndicesOfBInA(ldt_nogaps,ldt_gaps)
-    # update the series of Python datetimes
-    ds.series['DateTime']['Data'] = ldt_nogaps
-    ds.series['DateTime']['Flag'] = numpy.zeros(len(ldt_nogaps),dtype=numpy.int32)
+    # find the indices of the no-gap data in the original data, both are sorted
+    idx_gaps = numpy.searchsorted(dt64_nogaps,dt64_gaps)
+    # update the datetime series
+    ds.series['DateTime']['Data64'] = dt64_nogaps
+    ds.series['DateTime']['Flag'] = numpy.zeros(nRecs,dtype=numpy.int32)
     # get a list of series in the data structure
     series_list = [item for item in ds.series.keys() if '_QCFlag' not in item]
     # remove the datetime-related series from data structure
@@ -1528,7 +1876,10 @@ def FixTimeStep(ds,fixtimestepmethod="round"):
         #log.info("After FixNonIntegralTimeSteps:"+str(dtmin)+" "+str(dtmax))
     if dtmax > ts*60:
         # time gaps found
-        logger.info(' FixTimeStep: one or more time gaps found, inserting times ...')
+        idx_gaps, nmissing = get_time_gaps(get_datetime64(ds), ts)
+        msg = " FixTimeStep: " + str(len(idx_gaps)) + " time gaps found (" + str(int(numpy.sum(nmissing)))
+        msg += " missing records), inserting times ..."
+        logger.info(msg)
         FixTimeGaps(ds)
         dt = get_timestep(ds)
         dtmin = numpy.min(dt)
@@ -1639,9 +1990,17 @@ def GetDateIndex(ldt, date, ts=30, default=0, match='exact'):
                                      in the previous month
                 NOTE: "startnextday" and "endpreviousday" can be used to pick
                     out time periods with an integer number of days
+     If ldt is a datetime64 array or the datetime series from a data structure,
+     the lookup is done by the cached TimeIndex for the time axis (see
+     get_time_index), otherwise the array is searched directly.
     Author: PRI
     Date: Back in the day
+    Modified:
+     October 2026 - use the cached time index where possible
     """
+    index = get_time_index(ldt)
+    if index is not None:
+        return index.get_index(date, ts=ts, default=default, match=match)
     # trap default values of -1 since -1 + 1 = 0
     if default == -1:
         default = len(ldt)-1
@@ -1656,7 +2015,7 @@ def GetDateIndex(ldt, date, ts=30, default=0, match='exact'):
         if len(date) != 0:
             # if not empty, see if we can parse it
             try:
-                date = dateutil.parser.parse(date)
+                date = parse_date_string(date)
                 if (date>=ldt[0]) and (date<=ldt[-1]):
                     # date string parsed OK, is it within the datetime range of the data?
                     i = find_nearest_value(ldt, date)
@@ -1788,8 +2147,13 @@ def GetPlotVariableNamesFromCF(cf, n):
         logger.warning(msg)
     return SeriesList
 
-def GetSeries(ds,ThisOne,si=0,ei=-1,mode="truncate"):
-    """ Returns the data, QC flag and attributes of a series from the data structure."""
+def GetSeries(ds,ThisOne,si=0,ei=-1,mode="truncate",copy=True):
+    """
+    Returns the data, QC flag and attributes of a series from the data structure.
+    If copy is False, the data and QC flag are returned as views of the arrays in
+    the data structure (only possible when mode is "truncate" or no padding or
+    mirroring is needed) and writes to them change the data structure.
+    """
     # number of records
     nRecs = int(ds.globalattributes["nc_nrecs"])
     # check the series requested is in the data structure
@@ -1800,11 +2164,17 @@ def GetSeries(ds,ThisOne,si=0,ei=-1,mode="truncate"):
             Series = list(ds.series[ThisOne]['Data'])
         elif isinstance(ds.series[ThisOne]['Data'],numpy.ndarray):
             # return a numpy array if series is an array
-            Series = ds.series[ThisOne]['Data'].copy()
+            if copy:
+                Series = ds.series[ThisOne]['Data'].copy()
+            else:
+                Series = ds.series[ThisOne]['Data']
         # now get the QC flag
         if 'Flag' in ds.series[ThisOne].keys():
             # return the QC flag if it exists
-            Flag = ds.series[ThisOne]['Flag'].copy()
+            if copy:
+                Flag = ds.series[ThisOne]['Flag'].copy()
+            else:
+                Flag = ds.series[ThisOne]['Flag']
         else:
             # create a QC flag if one does not exist
             Flag = numpy.zeros(nRecs,dtype=numpy.int32)
@@ -1917,7 +2287,7 @@ def GetSeriesasMA(ds,ThisOne,si=0,ei=-1,mode="truncate"):
     Series,WasND = SeriestoMA(Series)
     return Series,Flag,Attr
 
-def GetVariable(ds, label, start=0, end=-1, mode="truncate", out_type="ma"):
+def GetVariable(ds, label, start=0, end=-1, mode="truncate", out_type="ma", copy=True):
     """
     Purpose:
      Returns a data variable from the data structure as a dictionary.
@@ -1930,6 +2300,9 @@ def GetVariable(ds, label, start=0, end=-1, mode="truncate", out_type="ma"):
       end   - end date or index (integer), default -1
       mode  - truncate or pad the data
       out_type - masked array or ndarray
+      copy  - if False, return views of the arrays in the data structure
+              rather than copies, writes to the views change the data
+              structure (not possible with out_type="nan")
     and the returned values are;
      The data are returned as a dictionary;
       variable["label"] - variable label in data structure
@@ -1945,14 +2318,18 @@ def GetVariable(ds, label, start=0, end=-1, mode="truncate", out_type="ma"):
     """
     nrecs = int(ds.globalattributes["nc_nrecs"])
     ts = int(ds.globalattributes["time_step"])
-    ldt = ds.series["DateTime"]["Data"]
+    index = get_time_index(ds)
     # get the start and end indices
-    si = GetDateIndex(ldt, start, ts=ts, default=0, match="exact")
-    ei = GetDateIndex(ldt, end, ts=ts, default=nrecs-1, match="exact")
-    dt = ldt[si:ei+1]
-    data, flag, attr = GetSeries(ds, label, si=si, ei=ei, mode=mode)
+    si = index.get_index(start, ts=ts, default=0, match="exact")
+    ei = index.get_index(end, ts=ts, default=nrecs-1, match="exact")
+    dt = ds.series["DateTime"]["Data"][si:ei+1]
+    data, flag, attr = GetSeries(ds, label, si=si, ei=ei, mode=mode, copy=copy)
     # check to see what kind of output the user wants
-    if isinstance(data, numpy.ndarray) and out_type == "ma":
+    if isinstance(data, numpy.ndarray) and out_type == "ma" and not copy:
+        # masked array that shares its data with the data structure
+        if data.dtype == "float64":
+            data = numpy.ma.masked_where(abs(data-float(c.missing_value)) < c.eps, data, copy=False)
+    elif isinstance(data, numpy.ndarray) and out_type == "ma":
         # convert to a masked array
         data, WasND = SeriestoMA(data)
     elif isinstance(data, numpy.ndarray) and out_type == "nan":
@@ -2046,6 +2423,172 @@ def get_datetime(cf, ds):
             result = getattr(pfp_func,function_name)(ds, "DateTime", *function_args)
     return
 
+def get_datetime64(ds, label="DateTime"):
+    """
+    Purpose:
+     Return the time axis of the data structure as a numpy datetime64 array.
+     If ds.series[label] is a plain dictionary (eg it was created by a
+     utility script), it is replaced by a DateTimeVariable so that the
+     datetime64 array is only made once.
+    Usage:
+     dt64 = pfp_utils.get_datetime64(ds)
+    Author: PRI
+    Date: October 2026
+    """
+    variable = ds.series[label]
+    if not isinstance(variable, DateTimeVariable):
+        variable = DateTimeVariable(variable)
+        ds.series[label] = variable
+    return variable["Data64"]
+
+def get_datetime64_window(dt64, start=None, end=None):
+    """
+    Purpose:
+     Return the indices of the first record at or after start and the last
+     record at or before end in a datetime64 array.  The start and end can be
+     strings, Python datetimes or numpy datetime64, None means the first or
+     the last record.
+     Returns None, None if the window does not overlap the array.
+    Usage:
+     si, ei = pfp_utils.get_datetime64_window(dt64, start="2015-01-01", end="2015-12-31 23:30")
+    Author: PRI
+    Date: October 2026
+    """
+    bounds = []
+    for date in [start, end]:
+        if isinstance(date, basestring):
+            parsed = parse_date_string(str(date))
+            if parsed is None:
+                msg = " Unable to parse date " + str(date)
+                logger.error(msg)
+                raise ValueError(msg)
+            date = parsed
+        if date is not None:
+            date = numpy.datetime64(date).astype(dt64.dtype)
+        bounds.append(date)
+    si, ei = 0, len(dt64) - 1
+    if bounds[0] is not None:
+        si = int(numpy.searchsorted(dt64, bounds[0], side="left"))
+    if bounds[1] is not None:
+        ei = int(numpy.searchsorted(dt64, bounds[1], side="right")) - 1
+    if si > ei:
+        return None, None
+    return si, ei
+
+def get_datetime64_from_datetime(ldt):
+    """
+    Purpose:
+     Convert a list or array of Python datetimes to a numpy datetime64 array.
+     The unit is seconds unless any of the datetimes have a fractional second,
+     in which case it is microseconds.
+    Usage:
+     dt64 = pfp_utils.get_datetime64_from_datetime(ldt)
+    Author: PRI
+    Date: October 2026
+    """
+    dt64 = numpy.array(numpy.ma.getdata(ldt), dtype="datetime64[us]")
+    return seconds_if_integral(dt64)
+
+def get_datetime64_from_nctime(values, units, calendar="gregorian"):
+    """
+    Purpose:
+     Convert netCDF time values (eg "days since 1800-01-01 00:00:00.0") to a
+     numpy datetime64 array without going through Python datetimes.
+     Times are rounded to the nearest microsecond, the same as cftime.
+     Non-standard calendars are passed to cftime.
+    Usage:
+     dt64 = pfp_utils.get_datetime64_from_nctime(values, units, calendar=calendar)
+    Author: PRI
+    Date: October 2026
+    """
+    scale, base = parse_nctime_units(units, calendar)
+    if base is None:
+        # let cftime deal with anything out of the ordinary
+        try:
+            ldt = cftime.num2pydate(values, units, calendar=calendar)
+        except AttributeError:
+            ldt = cftime.num2date(values, units, calendar=calendar)
+        return get_datetime64_from_datetime(ldt)
+    offset = numpy.rint(numpy.asarray(values, dtype=numpy.float64)*scale).astype(numpy.int64)
+    dt64 = numpy.datetime64(base, "us") + offset.astype("timedelta64[us]")
+    return seconds_if_integral(dt64)
+
+def get_datetime_from_datetime64(dt64):
+    """
+    Purpose:
+     Convert a numpy datetime64 array to an array of Python datetimes.
+    Usage:
+     ldt = pfp_utils.get_datetime_from_datetime64(dt64)
+    Author: PRI
+    Date: October 2026
+    """
+    # datetime64[ns] converts to integers, not datetimes
+    return numpy.asarray(dt64).astype("datetime64[us]").astype(object)
+
+def get_doy_from_datetime64(dt64):
+    """ Return the day of the year (1 to 366) from a datetime64 array."""
+    day = dt64.astype("datetime64[D]")
+    return (day - day.astype("datetime64[Y]")).astype(numpy.int32) + 1
+
+def get_nctime_from_datetime64(dt64, units, calendar="gregorian"):
+    """
+    Purpose:
+     Convert a numpy datetime64 array to netCDF time values in units, the
+     inverse of get_datetime64_from_nctime.
+    Usage:
+     values = pfp_utils.get_nctime_from_datetime64(dt64, units, calendar=calendar)
+    Author: PRI
+    Date: October 2026
+    """
+    scale, base = parse_nctime_units(units, calendar)
+    if base is None:
+        return netCDF4.date2num(get_datetime_from_datetime64(dt64), units, calendar=calendar)
+    offset = (dt64.astype("datetime64[us]") - numpy.datetime64(base, "us")).astype(numpy.int64)
+    return offset/scale
+
+def get_time_gaps(dt64, ts):
+    """
+    Purpose:
+     Find gaps in a datetime64 time axis with a time step of ts minutes.
+     Returns the indices of the records before each gap and the number of
+     missing records in each gap.
+    Usage:
+     idx, nmissing = pfp_utils.get_time_gaps(dt64, ts)
+    Author: PRI
+    Date: October 2026
+    """
+    step = numpy.timedelta64(int(ts), "m")
+    nsteps = numpy.diff(dt64)//step
+    idx = numpy.where(nsteps > 1)[0]
+    return idx, (nsteps[idx] - 1).astype(numpy.int64)
+
+def get_year_from_datetime64(dt64):
+    """ Return the year from a datetime64 array."""
+    return dt64.astype("datetime64[Y]").astype(numpy.int32) + 1970
+
+def get_ymdhms_from_datetime64(dt64):
+    """
+    Purpose:
+     Return the year, month, day, hour, minute and second of a datetime64
+     array as a dictionary of int32 arrays.
+    Usage:
+     ymdhms = pfp_utils.get_ymdhms_from_datetime64(dt64)
+     year = ymdhms["Year"]
+    Author: PRI
+    Date: October 2026
+    """
+    year = dt64.astype("datetime64[Y]")
+    month = dt64.astype("datetime64[M]")
+    day = dt64.astype("datetime64[D]")
+    seconds = (dt64.astype("datetime64[s]") - day).astype(numpy.int64)
+    ymdhms = {"Year": year.astype(numpy.int32) + 1970,
+              "Month": (month - year).astype(numpy.int32) + 1,
+              "Day": (day - month).astype(numpy.int32) + 1,
+              "Hour": (seconds//3600).astype(numpy.int32),
+              "Minute": ((seconds % 3600)//60).astype(numpy.int32),
+              "Second": (seconds % 60).astype(numpy.int32)}
+    return ymdhms
+
 def get_datetime_from_nctime(ds):
     """
     Purpose:
@@ -2060,26 +2603,24 @@ def get_datetime_from_nctime(ds):
     nRecs = int(ds.globalattributes["nc_nrecs"])
     nc_time_data = ds.series["time"]["Data"]
     nc_time_units = ds.series["time"]["Attr"]["units"]
-    # handle the change of default return object introduced at cftime V1.1.0
-    try:
-        # try cftime.num2pydate() first
-        # should work for cftime V1.1.0 and above
-        dt = cftime.num2pydate(nc_time_data, nc_time_units)
-    except AttributeError:
-        # use cftime.num2date() if cftime.num2pydate() doesn't exist
-        # should work for cftime less than V1.1.0
-        dt = cftime.num2date(nc_time_data, nc_time_units)
-    pydt = {"Label": "DateTime", "Data": dt, "Flag": numpy.zeros(nRecs),
-            "Attr": {"long_name": "Datetime in local timezone", "units": "None"}}
-    CreateVariable(ds, pydt)
+    nc_time_calendar = ds.series["time"]["Attr"].get("calendar", "gregorian")
+    # the Python datetimes are only created if they are asked for
+    dt64 = get_datetime64_from_nctime(nc_time_data, nc_time_units, calendar=nc_time_calendar)
+    ds.series["DateTime"] = DateTimeVariable({"Data64": dt64, "Flag": numpy.zeros(nRecs),
+                                              "Attr": {"long_name": "Datetime in local timezone",
+                                                       "units": "None"}})
     return
 
 def get_datetime_from_excel_date(values, xl_datemode):
-    values = numpy.array(values)
-    xl_date = values + 1462*int(xl_datemode)
-    base_date = datetime.datetime(1899, 12, 30)
-    dt = [base_date + datetime.timedelta(days=xl_date[i]) for i in range(len(values))]
-    return numpy.ma.array(dt)
+    dt64 = get_datetime64_from_xldate(values, xl_datemode)
+    return numpy.ma.array(get_datetime_from_datetime64(dt64))
+
+def get_datetime64_from_xldate(values, xl_datemode):
+    """ Return a datetime64 array from Excel dates, rounded to the nearest microsecond."""
+    xl_date = numpy.asarray(values, dtype=numpy.float64) + 1462*int(xl_datemode)
+    offset = numpy.rint(xl_date*86400E6).astype(numpy.int64)
+    dt64 = numpy.datetime64("1899-12-30", "us") + offset.astype("timedelta64[us]")
+    return seconds_if_integral(dt64)
 
 def get_datetime_from_xldatetime(ds):
     ''' Creates a series of Python datetime objects from the Excel date read from the Excel file.
@@ -2090,12 +2631,8 @@ def get_datetime_from_xldatetime(ds):
     xldate = ds.series['xlDateTime']['Data']
     nRecs = len(ds.series['xlDateTime']['Data'])
     datemode = int(ds.globalattributes['xl_datemode'])
-    ds.series[unicode('DateTime')] = {}
-    basedate = datetime.datetime(1899, 12, 30)
-    dt = [None]*nRecs
-    for i in range(nRecs):
-        dt[i] = basedate + datetime.timedelta(days=xldate[i] + 1462 * datemode)
-    ds.series['DateTime']['Data'] = numpy.array(dt)
+    ds.series[unicode('DateTime')] = DateTimeVariable()
+    ds.series['DateTime']['Data64'] = get_datetime64_from_xldate(xldate, datemode)
     ds.series['DateTime']['Flag'] = numpy.zeros(nRecs)
     ds.series['DateTime']['Attr'] = {}
     ds.series['DateTime']['Attr']['long_name'] = 'Datetime in local timezone'
@@ -2117,10 +2654,12 @@ def get_datetime_from_ymdhms(ds):
     hour = ds.series["Hour"]["Data"].astype('int')
     minute = ds.series["Minute"]["Data"].astype('int')
     second = ds.series["Second"]["Data"].astype('int')
-    dt = [datetime.datetime(yr,mn,dy,hr,mi,se) for yr,mn,dy,hr,mi,se in zip(year,month,day,hour,minute,second)]
-    ds.series["DateTime"] = {}
-    ds.series["DateTime"]["Data"] = numpy.array(dt)
-    ds.series["DateTime"]["Flag"] = numpy.zeros(len(dt))
+    # build the datetime64 series from the year and month, then add the rest
+    dt64 = (((year-1970)*12 + month - 1).astype("datetime64[M]").astype("datetime64[s]") +
+            ((day - 1)*86400 + hour*3600 + minute*60 + second).astype("timedelta64[s]"))
+    ds.series["DateTime"] = DateTimeVariable()
+    ds.series["DateTime"]["Data64"] = dt64
+    ds.series["DateTime"]["Flag"] = numpy.zeros(len(dt64))
     ds.series["DateTime"]["Attr"] = {}
     ds.series["DateTime"]["Attr"]["long_name"] = "Datetime in local timezone"
     ds.series["DateTime"]["Attr"]["units"] = "None"
@@ -2131,6 +2670,147 @@ def get_ddoy_from_datetime(dt):
     ddoy = dt.timetuple().tm_yday + float(dt.hour+float(dt.minute+float(dt.second)/60)/60)/24
     return ddoy
 
+def get_tod_index(Hdh, ts):
+    """
+    Purpose:
+     Return the time of day index (0 for 00:00, 1 for 00:30 etc) of the
+     decimal hours in Hdh and the number of time steps in a day.  Times that
+     are not on a time step boundary get an index of -1 so that they are left
+     out of the statistics done by get_grouped_stats.
+    Usage:
+     tod, nperday = pfp_utils.get_tod_index(Hdh, ts)
+     where Hdh is an array of decimal hours
+           ts is the time step in minutes
+    Author: PRI
+    Date: October 2026
+    """
+    nperday = 24*int((60/float(ts))+0.5)
+    Hdh = numpy.ma.getdata(Hdh).astype(numpy.float64)
+    tod = numpy.rint(Hdh*60.0/float(ts)).astype(numpy.int64)
+    on_step = (abs(Hdh - tod*float(ts)/60.) < c.eps) & (tod >= 0) & (tod < nperday)
+    tod[~on_step] = -1
+    return tod, nperday
+
+def get_diurnal_groups(ds, by_month=True):
+    """
+    Purpose:
+     Return the group index for diurnal statistics of the data in a data
+     structure and the number of groups.  When by_month is True, the groups
+     are the time of day in each month ((month-1)*nperday + time of day),
+     otherwise they are the time of day.  Times that are not on a time step
+     boundary get a group of -1.  The groups are made from the datetime64
+     time axis and are kept with the time index so they are only made once.
+    Usage:
+     groups, ngroups = pfp_utils.get_diurnal_groups(ds)
+     stats = pfp_utils.get_grouped_stats(data, groups, ngroups)
+    Author: PRI
+    Date: October 2026
+    """
+    ts = int(float(ds.globalattributes["time_step"]))
+    index = get_time_index(ds)
+    key = ("diurnal", ts, by_month)
+    if key not in index.tables:
+        dt64 = index.dt64
+        day = dt64.astype("datetime64[D]")
+        # decimal hours ignoring seconds, as hour + minute/60
+        Hdh = (dt64.astype("datetime64[m]") - day).astype(numpy.int64)/float(60)
+        tod, nperday = get_tod_index(Hdh, ts)
+        if by_month:
+            month = dt64.astype("datetime64[M]").astype(numpy.int64) % 12
+            groups = numpy.where(tod >= 0, month*nperday + tod, -1)
+            index.tables[key] = (groups, 12*nperday)
+        else:
+            index.tables[key] = (tod, nperday)
+    return index.tables[key]
+
+def get_grouped_stats(data, groups, ngroups, stats=["Num", "Av", "Sd", "Mx", "Mn"], percentiles=[]):
+    """
+    Purpose:
+     Return statistics of data for each group in one pass through the data.
+     This is the engine for the diurnal statistics (eg groups of time of day
+     in each month, see get_diurnal_groups) but any integer grouping can be
+     used.  The counts, means and standard deviations are done with
+     numpy.bincount, the maxima, minima and percentiles with one sort of the
+     data by group and value.
+     data can be 1D (one variable) or 2D with a column for each variable, in
+     which case all variables are done in the same call.
+     Masked values, missing values (c.missing_value), NaNs and values with
+     a group outside 0 to ngroups-1 are ignored.
+    Usage:
+     s = pfp_utils.get_grouped_stats(data, groups, ngroups, percentiles=[5, 95])
+     where data is a 1D or 2D array, masked arrays are allowed
+           groups is the integer group of each row of data
+           ngroups is the number of groups
+           stats is a list of the statistics wanted from "Num", "Av", "Sd",
+                 "Mx" and "Mn"
+           percentiles is a list of percentiles, returned as "P5", "P95" etc
+     s is a dictionary with an array for each statistic with shape (ngroups,)
+     for 1D data and (ngroups, nvariables) for 2D data.  "Num" is an integer
+     array, the others are masked arrays masked where a group has no data.
+     The standard deviation is the population standard deviation (as
+     numpy.std) and percentiles use linear interpolation (as numpy.percentile).
+    Author: PRI
+    Date: October 2026
+    """
+    values = numpy.ma.getdata(data).astype(numpy.float64)
+    mask = numpy.ma.getmaskarray(data)
+    one_d = (values.ndim == 1)
+    if one_d:
+        values = values.reshape((-1, 1))
+        mask = mask.reshape((-1, 1))
+    nrecs, nvars = values.shape
+    groups = numpy.asarray(groups, dtype=numpy.int64).reshape((-1, 1))
+    with numpy.errstate(invalid="ignore"):
+        valid = ((~mask) & numpy.isfinite(values) &
+                 (abs(values - float(c.missing_value)) > c.eps) &
+                 (groups >= 0) & (groups < ngroups))
+    # flat index of (group, variable), only the valid values are used
+    keys = (groups*nvars + numpy.arange(nvars).reshape((1, -1)))[valid]
+    values = values[valid]
+    nbins = ngroups*nvars
+    num = numpy.bincount(keys, minlength=nbins)
+    empty = (num == 0)
+    n = numpy.maximum(num, 1).astype(numpy.float64)
+    results = {}
+    if "Num" in stats:
+        results["Num"] = num
+    if "Av" in stats or "Sd" in stats:
+        av = numpy.bincount(keys, weights=values, minlength=nbins)/n
+        if "Av" in stats:
+            results["Av"] = numpy.ma.array(av, mask=empty)
+        if "Sd" in stats:
+            # two pass, as numpy.std, to avoid the round off of sum of squares
+            dev = values - av[keys]
+            sd = numpy.sqrt(numpy.bincount(keys, weights=dev*dev, minlength=nbins)/n)
+            results["Sd"] = numpy.ma.array(sd, mask=empty)
+    if "Mx" in stats or "Mn" in stats or len(percentiles) != 0:
+        # sort by group then by value, each group is then a contiguous block
+        order = numpy.lexsort((values, keys))
+        svalues = values[order]
+        start = numpy.concatenate(([0], numpy.cumsum(num)[:-1]))
+        last = numpy.where(empty, 0, start + num - 1)
+        first = numpy.where(empty, 0, start)
+        if len(svalues) == 0:
+            svalues = numpy.zeros(1)
+        if "Mx" in stats:
+            results["Mx"] = numpy.ma.array(svalues[last], mask=empty)
+        if "Mn" in stats:
+            results["Mn"] = numpy.ma.array(svalues[first], mask=empty)
+        for p in percentiles:
+            position = (float(p)/100.0)*(n - 1)
+            lo = numpy.floor(position).astype(numpy.int64)
+            hi = numpy.minimum(lo + 1, num - 1)
+            lo = numpy.where(empty, 0, first + lo)
+            hi = numpy.where(empty, 0, first + numpy.maximum(hi, 0))
+            pv = svalues[lo] + (svalues[hi] - svalues[lo])*(position - numpy.floor(position))
+            results["P" + "%g" % float(p)] = numpy.ma.array(pv, mask=empty)
+    for item in results:
+        if one_d:
+            results[item] = results[item].reshape((ngroups,))
+        else:
+            results[item] = results[item].reshape((ngroups, nvars))
+    return results
+
 def get_diurnalstats(dt,data,info):
     ts = info["time_step"]
     nperday = info["nperday"]
@@ -2313,6 +2993,32 @@ def get_number_from_heightstring(height):
         z = None
     return z
 
+def get_number_of_processes(cf):
+    """
+    Purpose:
+     Return the number of processes to use for tasks that can be run in
+     parallel.  The number is read from NumberOfProcesses in the [Options]
+     section of the control file, the default is 1 (run sequentially) and
+     "auto" uses one process per CPU.  Worker processes of a pool can not
+     start a pool of their own so 1 is returned when called from a worker.
+    Usage:
+     nprocs = pfp_utils.get_number_of_processes(cf)
+    Author: PRI
+    Date: October 2026
+    """
+    if multiprocessing.current_process().daemon:
+        return 1
+    opt = str(get_keyvaluefromcf(cf, ["Options"], "NumberOfProcesses", default=1)).lower()
+    if opt == "auto":
+        return multiprocessing.cpu_count()
+    try:
+        nprocs = int(opt)
+    except ValueError:
+        msg = " Unrecognised NumberOfProcesses (" + opt + "), using 1"
+        logger.warning(msg)
+        nprocs = 1
+    return max([1, nprocs])
+
 def get_nctime_from_datetime(ds, time_units="seconds since 1970-01-01 00:00:00.0",
                              calendar="gregorian"):
     """
@@ -2328,8 +3034,8 @@ def get_nctime_from_datetime(ds, time_units="seconds since 1970-01-01 00:00:00.0
     Author: PRI
     Date: October 2017
     """
-    ldt = ds.series["DateTime"]["Data"]
-    data = netCDF4.date2num(ldt, time_units, calendar=calendar)
+    dt64 = get_datetime64(ds)
+    data = get_nctime_from_datetime64(dt64, time_units, calendar=calendar)
     flag = numpy.zeros(len(data))
     attr = {"long_name":"time", "standard_name":"time", "units":time_units, "calendar":calendar}
     variable = {"Label":"time", "Data":data, "Flag":flag, "Attr":attr}
@@ -2347,6 +3053,31 @@ def get_nrecs(ds):
         nRecs = len(ds.series[series_list[0]]['Data'])
     return nRecs
 
+def get_run_windows(startdate, enddate, months=0, days=0):
+    """
+    Purpose:
+     Return the list of windows used by the auto (months) and auto (days)
+     gap filling runs.  The first window starts at startdate and each window
+     is months or days long, the last window is clipped at enddate.  Each
+     window starts at the end of the previous window.
+    Usage:
+     windows = pfp_utils.get_run_windows(startdate, enddate, months=2)
+     where startdate and enddate are strings ("YYYY-mm-dd HH:MM")
+           windows is a list of [startdate, enddate] string pairs
+    Author: PRI
+    Date: October 2026
+    """
+    windows = []
+    last = dateutil.parser.parse(enddate)
+    delta = dateutil.relativedelta.relativedelta(months=months, days=days)
+    start = dateutil.parser.parse(startdate)
+    end = min([last, start + delta])
+    while start < end:
+        windows.append([start.strftime("%Y-%m-%d %H:%M"), end.strftime("%Y-%m-%d %H:%M")])
+        start = end
+        end = min([last, start + delta])
+    return windows
+
 def get_start_index(ldt, start, mode="quiet"):
     """
     Purpose:
@@ -2395,10 +3126,10 @@ def get_timestep(ds):
     Author: PRI
     Date: February 2015
     """
-    # local pointer to the Python datetime series
-    ldt = ds.series["DateTime"]["Data"]
+    # local pointer to the datetime64 series
+    dt64 = get_datetime64(ds)
     # time step between records in seconds
-    dt = numpy.array([(ldt[i]-ldt[i-1]).total_seconds() for i in range(1,len(ldt))])
+    dt = numpy.diff(dt64)/numpy.timedelta64(1, "s")
     return dt
 
 def get_timezone(site_name,prompt="no"):
@@ -2423,22 +3154,12 @@ def get_UTCfromlocaltime(ds):
     Assumptions:
      No daylight savings used in the local datetime
     Author: PRI
+    Modified:
+     October 2026 - time zone check moved to check_time_zone
     '''
     # check the time_zone global attribute is set, we cant continue without it
-    if "time_zone" not in ds.globalattributes.keys():
-        logger.warning("get_UTCfromlocaltime: time_zone not in global attributes, checking elsewhere ...")
-        if "site_name" in ds.globalattributes.keys():
-            site_name = ds.globalattributes["site_name"]
-        else:
-            logger.warning("get_UTCfromlocaltime: site_name not in global attributes, skipping UTC calculation ...")
-            return
-        time_zone,found = get_timezone(site_name,prompt="no")
-        if not found:
-            logger.warning("get_UTCfromlocaltime: site_name not in time zone dictionary")
-            return
-        else:
-            logger.info("get_UTCfromlocaltime: time_zone found in time zone dictionary")
-            ds.globalattributes["time_zone"] = time_zone
+    if not check_time_zone(ds, "get_UTCfromlocaltime"):
+        return
     logger.info(' Getting the UTC datetime from the local datetime')
     # get the number of records
     nRecs = int(ds.globalattributes["nc_nrecs"])
@@ -2456,6 +3177,59 @@ def get_UTCfromlocaltime(ds):
     ldt_utc = [dt.astimezone(pytz.utc) for dt in ldt_loc_nodst]
     return ldt_utc
 
+def get_UTCfromlocaltime64(ds):
+    """
+    Purpose:
+     Returns the UTC time as a datetime64 array from the local time in the
+     data structure.  This gives the same times as get_UTCfromlocaltime but
+     the standard time offset is found once per day instead of once per
+     record.  Returns None if the time zone can not be found.
+    Usage:
+     dt_UTC = pfp_utils.get_UTCfromlocaltime64(ds)
+    Assumptions:
+     No daylight savings used in the local datetime
+    Author: PRI
+    Date: October 2026
+    """
+    if not check_time_zone(ds, "get_UTCfromlocaltime64"):
+        return None
+    loc_tz = pytz.timezone(ds.globalattributes["time_zone"])
+    dt64 = get_datetime64(ds).astype("datetime64[us]")
+    days, inverse = numpy.unique(dt64.astype("datetime64[D]"), return_inverse=True)
+    # the standard time offset (UTC offset without daylight saving) for each day
+    offsets = numpy.zeros(len(days), dtype=numpy.int64)
+    for n, day in enumerate(days.astype(datetime.datetime)):
+        dt = loc_tz.localize(datetime.datetime(day.year, day.month, day.day, 12, 0))
+        offsets[n] = int(round((dt.utcoffset() - dt.dst()).total_seconds()))
+    return dt64 - offsets[inverse].astype("timedelta64[s]")
+
+def check_time_zone(ds, caller):
+    """
+    Purpose:
+     Check that the time_zone global attribute is set and try to find it
+     from the site name if it is not.  Returns True if the time zone is set.
+    Usage:
+     if not pfp_utils.check_time_zone(ds, "get_UTCfromlocaltime"):
+         return
+    Author: PRI
+    Date: October 2026
+    """
+    if "time_zone" in ds.globalattributes.keys():
+        return True
+    logger.warning(caller + ": time_zone not in global attributes, checking elsewhere ...")
+    if "site_name" in ds.globalattributes.keys():
+        site_name = ds.globalattributes["site_name"]
+    else:
+        logger.warning(caller + ": site_name not in global attributes, skipping UTC calculation ...")
+        return False
+    time_zone,found = get_timezone(site_name,prompt="no")
+    if not found:
+        logger.warning(caller + ": site_name not in time zone dictionary")
+        return False
+    logger.info(caller + ": time_zone found in time zone dictionary")
+    ds.globalattributes["time_zone"] = time_zone
+    return True
+
 def get_xldatefromdatetime(ds):
     '''
     Purpose:
@@ -2475,17 +3249,13 @@ def get_xldatefromdatetime(ds):
     nRecs = int(ds.globalattributes["nc_nrecs"])
     # get the Excel datetime attributes
     xldt_attr = MakeAttributeDictionary(long_name="Date/time in Excel format",units="days since 1899-12-31 00:00:00")
-    # get a local pointer to the Python DateTime series in ds
-    ldt = ds.series["DateTime"]["Data"]
+    # get a local pointer to the datetime64 series in ds
+    dt64 = get_datetime64(ds).astype("datetime64[s]")
     flag = ds.series["DateTime"]["Flag"]
-    # get a list of Excel datetimes from the Python datetime objects
-    xldate = [xlrd.xldate.xldate_from_datetime_tuple((ldt[i].year,
-                                                      ldt[i].month,
-                                                      ldt[i].day,
-                                                      ldt[i].hour,
-                                                      ldt[i].minute,
-                                                      ldt[i].second),
-                                                      datemode) for i in range(0,len(ldt))]
+    # Excel dates are days since 1899-12-30 (datemode 0) or 1904-01-01 (datemode 1),
+    # same as xlrd.xldate.xldate_from_datetime_tuple for dates after 1900-03-01
+    xlbase = [numpy.datetime64("1899-12-30", "s"), numpy.datetime64("1904-01-01", "s")][datemode]
+    xldate = (dt64 - xlbase).astype(numpy.int64)/float(86400)
     xldt_new = numpy.ma.array(xldate, dtype=numpy.float64)
     # create the Excel datetime series
     CreateSeries(ds,"xlDateTime",xldt_new,flag,xldt_attr)
@@ -2521,16 +3291,17 @@ def get_ymdhmsfromdatetime(ds):
     Author: PRI
     '''
     nRecs = int(ds.globalattributes["nc_nrecs"])
-    dt = ds.series["DateTime"]["Data"]
+    dt64 = get_datetime64(ds)
     flag = numpy.zeros(nRecs,dtype=numpy.int32)
-    Year = numpy.array([dt[i].year for i in range(0,nRecs)]).astype(numpy.int32)
-    Month = numpy.array([dt[i].month for i in range(0,nRecs)]).astype(numpy.int32)
-    Day = numpy.array([dt[i].day for i in range(0,nRecs)]).astype(numpy.int32)
-    Hour = numpy.array([dt[i].hour for i in range(0,nRecs)]).astype(numpy.int32)
-    Minute = numpy.array([dt[i].minute for i in range(0,nRecs)]).astype(numpy.int32)
-    Second = numpy.array([dt[i].second for i in range(0,nRecs)]).astype(numpy.int32)
-    Hdh = numpy.array([float(Hour[i])+float(Minute[i])/60. for i in range(0,nRecs)]).astype(numpy.float64)
-    Ddd = numpy.array([(dt[i] - datetime.datetime(Year[i],1,1)).days+1+Hdh[i]/24. for i in range(0,nRecs)]).astype(numpy.float64)
+    ymdhms = get_ymdhms_from_datetime64(dt64)
+    Year = ymdhms["Year"]
+    Month = ymdhms["Month"]
+    Day = ymdhms["Day"]
+    Hour = ymdhms["Hour"]
+    Minute = ymdhms["Minute"]
+    Second = ymdhms["Second"]
+    Hdh = Hour.astype(numpy.float64)+Minute.astype(numpy.float64)/60.
+    Ddd = get_doy_from_datetime64(dt64).astype(numpy.float64)+Hdh/24.
     CreateSeries(ds,'Year',Year,flag,MakeAttributeDictionary(long_name='Year',units='none'))
     CreateSeries(ds,'Month',Month,flag,MakeAttributeDictionary(long_name='Month',units='none'))
     CreateSeries(ds,'Day',Day,flag,MakeAttributeDictionary(long_name='Day',units='none'))
@@ -2771,6 +3542,30 @@ def PadVariable(var_in, start, end, out_type="nan"):
                "DateTime":dt_padded, "time_step":ts}
     return var_out
 
+def parse_nctime_units(units, calendar):
+    """
+    Purpose:
+     Parse netCDF time units (eg "days since 1800-01-01 00:00:00.0") into the
+     number of microseconds per unit and the base datetime.  The base is
+     returned as None if the units or calendar can't be handled with numpy
+     datetime64 arithmetic.
+    Usage:
+     scale, base = pfp_utils.parse_nctime_units(units, calendar)
+    Author: PRI
+    Date: October 2026
+    """
+    scales = {"day": 86400E6, "hour": 3600E6, "minute": 60E6, "second": 1E6}
+    parts = units.split(" since ")
+    unit = parts[0].strip().lower().rstrip("s")
+    try:
+        base = dateutil.parser.parse(parts[1])
+    except (IndexError, ValueError):
+        return None, None
+    if (unit not in scales or base.tzinfo is not None or base.year < 1583 or
+        str(calendar).lower() not in ["standard", "gregorian", "proleptic_gregorian"]):
+        return None, None
+    return scales[unit], base
+
 def parse_rangecheck_limits(s):
     """
     Purpose:
@@ -2887,7 +3682,7 @@ def round_datetime(ds,mode="nearest_timestep"):
     Date: February 2015
     """
     # local pointer to the datetime series
-    ldt = ds.series["DateTime"]["Data"]
+    dt64 = get_datetime64(ds)
     # check which rounding option has been chosen
     if mode.lower()=="nearest_timestep":
         # get the time step
@@ -2898,18 +3693,42 @@ def round_datetime(ds,mode="nearest_timestep"):
             ts = roundtobase(ts,base=30)
             ds.globalattributes["time_step"] = ts
         # round to the nearest time step
-        rldt = [rounddttots(dt,ts=ts) for dt in ldt]
+        rdt64 = round_datetime64(dt64, ts=ts)
     elif mode.lower()=="nearest_second":
         # round to the nearest second
-        rldt = [rounddttoseconds(dt) for dt in ldt]
+        rdt64 = round_datetime64_to_seconds(dt64)
     else:
         # unrecognised option for mode, return original datetime series
         logger.error(" round_datetime: unrecognised mode ("+str(mode)+")"+" ,returning original time series")
-        rldt = ds.series["DateTime"]["Data"]
+        return
     # replace the original datetime series with the rounded one
-    ds.series["DateTime"]["Data"] = numpy.array(rldt)
+    if numpy.any(rdt64 != dt64):
+        ds.series["DateTime"]["Data64"] = rdt64
     return
 
+def round_datetime64(dt64, ts=30):
+    """
+    Purpose:
+     Round a datetime64 array to the nearest time step, gives the same
+     answer as rounddttots.
+    Usage:
+     dt64_rounded = pfp_utils.round_datetime64(dt64, ts=ts)
+    Author: PRI
+    Date: October 2026
+    """
+    ts = int(ts)
+    # add half a time step and truncate to the minute
+    dtm = (dt64 + numpy.timedelta64(int(ts/2), "m")).astype("datetime64[m]")
+    # then remove the minutes past the last multiple of the time step in the hour
+    minute = (dtm - dtm.astype("datetime64[h]")).astype(numpy.int64)
+    dtm = dtm - (minute % ts).astype("timedelta64[m]")
+    return dtm.astype("datetime64[s]")
+
+def round_datetime64_to_seconds(dt64):
+    """ Round a datetime64 array to the nearest second, same as rounddttoseconds."""
+    us = dt64.astype("datetime64[us]").astype(numpy.int64)
+    return ((us + 500000)//1000000).astype("datetime64[s]")
+
 def roundtobase(x,base=5):
     return int(base*round(float(x)/base))
 
@@ -2941,6 +3760,13 @@ def r(b, p, alpha):
            (1 / (p ** alpha + 1))
     return r
 
+def seconds_if_integral(dt64):
+    """ Return dt64 with a unit of seconds if none of the times have fractional seconds."""
+    us = dt64.astype("datetime64[us]")
+    if numpy.all(us.astype(numpy.int64) % 1000000 == 0):
+        return us.astype("datetime64[s]")
+    return us
+
 def SeriestoMA(Series):
     """
     Convert a numpy ndarray to a masked array.
@@ -0,0 +1,77 @@
+# standard modules
+import os
+import sys
+import time
+# 3rd party modules
+import numpy
+# check the scripts folder exists
+scripts_path = os.path.join("..", "scripts", "")
+if not os.path.exists(scripts_path):
+    print "benchmark_cpd2: the scripts directory is missing"
+    sys.exit()
+# since the scripts directory is there, try importing the modules
+sys.path.append(scripts_path)
+# PFP modules
+import pfp_log
+import pfp_cpd2
+
+logger = pfp_log.init_logger("pfp_log", "benchmark_cpd2.log", to_file=False, to_screen=False)
+
+def make_synthetic_year(seed=1, ts=30, ustar_threshold=0.25):
+    """
+    Purpose:
+     Return a year of synthetic data (t, NEE, ustar, Ta and the night time
+     indicator) in the form used by pfp_cpd2.cpd2_main.  Night time NEE is
+     respiration that depends on Ta and drops off below the ustar threshold.
+    Usage:
+     t, NEE, ustar, Ta, fNight = make_synthetic_year(seed=1)
+    Author: PRI
+    Date: October 2026
+    """
+    rs = numpy.random.RandomState(seed)
+    nrPerDay = 24*60/ts
+    nrecs = 365*nrPerDay
+    tod = numpy.arange(nrecs) % nrPerDay
+    doy = numpy.arange(nrecs)/nrPerDay
+    Fsd = numpy.maximum(0, 1000*numpy.sin(2*numpy.pi*(tod-nrPerDay/4.0)/nrPerDay))
+    Ta = 15 - 10*numpy.cos(2*numpy.pi*doy/365.0) + 5*numpy.sin(2*numpy.pi*(tod-nrPerDay/3.0)/nrPerDay)
+    Ta = Ta + rs.randn(nrecs)
+    ustar = rs.gamma(2.0, 0.15, nrecs)
+    NEE = 2*numpy.exp(0.07*Ta)*numpy.minimum(1, ustar/ustar_threshold) + 0.5*rs.randn(nrecs)
+    # about 30% of the data missing
+    idx = rs.rand(nrecs) < 0.3
+    NEE[idx] = numpy.nan
+    fNight = numpy.where(Fsd < 5, 1, 0)
+    first = 1 + float(1)/float(nrPerDay)
+    last = float(nrecs)/float(nrPerDay) + 1
+    t = numpy.linspace(first, last, nrecs)
+    return t, NEE, ustar, Ta, fNight
+
+def run_site_year(data, nBoot, nprocs, seed=0):
+    """ Run the Barr CPD on one site-year, return the annual thresholds and the elapsed time."""
+    t, NEE, ustar, Ta, fNight = [numpy.array(d) for d in data]
+    numpy.random.seed(seed)
+    pb = {"nYears": 1, "n": 1}
+    start = time.time()
+    Cp2, Stats2, Cp3, Stats3 = pfp_cpd2.cpdBootstrapUStarTh4Season20100901(t, NEE, ustar, Ta, fNight,
+                                                                          0, "Synthetic", nBoot, pb,
+                                                                          nprocs=nprocs)
+    Cp = pfp_cpd2.cpdAssignUStarTh20100901(Stats2, 0, "Synthetic")[0]
+    return Cp, time.time() - start
+
+if (__name__ == '__main__'):
+    # usage: python benchmark_cpd2.py [nBoot] [nprocs] [nyears]
+    nBoot = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    nprocs = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    nyears = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    elapsed = 0.0
+    for n in range(nyears):
+        data = make_synthetic_year(seed=n+1)
+        Cp, dt = run_site_year(data, nBoot, nprocs)
+        elapsed += dt
+        # end the progress bar line
+        print
+        print "site-year %d: ustar threshold %.3f +/- %.3f (%.1f s)" % (n+1, numpy.nanmean(Cp),
+                                                                       numpy.nanstd(Cp), dt)
+    print "%d bootstraps, %d process(es)" % (nBoot, nprocs)
+    print "%.2f site-years per minute" % (60.0*nyears/elapsed)
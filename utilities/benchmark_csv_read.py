@@ -0,0 +1,95 @@
+# standard modules
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+# 3rd party modules
+import numpy
+# check the scripts folder exists
+scripts_path = os.path.join("..", "scripts", "")
+if not os.path.exists(scripts_path):
+    print "benchmark_csv_read: the scripts directory is missing"
+    sys.exit()
+# since the scripts directory is there, try importing the modules
+sys.path.append(scripts_path)
+# PFP modules
+import constants as c
+import pfp_io
+import pfp_log
+
+logger = pfp_log.init_logger("pfp_log", "benchmark_csv_read.log", to_file=False, to_screen=False)
+
+def make_toa5_file(file_name, nyears, nvars, seed=1, ts=30):
+    """
+    Purpose:
+     Write a TOA5 file with nyears of synthetic data for nvars variables
+     (V0, V1 etc).  1% of the values are "NAN", as written by Campbell
+     Scientific loggers.
+    Usage:
+     make_toa5_file("toa5.dat", 5, 60)
+    Author: PRI
+    Date: October 2026
+    """
+    rs = numpy.random.RandomState(seed)
+    nrecs = int(nyears*365*24*60/ts)
+    dt64 = numpy.datetime64("2012-01-01T00:30") + numpy.arange(nrecs)*numpy.timedelta64(ts, "m")
+    labels = ["V"+str(n) for n in range(nvars)]
+    data = numpy.round(100*rs.standard_normal((nrecs, nvars)), 4).astype(str)
+    data[rs.rand(nrecs, nvars) < 0.01] = '"NAN"'
+    with open(file_name, "wb") as f:
+        f.write('"TOA5","Site","CR3000","1234","CR3000.Std","CPU:prog.CR3","1234","Flux"\n')
+        f.write(",".join(['"'+l+'"' for l in ["TIMESTAMP", "RECORD"] + labels]) + "\n")
+        f.write(",".join(['"TS"', '"RN"'] + ['"u"']*nvars) + "\n")
+        f.write(",".join(['""', '""'] + ['"Avg"']*nvars) + "\n")
+        for i in range(nrecs):
+            ts_str = str(dt64[i]).replace("T", " ")
+            f.write('"' + ts_str + ':00",' + str(i) + "," + ",".join(data[i]) + "\n")
+    return labels
+
+def make_l1_info(file_name, labels):
+    """ Return the l1_info dictionary that pfp_compliance.ParseL1ControlFile gives for a TOA5 file."""
+    l1ire = {"Files": {"file_name": file_name, "in_headerrow": 1, "in_firstdatarow": 4},
+             "Global": {"time_step": "30"}, "Variables": {}}
+    l1ire["Variables"]["xlDateTime"] = {"xl": {"sheet": "", "name": "TIMESTAMP"}, "Attr": {}}
+    for label in labels:
+        l1ire["Variables"][label] = {"xl": {"sheet": "", "name": label},
+                                     "Attr": {"long_name": label, "units": "u"}}
+    return {"read_excel": l1ire}
+
+def read_genfromtxt(file_name, labels):
+    """ Read the file with numpy.genfromtxt, as pfp_io.csv_read_series does."""
+    data = numpy.genfromtxt(file_name, delimiter=",", skip_header=4, names=None, dtype=None,
+                            usecols=range(2, len(labels)+2), missing_values='"NAN"',
+                            filling_values=c.missing_value)
+    return data
+
+if (__name__ == '__main__'):
+    # usage: python benchmark_csv_read.py [nyears] [nvars]
+    nyears = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    nvars = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        file_name = os.path.join(tmp_dir, "toa5.dat")
+        labels = make_toa5_file(file_name, nyears, nvars)
+        with open(file_name, "rb") as fi, gzip.open(file_name + ".gz", "wb") as fo:
+            shutil.copyfileobj(fi, fo)
+        start = time.time()
+        data_gft = read_genfromtxt(file_name, labels)
+        t_gft = time.time() - start
+        print "%g years, %d variables, %d rows" % (nyears, nvars, len(data_gft))
+        print "genfromtxt:    %8.2f s (%.0f rows/s)" % (t_gft, len(data_gft)/t_gft)
+        for name in [file_name, file_name + ".gz"]:
+            start = time.time()
+            ds = pfp_io.CSVToDataStructures(make_l1_info(name, labels)).values()[0]
+            t_csv = time.time() - start
+            nrecs = int(ds.globalattributes["nc_nrecs"])
+            ndiff = 0
+            for n, label in enumerate(labels):
+                ndiff += numpy.sum(numpy.abs(numpy.ma.filled(ds.series[label]["Data"], c.missing_value) -
+                                             data_gft[:, n]) > 1E-9)
+            print "%-14s %8.2f s (%.0f rows/s, %.0f times faster), %d values different" % \
+                  (os.path.basename(name)+":", t_csv, nrecs/t_csv, t_gft/max([t_csv, 1E-6]), ndiff)
+    finally:
+        shutil.rmtree(tmp_dir)
@@ -0,0 +1,118 @@
+# standard modules
+import copy
+import datetime
+import os
+import resource
+import subprocess
+import sys
+import time
+# 3rd party modules
+import numpy
+# check the scripts folder exists
+scripts_path = os.path.join("..", "scripts", "")
+if not os.path.exists(scripts_path):
+    print "benchmark_datastructure: the scripts directory is missing"
+    sys.exit()
+# since the scripts directory is there, try importing the modules
+sys.path.append(scripts_path)
+# PFP modules
+import constants as c
+import pfp_io
+import pfp_log
+import pfp_utils
+
+logger = pfp_log.init_logger("pfp_log", "benchmark_datastructure.log", to_file=False, to_screen=False)
+
+def make_synthetic_site(ds, nyears=10, nvars=300, ts=30):
+    """
+    Purpose:
+     Fill a data structure with nyears of synthetic data for nvars variables
+     at a time step of ts minutes.  About 10% of each variable is missing.
+    Usage:
+     make_synthetic_site(ds, nyears=10, nvars=300)
+    Author: PRI
+    Date: October 2026
+    """
+    start = datetime.datetime(2010, 1, 1, 0, 30)
+    nrecs = int(nyears*365*24*60/ts)
+    ldt = numpy.array([start + datetime.timedelta(minutes=ts*i) for i in range(nrecs)])
+    if getattr(ds.series, "columnar", False):
+        # allocate the blocks up front, as pfp_io.ColumnarSeries.pack() does
+        ds.series = pfp_io.ColumnarSeries(nrecs, nvars)
+    ds.globalattributes["nc_nrecs"] = nrecs
+    ds.globalattributes["time_step"] = ts
+    ds.globalattributes["nc_level"] = "L3"
+    ds.series["DateTime"] = {"Data": ldt, "Flag": numpy.zeros(nrecs, dtype=numpy.int32),
+                             "Attr": {"long_name": "Datetime in local timezone", "units": "None"}}
+    numpy.random.seed(0)
+    for n in range(nvars):
+        label = "Var" + str(n)
+        data = numpy.random.randn(nrecs)
+        flag = numpy.zeros(nrecs, dtype=numpy.int32)
+        idx = numpy.random.randint(0, nrecs, size=nrecs//10)
+        data[idx] = float(c.missing_value)
+        flag[idx] = numpy.int32(1)
+        ds.series[label] = {"Data": data, "Flag": flag,
+                            "Attr": {"long_name": label, "units": "none"}}
+    return
+
+def run_levels(ds, copy_data=True):
+    """
+    Purpose:
+     Mimic the data structure traffic of L3 to L6, each level makes a copy of
+     the previous data structure, reads and re-writes every variable, checks
+     the QC flags and updates the coverage statistics.
+    Author: PRI
+    Date: October 2026
+    """
+    labels = [l for l in ds.series.keys() if l != "DateTime"]
+    for level in ["L4", "L5", "L6"]:
+        ds = copy.deepcopy(ds)
+        ds.globalattributes["nc_level"] = level
+        for label in labels:
+            var = pfp_utils.GetVariable(ds, label, copy=copy_data)
+            var["Data"] = var["Data"]*numpy.float64(1.0001)
+            var["Flag"] = numpy.where(numpy.ma.getmaskarray(var["Data"]), 1, 0).astype(numpy.int32)
+            pfp_utils.CreateVariable(ds, var)
+        pfp_utils.CheckQCFlags(ds)
+        pfp_utils.get_coverage_individual(ds)
+    return ds
+
+def get_rss():
+    """ Return the current resident set size in MB (Linux only)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages*resource.getpagesize()/1024.0/1024.0
+    except IOError:
+        return numpy.nan
+
+def run_backend(backend, nyears, nvars):
+    """ Run the benchmark for one backend and print the results."""
+    if backend == "columnar":
+        ds = pfp_io.ColumnarDataStructure()
+    else:
+        ds = pfp_io.DataStructure()
+    make_synthetic_site(ds, nyears=nyears, nvars=nvars)
+    rss_start = get_rss()
+    start = time.time()
+    # the dictionary backend uses the existing copy semantics
+    run_levels(ds, copy_data=(backend != "columnar"))
+    elapsed = time.time() - start
+    # ru_maxrss is in kilobytes on Linux
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.0
+    print "%-10s %8.2f s %10.1f MB %10.1f MB" % (backend, elapsed, rss_start, rss_peak)
+    return
+
+if (__name__ == '__main__'):
+    # usage: python benchmark_datastructure.py [nyears] [nvars] [backend]
+    nyears = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    nvars = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    if len(sys.argv) > 3:
+        run_backend(sys.argv[3], nyears, nvars)
+    else:
+        # run each backend in its own process so the peak memory is not shared
+        print "%d years, %d variables" % (nyears, nvars)
+        print "%-10s %10s %13s %13s" % ("backend", "time", "start RSS", "peak RSS")
+        for backend in ["dict", "columnar"]:
+            subprocess.call([sys.executable, os.path.abspath(__file__), str(nyears), str(nvars), backend])
@@ -0,0 +1,116 @@
+# standard modules
+import copy
+import os
+import sys
+import time
+# 3rd party modules
+import numpy
+# check the scripts folder exists
+scripts_path = os.path.join("..", "scripts", "")
+if not os.path.exists(scripts_path):
+    print "benchmark_diurnalcheck: the scripts directory is missing"
+    sys.exit()
+# since the scripts directory is there, try importing the modules
+sys.path.append(scripts_path)
+# PFP modules
+import constants as c
+import pfp_io
+import pfp_log
+import pfp_ck
+import pfp_utils
+
+logger = pfp_log.init_logger("pfp_log", "benchmark_diurnalcheck.log", to_file=False, to_screen=False)
+
+def make_synthetic_ds(nyears, nvars, seed=1, ts=30):
+    """
+    Purpose:
+     Return a data structure with nyears of synthetic data for nvars
+     variables.  Each variable has a diurnal cycle, heavy tailed noise (so
+     the diurnal check has something to do) and 20% missing data.
+    Usage:
+     ds = make_synthetic_ds(10, 100)
+    Author: PRI
+    Date: October 2026
+    """
+    rs = numpy.random.RandomState(seed)
+    nperday = 24*60/ts
+    nrecs = int(nyears*365*nperday)
+    dt64 = numpy.datetime64("2010-01-01T00:30") + numpy.arange(nrecs)*numpy.timedelta64(ts, "m")
+    ds = pfp_io.DataStructure()
+    ds.globalattributes["time_step"] = str(ts)
+    ds.globalattributes["nc_nrecs"] = str(nrecs)
+    flag = numpy.zeros(nrecs, dtype=numpy.int32)
+    ds.series["DateTime"] = pfp_utils.DateTimeVariable({"Data64": dt64, "Flag": flag, "Attr": {}})
+    tod = numpy.arange(nrecs) % nperday
+    for n in range(nvars):
+        data = 10*numpy.sin(2*numpy.pi*tod/float(nperday)) + rs.standard_t(3, nrecs)
+        data[rs.rand(nrecs) < 0.2] = float(c.missing_value)
+        ds.series["V"+str(n)] = {"Data": data, "Flag": flag.copy(), "Attr": {}}
+    return ds
+
+def reference_diurnalcheck(ds, series, NSd, code=5):
+    """
+    Purpose:
+     The month by month, time step by time step loop used by
+     pfp_ck.do_diurnalcheck before the grouped statistics engine, kept
+     here as the reference for the timing and the results.  The indices are
+     taken from the month index so that data with more than 1 year gives
+     the right answer.
+    Author: PRI
+    Date: October 2026
+    """
+    ts = float(ds.globalattributes['time_step'])
+    n = int((60./ts) + 0.5)
+    nInts = int((1440.0/ts)+0.5)
+    Av = numpy.array([c.missing_value]*nInts, dtype=numpy.float64)
+    Sd = numpy.array([c.missing_value]*nInts, dtype=numpy.float64)
+    ldt = ds.series["DateTime"]["Data"]
+    month = numpy.array([d.month for d in ldt])
+    Hdh = numpy.array([(d.hour + d.minute/float(60)) for d in ldt])
+    for m in range(1, 13):
+        mindex = numpy.where(month == m)[0]
+        if len(mindex) != 0:
+            lHdh = Hdh[mindex]
+            l2ds = ds.series[series]["Data"][mindex]
+            for i in range(nInts):
+                li = numpy.where((abs(lHdh-(float(i)/float(n)))<c.eps)&(l2ds!=float(c.missing_value)))
+                if numpy.size(li)!=0:
+                    Av[i] = numpy.mean(l2ds[li])
+                    Sd[i] = numpy.std(l2ds[li])
+                else:
+                    Av[i] = float(c.missing_value)
+                    Sd[i] = float(c.missing_value)
+            Lwr = Av - NSd[m-1]*Sd
+            Upr = Av + NSd[m-1]*Sd
+            hindex = numpy.array(n*lHdh,int)
+            index = mindex[numpy.where(((l2ds!=float(c.missing_value))&(l2ds<Lwr[hindex]))|
+                                       ((l2ds!=float(c.missing_value))&(l2ds>Upr[hindex])))[0]]
+            ds.series[series]["Data"][index] = numpy.float64(c.missing_value)
+            ds.series[series]["Flag"][index] = numpy.int32(code)
+    return
+
+if (__name__ == '__main__'):
+    # usage: python benchmark_diurnalcheck.py [nyears] [nvars]
+    nyears = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    nvars = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    ds_new = make_synthetic_ds(nyears, nvars)
+    ds_ref = copy.deepcopy(ds_new)
+    labels = ["V"+str(n) for n in range(nvars)]
+    cf = {"Variables": {}}
+    for label in labels:
+        cf["Variables"][label] = {"DiurnalCheck": {"NumSd": "[3]*12"}}
+    start = time.time()
+    for label in labels:
+        reference_diurnalcheck(ds_ref, label, [3]*12)
+    t_ref = time.time() - start
+    start = time.time()
+    pfp_ck.do_diurnalchecks(cf, ds_new, "Variables", labels)
+    t_new = time.time() - start
+    ndiff = 0
+    for label in labels:
+        ndiff += numpy.sum(ds_ref.series[label]["Flag"] != ds_new.series[label]["Flag"])
+    nflag = sum([numpy.sum(ds_new.series[label]["Flag"] == 5) for label in labels])
+    print "%g years, %d variables, %d records per variable" % (nyears, nvars, len(ds_new.series["V0"]["Data"]))
+    print "loop:    %8.2f s" % t_ref
+    print "grouped: %8.2f s (%.0f times faster)" % (t_new, t_ref/max([t_new, 1E-6]))
+    print "%d points rejected, %d flags different" % (nflag, ndiff)
@@ -0,0 +1,94 @@
+# standard modules
+import os
+import sys
+import time
+# 3rd party modules
+import numpy
+from scipy.optimize import curve_fit
+# check the scripts folder exists
+scripts_path = os.path.join("..", "scripts", "")
+if not os.path.exists(scripts_path):
+    print "benchmark_lloydtaylor: the scripts directory is missing"
+    sys.exit()
+# since the scripts directory is there, try importing the modules
+sys.path.append(scripts_path)
+# PFP modules
+# pfp_io is not used but it must be imported before pfp_rpLT (which imports
+# pfp_utils) so that meteorologicalfunctions is loaded first, otherwise its
+# import from pfp_utils fails
+import pfp_io
+import pfp_log
+import pfp_rpLT
+
+logger = pfp_log.init_logger("pfp_log", "benchmark_lloydtaylor.log", to_file=False, to_screen=False)
+
+def make_synthetic_data(nyears, seed=1, ts=30):
+    """
+    Purpose:
+     Return nyears of synthetic temperature and night time ER with a seasonal
+     cycle in rb, noise and 70% missing data, plus the start and end indices
+     of 15 day windows stepped by 5 days as used by ERUsingLloydTaylor.
+    Usage:
+     T, ER, valid, starts, ends = make_synthetic_data(5)
+    Author: PRI
+    Date: October 2026
+    """
+    rs = numpy.random.RandomState(seed)
+    nperday = 24*60/ts
+    nrecs = int(nyears*365*nperday)
+    doy = numpy.arange(nrecs)/float(nperday)
+    T = 15 + 10*numpy.sin(2*numpy.pi*doy/365.) + 5*numpy.sin(2*numpy.pi*doy) + rs.randn(nrecs)
+    rb = 2 + numpy.sin(2*numpy.pi*doy/365.)
+    ER = rb*numpy.exp(150*pfp_rpLT.get_LT_x(T)) + 0.5*rs.randn(nrecs)
+    valid = rs.rand(nrecs) > 0.7
+    starts = numpy.arange(0, nrecs - 15*nperday, 5*nperday)
+    ends = starts + 15*nperday - 1
+    return T, ER, valid, starts, ends
+
+def reference_fits(T, ER, valid, starts, ends, Eo):
+    """ The per window curve_fit calls used before the batched solvers."""
+    rb_fixed = numpy.full(len(starts), numpy.nan)
+    Eo_free = numpy.full(len(starts), numpy.nan)
+    rb_free = numpy.full(len(starts), numpy.nan)
+    for n, (si, ei) in enumerate(zip(starts, ends)):
+        idx = numpy.flatnonzero(valid[si:ei+1]) + si
+        x = pfp_rpLT.get_LT_x(T[idx])
+        y = ER[idx]
+        try:
+            popt, _ = curve_fit(lambda x, rb: rb*numpy.exp(Eo[n]*x), x, y, p0=[numpy.mean(y)])
+            rb_fixed[n] = popt[0]
+            popt, _ = curve_fit(lambda x, E, rb: rb*numpy.exp(E*x), x, y, p0=[100, numpy.mean(y)])
+            Eo_free[n], rb_free[n] = popt
+        except RuntimeError:
+            pass
+    return rb_fixed, Eo_free, rb_free
+
+if (__name__ == '__main__'):
+    # usage: python benchmark_lloydtaylor.py [nyears]
+    nyears = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    T, ER, valid, starts, ends = make_synthetic_data(nyears)
+    Eo = numpy.full(len(starts), 150.0)
+    start = time.time()
+    rb_fixed_ref, Eo_free_ref, rb_free_ref = reference_fits(T, ER, valid, starts, ends, Eo)
+    t_ref = time.time() - start
+    start = time.time()
+    rb_fixed, _ = pfp_rpLT.get_rb_windows(T, ER, valid, starts, ends, Eo)
+    Eo_free, rb_free, error_state, _ = pfp_rpLT.get_Eo_rb_windows(T, ER, valid, starts, ends, 100)
+    t_new = time.time() - start
+    print "%g years, %d windows" % (nyears, len(starts))
+    print "curve_fit: %8.3f s" % t_ref
+    print "batched:   %8.3f s (%.0f times faster)" % (t_new, t_ref/max([t_new, 1E-6]))
+    print "rb (fixed Eo) max relative difference %.2e" % numpy.nanmax(numpy.abs(rb_fixed - rb_fixed_ref)/rb_fixed_ref)
+    print "Eo (free) max relative difference     %.2e" % numpy.nanmax(numpy.abs(Eo_free - Eo_free_ref)/Eo_free_ref)
+    print "rb (free) max relative difference     %.2e" % numpy.nanmax(numpy.abs(rb_free - rb_free_ref)/rb_free_ref)
+    print "%d windows did not converge" % numpy.sum(error_state != 0)
+    # the batched fit should be at least as close to the minimum as curve_fit
+    nworse = 0
+    for n, (si, ei) in enumerate(zip(starts, ends)):
+        idx = numpy.flatnonzero(valid[si:ei+1]) + si
+        x = pfp_rpLT.get_LT_x(T[idx])
+        sse_ref = numpy.sum((ER[idx] - rb_free_ref[n]*numpy.exp(Eo_free_ref[n]*x))**2)
+        sse_new = numpy.sum((ER[idx] - rb_free[n]*numpy.exp(Eo_free[n]*x))**2)
+        if sse_new > sse_ref*(1 + 1E-9):
+            nworse += 1
+    print "%d windows with a larger sum of squares than curve_fit" % nworse
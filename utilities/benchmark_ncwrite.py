@@ -0,0 +1,113 @@
+# standard modules
+import os
+import sys
+import tempfile
+import time
+# 3rd party modules
+import numpy
+# check the scripts folder exists
+scripts_path = os.path.join("..", "scripts", "")
+if not os.path.exists(scripts_path):
+    print "benchmark_ncwrite: the scripts directory is missing"
+    sys.exit()
+# since the scripts directory is there, try importing the modules
+sys.path.append(scripts_path)
+# PFP modules
+import constants as c
+import pfp_io
+import pfp_log
+import pfp_utils
+
+logger = pfp_log.init_logger("pfp_log", "benchmark_ncwrite.log", to_file=False, to_screen=False)
+
+def make_synthetic_site(nyears=20, nvars=100, ts=30):
+    """
+    Purpose:
+     Return a data structure with nyears of synthetic data for nvars variables
+     at a time step of ts minutes.  About 10% of each variable is missing and
+     the QC flags take a handful of values, as they do in real files.
+    Usage:
+     ds = make_synthetic_site(nyears=20, nvars=100)
+    Author: PRI
+    Date: October 2026
+    """
+    ds = pfp_io.DataStructure()
+    nrecs = int(nyears*365*24*60/ts)
+    start = numpy.datetime64("2000-01-01T00:00", "s") + numpy.timedelta64(ts, "m")
+    dt64 = start + numpy.arange(nrecs)*numpy.timedelta64(ts, "m")
+    ds.globalattributes["nc_nrecs"] = nrecs
+    ds.globalattributes["time_step"] = ts
+    ds.globalattributes["nc_level"] = "L6"
+    ds.series["DateTime"] = pfp_utils.DateTimeVariable({"Data64": dt64,
+                                                        "Flag": numpy.zeros(nrecs, dtype=numpy.int32),
+                                                        "Attr": {"long_name": "Datetime in local timezone",
+                                                                 "units": "None"}})
+    numpy.random.seed(0)
+    # a diurnal cycle plus noise compresses about as well as real data
+    hour = numpy.arange(nrecs) % (24*60/ts)
+    diurnal = numpy.sin(2*numpy.pi*hour/(24*60/ts))
+    for n in range(nvars):
+        label = "Var" + str(n)
+        data = numpy.round(10*diurnal + numpy.random.randn(nrecs), 2)
+        flag = numpy.zeros(nrecs, dtype=numpy.int32)
+        idx = numpy.random.randint(0, nrecs, size=nrecs//10)
+        data[idx] = float(c.missing_value)
+        flag[idx] = numpy.random.choice([1, 2, 3, 30, 50], size=len(idx))
+        ds.series[label] = {"Data": data, "Flag": flag,
+                            "Attr": {"long_name": label, "units": "none"}}
+    return ds
+
+def write_legacy(ncFile, ds):
+    """
+    Purpose:
+     The writer as it was before October 2026, every variable converted to a
+     list and written uncompressed.  Used as the baseline for the benchmark.
+    Author: PRI
+    Date: October 2026
+    """
+    pfp_io.nc_write_globalattributes(ncFile, ds)
+    nrecs = int(ds.globalattributes["nc_nrecs"])
+    ncFile.createDimension("time", nrecs)
+    ncFile.createDimension("latitude", 1)
+    ncFile.createDimension("longitude", 1)
+    dims = ("time", "latitude", "longitude")
+    ldt = ds.series["DateTime"]["Data"]
+    ncVar = ncFile.createVariable("time", "d", ("time",))
+    ncVar[:] = pfp_io.netCDF4.date2num(ldt, "days since 1800-01-01 00:00:00.0", calendar="gregorian")
+    for label in sorted([l for l in ds.series.keys() if l != "DateTime"]):
+        ncVar = ncFile.createVariable(label, "d", dims)
+        ncVar[:, 0, 0] = ds.series[label]["Data"].tolist()
+        ncVar = ncFile.createVariable(label+"_QCFlag", "i", dims)
+        ncVar[:, 0, 0] = ds.series[label]["Flag"].tolist()
+    ncFile.close()
+
+def run_case(ds, name, nc_options):
+    """ Write ds with nc_options (None for the legacy writer), return time and file size."""
+    nc_name = os.path.join(tempfile.gettempdir(), "benchmark_ncwrite_" + name + ".nc")
+    start = time.time()
+    ncFile = pfp_io.nc_open_write(nc_name)
+    if nc_options is None:
+        write_legacy(ncFile, ds)
+    else:
+        pfp_io.nc_write_series(ncFile, ds, nc_options=nc_options)
+    elapsed = time.time() - start
+    size = os.path.getsize(nc_name)/1024.0/1024.0
+    os.remove(nc_name)
+    return elapsed, size
+
+if (__name__ == '__main__'):
+    # usage: python benchmark_ncwrite.py [nyears] [nvars]
+    nyears = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    nvars = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    ds = make_synthetic_site(nyears=nyears, nvars=nvars)
+    cases = [["legacy", None],
+             ["numpy", {"zlib_level": 0, "shuffle": True, "int8_flags": False}],
+             ["numpy_int8", {"zlib_level": 0, "shuffle": True, "int8_flags": True}],
+             ["zlib1", {"zlib_level": 1, "shuffle": True, "int8_flags": True}],
+             ["zlib4", {"zlib_level": 4, "shuffle": True, "int8_flags": True}],
+             ["zlib9", {"zlib_level": 9, "shuffle": True, "int8_flags": True}]]
+    print "%d years, %d variables" % (nyears, nvars)
+    print "%-12s %10s %12s" % ("case", "time", "size")
+    for name, nc_options in cases:
+        elapsed, size = run_case(ds, name, nc_options)
+        print "%-12s %8.2f s %9.1f MB" % (name, elapsed, size)
@@ -0,0 +1,124 @@
+# standard modules
+import copy
+import os
+import sys
+import time
+# 3rd party modules
+from configobj import ConfigObj
+import numpy
+# check the scripts folder exists
+scripts_path = os.path.join("..", "scripts", "")
+if not os.path.exists(scripts_path):
+    print "benchmark_qcchecks: the scripts directory is missing"
+    sys.exit()
+# since the scripts directory is there, try importing the modules
+sys.path.append(scripts_path)
+# PFP modules
+import constants as c
+import pfp_io
+import pfp_log
+import pfp_ck
+import pfp_utils
+
+logger = pfp_log.init_logger("pfp_log", "benchmark_qcchecks.log", to_file=False, to_screen=False)
+
+def make_synthetic_ds(nyears, nvars, seed=1, ts=30):
+    """
+    Purpose:
+     Return a data structure with nyears of synthetic L1 data for nvars
+     variables (V0, V1 etc) and an EddyPro style QC flag (EPQC).  Each
+     variable has a diurnal cycle, heavy tailed noise and 10% missing data.
+    Usage:
+     ds = make_synthetic_ds(1, 200)
+    Author: PRI
+    Date: October 2026
+    """
+    rs = numpy.random.RandomState(seed)
+    nperday = 24*60/ts
+    nrecs = int(nyears*365*nperday)
+    dt64 = numpy.datetime64("2016-01-01T00:30") + numpy.arange(nrecs)*numpy.timedelta64(ts, "m")
+    ds = pfp_io.DataStructure()
+    ds.globalattributes["time_step"] = str(ts)
+    ds.globalattributes["nc_nrecs"] = str(nrecs)
+    ds.globalattributes["nc_level"] = "L2"
+    zeros = numpy.zeros(nrecs, dtype=numpy.int32)
+    ds.series["DateTime"] = pfp_utils.DateTimeVariable({"Data64": dt64, "Flag": zeros.copy(), "Attr": {}})
+    tod = numpy.arange(nrecs) % nperday
+    for n in range(nvars):
+        data = 10*numpy.sin(2*numpy.pi*tod/float(nperday)) + 3*rs.standard_t(3, nrecs)
+        flag = zeros.copy()
+        idx = rs.rand(nrecs) < 0.1
+        data[idx] = float(c.missing_value)
+        flag[idx] = numpy.int32(1)
+        ds.series["V"+str(n)] = {"Data": data, "Flag": flag, "Attr": {}}
+    epqc = rs.randint(0, 3, nrecs).astype(numpy.float64)
+    ds.series["EPQC"] = {"Data": epqc, "Flag": zeros.copy(), "Attr": {}}
+    return ds
+
+def make_control_file(nvars):
+    """
+    Purpose:
+     Return an L2 control file with a mix of the QC checks for nvars
+     variables.  Every variable has a range check, every third a diurnal
+     check and the others have lower, upper, EPQCFlag, exclude dates,
+     exclude hours and dependency checks.  The dependency checks form
+     chains where a variable depends on one earlier in the list.
+    Usage:
+     cf = make_control_file(200)
+    Author: PRI
+    Date: October 2026
+    """
+    cf = ConfigObj()
+    cf["Variables"] = {}
+    for n in range(nvars):
+        cfv = {"RangeCheck": {"lower": "[-15]*12", "upper": "12,12,12,12,13,13,13,13,12,12,12,12"}}
+        if n % 3 == 0:
+            cfv["DiurnalCheck"] = {"NumSd": "[3]*12"}
+        if n % 7 == 1:
+            cfv["LowerCheck"] = {"0": "2016-02-01 00:00,-5,2016-03-01 00:00,0"}
+        if n % 7 == 2:
+            cfv["UpperCheck"] = {"0": ["2016-04-01 00:00", "5", "2016-05-01 00:00", "0"]}
+        if n % 6 == 5:
+            cfv["EPQCFlagCheck"] = {"source": "EPQC", "reject": "2"}
+        if n % 8 == 3:
+            cfv["ExcludeDates"] = {"0": "2016-06-01 00:00,2016-06-10 12:00"}
+        if n % 9 == 4:
+            cfv["ExcludeHours"] = {"0": "2016-01-01 00:30,2016-12-31 00:00,12:00,12:30"}
+        if n % 4 == 2 and n > 4:
+            cfv["DependencyCheck"] = {"source": "V"+str(n-4)}
+        cf["Variables"]["V"+str(n)] = cfv
+    return cf
+
+def run_per_series(cf, ds):
+    """ The per series QC loops used by pfp_ck.do_qcchecks before the QC plan."""
+    series_list = cf["Variables"].keys()
+    for series in series_list:
+        pfp_ck.do_qcchecks_oneseries(cf, ds, "Variables", series)
+    for series in series_list:
+        pfp_ck.do_dependencycheck(cf, ds, "Variables", series, code=23, mode="quiet")
+    return
+
+if (__name__ == '__main__'):
+    # usage: python benchmark_qcchecks.py [nvars] [nyears]
+    nvars = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    nyears = float(sys.argv[2]) if len(sys.argv) > 2 else 1
+    cf = make_control_file(nvars)
+    ds_plan = make_synthetic_ds(nyears, nvars)
+    ds_loop = copy.deepcopy(ds_plan)
+    start = time.time()
+    run_per_series(cf, ds_loop)
+    t_loop = time.time() - start
+    start = time.time()
+    pfp_ck.do_qcchecks(cf, ds_plan, mode="quiet")
+    t_plan = time.time() - start
+    labels = ["V"+str(n) for n in range(nvars)]
+    ndiff = 0
+    for label in labels:
+        ndiff += numpy.sum(ds_loop.series[label]["Flag"] != ds_plan.series[label]["Flag"])
+    print "%d variables, %d records per variable" % (nvars, len(ds_plan.series["V0"]["Data"]))
+    print "per series: %8.2f s" % t_loop
+    print "QC plan:    %8.2f s (%.0f times faster)" % (t_plan, t_loop/max([t_plan, 1E-6]))
+    for code in [2, 5, 6, 7, 9, 23]:
+        nflag = sum([numpy.sum(ds_plan.series[label]["Flag"] == code) for label in labels])
+        print "  flag %2d: %d points" % (code, nflag)
+    print "%d flags different from the per series loop" % ndiff
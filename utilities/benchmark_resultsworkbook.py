@@ -0,0 +1,109 @@
+# standard modules
+import csv
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+# 3rd party modules
+import numpy
+import xlrd
+import xlwt
+# check the scripts folder exists
+scripts_path = os.path.join("..", "scripts", "")
+if not os.path.exists(scripts_path):
+    print "benchmark_resultsworkbook: the scripts directory is missing"
+    sys.exit()
+# since the scripts directory is there, try importing the modules
+sys.path.append(scripts_path)
+# PFP modules
+import pfp_io
+import pfp_log
+
+logger = pfp_log.init_logger("pfp_log", "benchmark_resultsworkbook.log", to_file=False, to_screen=False)
+
+def make_synthetic_data(nrecs, nvars, seed=1, ts=30):
+    """
+    Purpose:
+     Return a data dictionary in the form used by pfp_io.xl_write_data with
+     nrecs time steps of nvars variables (V0, V1 etc) and 10% missing data.
+    Usage:
+     data = make_synthetic_data(17520, 20)
+    Author: PRI
+    Date: October 2026
+    """
+    rs = numpy.random.RandomState(seed)
+    start = datetime.datetime(2015, 1, 1, 0, 30)
+    dt = [start + datetime.timedelta(minutes=ts*i) for i in range(nrecs)]
+    data = {"DateTime": {"data": dt, "attr": {"units": "Days", "format": "dd/mm/yyyy hh:mm"}}}
+    for n in range(nvars):
+        values = numpy.ma.masked_where(rs.rand(nrecs) < 0.1, rs.randn(nrecs))
+        data["V"+str(n)] = {"data": values, "attr": {"units": "gC/m2", "format": "0.00"}}
+    return data
+
+def reference_write(xl_name, data):
+    """ The cell by cell xlwt writes used by pfp_io.xl_write_data before the ResultsWorkbook."""
+    xl_file = xlwt.Workbook()
+    xl_sheet = xl_file.add_sheet("Data")
+    xl_sheet.write(1, 0, data["DateTime"]["attr"]["units"])
+    nrows = len(data["DateTime"]["data"])
+    d_xf = xlwt.easyxf(num_format_str=data["DateTime"]["attr"]["format"])
+    for j in range(nrows):
+        xl_sheet.write(j+2, 0, data["DateTime"]["data"][j], d_xf)
+    labels = sorted([label for label in data.keys() if label != "DateTime"])
+    for xlCol, label in enumerate(labels):
+        xl_sheet.write(0, xlCol+1, data[label]["attr"]["units"])
+        xl_sheet.write(1, xlCol+1, label)
+        d_xf = xlwt.easyxf(num_format_str=data[label]["attr"]["format"])
+        tmp = numpy.ma.filled(data[label]["data"], fill_value=numpy.NaN)
+        for j in range(nrows):
+            xl_sheet.write(j+2, xlCol+1, tmp[j], d_xf)
+    xl_file.save(xl_name)
+    return
+
+def read_numbers(file_name):
+    """ Return the numeric cells of the Data sheet (or CSV file) as a 2D array, NaN for empty cells."""
+    if file_name.endswith(".csv"):
+        rows = [row for row in csv.reader(open(file_name, "rb"))][2:]
+        values = [[float(v) if len(v) != 0 else numpy.nan for v in row[1:]] for row in rows]
+        return numpy.array(values)
+    xl_sheet = xlrd.open_workbook(file_name).sheet_by_name("Data")
+    values = numpy.full((xl_sheet.nrows-2, xl_sheet.ncols-1), numpy.nan)
+    for col in range(1, xl_sheet.ncols):
+        for row, cell in enumerate(xl_sheet.col(col)[2:]):
+            if cell.ctype == xlrd.XL_CELL_NUMBER:
+                values[row, col-1] = cell.value
+    return values
+
+if (__name__ == '__main__'):
+    # usage: python benchmark_resultsworkbook.py [nrecs] [nvars]
+    nrecs = int(sys.argv[1]) if len(sys.argv) > 1 else 17520
+    nvars = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    data = make_synthetic_data(nrecs, nvars)
+    out_path = tempfile.mkdtemp()
+    start = time.time()
+    reference_write(os.path.join(out_path, "reference.xls"), data)
+    t_ref = time.time() - start
+    reference = read_numbers(os.path.join(out_path, "reference.xls"))
+    print "%d rows, %d variables" % (nrecs, nvars)
+    print "xlwt cell by cell: %8.2f s" % t_ref
+    for results_format in ["xls", "xlsx", "csv"]:
+        xl_file = pfp_io.xl_open_write(os.path.join(out_path, "results.xls"), results_format=results_format)
+        start = time.time()
+        pfp_io.xl_write_data(xl_file.add_sheet("Data"), data)
+        xl_file.save()
+        elapsed = time.time() - start
+        if results_format == "csv":
+            file_name = xl_file.file_name + "_Data.csv"
+        else:
+            file_name = xl_file.file_name
+        # NaN cells are written as empty cells in xlsx and csv files
+        values = read_numbers(file_name)
+        ok = numpy.isfinite(reference) & numpy.isfinite(values)
+        same_missing = numpy.all(numpy.isfinite(reference) == numpy.isfinite(values))
+        # numbers are written to the CSV files at full precision so the difference should be 0
+        max_diff = numpy.max(numpy.abs(reference[ok] - values[ok]))
+        print "%-4s %12.2f s (%.1f times faster), max difference %.1e, missing data the same: %s" % \
+              (results_format, elapsed, t_ref/max([elapsed, 1E-6]), max_diff, same_missing)
+    shutil.rmtree(out_path)
@@ -0,0 +1,74 @@
+# standard modules
+import datetime
+import os
+import sys
+import time
+# 3rd party modules
+import numpy
+# check the scripts folder exists
+scripts_path = os.path.join("..", "scripts", "")
+if not os.path.exists(scripts_path):
+    print "compare_solar_position: the scripts directory is missing"
+    sys.exit()
+# since the scripts directory is there, try importing the modules
+sys.path.append(scripts_path)
+# PFP modules
+import pfp_log
+import pfp_solar
+import pysolar
+
+logger = pfp_log.init_logger("pfp_log", "compare_solar_position.log", to_file=False, to_screen=False)
+
+def make_times(nrecs, seed=1):
+    """
+    Purpose:
+     Return nrecs random UTC times between 1990 and 2030 as a datetime64
+     array and as a list of Python datetimes.
+    Usage:
+     dt64, ldt = make_times(10000)
+    Author: PRI
+    Date: October 2026
+    """
+    rs = numpy.random.RandomState(seed)
+    start = numpy.datetime64("1990-01-01T00:00:00", "us")
+    seconds = rs.randint(0, 40*365*86400, nrecs).astype(numpy.int64)
+    dt64 = start + (seconds*1000000).astype("timedelta64[us]")
+    ldt = dt64.astype(datetime.datetime).tolist()
+    return dt64, ldt
+
+def run_pysolar(lat, lon, ldt):
+    """ Return the altitude, azimuth and clear sky Fsd from pysolar and the elapsed time."""
+    start = time.time()
+    altitude = numpy.array([pysolar.GetAltitude(lat, lon, dt) for dt in ldt])
+    azimuth = numpy.array([pysolar.GetAzimuth(lat, lon, dt) for dt in ldt])
+    Fsd_syn = numpy.array([pysolar.GetRadiationDirect(dt, alt) for dt, alt in zip(ldt, altitude)])
+    return altitude, azimuth, Fsd_syn, time.time() - start
+
+def run_pfp_solar(lat, lon, dt64):
+    """ Return the altitude, azimuth and clear sky Fsd from pfp_solar and the elapsed time."""
+    start = time.time()
+    altitude, azimuth = pfp_solar.get_solar_position(lat, lon, dt64)
+    Fsd_syn = pfp_solar.get_radiation_direct(dt64, altitude)
+    return altitude, azimuth, Fsd_syn, time.time() - start
+
+def angle_difference(a, b):
+    """ Return the absolute difference between 2 angles in degrees allowing for wrap around."""
+    return numpy.abs((a - b + 180) % 360 - 180)
+
+if (__name__ == '__main__'):
+    # usage: python compare_solar_position.py [nrecs]
+    nrecs = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    dt64, ldt = make_times(nrecs)
+    sites = [["Howard Springs", -12.495, 131.150], ["Tumbarumba", -35.657, 148.152],
+             ["Boston", 42.365, -71.113], ["Svalbard", 78.9, 11.9], ["Equator", 0.0, 0.0]]
+    print "%d random times from 1990 to 2030" % nrecs
+    for name, lat, lon in sites:
+        alt_p, azi_p, fsd_p, t_p = run_pysolar(lat, lon, ldt)
+        alt_n, azi_n, fsd_n, t_n = run_pfp_solar(lat, lon, dt64)
+        # the refraction correction is singular when the altitude is close to -5.11 degrees
+        ok = numpy.abs(alt_p + 5.11) > 0.5
+        print "%s (%.3f, %.3f)" % (name, lat, lon)
+        print "  altitude max difference %.2e deg" % numpy.max(numpy.abs(alt_p - alt_n)[ok])
+        print "  azimuth max difference  %.2e deg" % numpy.max(angle_difference(azi_p, azi_n))
+        print "  Fsd_syn max difference  %.2e W/m2" % numpy.max(numpy.abs(fsd_p - fsd_n))
+        print "  pysolar %.3f s, pfp_solar %.3f s (%.0f times faster)" % (t_p, t_n, t_p/max([t_n, 1E-6]))
@@ -0,0 +1,134 @@
+# standard modules
+import os
+import platform
+import subprocess
+import sys
+import time
+# 3rd party modules
+import numpy
+# check the scripts folder exists
+scripts_path = os.path.join("..", "scripts", "")
+if not os.path.exists(scripts_path):
+    print "compare_solo_engines: the scripts directory is missing"
+    sys.exit()
+# since the scripts directory is there, try importing the modules
+sys.path.append(scripts_path)
+# PFP modules
+import constants as c
+# pfp_io is not used but it must be imported before pfp_utils so that
+# meteorologicalfunctions is loaded first, otherwise its import from
+# pfp_utils fails
+import pfp_io
+import pfp_log
+import pfp_solo
+import pfp_utils
+
+logger = pfp_log.init_logger("pfp_log", "compare_solo_engines.log", to_file=False, to_screen=False)
+
+def make_synthetic_drivers(nda=1440, gap_fraction=0.3, seed=1):
+    """
+    Purpose:
+     Return synthetic drivers (Fsd, Ta, VPD) and a target (Fc) with a diurnal
+     cycle, a light response and a temperature response.  A fraction of the
+     target is set to missing so that SEQSOLO has gaps to fill.
+    Usage:
+     drivers, target = make_synthetic_drivers(nda=1440)
+    Author: PRI
+    Date: October 2026
+    """
+    rs = numpy.random.RandomState(seed)
+    tod = numpy.arange(nda) % 48
+    Fsd = numpy.maximum(0, 800*numpy.sin(2*numpy.pi*(tod-12)/48.0)) + rs.rand(nda)
+    Ta = 15 + 8*numpy.sin(2*numpy.pi*(tod-18)/48.0) + rs.randn(nda)
+    VPD = 1 + 0.1*Ta + 0.2*rs.rand(nda)
+    Fc = -10*Fsd/(Fsd+300) + 2*numpy.exp(0.07*Ta) + rs.randn(nda)
+    Fc[rs.rand(nda) < gap_fraction] = float(c.missing_value)
+    return numpy.column_stack([Fsd, Ta, VPD]), Fc
+
+def write_inf_files(wd, s):
+    """ Write minimal sofm, solo and seqsolo inf files in the work directory wd."""
+    p = lambda name: os.path.join(wd, name)
+    lines = [s["node"], s["training"], 20, 0.01, 1234, p("sofm_input.csv"),
+             p("sofm_1.out"), p("sofm_2.out"), p("sofm_3.out"), p("sofm_4.out"), 50]
+    with open(p("sofm.inf"), "w") as f:
+        f.write("\n".join([str(l) for l in lines]) + "\n")
+    outputs = ["eigenValue.out", "eigenVector.out", "accumErr.out", "accumRR.out",
+               "trainProcess.out", "freqTable.out", "hidOutputWt.out", "errorMap.out",
+               "finResult.out", "trainWin.out", "trainWout.out"]
+    lines = [s["node"], s["nda_factor"], p("sofm_4.out"), p("solo_input.csv"),
+             "training", 5678, 0] + [p(o) for o in outputs]
+    with open(p("solo.inf"), "w") as f:
+        f.write("\n".join([str(l) for l in lines]) + "\n")
+    outputs = ["eigenValue.out", "eigenVector.out", "trainWout.out", "freqTable.out",
+               "errorMap.out", "finResult.out", "trainingRMSE.out", "seqOut0.out",
+               "seqOut1.out", "seqOut2.out", "seqHidOutW.out", "seqFreqMap.out"]
+    lines = [s["node"], 0, s["learning_rate"], s["iterations"], p("sofm_4.out"),
+             p("seqsolo_input.csv"), "simulation", 9100, 0] + [p(o) for o in outputs]
+    lines.append(c.missing_value)
+    with open(p("seqsolo.inf"), "w") as f:
+        f.write("\n".join([str(l) for l in lines]) + "\n")
+    return
+
+def run_binary(drivers, target, s, bin_path):
+    """
+    Purpose:
+     Run the SOFM, SOLO and SEQSOLO executables on the drivers and target,
+     return the SEQSOLO output, the SOFM weights and the elapsed time.
+    Author: PRI
+    Date: October 2026
+    """
+    ws = pfp_utils.Workspace("solo", [])
+    wd = ws.root
+    write_inf_files(wd, s)
+    good = numpy.where(abs(target - float(c.missing_value)) > c.eps)[0]
+    data = numpy.column_stack([drivers, target])
+    numpy.savetxt(os.path.join(wd, "sofm_input.csv"), drivers, delimiter=",")
+    numpy.savetxt(os.path.join(wd, "solo_input.csv"), data[good], delimiter=",")
+    numpy.savetxt(os.path.join(wd, "seqsolo_input.csv"), data, delimiter=",")
+    suffix = ".exe" if platform.system() == "Windows" else ""
+    start = time.time()
+    with open(os.devnull, "w") as devnull:
+        for name in ["sofm", "solo", "seqsolo"]:
+            subprocess.call([os.path.join(bin_path, name + suffix),
+                             os.path.join(wd, name + ".inf")], stdout=devnull)
+    elapsed = time.time() - start
+    node = s["node"]
+    Wi = numpy.loadtxt(os.path.join(wd, "sofm_4.out"))
+    Wi = Wi.reshape((drivers.shape[1], node, node)).transpose((1, 2, 0))
+    output = numpy.genfromtxt(os.path.join(wd, "seqOut2.out"))[:, 1]
+    ws.cleanup()
+    return output, Wi, elapsed
+
+def run_numpy(drivers, target, s):
+    """ Run the pfp_solo engine, return the SEQSOLO output, the SOFM weights and the elapsed times."""
+    start = time.time()
+    Wi = pfp_solo.sofm(drivers, s["node"], s["training"])
+    t_sofm = time.time()
+    good = numpy.where(abs(target - float(c.missing_value)) > c.eps)[0]
+    network = pfp_solo.solo(drivers[good], target[good], Wi, s["nda_factor"])
+    t_solo = time.time()
+    output = pfp_solo.seqsolo(drivers, target, Wi, network, s["learning_rate"], s["iterations"])
+    t_seqsolo = time.time()
+    return output, Wi, [t_sofm-start, t_solo-t_sofm, t_seqsolo-t_solo]
+
+if (__name__ == '__main__'):
+    # usage: python compare_solo_engines.py [nda] [training] [bin_path]
+    nda = int(sys.argv[1]) if len(sys.argv) > 1 else 1440
+    training = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    bin_path = sys.argv[3] if len(sys.argv) > 3 else os.path.join("..", "solo", "bin")
+    s = {"node": 4, "training": training, "nda_factor": 5,
+         "learning_rate": 0.001, "iterations": 500}
+    drivers, target = make_synthetic_drivers(nda=nda)
+    output_b, Wi_b, elapsed_b = run_binary(drivers, target, s, bin_path)
+    output_n, Wi_n, elapsed_n = run_numpy(drivers, target, s)
+    print "%d records, %d training iterations" % (nda, training)
+    print "binary: %8.3f s" % elapsed_b
+    print "numpy:  %8.3f s (sofm %.3f s, solo %.3f s, seqsolo %.3f s)" % (sum(elapsed_n),
+                                                                          elapsed_n[0], elapsed_n[1], elapsed_n[2])
+    # the executables write the SOFM weights with 5 decimal places
+    print "SOFM weights max difference: %.2e" % numpy.max(numpy.abs(Wi_b - Wi_n))
+    diff = numpy.abs(output_b - output_n)
+    print "SEQSOLO output differences: max %.2e, 99th percentile %.2e, median %.2e" % (numpy.max(diff),
+                                                                                        numpy.percentile(diff, 99),
+                                                                                        numpy.median(diff))
+    print "SEQSOLO output range: %.3f to %.3f" % (numpy.min(output_b), numpy.max(output_b))
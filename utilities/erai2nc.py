@@ -20,7 +20,7 @@ if not os.path.exists("../scripts/"):
 sys.path.append('../scripts')
 # PFP
 import meteorologicalfunctions as mf
-import pysolar
+import pfp_solar
 import qcio
 import qclog
 import qcutils
@@ -187,9 +187,9 @@ for n, erai_name in enumerate(erai_list):
         # get the solar altitude, we will use this later to interpolate the ERA Interim solar
         # data from the ERA-I 3 hour time step to the tower time step.
         # NOTE: alt_solar is in degrees
-        alt_solar_3hr = numpy.array([pysolar.GetAltitude(erai_latitude,erai_longitude,dt) for dt in dt_erai_utc_cor])
+        alt_solar_3hr = pfp_solar.get_altitude(erai_latitude,erai_longitude,dt_erai_utc_cor)
         # get the solar altitude at the tower time step
-        alt_solar_tts = numpy.array([pysolar.GetAltitude(erai_latitude,erai_longitude,dt) for dt in dt_erai_utc_tts])
+        alt_solar_tts = pfp_solar.get_altitude(erai_latitude,erai_longitude,dt_erai_utc_tts)
         idx = numpy.where(alt_solar_tts<=0)[0]
         alt_solar_tts[idx] = float(0)
 